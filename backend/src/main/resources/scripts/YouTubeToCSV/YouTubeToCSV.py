@@ -4,21 +4,28 @@ import json
 import logging
 import os
 import re
+import sys
 import time
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from urllib.error import HTTPError, URLError
 from urllib.parse import parse_qs, urlparse
-from urllib.request import Request, urlopen
 
 from googleapiclient.discovery import build
 from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, YouTubeTranscriptApi
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from openai_helpers.http_client import default_client  # noqa: E402
+from openai_helpers.rate_limit import RateLimiter, normalize_retry_after_seconds, parse_retry_after_seconds  # noqa: E402
+
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 DEFAULT_OPENAI_MODEL = "gpt-4.1-mini"
 OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+# Shared RPM/TPM budget for openai_chat (override via OPENAI_YOUTUBE_RPM / OPENAI_YOUTUBE_TPM).
+DEFAULT_OPENAI_RPM = 30
+DEFAULT_OPENAI_TPM = 0
 
 RESERVED_SOURCE_ID_START_BY_AUTHOR_ID: Dict[int, int] = {
     # sauthorID -> reserved start sourceID (range size defined below)
@@ -292,6 +299,7 @@ def openai_chat(
     temperature: float = 0.2,
     timeout_s: int = 60,
     max_attempts: int = 3,
+    limiter: Optional[RateLimiter] = None,
 ) -> str:
     payload = {
         "model": model,
@@ -308,26 +316,39 @@ def openai_chat(
         "Content-Type": "application/json",
     }
 
+    prompt_chars = len(system) + len(user)
     last_err: Optional[str] = None
     for attempt in range(1, max_attempts + 1):
+        reservation = (
+            limiter.wait_for_slot(limiter.estimate_tokens(system + user), prompt_chars=prompt_chars) if limiter else None
+        )
         try:
-            req = Request(OPENAI_API_URL, data=data, headers=headers, method="POST")
-            with urlopen(req, timeout=timeout_s) as resp:
-                body = resp.read().decode("utf-8", errors="replace")
-                parsed = json.loads(body)
-                content = (
-                    parsed.get("choices", [{}])[0]
-                    .get("message", {})
-                    .get("content", "")
-                )
-                return (content or "").strip()
+            resp = default_client().request("POST", OPENAI_API_URL, body=data, headers=headers, timeout=timeout_s)
+            body = resp.read().decode("utf-8", errors="replace")
+            parsed = json.loads(body)
+            if limiter and reservation:
+                limiter.record_usage(reservation, parsed.get("usage"))
+            content = (
+                parsed.get("choices", [{}])[0]
+                .get("message", {})
+                .get("content", "")
+            )
+            return (content or "").strip()
         except HTTPError as e:
             raw = e.read().decode("utf-8", errors="replace") if hasattr(e, "read") else ""
             last_err = f"HTTP {e.code}: {raw[:500]}"
             if e.code == 429 and attempt < max_attempts:
-                wait_s = min(20, attempt * 3)
-                logging.warning("OpenAI 429; retrying in %ss (attempt %s/%s)", wait_s, attempt, max_attempts)
-                time.sleep(wait_s)
+                wait_s = parse_retry_after_seconds(e.headers) or min(20, attempt * 3)
+                try:
+                    err = json.loads(raw).get("error", {})
+                    wait_s = normalize_retry_after_seconds(err.get("retry_after")) or wait_s
+                except Exception:
+                    pass
+                logging.warning("OpenAI 429; retrying in %.1fs (attempt %s/%s)", wait_s, attempt, max_attempts)
+                if limiter:
+                    limiter.backoff(retry_after=wait_s)
+                else:
+                    time.sleep(wait_s)
                 continue
             if e.code in (401, 403):
                 raise RuntimeError(f"OpenAI auth error ({e.code}). Check OPENAI_API_KEY.") from e
@@ -335,6 +356,9 @@ def openai_chat(
             last_err = f"Network error: {e}"
         except Exception as e:
             last_err = f"Unexpected error: {e}"
+        finally:
+            if limiter and reservation:
+                limiter.release(reservation)  # no-op once usage was recorded
 
         if attempt < max_attempts:
             time.sleep(1.5 * attempt)
@@ -350,6 +374,7 @@ def generate_abstract_two_step(
     description: str,
     transcript: str,
     max_input_chars: int = 12000,
+    limiter: Optional[RateLimiter] = None,
 ) -> str:
     base = []
     if title:
@@ -375,7 +400,9 @@ def generate_abstract_two_step(
         "- If the provided content is insufficient to summarize, return an empty string.\n\n"
         f"CONTENT:\n{source_text}"
     )
-    draft = openai_chat(api_key, model, system, draft_prompt, temperature=0.2, timeout_s=90, max_attempts=3)
+    draft = openai_chat(
+        api_key, model, system, draft_prompt, temperature=0.2, timeout_s=90, max_attempts=3, limiter=limiter
+    )
     draft = (draft or "").strip()
 
     if not draft:
@@ -389,7 +416,9 @@ def generate_abstract_two_step(
         "- Return ONLY the shortened text.\n\n"
         f"SUMMARY:\n{draft}"
     )
-    shortened = openai_chat(api_key, model, system, compress_prompt, temperature=0.0, timeout_s=60, max_attempts=3)
+    shortened = openai_chat(
+        api_key, model, system, compress_prompt, temperature=0.0, timeout_s=60, max_attempts=3, limiter=limiter
+    )
     shortened = (shortened or "").strip()
 
     if len(shortened) > 500:
@@ -450,6 +479,10 @@ def main() -> int:
     youtube_key = (config.get("YOUTUBE_DATA_API_KEY") or "").strip()
     openai_key = (config.get("OPENAI_API_KEY") or "").strip()
     openai_model = (config.get("OPENAI_YOUTUBE_MODEL") or DEFAULT_OPENAI_MODEL).strip()
+    openai_limiter = RateLimiter(
+        int(config.get("OPENAI_YOUTUBE_RPM") or DEFAULT_OPENAI_RPM),
+        int(config.get("OPENAI_YOUTUBE_TPM") or DEFAULT_OPENAI_TPM),
+    )
 
     if not youtube_key and not args.dry_run:
         logging.error("YOUTUBE_DATA_API_KEY is required. Set it in backend/.env.")
@@ -554,6 +587,7 @@ def main() -> int:
                 title=title,
                 description=description,
                 transcript=transcript,
+                limiter=openai_limiter,
             )
         except Exception as e:
             logging.error("Error generating abstract for %s: %s", video_url, e)
@@ -615,6 +649,8 @@ def main() -> int:
         logging.info("No pending URLs found in %s.", import_file)
     else:
         logging.info("Processed %s URL(s).", processed)
+    if not args.dry_run:
+        logging.info("OpenAI HTTP: %s", default_client().stats.summary())
 
     return 0
 
@@ -1,19 +1,22 @@
 from __future__ import annotations
 
-import random
-import time
-from typing import List, Tuple
+import sys
+from pathlib import Path
+from typing import List
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # scripts/ (shared embedding_helpers)
+from embedding_helpers.ordering import best_orders  # noqa: E402
+from embedding_helpers.store import open_store  # noqa: E402
 
 # User-configurable settings
 MAX_SECONDS = 300
-RANDOM_STARTS = 200
+RANDOM_STARTS = 20000  # after one greedy start per tag; each runs 2-opt + Or-opt to a local optimum
 SEED = 42
 TOP_RESULTS = 3
-TWO_OPT_PASSES = 3
-SCORE_MODE = "product"  # "sum" or "product"
+SCORE_MODE = "product"  # "sum" or "product" (optimized as a sum of logs)
+WORKERS = 0  # processes for the restarts; 0 = all cores
 
 BASE_TAG_ORDER = [
     "Music",
@@ -48,7 +51,6 @@ BASE_TAG_ORDER = [
 ]
 
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
-EPS = 1e-9
 
 
 def normalize_names(names: List[str]) -> List[str]:
@@ -79,105 +81,6 @@ def score_path(order: List[int], sim: np.ndarray, mode: str) -> float:
     return sum(float(sim[order[i], order[i + 1]]) for i in range(len(order) - 1))
 
 
-def greedy_path(start: int, sim: np.ndarray) -> List[int]:
-    n = sim.shape[0]
-    remaining = set(range(n))
-    remaining.remove(start)
-    path = [start]
-    current = start
-    while remaining:
-        next_idx = max(remaining, key=lambda j: sim[current, j])
-        remaining.remove(next_idx)
-        path.append(next_idx)
-        current = next_idx
-    return path
-
-
-def two_opt(order: List[int], sim: np.ndarray, deadline: float, max_passes: int) -> List[int]:
-    n = len(order)
-    improved = True
-    passes = 0
-    while improved and passes < max_passes:
-        if time.time() >= deadline:
-            break
-        improved = False
-        for i in range(n - 1):
-            if time.time() >= deadline:
-                return order
-            a = order[i - 1] if i > 0 else None
-            b = order[i]
-            for k in range(i + 1, n):
-                if time.time() >= deadline:
-                    return order
-                c = order[k]
-                d = order[k + 1] if k + 1 < n else None
-                old = 0.0
-                new = 0.0
-                if a is not None:
-                    old += float(sim[a, b])
-                    new += float(sim[a, c])
-                if d is not None:
-                    old += float(sim[c, d])
-                    new += float(sim[b, d])
-                if new > old + EPS:
-                    order[i : k + 1] = reversed(order[i : k + 1])
-                    improved = True
-        passes += 1
-    return order
-
-
-def best_orders(
-    sim: np.ndarray,
-    max_seconds: int,
-    random_starts: int,
-    seed: int,
-    top_results: int,
-    score_mode: str,
-) -> List[Tuple[float, List[int]]]:
-    n = sim.shape[0]
-    rng = random.Random(seed)
-    best = list(range(n))
-    best_score = score_path(best, sim, score_mode)
-    seen: set[Tuple[int, ...]] = {tuple(best)}
-    top: List[Tuple[float, List[int]]] = [(best_score, best)]
-
-    start_time = time.time()
-    deadline = start_time + max_seconds
-
-    for start in range(n):
-        if time.time() >= deadline:
-            break
-        candidate = greedy_path(start, sim)
-        candidate = two_opt(candidate, sim, deadline, TWO_OPT_PASSES)
-        cand_score = score_path(candidate, sim, score_mode)
-        cand_key = tuple(candidate)
-        if cand_key not in seen:
-            seen.add(cand_key)
-            top.append((cand_score, candidate))
-        if cand_score > best_score:
-            best = candidate
-            best_score = cand_score
-
-    while time.time() < deadline and random_starts > 0:
-        random_starts -= 1
-        if time.time() >= deadline:
-            break
-        candidate = list(range(n))
-        rng.shuffle(candidate)
-        candidate = two_opt(candidate, sim, deadline, TWO_OPT_PASSES)
-        cand_score = score_path(candidate, sim, score_mode)
-        cand_key = tuple(candidate)
-        if cand_key not in seen:
-            seen.add(cand_key)
-            top.append((cand_score, candidate))
-        if cand_score > best_score:
-            best = candidate
-            best_score = cand_score
-
-    top.sort(key=lambda item: (-item[0], item[1]))
-    return top[:max(top_results, 1)]
-
-
 def main() -> None:
     original_names = [name.strip() for name in BASE_TAG_ORDER if name.strip()]
     names = normalize_names(BASE_TAG_ORDER)
@@ -185,19 +88,27 @@ def main() -> None:
         print("Need at least 2 tags in BASE_TAG_ORDER.")
         return
 
-    model = SentenceTransformer(MODEL_NAME)
-    emb = model.encode(names, normalize_embeddings=True)
+    emb = open_store(MODEL_NAME).encode(names)
     sim = cosine_sim_matrix(emb)
     sim = normalize_similarity_rows(sim)
 
     base_order = list(range(len(names)))
     base_score = score_path(base_order, sim, SCORE_MODE)
 
-    best = best_orders(sim, MAX_SECONDS, RANDOM_STARTS, SEED, TOP_RESULTS, SCORE_MODE)
+    best, restarts = best_orders(
+        sim,
+        SCORE_MODE,
+        max_seconds=MAX_SECONDS,
+        random_starts=RANDOM_STARTS,
+        seed=SEED,
+        top_results=TOP_RESULTS,
+        workers=WORKERS or None,
+    )
 
     print(f"Base score: {base_score:0.4f}")
-    for rank, (score, order) in enumerate(best, start=1):
-        print(f"Result {rank} (score {score:0.4f}):")
+    print(f"Restarts completed: {restarts}")
+    for rank, (_objective, order) in enumerate(best, start=1):
+        print(f"Result {rank} (score {score_path(order, sim, SCORE_MODE):0.4f}):")
         for idx in order:
             print(f'    "{original_names[idx]}",')
 
@@ -0,0 +1,92 @@
+"""
+Benchmark of embedding_helpers/ordering.py against the former base_tag_order.py search
+(pure-Python greedy + 2-opt per start node) on random row-normalized similarities.
+
+    python embedding/testing/ordering_benchmark.py --nodes 60 --seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # scripts/ (shared embedding_helpers)
+from embedding_helpers.ordering import EPS, best_orders, edge_weights, path_score  # noqa: E402
+
+
+def legacy_greedy_two_opt(sim: np.ndarray, deadline: float, passes: int = 3) -> List[List[int]]:
+    """The former pure-Python greedy + 2-opt per start node (symmetric deltas), for the benchmark."""
+    n = sim.shape[0]
+    results = []
+    for start in range(n):
+        remaining = set(range(n)) - {start}
+        order = [start]
+        while remaining:
+            nxt = max(remaining, key=lambda j: sim[order[-1], j])
+            remaining.remove(nxt)
+            order.append(nxt)
+        for _ in range(passes):
+            improved = False
+            for i in range(n - 1):
+                a = order[i - 1] if i > 0 else None
+                for k in range(i + 1, n):
+                    if time.time() >= deadline:
+                        return results
+                    b, c = order[i], order[k]
+                    d = order[k + 1] if k + 1 < n else None
+                    old = (float(sim[a, b]) if a is not None else 0.0) + (float(sim[c, d]) if d is not None else 0.0)
+                    new = (float(sim[a, c]) if a is not None else 0.0) + (float(sim[b, d]) if d is not None else 0.0)
+                    if new > old + EPS:
+                        order[i : k + 1] = reversed(order[i : k + 1])
+                        improved = True
+            if not improved:
+                break
+        results.append(order)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ordering solver on random row-normalized similarities.")
+    parser.add_argument("--nodes", type=int, default=60, help="Number of nodes (default: 60).")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Time budget per solver (default: 10).")
+    parser.add_argument("--mode", choices=("sum", "product"), default="product", help="Score mode (default: product).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed (default: 42).")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    points = rng.standard_normal((args.nodes, 16)) + 2.0
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    raw = points @ points.T
+    off_diagonal = raw.copy()
+    np.fill_diagonal(off_diagonal, -np.inf)
+    sim = raw / off_diagonal.max(axis=1, keepdims=True)  # row-normalized like base_tag_order.py
+    weights = edge_weights(sim, args.mode)
+
+    started = time.time()
+    legacy = legacy_greedy_two_opt(sim, started + args.seconds)
+    legacy_best = max((path_score(order, weights) for order in legacy), default=float("-inf"))
+    legacy_s = time.time() - started
+
+    started = time.time()
+    top, completed = best_orders(
+        sim,
+        args.mode,
+        max_seconds=args.seconds,
+        random_starts=10**9,
+        seed=args.seed,
+        top_results=1,
+        workers=args.workers,
+    )
+    print(f"legacy greedy+2-opt: {len(legacy)} starts in {legacy_s:.2f}s, best {args.mode} objective {legacy_best:.4f}")
+    print(f"solver:              {completed} restarts in {time.time() - started:.2f}s, best {top[0][0]:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,12 +3,15 @@ from __future__ import annotations
 import argparse
 import csv
 import re
+import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List, Sequence, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # scripts/ (shared embedding_helpers)
+from embedding_helpers.store import open_store  # noqa: E402
 
 # Run-button arrays (additive to CLI arguments)
 # Example:
@@ -262,10 +265,10 @@ def order_rows_by_base(
         return rows
 
     tag_names = [normalize_name(row.get("name") or "") for row in rows]
-    model = SentenceTransformer(model_name)
+    store = open_store(model_name)
 
-    tag_emb = model.encode(tag_names, normalize_embeddings=True)
-    base_emb = model.encode(base_names, normalize_embeddings=True)
+    emb = store.encode(tag_names + base_names)  # one call: new strings are stored with one index write
+    tag_emb, base_emb = emb[: len(tag_names)], emb[len(tag_names) :]
 
     adjusted_sim = compute_adjusted_similarity(tag_emb, base_emb)
     assignments = np.argmax(adjusted_sim, axis=1)
@@ -0,0 +1 @@
+# Helpers for sentence-transformer embeddings shared by the tagging scripts.
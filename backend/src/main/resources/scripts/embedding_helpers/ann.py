@@ -0,0 +1,371 @@
+"""
+Approximate nearest-neighbour search over tag-variant embeddings (IVF, NumPy only).
+
+Exact tag lookup scores a query against every tag variant ("Tag: {name}." and one
+text per synonym, as in tag_assign_v1.py / eval_queries_v1.py) and takes the
+median per tag. The index instead clusters the variant vectors with spherical
+k-means (about sqrt(n) lists) and, per query, scans only the `nprobe` lists whose
+centroids are closest. The tags owning the variants found there are then scored
+exactly (median over all their variants), so the ranking only differs from exact
+search when a tag's variants were all missed.
+
+The index is stored per model and tag file under .cache/ann/ (EMBEDDING_ANN_DIR)
+as an .npz with the variant texts as keys. Opening it for a changed catalog (e.g.
+after tag_update.py) re-uses every known variant: new variants are added to the
+nearest list, dropped ones removed, and the centroids are only re-trained once
+RETRAIN_FRACTION of the index has changed since the last training.
+
+    index = TagIndex.open(tags, store, index_path_for(TAGS_PATH, store.model_name))
+    hits = index.search(query_emb, k=7)          # [[(tagID, score), ...] per query]
+    print(index.recall(sample_emb, k=7))         # vs exact search
+
+    python -m embedding_helpers.ann update --tags PATH     # build or refresh, print stats
+    python -m embedding_helpers.ann recall --tags PATH     # recall@K and latency vs exact search
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .shortlist import DEFAULT_MODEL_NAME, build_tag_variants
+
+ANN_VERSION = 2  # 2: keys stored as a fixed-width string array (loads without pickle)
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_ANN_DIR = Path(os.getenv("EMBEDDING_ANN_DIR", SCRIPTS_DIR / ".cache" / "ann"))
+DEFAULT_NPROBE = 8
+CANDIDATE_FACTOR = 4  # variants fetched per requested tag before exact re-scoring
+RETRAIN_FRACTION = 0.3
+KMEANS_ITERATIONS = 12
+
+TagEntry = Tuple[int, str, Sequence[str]]  # (tagID, name, synonyms)
+Encoder = Callable[[Sequence[str]], object]
+
+
+def default_n_lists(n: int) -> int:
+    return max(1, int(round(np.sqrt(n))))
+
+
+def spherical_kmeans(vectors: np.ndarray, n_lists: int, *, seed: int = 0) -> np.ndarray:
+    """Unit-length centroids maximizing the summed cosine similarity to their members."""
+    rng = np.random.default_rng(seed)
+    n_lists = max(1, min(n_lists, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        sim = vectors @ centroids.T
+        assign = sim.argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.flatnonzero(np.bincount(assign, minlength=n_lists) == 0)
+        if len(empty):
+            # Re-seed empty lists with the points their centroid serves worst.
+            worst = np.argsort(sim[np.arange(len(vectors)), assign])[: len(empty)]
+            sums[empty] = vectors[worst]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over L2-normalized vectors, one string key per vector."""
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self.keys: List[str] = []
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.assign = np.empty(0, dtype=np.int64)
+        self.changes_since_training = 0
+        self.meta: Dict[str, object] = {}
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def train(self, seed: int = 0) -> None:
+        if not self.keys:
+            self.centroids = np.empty((0, self.dim), dtype=np.float32)
+            self.assign = np.empty(0, dtype=np.int64)
+        else:
+            self.centroids = spherical_kmeans(self.vectors, default_n_lists(len(self.keys)), seed=seed)
+            self.assign = (self.vectors @ self.centroids.T).argmax(axis=1)
+        self.changes_since_training = 0
+        self._lists = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows ordered by list, offsets): list c holds rows[offsets[c]:offsets[c + 1]]."""
+        if self._lists is None:
+            rows = np.argsort(self.assign, kind="stable")
+            offsets = np.searchsorted(self.assign[rows], np.arange(self.n_lists + 1))
+            self._lists = (rows, offsets)
+        return self._lists
+
+    def sync(self, keys: Sequence[str], vectors: np.ndarray) -> Tuple[int, int, bool]:
+        """
+        Make the index hold exactly `keys` (vectors row-aligned). Known keys keep their
+        list; returns (added, removed, retrained).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        wanted = {key: row for row, key in enumerate(keys)}
+        keep = [row for row, key in enumerate(self.keys) if key in wanted]
+        # A stored vector that no longer matches (other model output) counts as removed and re-added.
+        keep_new = [wanted[self.keys[row]] for row in keep]
+        same = np.all(np.abs(self.vectors[keep] - vectors[keep_new]) <= 1e-4, axis=1) if keep else np.empty(0, bool)
+        keep = [row for row, ok in zip(keep, same.tolist()) if ok]
+        kept_keys = {self.keys[row] for row in keep}
+        new = [row for row, key in enumerate(keys) if key not in kept_keys]
+        removed = len(self.keys) - len(keep)
+
+        self.keys = [self.keys[row] for row in keep] + [keys[row] for row in new]
+        self.vectors = np.concatenate([self.vectors[keep], vectors[new]]).astype(np.float32)
+        old_assign = self.assign[keep]
+        self.changes_since_training += len(new) + removed
+        self._lists = None
+        if self.n_lists == 0 or self.changes_since_training > RETRAIN_FRACTION * max(1, len(self.keys)):
+            self.train()
+            return len(new), removed, True
+        new_assign = (vectors[new] @ self.centroids.T).argmax(axis=1) if new else np.empty(0, dtype=np.int64)
+        self.assign = np.concatenate([old_assign, new_assign]).astype(np.int64)
+        return len(new), removed, False
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int = DEFAULT_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores), both (len(queries), k), best first; rows are -1 where fewer than k were found."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if not self.keys or k < 1:
+            return out_rows, out_scores
+        rows, offsets = self._inverted_lists()
+        probe = min(max(1, nprobe), self.n_lists)
+        centroid_sim = queries @ self.centroids.T
+        lists = np.argpartition(-centroid_sim, probe - 1, axis=1)[:, :probe]
+        for q, chosen in enumerate(lists):
+            members = np.concatenate([rows[offsets[c] : offsets[c + 1]] for c in chosen.tolist()])
+            scores = self.vectors[members] @ queries[q]
+            take = min(k, len(members))
+            best = np.argpartition(-scores, take - 1)[:take] if take < len(members) else np.arange(len(members))
+            best = best[np.argsort(-scores[best], kind="stable")]
+            out_rows[q, :take] = members[best]
+            out_scores[q, :take] = scores[best]
+        return out_rows, out_scores
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = dict(self.meta, version=ANN_VERSION, dim=self.dim, changes_since_training=self.changes_since_training)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            meta=np.array(json.dumps(meta)),
+            keys=np.array(self.keys, dtype=str),
+            vectors=self.vectors,
+            centroids=self.centroids,
+            assign=self.assign,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["IVFIndex"]:
+        """The stored index, or None if missing or written by another format version."""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != ANN_VERSION:
+                    return None
+                index = cls(int(meta["dim"]))
+                index.keys = [str(key) for key in data["keys"].tolist()]
+                index.vectors = data["vectors"].astype(np.float32)
+                index.centroids = data["centroids"].astype(np.float32)
+                index.assign = data["assign"].astype(np.int64)
+        except (OSError, ValueError, KeyError):
+            return None
+        index.changes_since_training = int(meta.get("changes_since_training", 0))
+        index.meta = meta
+        return index
+
+
+def index_path_for(tags_path: Path, model_name: str, root: Optional[Path] = None) -> Path:
+    """One index file per model and tag file (two tag files of the same name do not share one)."""
+    model_dir = "".join(ch if ch.isalnum() or ch in "._-" else "_" for ch in model_name)
+    digest = hashlib.sha1(str(Path(tags_path).resolve()).encode("utf-8")).hexdigest()[:8]
+    return (root or DEFAULT_ANN_DIR) / model_dir / f"{Path(tags_path).stem}-{digest}.npz"
+
+
+class TagIndex:
+    """Tag lookup by median-over-variants similarity with an IVF candidate search."""
+
+    def __init__(self, tags: Sequence[TagEntry], index: IVFIndex) -> None:
+        self.tag_ids = [tag_id for tag_id, _name, _synonyms in tags]
+        texts, tag_variant_indices = build_tag_variants(tags)
+        row_of = {key: row for row, key in enumerate(index.keys)}
+        self.index = index
+        # Index rows of each tag's variants (padded with -1), and the owning tags of each index row.
+        tag_rows = [[row_of[texts[i]] for i in indices] for indices in tag_variant_indices]
+        self.variant_counts = np.array([len(rows) for rows in tag_rows], dtype=np.int64)
+        self.tag_rows = np.full((len(tag_rows), max([1, *self.variant_counts.tolist()])), -1, dtype=np.int64)
+        for tag_pos, rows in enumerate(tag_rows):
+            self.tag_rows[tag_pos, : len(rows)] = rows
+        self.row_tags: List[List[int]] = [[] for _ in range(len(index))]
+        for tag_pos, rows in enumerate(tag_rows):
+            for row in rows:
+                self.row_tags[row].append(tag_pos)
+
+    @classmethod
+    def open(cls, tags: Sequence[TagEntry], encoder: Encoder, path: Optional[Path] = None) -> "TagIndex":
+        """Load the index at `path` and bring it up to date with `tags` (saving it if anything changed)."""
+        texts, _indices = build_tag_variants(tags)
+        keys = list(dict.fromkeys(texts))
+        vectors = np.asarray(encoder(keys), dtype=np.float32)
+        index = IVFIndex.load(path) if path is not None else None
+        if index is None or index.dim != vectors.shape[1]:
+            index = IVFIndex(vectors.shape[1])
+        started = time.perf_counter()
+        added, removed, retrained = index.sync(keys, vectors)
+        if path is not None and (added or removed or not path.exists()):
+            index.save(path)
+        index.meta["last_sync"] = {
+            "added": added,
+            "removed": removed,
+            "retrained": retrained,
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+        return cls(tags, index)
+
+    def _tag_scores(self, query: np.ndarray, positions: np.ndarray, variant_scores: Optional[np.ndarray]) -> np.ndarray:
+        """Median variant similarity of the tags at `positions`, one vectorized median per variant count."""
+        scores = np.empty(len(positions), dtype=np.float32)
+        counts = self.variant_counts[positions]
+        for count in np.unique(counts).tolist():
+            selected = np.flatnonzero(counts == count)
+            rows = self.tag_rows[positions[selected], :count]
+            values = variant_scores[rows] if variant_scores is not None else self.index.vectors[rows] @ query
+            scores[selected] = np.median(values, axis=1)
+        return scores
+
+    def _ranked(
+        self, query: np.ndarray, positions: np.ndarray, k: int, variant_scores: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        scores = self._tag_scores(query, positions, variant_scores)
+        order = np.lexsort((positions, -scores))[:k]  # equal scores: catalog order, as the exact ranking
+        return [(self.tag_ids[positions[i]], float(scores[i])) for i in order]
+
+    def search(self, queries: np.ndarray, k: int, *, nprobe: int = DEFAULT_NPROBE) -> List[List[Tuple[int, float]]]:
+        """Top-k (tagID, median similarity) per query row, best first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        rows, _scores = self.index.search(queries, max(k, 1) * CANDIDATE_FACTOR, nprobe)
+        results = []
+        for query, found in zip(queries, rows):
+            candidates = sorted({tag for row in found.tolist() if row >= 0 for tag in self.row_tags[row]})
+            results.append(self._ranked(query, np.asarray(candidates, dtype=np.int64), k))
+        return results
+
+    def exact(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """Same as search() over all tags (the reference for recall)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        everything = np.arange(len(self.tag_ids))
+        return [self._ranked(query, everything, k, self.index.vectors @ query) for query in queries]
+
+    def recall(self, queries: np.ndarray, k: int, *, nprobe: int = DEFAULT_NPROBE) -> Dict[str, float]:
+        """Mean recall@k of search() against exact(), and the mean latency per query of both."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        self.search(queries[:1], k, nprobe=nprobe)  # warm-up: the first call pays one-off setup costs
+        self.exact(queries[:1], k)
+        started = time.perf_counter()
+        approx = self.search(queries, k, nprobe=nprobe)
+        ann_s = time.perf_counter() - started
+        started = time.perf_counter()
+        exact = self.exact(queries, k)
+        exact_s = time.perf_counter() - started
+        recalls = [
+            len({t for t, _s in a} & {t for t, _s in e}) / max(1, len(e)) for a, e in zip(approx, exact)
+        ]
+        n = max(1, len(queries))
+        return {
+            "recall": sum(recalls) / n,
+            "ann_ms": 1000 * ann_s / n,
+            "exact_ms": 1000 * exact_s / n,
+        }
+
+    def summary(self) -> str:
+        sync = self.index.meta.get("last_sync") or {}
+        return (
+            f"tags={len(self.tag_ids)} variants={len(self.index)} lists={self.index.n_lists} "
+            f"added={sync.get('added', 0)} removed={sync.get('removed', 0)} retrained={sync.get('retrained', False)}"
+        )
+
+
+def load_tag_entries(path: Path) -> List[TagEntry]:
+    """(tagID, name, synonyms) from a tag CSV with tagID,name[,synonyms] columns."""
+    entries: List[TagEntry] = []
+    with path.open(encoding="utf-8", newline="") as handle:
+        for row in csv.DictReader(handle):
+            name = (row.get("name") or "").strip()
+            try:
+                tag_id = int((row.get("tagID") or "").strip())
+            except ValueError:
+                continue
+            if name:
+                synonyms = [s.strip() for s in (row.get("synonyms") or "").split(",") if s.strip()]
+                entries.append((tag_id, name, synonyms))
+    return entries
+
+
+def update_tag_index(tags_path: Path, model_name: str = DEFAULT_MODEL_NAME) -> TagIndex:
+    """Bring the stored index of a tag file up to date (`python -m embedding_helpers.ann update`)."""
+    from .store import open_store
+
+    index = TagIndex.open(load_tag_entries(tags_path), open_store(model_name), index_path_for(tags_path, model_name))
+    print(f"[ann] {tags_path.name}: {index.summary()}", file=sys.stderr)
+    return index
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build, refresh and evaluate the tag-variant ANN index.")
+    parser.add_argument("command", choices=("update", "recall"))
+    parser.add_argument("--tags", required=True, help="Tag CSV (tagID,name,synonyms).")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help=f"Model name (default: {DEFAULT_MODEL_NAME}).")
+    parser.add_argument("--queries", default=None, help="recall: CSV with a name column (default: the tag names).")
+    parser.add_argument("--top-k", type=int, default=7, help="recall: tags per query (default: 7).")
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=DEFAULT_NPROBE,
+        help=f"recall: lists scanned per query (default: {DEFAULT_NPROBE}).",
+    )
+    args = parser.parse_args(argv)
+
+    tags_path = Path(args.tags)
+    index = update_tag_index(tags_path, args.model)
+    if args.command == "recall":
+        from .store import open_store
+
+        if args.queries:
+            with Path(args.queries).open(encoding="utf-8", newline="") as handle:
+                texts = [(row.get("name") or "").strip() for row in csv.DictReader(handle)]
+        else:
+            texts = [name for _tag_id, name, _synonyms in load_tag_entries(tags_path)]
+        texts = [text for text in texts if text]
+        report = index.recall(open_store(args.model).encode(texts), args.top_k, nprobe=args.nprobe)
+        print(
+            f"[ann] recall@{args.top_k}={report['recall']:.3f} over {len(texts)} queries (nprobe={args.nprobe}); "
+            f"{report['ann_ms']:.3f} ms/query vs exact {report['exact_ms']:.3f} ms/query"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
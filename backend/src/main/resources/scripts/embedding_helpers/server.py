@@ -0,0 +1,393 @@
+"""
+Local embedding server: keeps one sentence-transformers model loaded between script runs.
+
+Loading the model (torch import plus weights) takes several seconds, which every
+embedding script pays again when the tag-curation loop in embedding/TASK_PLAN.md
+re-runs them. The server loads it once and answers encode requests over HTTP on
+localhost; concurrent requests are collected for a few milliseconds and encoded as
+one batch.
+
+    python -m embedding_helpers.server serve            # foreground; Ctrl+C to stop
+    python -m embedding_helpers.server status
+    python -m embedding_helpers.server stop
+
+Scripts do not talk to it directly: the embedding store (store.py) gets its encoder
+from daemon_or_local_encoder(), which uses the server when one is running for the
+same model and otherwise loads the model in-process as before. EMBEDDING_SERVER
+sets the address (default 127.0.0.1:8765); EMBEDDING_SERVER=off never asks a server.
+
+Protocol: GET /health -> JSON {model, dim, requests, batches, texts};
+POST /encode with JSON {model, texts} -> raw little-endian float32 rows
+(header X-Embedding-Shape: "n,dim"); POST /shutdown stops the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.error import HTTPError, URLError
+
+import numpy as np
+
+from openai_helpers.http_client import HttpClient
+
+from .shortlist import DEFAULT_MODEL_NAME, Encoder, sentence_transformer_encoder
+
+DEFAULT_SERVER_ADDRESS = os.getenv("EMBEDDING_SERVER", "127.0.0.1:8765")
+DEFAULT_MAX_BATCH_TEXTS = 512
+DEFAULT_BATCH_WAIT_SECONDS = 0.005  # how long the batcher waits for more requests after the first one
+HEALTH_TIMEOUT_SECONDS = 0.5
+ENCODE_TIMEOUT_SECONDS = 600.0
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[np.ndarray] = None
+    error: Optional[BaseException] = None
+
+
+class BatchingEncoder:
+    """
+    Thread-safe front for an Encoder: requests arriving while a batch is being
+    collected (up to `max_batch_texts` texts, `max_wait_s` after the first request)
+    are encoded with one model call. Texts shared between requests are encoded once.
+    """
+
+    def __init__(
+        self,
+        encoder: Encoder,
+        *,
+        max_batch_texts: int = DEFAULT_MAX_BATCH_TEXTS,
+        max_wait_s: float = DEFAULT_BATCH_WAIT_SECONDS,
+    ) -> None:
+        self.encoder = encoder
+        self.max_batch_texts = max(1, max_batch_texts)
+        self.max_wait_s = max(0.0, max_wait_s)
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.dim = 0
+        self.closed = False
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        if self.closed:
+            raise RuntimeError("batching encoder is closed")
+        request = _Request(list(texts))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        assert request.result is not None
+        return request.result
+
+    __call__ = encode
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.monotonic() + self.max_wait_s
+        while size < self.max_batch_texts:
+            try:
+                request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # let _run see the stop marker after this batch
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            unique = list(dict.fromkeys(text for request in batch for text in request.texts))
+            try:
+                vectors = np.asarray(self.encoder(unique), dtype=np.float32) if unique else None
+            except Exception as exc:  # noqa: BLE001 - handed to every waiting request
+                for request in batch:
+                    request.error = exc
+                    request.done.set()
+                continue
+            if vectors is not None:
+                self.dim = vectors.shape[1]
+            rows = {text: row for row, text in enumerate(unique)}
+            self.requests += len(batch)
+            self.batches += 1
+            self.texts += len(unique)
+            for request in batch:
+                if vectors is None or not request.texts:
+                    request.result = np.empty((0, self.dim), dtype=np.float32)
+                else:
+                    request.result = vectors[[rows[text] for text in request.texts]]
+                request.done.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join()
+        while not self._queue.empty():  # requests that raced with close()
+            request = self._queue.get()
+            if request is not None:
+                request.error = RuntimeError("batching encoder is closed")
+                request.done.set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so a script's requests share one connection
+    server: "EmbeddingServer"
+
+    def _reply(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, payload: Dict[str, object]) -> None:
+        self._reply(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        if self.path != "/health":
+            self._json(404, {"error": "not found"})
+            return
+        self._json(200, self.server.health())
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.path == "/shutdown":
+            self._json(200, {"stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if self.path != "/encode":
+            self._json(404, {"error": "not found"})
+            return
+        if self.server.batcher.closed:  # stopping; keep-alive connections outlive the listener
+            self.close_connection = True
+            self._json(503, {"error": "server is stopping"})
+            return
+        try:
+            payload = json.loads(raw.decode("utf-8"))
+            texts = [str(text) for text in payload["texts"]]
+            model = str(payload.get("model") or self.server.model_name)
+        except (ValueError, KeyError, TypeError) as exc:
+            self._json(400, {"error": f"bad request: {exc}"})
+            return
+        if model != self.server.model_name:
+            self._json(409, {"error": f"server runs {self.server.model_name}, not {model}"})
+            return
+        try:
+            vectors = self.server.batcher.encode(texts)
+        except Exception as exc:  # noqa: BLE001 - reported to the client
+            self._json(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        data = np.ascontiguousarray(vectors, dtype="<f4")
+        shape = f"{data.shape[0]},{data.shape[1] if data.ndim == 2 else 0}"
+        self._reply(200, data.tobytes(), "application/octet-stream", {"X-Embedding-Shape": shape})
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002 - http.server signature
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class EmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], model_name: str, encoder: Encoder, *, verbose: bool = False, **kw):
+        super().__init__(address, _Handler)
+        self.model_name = model_name
+        self.batcher = BatchingEncoder(encoder, **kw)
+        self.verbose = verbose
+        self.started = time.time()
+
+    def health(self) -> Dict[str, object]:
+        return {
+            "model": self.model_name,
+            "dim": self.batcher.dim,
+            "requests": self.batcher.requests,
+            "batches": self.batcher.batches,
+            "texts": self.batcher.texts,
+            "uptime_s": round(time.time() - self.started, 1),
+            "pid": os.getpid(),
+        }
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+
+
+class EmbeddingClient:
+    """Encoder that sends texts to a running server."""
+
+    def __init__(self, address: str = DEFAULT_SERVER_ADDRESS, model_name: str = DEFAULT_MODEL_NAME) -> None:
+        host, port = parse_address(address)
+        self.base_url = f"http://{host}:{port}"
+        self.model_name = model_name
+        self._http = HttpClient(max_connections_per_host=2)
+
+    def health(self, timeout: float = HEALTH_TIMEOUT_SECONDS) -> Optional[Dict[str, object]]:
+        """Server status, or None if nothing answers at the address."""
+        try:
+            health = self._http.request("GET", f"{self.base_url}/health", timeout=timeout).json()
+        except (URLError, ValueError):
+            return None
+        return health if isinstance(health, dict) else None
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        body = json.dumps({"model": self.model_name, "texts": list(texts)}).encode("utf-8")
+        resp = self._http.request(
+            "POST",
+            f"{self.base_url}/encode",
+            body=body,
+            headers={"Content-Type": "application/json"},
+            timeout=ENCODE_TIMEOUT_SECONDS,
+        )
+        rows, dim = (int(v) for v in resp.headers["X-Embedding-Shape"].split(","))
+        return np.frombuffer(resp.read(), dtype="<f4").reshape(rows, dim)
+
+    __call__ = encode
+
+    def shutdown(self) -> None:
+        self._http.request("POST", f"{self.base_url}/shutdown", body=b"", timeout=HEALTH_TIMEOUT_SECONDS)
+
+    def close(self) -> None:
+        self._http.close()
+
+
+def daemon_or_local_encoder(
+    model_name: str = DEFAULT_MODEL_NAME,
+    *,
+    address: str = DEFAULT_SERVER_ADDRESS,
+    local_factory: Callable[[str], Encoder] = sentence_transformer_encoder,
+) -> Encoder:
+    """
+    Encoder backed by the server at `address` if it runs `model_name`, else the model
+    loaded in-process. If the server goes away mid-run, the model is loaded in-process
+    and used from then on.
+    """
+    if address.lower() in ("", "off", "none"):
+        return local_factory(model_name)
+    client = EmbeddingClient(address, model_name)
+    health = client.health()
+    if health is None or health.get("model") != model_name:
+        client.close()
+        if health is not None:
+            print(
+                f"[embeddings] server at {address} runs {health.get('model')}; loading {model_name} in-process",
+                file=sys.stderr,
+            )
+        return local_factory(model_name)
+    print(f"[embeddings] using embedding server at {address}", file=sys.stderr)
+    local: List[Encoder] = []
+
+    def encode(texts: Sequence[str]) -> np.ndarray:
+        if not local:
+            try:
+                return client.encode(texts)
+            except URLError as exc:
+                if isinstance(exc, HTTPError) and exc.code != 503:
+                    raise
+                print(
+                    f"[embeddings] server at {address} unavailable ({exc.reason}); loading in-process",
+                    file=sys.stderr,
+                )
+                client.close()
+                local.append(local_factory(model_name))
+        return np.asarray(local[0](texts), dtype=np.float32)
+
+    return encode
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Keep an embedding model loaded and serve encode requests.")
+    parser.add_argument("command", choices=("serve", "status", "stop"))
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help=f"Model name (default: {DEFAULT_MODEL_NAME}).")
+    parser.add_argument(
+        "--address", default=DEFAULT_SERVER_ADDRESS, help=f"host:port to listen on (default: {DEFAULT_SERVER_ADDRESS})."
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=DEFAULT_MAX_BATCH_TEXTS,
+        help=f"Texts per model call (default: {DEFAULT_MAX_BATCH_TEXTS}).",
+    )
+    parser.add_argument(
+        "--batch-wait-ms",
+        type=float,
+        default=DEFAULT_BATCH_WAIT_SECONDS * 1000,
+        help=f"Wait for more requests before encoding (default: {DEFAULT_BATCH_WAIT_SECONDS * 1000:g}).",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args(argv)
+
+    client = EmbeddingClient(args.address, args.model)
+    health = client.health()
+    if args.command == "status":
+        print(json.dumps(health) if health else f"[embeddings] no server at {args.address}")
+        return 0 if health else 1
+    if args.command == "stop":
+        if health is None:
+            print(f"[embeddings] no server at {args.address}", file=sys.stderr)
+            return 1
+        client.shutdown()
+        print(f"[embeddings] stopped server at {args.address} (pid {health.get('pid')})", file=sys.stderr)
+        return 0
+    if health is not None:
+        print(f"[embeddings] a server already runs at {args.address}: {health.get('model')}", file=sys.stderr)
+        return 1
+    client.close()
+
+    started = time.perf_counter()
+    encoder = sentence_transformer_encoder(args.model)
+    server = EmbeddingServer(
+        parse_address(args.address),
+        args.model,
+        encoder,
+        verbose=args.verbose,
+        max_batch_texts=args.max_batch,
+        max_wait_s=args.batch_wait_ms / 1000,
+    )
+    print(
+        f"[embeddings] {args.model} loaded in {time.perf_counter() - started:.1f}s; serving on {args.address}",
+        file=sys.stderr,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        h = server.health()
+        print(
+            f"[embeddings] served {h['requests']} requests in {h['batches']} batches ({h['texts']} texts)",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+"""
+Embedding-based candidate pre-filter for the LLM tagging scripts.
+
+Scores every tag against a topic/resource text with the same model and
+median-of-variants scoring as tags/testing/scripts/tag_assign_v1.py:
+each tag is embedded as "Tag: {name}." plus one text per synonym, and the tag
+score is the median cosine similarity over its variants. Only the top-K tags
+per item are then put into the prompt.
+
+numpy and sentence-transformers are only imported when a shortlister is built.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_MODEL_NAME = os.getenv("TAG_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+DEFAULT_RECALL_KS = (10, 20, 30, 50)
+
+# texts -> (n, dim) array of L2-normalized embeddings
+Encoder = Callable[[Sequence[str]], object]
+
+
+def build_tag_variants(tags: Sequence[Tuple[int, str, Sequence[str]]]) -> Tuple[List[str], List[List[int]]]:
+    """Return (variant texts, variant indices per tag) for (tagID, name, synonyms) triples."""
+    variant_texts: List[str] = []
+    tag_variant_indices: List[List[int]] = []
+    for _tag_id, name, synonyms in tags:
+        indices: List[int] = []
+        for variant in [name, *synonyms]:
+            variant_texts.append(f"Tag: {variant}.")
+            indices.append(len(variant_texts) - 1)
+        tag_variant_indices.append(indices)
+    return variant_texts, tag_variant_indices
+
+
+def item_text(name: str, description: str) -> str:
+    """Same text shape as tag_assign_v1.topic_text."""
+    if description:
+        return f"{name}. {description}"
+    return name
+
+
+def sentence_transformer_encoder(model_name: str = DEFAULT_MODEL_NAME) -> Encoder:
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as exc:  # pragma: no cover - depends on local install
+        raise RuntimeError(
+            "The tag shortlist needs sentence-transformers (pip install sentence-transformers)."
+        ) from exc
+    model = SentenceTransformer(model_name)
+
+    def encode(texts: Sequence[str]) -> object:
+        return model.encode(list(texts), normalize_embeddings=True, show_progress_bar=False)
+
+    return encode
+
+
+class TagShortlister:
+    """Embeds the tag variants once; shortlist() ranks tags for any number of item texts."""
+
+    def __init__(self, tags: Sequence[Tuple[int, str, Sequence[str]]], encoder: Encoder) -> None:
+        import numpy as np
+
+        self._np = np
+        self.encoder = encoder
+        self.tag_ids = [tag_id for tag_id, _name, _synonyms in tags]
+        variant_texts, self.tag_variant_indices = build_tag_variants(tags)
+        self.variant_emb = np.asarray(encoder(variant_texts), dtype=np.float32)
+
+    def scores(self, texts: Sequence[str]) -> object:
+        """(len(texts), n_tags) matrix of median-over-variants cosine similarities."""
+        np = self._np
+        item_emb = np.asarray(self.encoder(texts), dtype=np.float32)
+        sim = item_emb @ self.variant_emb.T
+        tag_scores = np.empty((len(texts), len(self.tag_ids)), dtype=np.float32)
+        for tag_idx, indices in enumerate(self.tag_variant_indices):
+            tag_scores[:, tag_idx] = np.median(sim[:, indices], axis=1)
+        return tag_scores
+
+    def shortlist(self, texts: Sequence[str], top_k: int) -> List[List[int]]:
+        """Top-K tagIDs per text, best first (stable order on ties)."""
+        np = self._np
+        if not texts:
+            return []
+        tag_scores = self.scores(texts)
+        order = np.argsort(-tag_scores, axis=1, kind="stable")[:, : max(1, top_k)]
+        return [[self.tag_ids[i] for i in row] for row in order.tolist()]
+
+
+def load_reference_rows(path: Path, id_column: str) -> Dict[str, List[int]]:
+    """Read an existing full-catalog output CSV (id,tagID,weight) into id -> tagIDs in file order."""
+    reference: Dict[str, List[int]] = {}
+    if not path.exists():
+        return reference
+    with path.open(encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            item_id = (row.get(id_column) or "").strip()
+            try:
+                tag_id = int(row.get("tagID") or "")
+            except ValueError:
+                continue
+            if item_id:
+                reference.setdefault(item_id, []).append(tag_id)
+    return reference
+
+
+def recall_at_k(
+    reference: Mapping[str, Sequence[int]],
+    ranked: Mapping[str, Sequence[int]],
+    ks: Sequence[int],
+) -> Dict[int, Tuple[float, float]]:
+    """
+    For each K: (mean recall, share of items with full recall) of the reference
+    tags within the first K ranked candidates, over items present in both maps.
+    """
+    result: Dict[int, Tuple[float, float]] = {}
+    items = [item for item in ranked if reference.get(item)]
+    for k in ks:
+        if not items:
+            result[k] = (0.0, 0.0)
+            continue
+        recalls = []
+        for item in items:
+            ref = set(reference[item])
+            recalls.append(len(ref & set(ranked[item][:k])) / len(ref))
+        result[k] = (sum(recalls) / len(recalls), sum(1 for r in recalls if r >= 1.0) / len(recalls))
+    return result
+
+
+def print_recall_report(
+    reference: Mapping[str, Sequence[int]],
+    ranked: Mapping[str, Sequence[int]],
+    ks: Sequence[int],
+    *,
+    label: str,
+    catalog_size: Optional[int] = None,
+) -> None:
+    """Print a recall table: how many full-catalog picks the shortlist of size K would have kept."""
+    compared = sum(1 for item in ranked if reference.get(item))
+    print(f"[shortlist] recall vs full-catalog results ({label}); items compared={compared}", file=sys.stderr)
+    print("    K  mean_recall  full_recall  prompt_share", file=sys.stderr)
+    for k, (mean_recall, full_recall) in recall_at_k(reference, ranked, ks).items():
+        share = f"{k / catalog_size:11.0%}" if catalog_size else "        n/a"
+        print(f"{k:5d}  {mean_recall:11.3f}  {full_recall:11.3f}  {share}", file=sys.stderr)
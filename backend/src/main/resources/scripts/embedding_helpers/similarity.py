@@ -0,0 +1,366 @@
+"""
+Similarity-matrix analyses for the tag curation scripts (NumPy).
+
+Every analysis streams blocks of rows (a[r0:r1] @ b.T) and keeps only what it
+needs, so no full topics x tags or tags x tags matrix is held; `max_bytes` caps
+the size of one block of scores (default 64 MB, at least one row):
+- top_per_row: the N best columns per row (tags per topic), best first;
+- threshold_edges: pairs i < j of one matrix with similarity >= threshold (redundancy graph);
+- PairScores: single entries emb[i] . emb[j] on demand (small lookups such as split_tag_groups).
+
+Redundancy groups are the connected components of the threshold edges, found with
+union-find (connected_groups). redundancy_sweep takes the edges for the lowest of
+several thresholds once, adds them in order of decreasing similarity and records the
+groups each time the next threshold is passed, so one pass shows how groups form
+and merge as the threshold is lowered.
+
+top_pairs returns the k most similar distinct pairs (i < j) of a similarity matrix,
+skipping pairs listed as excluded (by label, case-insensitive, either order). It
+gives the same list as the former per-pair loop in tag_redundancy_demo.py
+(score descending, ties in row-major order) but works on arrays: up to block_rows
+rows, the whole upper triangle at once (one argpartition instead of a Python list
+of all n^2/2 pairs and a full sort); above that, block by block of rows, keeping
+only the best k pairs seen so far, so no n x n mask or triangle index arrays are built.
+
+top_pairs_blocked does the same from the embeddings, computing the similarity
+matrix in blocks of rows, so the full n x n matrix is never held either
+(peak memory ~ block_rows * n floats).
+
+    pairs = top_pairs(tag_emb @ tag_emb.T, labels, k=40, excluded=EXCLUDED_TOP_PAIRS)
+    pairs = top_pairs_blocked(tag_emb, labels, k=40, excluded=EXCLUDED_TOP_PAIRS, block_rows=1024)
+
+Benchmark and equivalence check against the per-pair loop:
+    python -m embedding_helpers.similarity --tags 3000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_BLOCK_ROWS = 1024
+DEFAULT_MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+Pair = Tuple[float, str, str]  # (similarity, label i, label j), i < j
+
+
+def block_rows_for(n_cols: int, max_bytes: int = DEFAULT_MAX_BLOCK_BYTES) -> int:
+    """Rows per block so that one block of float32 scores stays within max_bytes (at least 1)."""
+    return max(1, int(max_bytes // max(1, 4 * n_cols)))
+
+
+def iter_similarity_blocks(
+    a: np.ndarray, b: np.ndarray, *, max_bytes: int = DEFAULT_MAX_BLOCK_BYTES
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """(r0, a[r0:r1] @ b.T) for consecutive row blocks of a."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    step = block_rows_for(len(b), max_bytes)
+    for r0 in range(0, len(a), step):
+        yield r0, a[r0 : r0 + step] @ b.T
+
+
+def top_per_row(
+    a: np.ndarray, b: np.ndarray, n: int, *, max_bytes: int = DEFAULT_MAX_BLOCK_BYTES
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (indices, scores), both (len(a), min(n, len(b))): the n columns of b most similar to
+    each row of a, best first (equal scores by column index).
+    """
+    limit = max(0, min(n, len(b)))
+    indices = np.empty((len(a), limit), dtype=np.int64)
+    scores = np.empty((len(a), limit), dtype=np.float32)
+    if limit == 0:
+        return indices, scores
+    for r0, block in iter_similarity_blocks(a, b, max_bytes=max_bytes):
+        if limit < block.shape[1]:
+            part = np.argpartition(-block, limit - 1, axis=1)[:, :limit]
+        else:
+            part = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+        part = np.array(part)
+        part_scores = np.take_along_axis(block, part, axis=1)
+        if limit < block.shape[1]:
+            # argpartition picks arbitrarily among scores tied with the n-th; redo those rows in full.
+            kth = part_scores.min(axis=1, keepdims=True)
+            tied = np.flatnonzero(np.count_nonzero(block >= kth, axis=1) > limit)
+            if len(tied):
+                columns = np.broadcast_to(np.arange(block.shape[1]), (len(tied), block.shape[1]))
+                part[tied] = np.lexsort((columns, -block[tied]), axis=1)[:, :limit]
+                part_scores[tied] = np.take_along_axis(block[tied], part[tied], axis=1)
+        order = np.lexsort((part, -part_scores), axis=1)
+        indices[r0 : r0 + len(block)] = np.take_along_axis(part, order, axis=1)
+        scores[r0 : r0 + len(block)] = np.take_along_axis(part_scores, order, axis=1)
+    return indices, scores
+
+
+def threshold_edges(
+    emb: np.ndarray, threshold: float, *, max_bytes: int = DEFAULT_MAX_BLOCK_BYTES
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(rows, cols, scores) of all pairs i < j with emb[i] . emb[j] >= threshold, in row-major order."""
+    emb = np.asarray(emb, dtype=np.float32)
+    n = len(emb)
+    found_rows: List[np.ndarray] = []
+    found_cols: List[np.ndarray] = []
+    found_scores: List[np.ndarray] = []
+    step = block_rows_for(n, max_bytes)
+    for r0 in range(0, n, step):
+        block = emb[r0 : r0 + step] @ emb[r0:].T  # column c is row r0 + c; only later rows are needed
+        local_rows, local_cols = np.nonzero(np.triu(block >= threshold, 1))
+        found_rows.append(local_rows + r0)
+        found_cols.append(local_cols + r0)
+        found_scores.append(block[local_rows, local_cols])
+    if not found_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(found_rows), np.concatenate(found_cols), np.concatenate(found_scores)
+
+
+class PairScores:
+    """sim[i, j] for single pairs without building the matrix (emb rows are L2-normalized)."""
+
+    def __init__(self, emb: np.ndarray) -> None:
+        self.emb = np.asarray(emb, dtype=np.float32)
+        self.shape = (len(self.emb), len(self.emb))
+
+    def __getitem__(self, index: Tuple[int, int]) -> float:
+        i, j = index
+        return float(self.emb[i] @ self.emb[j])
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 (union by size, path compression)."""
+
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of a and b; False if they were already one set."""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return True
+
+    def groups(self) -> List[List[int]]:
+        """Sets with more than one member, each ascending, ordered by their smallest member."""
+        members: Dict[int, List[int]] = {}
+        for x in range(len(self.parent)):
+            members.setdefault(self.find(x), []).append(x)
+        return [group for group in members.values() if len(group) > 1]
+
+
+def connected_groups(n: int, rows: np.ndarray, cols: np.ndarray) -> List[List[int]]:
+    """Connected components (size > 1) of the graph on 0..n-1 with edges rows[k] - cols[k]."""
+    uf = UnionFind(n)
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        uf.union(i, j)
+    return uf.groups()
+
+
+def redundancy_sweep(
+    emb: np.ndarray, thresholds: Iterable[float], *, max_bytes: int = DEFAULT_MAX_BLOCK_BYTES
+) -> List[Tuple[float, List[List[int]]]]:
+    """
+    [(threshold, connected_groups at that threshold), ...] for every threshold, highest
+    first, from a single threshold_edges pass at the lowest one.
+    """
+    levels = sorted(set(thresholds), reverse=True)
+    if not levels:
+        return []
+    rows, cols, scores = threshold_edges(emb, levels[-1], max_bytes=max_bytes)
+    order = np.argsort(-scores, kind="stable")
+    rows, cols, scores = rows[order].tolist(), cols[order].tolist(), scores[order]
+    uf = UnionFind(len(emb))
+    result: List[Tuple[float, List[List[int]]]] = []
+    edge = 0
+    for level in levels:
+        while edge < len(rows) and scores[edge] >= level:
+            uf.union(rows[edge], cols[edge])
+            edge += 1
+        result.append((level, uf.groups()))
+    return result
+
+
+def exclusion_pairs(labels: Sequence[str], excluded: Iterable[Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Index arrays (rows, cols), rows < cols, of all label pairs listed in `excluded`."""
+    positions: Dict[str, List[int]] = {}
+    for index, label in enumerate(labels):
+        positions.setdefault(label.casefold(), []).append(index)
+    keys = set()
+    for a, b in excluded:
+        i_list = positions.get(a.casefold(), [])
+        j_list = positions.get(b.casefold(), [])
+        for i in i_list:
+            for j in j_list:
+                if i != j:
+                    keys.add((min(i, j), max(i, j)))
+    if not keys:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    pairs = np.array(sorted(keys), dtype=np.int64)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _top_k(values: np.ndarray, keys: Optional[np.ndarray], k: int) -> np.ndarray:
+    """Positions of the k largest values, ordered by value descending, then key (default: position) ascending."""
+    if k < len(values):
+        kth = values[np.argpartition(values, len(values) - k)[len(values) - k]]
+        candidates = np.flatnonzero(values >= kth)  # every tie of the k-th value, for a deterministic cut
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((candidates if keys is None else keys[candidates], -values[candidates]))
+    return candidates[order[:k]]
+
+
+def top_pairs(
+    sim: np.ndarray,
+    labels: Sequence[str],
+    k: int = 10,
+    *,
+    excluded: Iterable[Tuple[str, str]] = (),
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+) -> List[Pair]:
+    """Top-k most similar distinct pairs (i < j) of a full similarity matrix."""
+    n = sim.shape[0]
+    if k < 1 or n < 2:
+        return []
+    if n > block_rows:
+        step = max(1, block_rows)
+        blocks = ((r0, np.array(sim[r0 : r0 + step, r0:])) for r0 in range(0, n, step))
+        return _top_pairs_in_blocks(blocks, labels, k, excluded)
+    rows, cols = np.triu_indices(n, 1)
+    ex_rows, ex_cols = exclusion_pairs(labels, excluded)
+    keep = ~np.isin(rows * n + cols, ex_rows * n + ex_cols)
+    rows, cols = rows[keep], cols[keep]
+    values = sim[rows, cols]
+    best = _top_k(values, None, k)  # triu_indices is row-major: position == loop order
+    return [(float(values[p]), labels[rows[p]], labels[cols[p]]) for p in best]
+
+
+def top_pairs_blocked(
+    emb: np.ndarray,
+    labels: Sequence[str],
+    k: int = 10,
+    *,
+    excluded: Iterable[Tuple[str, str]] = (),
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+) -> List[Pair]:
+    """
+    top_pairs(emb @ emb.T, ...) without the full matrix: each block of rows is compared
+    with itself and all later rows only. Scores can differ from the full product in the
+    last float bit (other summation order), which may reorder exact ties.
+    """
+    emb = np.asarray(emb, dtype=np.float32)
+    n = emb.shape[0]
+    if k < 1 or n < 2:
+        return []
+    step = max(1, block_rows)
+    blocks = ((r0, emb[r0 : r0 + step] @ emb[r0:].T) for r0 in range(0, n, step))
+    return _top_pairs_in_blocks(blocks, labels, k, excluded)
+
+
+def _top_pairs_in_blocks(
+    blocks: Iterable[Tuple[int, np.ndarray]],
+    labels: Sequence[str],
+    k: int,
+    excluded: Iterable[Tuple[str, str]],
+) -> List[Pair]:
+    """Top-k pairs from consecutive (r0, writable scores of rows r0.. against columns r0..n-1) blocks."""
+    n = len(labels)
+    ex_rows, ex_cols = exclusion_pairs(labels, excluded)
+    best_values = np.empty(0, dtype=np.float32)
+    best_keys = np.empty(0, dtype=np.int64)  # i * n + j, i.e. row-major position
+    for r0, block in blocks:
+        r1 = r0 + len(block)  # column c is row r0 + c
+        block[np.tril_indices(r1 - r0, 0, n - r0)] = -np.inf  # keep j > i only
+        in_block = (ex_rows >= r0) & (ex_rows < r1)
+        block[ex_rows[in_block] - r0, ex_cols[in_block] - r0] = -np.inf
+        flat = block.ravel()
+        local = _top_k(flat, None, k)  # block positions are in the same order as global ones
+        local = local[np.isfinite(flat[local])]
+        local_rows, local_cols = np.divmod(local.astype(np.int64), n - r0)
+        values = np.concatenate([best_values, flat[local]])
+        merged_keys = np.concatenate([best_keys, (local_rows + r0) * n + local_cols + r0])
+        keep = _top_k(values, merged_keys, k)
+        best_values, best_keys = values[keep], merged_keys[keep]
+    return [(float(v), labels[key // n], labels[key % n]) for v, key in zip(best_values, best_keys.tolist())]
+
+
+def top_pairs_loop(
+    sim: np.ndarray, labels: Sequence[str], k: int = 10, *, excluded: Iterable[Tuple[str, str]] = ()
+) -> List[Pair]:
+    """The original per-pair implementation; kept as the reference for tests and the benchmark."""
+    excluded_keys = {frozenset((a.casefold(), b.casefold())) for a, b in excluded}
+    n = sim.shape[0]
+    pairs: List[Pair] = []
+    for i in range(n):
+        for j in range(i + 1, n):
+            if frozenset((labels[i].casefold(), labels[j].casefold())) in excluded_keys:
+                continue
+            pairs.append((float(sim[i, j]), labels[i], labels[j]))
+    pairs.sort(key=lambda t: t[0], reverse=True)
+    return pairs[:k]
+
+
+def _synthetic_embeddings(n: int, dim: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, so there are many close pairs like in a real tag catalog."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 8), dim))
+    emb = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, dim))
+    return (emb / np.linalg.norm(emb, axis=1, keepdims=True)).astype(np.float32)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark top_pairs against the per-pair loop on synthetic tags.")
+    parser.add_argument("--tags", type=int, default=3000, help="Number of synthetic tags (default: 3000).")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (default: 768).")
+    parser.add_argument("--top-k", type=int, default=40, help="Pairs returned (default: 40).")
+    parser.add_argument(
+        "--block-rows", type=int, default=DEFAULT_BLOCK_ROWS, help=f"Rows per block (default: {DEFAULT_BLOCK_ROWS})."
+    )
+    parser.add_argument("--skip-loop", action="store_true", help="Do not run the (slow) per-pair loop.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args(argv)
+
+    emb = _synthetic_embeddings(args.tags, args.dim, args.seed)
+    labels = [f"tag{i}" for i in range(args.tags)]
+    excluded = [(labels[i], labels[i + 1]) for i in range(0, args.tags - 1, 7)]
+    sim = emb @ emb.T
+
+    started = time.perf_counter()
+    dense = top_pairs(sim, labels, args.top_k, excluded=excluded)
+    dense_s = time.perf_counter() - started
+    started = time.perf_counter()
+    blocked = top_pairs_blocked(emb, labels, args.top_k, excluded=excluded, block_rows=args.block_rows)
+    blocked_s = time.perf_counter() - started
+    block_mb = min(args.block_rows, args.tags) * args.tags * 4 / 1e6
+    print(f"[pairs] tags={args.tags} pairs={args.tags * (args.tags - 1) // 2:,} excluded={len(excluded)}")
+    print(f"[pairs] top_pairs          {dense_s:8.3f}s  (full matrix {sim.nbytes / 1e6:.0f}MB)")
+    print(f"[pairs] top_pairs_blocked  {blocked_s:8.3f}s  (incl. similarity; block {block_mb:.0f}MB)")
+    mismatches = sum((a[1], a[2]) != (b[1], b[2]) for a, b in zip(dense, blocked)) + abs(len(dense) - len(blocked))
+    if not args.skip_loop:
+        started = time.perf_counter()
+        expected = top_pairs_loop(sim, labels, args.top_k, excluded=excluded)
+        loop_s = time.perf_counter() - started
+        mismatches += sum(a != e for a, e in zip(dense, expected)) + abs(len(dense) - len(expected))
+        print(f"[pairs] per-pair loop      {loop_s:8.3f}s  (speed-up x{loop_s / max(dense_s, 1e-9):.0f})")
+    print(f"[pairs] mismatching pairs: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
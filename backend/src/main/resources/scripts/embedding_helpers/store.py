@@ -0,0 +1,437 @@
+"""
+Persistent embedding store shared by the embedding scripts and the tagging shortlist.
+
+Vectors are keyed by (model name, normalized text) and kept per model in
+    <store dir>/<model>/vectors.bin   raw float32 or float16 rows, memory-mapped for reads
+    <store dir>/<model>/index.json    text of every row, day it was last used, model/dim/dtype
+so a run only encodes strings the store has not seen yet; everything else is a row lookup.
+Texts are normalized (Unicode NFC, surrounding whitespace stripped, inner whitespace
+collapsed) before lookup and before encoding; case is kept. Vectors are L2-normalized
+(normalize_embeddings=True, as in every caller), so cosine similarity is a dot product.
+
+Invalidation:
+- a different model name is a different store; a store whose model, dimension or format
+  version does not match is discarded and rebuilt;
+- the first time the model is loaded in a process, one stored vector is re-encoded; if it
+  no longer matches (model weights or library changed), the store is discarded;
+- edited strings are new keys; rows not used for a while are removed with `prune`.
+
+    store = open_store("sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    emb = store.encode(texts)        # (len(texts), dim) float32; the model loads only on a miss
+
+On a miss the texts go to the embedding server (server.py) if one is running, else
+the model is loaded in-process.
+
+    python -m embedding_helpers.store stats
+    python -m embedding_helpers.store warm                # tag/topic strings the scripts embed
+    python -m embedding_helpers.store prune --older-than-days 30
+    python -m embedding_helpers.store clear
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .server import daemon_or_local_encoder
+from .shortlist import DEFAULT_MODEL_NAME, Encoder, item_text
+
+try:  # POSIX only; elsewhere concurrent writers are not serialized
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+STORE_VERSION = 1
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_STORE_DIR = Path(os.getenv("EMBEDDING_STORE_DIR", SCRIPTS_DIR / ".cache" / "embeddings"))
+DEFAULT_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+DTYPES = ("float32", "float16")
+VERIFY_MIN_COSINE = 0.999  # re-encoded probe vs stored vector; float16 rounding stays far above this
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _today() -> int:
+    return int(time.time() // 86400)
+
+
+def _model_dir_name(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "__", model_name)
+
+
+class EmbeddingStore:
+    """One model's vectors; encode() is the only call most scripts need."""
+
+    def __init__(
+        self,
+        root: Path,
+        model_name: str,
+        *,
+        dtype: str = DEFAULT_DTYPE,
+        encoder_factory: Optional[Callable[[str], Encoder]] = None,
+    ) -> None:
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        self.model_name = model_name
+        self.dir = root / _model_dir_name(model_name)
+        self.data_path = self.dir / "vectors.bin"
+        self.index_path = self.dir / "index.json"
+        self.lock_path = self.dir / "lock"
+        self.requested_dtype = dtype
+        self.encoder_factory = encoder_factory or daemon_or_local_encoder
+        self.hits = 0
+        self.misses = 0
+        self._encoder: Optional[Encoder] = None
+        self._verified = False
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # -- index and matrix -------------------------------------------------------------
+
+    def _load(self) -> None:
+        self._reset()
+        with self._locked():
+            self._refresh()
+
+    def _reset(self) -> None:
+        self.dim = 0
+        self.dtype = self.requested_dtype
+        self.texts: List[str] = []
+        self.last_used: List[int] = []
+        self.rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._index_stat: Optional[Tuple[int, int, int]] = None  # index.json as last read or written
+
+    def _stat_index(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = self.index_path.stat()
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _refresh(self) -> None:
+        """Adopt the index on disk (other processes may have appended or pruned); call with the lock held."""
+        self._index_stat = self._stat_index()
+        try:
+            meta = json.loads(self.index_path.read_text(encoding="utf-8")) if self.index_path.exists() else None
+        except (OSError, json.JSONDecodeError):
+            meta = {}
+        if meta is None:
+            if self.data_path.exists():
+                self.data_path.unlink()  # rows without an index cannot be looked up
+            self._reset()
+            return
+        if meta.get("version") != STORE_VERSION or meta.get("model") != self.model_name:
+            self._discard(f"index format or model changed ({self.index_path})")
+            return
+        texts = list(meta["texts"])
+        if texts != self.texts:
+            self.texts = texts
+            self.rows = {text: row for row, text in enumerate(texts)}
+            self._matrix = None
+        self.dim = int(meta["dim"])
+        self.dtype = str(meta["dtype"])
+        self.last_used = list(meta.get("last_used") or [_today()] * len(texts))
+        expected = len(texts) * self.dim * np.dtype(self.dtype).itemsize
+        size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        if size < expected:
+            self._discard(f"{self.data_path.name} is shorter than its index")
+        elif size > expected:
+            # Rows appended by a writer that died before updating the index.
+            with self.data_path.open("r+b") as f:
+                f.truncate(expected)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """All stored rows, memory-mapped read-only (empty (0, dim) array for an empty store)."""
+        if self._matrix is None or len(self._matrix) != len(self.texts):
+            if not self.texts:
+                self._matrix = np.empty((0, self.dim), dtype=self.dtype)
+            else:
+                self._matrix = np.memmap(
+                    self.data_path, dtype=self.dtype, mode="r", shape=(len(self.texts), self.dim)
+                )
+        return self._matrix
+
+    def _save_index(self) -> None:
+        meta = {
+            "version": STORE_VERSION,
+            "model": self.model_name,
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "texts": self.texts,
+            "last_used": self.last_used,
+        }
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+        self._index_stat = self._stat_index()
+
+    def _discard(self, reason: str) -> None:
+        print(f"[embeddings] discarding store for {self.model_name}: {reason}", file=sys.stderr)
+        self.clear()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive across processes; not re-entrant (flock on a new handle would wait for ourselves)."""
+        with self.lock_path.open("a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    # -- public API -----------------------------------------------------------------
+
+    def encoder(self) -> Encoder:
+        if self._encoder is None:
+            self._encoder = self.encoder_factory(self.model_name)
+        return self._encoder
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        (len(texts), dim) float32 vectors; only texts not stored yet are encoded. A call writes
+        the index at most once, however many texts are new, so pass all texts in one call.
+        """
+        keys = [normalize_text(text) for text in texts]
+        unique = list(dict.fromkeys(keys))
+        missing = [key for key in unique if key not in self.rows]
+        if missing and self._stat_index() != self._index_stat:
+            with self._locked():
+                self._refresh()  # another process may have added them
+            missing = [key for key in unique if key not in self.rows]
+        if missing:
+            self._verify(self.encoder())
+            missing = [key for key in unique if key not in self.rows]
+        vectors = self._encode_new(missing) if missing else None
+        today = _today()
+        if vectors is not None or any(self.last_used[self.rows[key]] != today for key in unique):
+            with self._locked():
+                self._refresh()
+                if vectors is not None:
+                    self._append(missing, vectors)
+                for key in unique:
+                    if key in self.rows:
+                        self.last_used[self.rows[key]] = today
+                self._save_index()
+            if any(key not in self.rows for key in unique):
+                return self.encode(texts)  # another process pruned or cleared the store meanwhile
+        missing_set = set(missing)
+        self.misses += len(missing)
+        self.hits += sum(1 for key in keys if key not in missing_set)
+        if not keys:
+            return np.empty((0, self.dim), dtype=np.float32)
+        rows = np.fromiter((self.rows[key] for key in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self.matrix[rows], dtype=np.float32)
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        """Use the store wherever an Encoder (texts -> normalized vectors) is expected."""
+        return self.encode(texts)
+
+    def _encode_new(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.encoder()(texts), dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise RuntimeError(f"encoder returned shape {vectors.shape} for {len(texts)} texts")
+        if self.dim and vectors.shape[1] != self.dim:
+            raise RuntimeError(f"encoder returned {vectors.shape[1]}-dim vectors; store has {self.dim}")
+        return vectors
+
+    def _append(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Append rows for texts still missing after _refresh() (lock held)."""
+        self.dim = vectors.shape[1]
+        fresh = [i for i, text in enumerate(texts) if text not in self.rows]
+        if not fresh:
+            return
+        with self.data_path.open("ab") as f:
+            f.write(vectors[fresh].astype(self.dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        for i in fresh:
+            self.rows[texts[i]] = len(self.texts)
+            self.texts.append(texts[i])
+            self.last_used.append(_today())
+        self._matrix = None
+
+    def _verify(self, encoder: Encoder) -> None:
+        """Once per process: does the model still produce the stored vectors?"""
+        if self._verified:
+            return
+        self._verified = True
+        if not self.texts:
+            return
+        probe = np.asarray(encoder([self.texts[0]]), dtype=np.float32)[0]
+        stored = np.asarray(self.matrix[0], dtype=np.float32)
+        if probe.shape != stored.shape:
+            cosine = 0.0
+        else:
+            cosine = float(probe @ stored / max(1e-12, float(np.linalg.norm(probe) * np.linalg.norm(stored))))
+        if cosine < VERIFY_MIN_COSINE:
+            with self._locked():
+                self._discard(f"model output changed (probe cosine {cosine:.4f})")
+
+    def prune(self, older_than_days: int) -> int:
+        """Drop rows not used for `older_than_days` days; returns the number removed."""
+        cutoff = _today() - older_than_days
+        with self._locked():
+            self._refresh()
+            keep = [row for row, used in enumerate(self.last_used) if used >= cutoff]
+            removed = len(self.texts) - len(keep)
+            if not removed:
+                return 0
+            kept = np.array(self.matrix[keep]) if keep else np.empty((0, self.dim), dtype=self.dtype)
+            self._matrix = None
+            tmp = self.data_path.with_name(self.data_path.name + ".tmp")
+            with tmp.open("wb") as f:
+                f.write(kept.astype(self.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.texts = [self.texts[row] for row in keep]
+            self.last_used = [self.last_used[row] for row in keep]
+            self.rows = {text: row for row, text in enumerate(self.texts)}
+            # Index first: a crash in between leaves a longer data file, which is the recoverable case.
+            self._save_index()
+            os.replace(tmp, self.data_path)
+        return removed
+
+    def clear(self) -> None:
+        """Remove every row (caller holds the lock when other processes may be writing)."""
+        self._matrix = None
+        for path in (self.index_path, self.data_path):
+            if path.exists():
+                path.unlink()
+        self._reset()
+
+    def stats(self) -> Dict[str, object]:
+        today = _today()
+        size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        unused_7 = sum(1 for used in self.last_used if used < today - 7)
+        return {
+            "model": self.model_name,
+            "rows": len(self.texts),
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "bytes": size,
+            "unused_7d": unused_7,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"store={self.dir.name} rows={s['rows']} dim={s['dim']} dtype={s['dtype']} "
+            f"size={int(s['bytes']) / 1e6:.1f}MB hits={s['hits']} misses={s['misses']}"
+        )
+
+
+def open_store(
+    model_name: str = DEFAULT_MODEL_NAME,
+    *,
+    root: Optional[Path] = None,
+    dtype: str = DEFAULT_DTYPE,
+) -> EmbeddingStore:
+    return EmbeddingStore(root or DEFAULT_STORE_DIR, model_name, dtype=dtype)
+
+
+def _warm_texts(tag_paths: Sequence[Path], topic_paths: Sequence[Path]) -> List[str]:
+    """The string shapes the embedding scripts and the shortlist encode for tags and topics."""
+    texts: List[str] = []
+    for path in tag_paths:
+        with path.open(encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("name") or "").strip()
+                if not name:
+                    continue
+                synonyms = [s.strip() for s in (row.get("synonyms") or "").split(",") if s.strip()]
+                texts.append(name.lower())  # tag_update.py, base_tag_order.py, tag_redundancy_demo.py
+                if synonyms:
+                    texts.append(f"{name.lower()} ({', '.join(synonyms)})")  # tag_redundancy_demo.py
+                texts += [f"Tag: {variant}." for variant in [name, *synonyms]]  # tag_assign_v1.py, shortlist
+    for path in topic_paths:
+        with path.open(encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("name") or "").strip()
+                if name:
+                    texts.append(name.lower())
+                    texts.append(item_text(name, (row.get("description") or "").strip()))
+    return list(dict.fromkeys(texts))
+
+
+def _default_sources() -> Dict[str, List[Path]]:
+    resources = SCRIPTS_DIR.parent
+    repo = resources.parents[3]
+    tags = [
+        resources / "csv" / "t_tag.csv",
+        SCRIPTS_DIR / "embedding" / "testing" / "data" / "t_tag_PLANNING.txt",
+        repo / "tags" / "testing" / "data" / "t_tag_PLANNING.txt",
+    ]
+    topics = [
+        resources / "csv" / "t_topic.csv",
+        resources / "csv" / "topics" / "t_topic_PLANNING.csv",
+        repo / "tags" / "testing" / "data" / "t_topic_PLANNING.csv",
+    ]
+    return {"tags": [p for p in tags if p.exists()], "topics": [p for p in topics if p.exists()]}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Warm up, inspect and prune the persistent embedding store.")
+    parser.add_argument("command", choices=("stats", "warm", "prune", "clear"))
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help=f"Model name (default: {DEFAULT_MODEL_NAME}).")
+    parser.add_argument("--dir", default=None, help=f"Store directory (default: {DEFAULT_STORE_DIR}).")
+    parser.add_argument(
+        "--dtype", choices=DTYPES, default=DEFAULT_DTYPE, help=f"Dtype of a new store (default: {DEFAULT_DTYPE})."
+    )
+    parser.add_argument("--tags", nargs="*", default=None, help="Tag CSVs for warm (default: the known tag files).")
+    parser.add_argument(
+        "--topics", nargs="*", default=None, help="Topic CSVs for warm (default: the known topic files)."
+    )
+    parser.add_argument(
+        "--older-than-days", type=int, default=30, help="prune: drop rows unused this long (default: 30)."
+    )
+    args = parser.parse_args(argv)
+
+    store = open_store(args.model, root=Path(args.dir) if args.dir else None, dtype=args.dtype)
+    if args.command == "warm":
+        sources = _default_sources()
+        tag_paths = [Path(p) for p in args.tags] if args.tags is not None else sources["tags"]
+        topic_paths = [Path(p) for p in args.topics] if args.topics is not None else sources["topics"]
+        texts = _warm_texts(tag_paths, topic_paths)
+        started = time.perf_counter()
+        store.encode(texts)
+        print(
+            f"[embeddings] warm: {len(texts)} texts from {len(tag_paths) + len(topic_paths)} files, "
+            f"{store.misses} encoded in {time.perf_counter() - started:.1f}s",
+            file=sys.stderr,
+        )
+    elif args.command == "prune":
+        removed = store.prune(args.older_than_days)
+        print(f"[embeddings] pruned {removed} rows unused for {args.older_than_days}+ days", file=sys.stderr)
+    elif args.command == "clear":
+        with store._locked():
+            store.clear()
+        print(f"[embeddings] cleared {store.dir}", file=sys.stderr)
+    print(f"[embeddings] {store.summary()}")
+    if args.command == "stats":
+        print(f"[embeddings] rows unused for 7+ days: {store.stats()['unused_7d']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
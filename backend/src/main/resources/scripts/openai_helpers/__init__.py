@@ -0,0 +1 @@
+# Shared helpers for scripts that call the OpenAI API.
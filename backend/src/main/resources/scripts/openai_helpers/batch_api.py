@@ -0,0 +1,177 @@
+"""
+Minimal client for the OpenAI Batch API (files + batches endpoints).
+
+Flow: write a JSONL file of requests -> upload_batch_file -> create_batch ->
+wait_for_batch -> download_file / iter_batch_results.
+`api_base` is configurable so the flow can run against a local stand-in server.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from urllib.error import HTTPError, URLError
+
+from .http_client import default_client
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+DEFAULT_COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_SECONDS = 30.0
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchError(RuntimeError):
+    pass
+
+
+def _request_json(
+    api_key: str,
+    url: str,
+    *,
+    data: Optional[bytes] = None,
+    content_type: str = "application/json",
+    timeout: float = 60.0,
+) -> Dict[str, object]:
+    headers = {"Authorization": f"Bearer {api_key}"}
+    if data is not None:
+        headers["Content-Type"] = content_type
+    try:
+        method = "POST" if data is not None else "GET"
+        resp = default_client().request(method, url, body=data, headers=headers, timeout=timeout)
+        return json.loads(resp.read().decode("utf-8"))
+    except HTTPError as exc:
+        detail = exc.read().decode("utf-8", errors="ignore")
+        raise BatchError(f"OpenAI batch HTTP error {exc.code} for {url}: {detail}") from exc
+    except URLError as exc:
+        raise BatchError(f"OpenAI batch network error for {url}: {exc}") from exc
+
+
+def build_batch_line(custom_id: str, body: Dict[str, object], endpoint: str = CHAT_COMPLETIONS_ENDPOINT) -> str:
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body}, ensure_ascii=False)
+
+
+def upload_batch_file(api_key: str, path: Path, *, api_base: str = DEFAULT_API_BASE) -> str:
+    """Upload a JSONL request file with purpose=batch and return its file ID."""
+    boundary = f"----batch{uuid.uuid4().hex}"
+    payload = b"".join(
+        [
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="purpose"\r\n\r\nbatch\r\n',
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="file"; filename="{path.name}"\r\n'.encode(),
+            b"Content-Type: application/jsonl\r\n\r\n",
+            path.read_bytes(),
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+    )
+    parsed = _request_json(
+        api_key,
+        f"{api_base}/files",
+        data=payload,
+        content_type=f"multipart/form-data; boundary={boundary}",
+        timeout=300.0,
+    )
+    file_id = parsed.get("id")
+    if not isinstance(file_id, str):
+        raise BatchError(f"File upload returned no id: {parsed}")
+    return file_id
+
+
+def create_batch(
+    api_key: str,
+    input_file_id: str,
+    *,
+    api_base: str = DEFAULT_API_BASE,
+    endpoint: str = CHAT_COMPLETIONS_ENDPOINT,
+    completion_window: str = DEFAULT_COMPLETION_WINDOW,
+    metadata: Optional[Dict[str, str]] = None,
+) -> Dict[str, object]:
+    body: Dict[str, object] = {
+        "input_file_id": input_file_id,
+        "endpoint": endpoint,
+        "completion_window": completion_window,
+    }
+    if metadata:
+        body["metadata"] = metadata
+    return _request_json(api_key, f"{api_base}/batches", data=json.dumps(body).encode("utf-8"))
+
+
+def get_batch(api_key: str, batch_id: str, *, api_base: str = DEFAULT_API_BASE) -> Dict[str, object]:
+    return _request_json(api_key, f"{api_base}/batches/{batch_id}")
+
+
+def wait_for_batch(
+    api_key: str,
+    batch_id: str,
+    *,
+    api_base: str = DEFAULT_API_BASE,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, object]:
+    """Poll until the batch reaches a terminal status and return the final batch object."""
+    last_status = None
+    while True:
+        batch = get_batch(api_key, batch_id, api_base=api_base)
+        status = batch.get("status")
+        if status != last_status:
+            counts = batch.get("request_counts") or {}
+            print(f"[batch {batch_id}] status={status} counts={counts}", file=sys.stderr)
+            last_status = status
+        if status in TERMINAL_STATUSES:
+            return batch
+        sleep(poll_seconds)
+
+
+def download_file(api_key: str, file_id: str, target: Path, *, api_base: str = DEFAULT_API_BASE) -> Path:
+    """Stream a file's content to `target` (written to a temp name first, so partial downloads are not reused)."""
+    url = f"{api_base}/files/{file_id}/content"
+    tmp = target.with_name(target.name + ".part")
+    try:
+        with tmp.open("wb") as out:
+            default_client().request("GET", url, headers={"Authorization": f"Bearer {api_key}"}, timeout=300, sink=out)
+    except HTTPError as exc:
+        detail = exc.read().decode("utf-8", errors="ignore")
+        raise BatchError(f"OpenAI batch HTTP error {exc.code} downloading {file_id}: {detail}") from exc
+    except URLError as exc:
+        raise BatchError(f"OpenAI batch network error downloading {file_id}: {exc}") from exc
+    tmp.replace(target)
+    return target
+
+
+def iter_batch_results(path: Path) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Yield (custom_id, content, error) per line of a batch output/error file.
+    `content` is the first non-empty message content; `error` describes failed requests.
+    """
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            custom_id = str(record.get("custom_id") or "")
+            error = record.get("error")
+            response = record.get("response") or {}
+            status_code = response.get("status_code")
+            body = response.get("body") or {}
+            if error or (status_code is not None and status_code != 200):
+                yield custom_id, None, json.dumps(error or body)
+                continue
+            content = None
+            for choice in body.get("choices") or []:
+                msg = (choice.get("message") or {}).get("content")
+                if isinstance(msg, str) and msg.strip():
+                    content = msg
+                    break
+            if content is None:
+                yield custom_id, None, "no content in batch response"
+            else:
+                yield custom_id, content, None
@@ -0,0 +1,314 @@
+"""
+Shared keep-alive HTTP client for all OpenAI calls (stdlib only).
+
+urlopen() opens a fresh TCP + TLS connection for every request; at a few
+hundred calls per tagging run that handshake is a noticeable part of each
+request. HttpClient keeps a small pool of http.client connections per host
+and reuses them, and records per-request timings (connect, time to first
+byte, total) so the effect is visible in the run summary.
+
+Errors are raised as urllib.error.HTTPError / URLError, so callers keep their
+existing handling of 429/400 responses and network failures.
+
+    client = default_client()
+    resp = client.request("POST", url, body=data, headers=headers, timeout=30)
+    payload = resp.read()
+
+An asyncio front-end (AsyncHttpClient) runs requests on worker threads and
+shares the same pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import io
+import json
+import select
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+DEFAULT_TIMEOUT = 60.0
+STREAM_CHUNK_BYTES = 1 << 16
+
+PoolKey = Tuple[str, str, int]
+
+
+class _StaleConnection(Exception):
+    """A reused keep-alive connection failed before the request was fully sent (safe to resend)."""
+
+
+@dataclass(frozen=True)
+class RequestTiming:
+    connect_s: float  # 0.0 when a pooled connection was reused
+    ttfb_s: float  # request sent -> status line and headers received
+    total_s: float  # including connect and reading the body
+    reused: bool
+
+
+class HttpResponse:
+    """Fully read (or streamed to `sink`) response; read() mirrors the urlopen response object."""
+
+    def __init__(self, status: int, reason: str, headers: http.client.HTTPMessage, body: bytes, timing: RequestTiming):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.timing = timing
+
+    def read(self) -> bytes:
+        return self.body
+
+    def json(self) -> object:
+        return json.loads(self.body.decode("utf-8"))
+
+
+class TimingStats:
+    """Thread-safe aggregate of RequestTiming values."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._timings: List[RequestTiming] = []
+
+    def record(self, timing: RequestTiming) -> None:
+        with self._lock:
+            self._timings.append(timing)
+
+    def snapshot(self) -> List[RequestTiming]:
+        with self._lock:
+            return list(self._timings)
+
+    def summary(self) -> str:
+        timings = self.snapshot()
+        if not timings:
+            return "requests=0"
+        reused = sum(1 for t in timings if t.reused)
+        connects = [t.connect_s for t in timings if not t.reused]
+        connect_avg = sum(connects) / len(connects) if connects else 0.0
+        ttfb = sorted(t.ttfb_s for t in timings)
+        total = sorted(t.total_s for t in timings)
+        return (
+            f"requests={len(timings)} reused={reused} new_connections={len(connects)} "
+            f"connect_avg={connect_avg * 1000:.0f}ms "
+            f"ttfb_p50={_percentile(ttfb, 0.5) * 1000:.0f}ms ttfb_p95={_percentile(ttfb, 0.95) * 1000:.0f}ms "
+            f"total_p50={_percentile(total, 0.5) * 1000:.0f}ms total_p95={_percentile(total, 0.95) * 1000:.0f}ms"
+        )
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class HttpClient:
+    """Thread-safe pool of keep-alive connections, keyed by (scheme, host, port)."""
+
+    def __init__(self, *, max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST) -> None:
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self.stats = TimingStats()
+        self._idle: Dict[PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        self._proxies = getproxies()
+
+    def _new_connection(self, key: PoolKey, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            proxy = self._proxies.get("https")
+            if proxy and not proxy_bypass(host):
+                # Same as urlopen with HTTPS_PROXY set: CONNECT tunnel, TLS to the target inside it.
+                parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+                conn = http.client.HTTPSConnection(
+                    parts.hostname, parts.port or 80, timeout=timeout, context=self._ssl_context
+                )
+                conn.set_tunnel(host, port)
+                return conn
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        # Plain HTTP is only used for local stand-in servers; no proxy handling.
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key: PoolKey) -> Optional[http.client.HTTPConnection]:
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None or not _is_dropped(conn):
+                return conn
+            conn.close()  # the server closed it while idle; checked before sending so nothing is resent
+
+    def set_max_connections(self, max_connections_per_host: int) -> None:
+        """Change the pool size; idle connections above the new cap are closed."""
+        surplus: List[http.client.HTTPConnection] = []
+        with self._lock:
+            self.max_connections_per_host = max(1, max_connections_per_host)
+            for idle in self._idle.values():
+                while len(idle) > self.max_connections_per_host:
+                    surplus.append(idle.pop(0))
+        for conn in surplus:
+            conn.close()
+
+    def _release(self, key: PoolKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_connections_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        sink: Optional[BinaryIO] = None,
+    ) -> HttpResponse:
+        """
+        Send one request over a pooled connection. With `sink`, a 2xx body is streamed
+        into it instead of being kept in memory. Raises HTTPError for status >= 400.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise URLError(f"unsupported URL: {url}")
+        key: PoolKey = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        send_headers = dict(headers or {})
+        send_headers.setdefault("Connection", "keep-alive")
+
+        conn = self._acquire(key)
+        if conn is not None:
+            try:
+                return self._send(key, conn, True, method, url, path, body, send_headers, timeout, sink)
+            except _StaleConnection:
+                conn.close()  # the request never fully went out; retry once on a fresh connection
+        conn = self._new_connection(key, timeout)
+        return self._send(key, conn, False, method, url, path, body, send_headers, timeout, sink)
+
+    def _send(
+        self,
+        key: PoolKey,
+        conn: http.client.HTTPConnection,
+        reused: bool,
+        method: str,
+        url: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+        timeout: float,
+        sink: Optional[BinaryIO],
+    ) -> HttpResponse:
+        start = time.perf_counter()
+        connect_s = 0.0
+        request_sent = False
+        try:
+            conn.timeout = timeout
+            if conn.sock is None:
+                conn.connect()
+                connect_s = time.perf_counter() - start
+            else:
+                conn.sock.settimeout(timeout)
+            sent = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            request_sent = True
+            resp = conn.getresponse()
+            ttfb_s = time.perf_counter() - sent
+            if sink is not None and 200 <= resp.status < 300:
+                while True:
+                    chunk = resp.read(STREAM_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    sink.write(chunk)
+                data = b""
+            else:
+                data = resp.read()
+        except (OSError, http.client.HTTPException) as exc:
+            if reused and not request_sent and not isinstance(exc, TimeoutError):
+                # Once the body is out the server may act on it (a paid call); never resend those.
+                raise _StaleConnection() from exc
+            conn.close()
+            raise URLError(exc) from exc
+
+        timing = RequestTiming(connect_s=connect_s, ttfb_s=ttfb_s, total_s=time.perf_counter() - start, reused=reused)
+        self.stats.record(timing)
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        if resp.status >= 400:
+            raise HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(data))
+        return HttpResponse(resp.status, resp.reason, resp.headers, data, timing)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class AsyncHttpClient:
+    """
+    asyncio front-end: requests run on worker threads over the shared pool; a semaphore
+    caps in-flight requests at the pool size so they never queue for sockets.
+    """
+
+    def __init__(self, client: Optional[HttpClient] = None) -> None:
+        self.client = client or default_client()
+        self._semaphore = asyncio.Semaphore(self.client.max_connections_per_host)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> HttpResponse:
+        async with self._semaphore:
+            return await asyncio.to_thread(
+                self.client.request, method, url, body=body, headers=headers, timeout=timeout
+            )
+
+
+_DEFAULT_CLIENT: Optional[HttpClient] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_client() -> HttpClient:
+    """Process-wide client shared by all call sites, so they also share warm connections."""
+    global _DEFAULT_CLIENT
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CLIENT is None:
+            _DEFAULT_CLIENT = HttpClient()
+        return _DEFAULT_CLIENT
+
+
+def set_default_pool_size(max_connections_per_host: int) -> None:
+    """Match the pool to the caller's concurrency (idle connections above the cap are closed)."""
+    default_client().set_max_connections(max_connections_per_host)
+
+
+def _is_dropped(conn: http.client.HTTPConnection) -> bool:
+    """An idle keep-alive socket that reads as ready has been closed by the peer (or holds stray data)."""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
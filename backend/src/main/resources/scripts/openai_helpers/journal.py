@@ -0,0 +1,317 @@
+"""
+Write-ahead job journal for the tagging scripts (JSONL, append-only).
+
+Two record kinds:
+  {"t": "call", "item": ID, "key": K, "value": V}   one completed (paid) model call (a call that
+                                                    answers several items gets one record per item)
+  {"t": "commit", "item": ID, "rows": [[...], ...]} an item whose output rows are final
+
+A commit record is written (and fsynced) *before* the rows go to the output CSV,
+so after a crash the journal knows everything the CSV may contain. The rows of the
+last RECENT_COMMITS commits are kept, so a writer that commits a whole batch of
+items before appending them can be caught up after a crash. Replaying the journal
+on start-up is a single pass; call records of committed items are dropped and the
+file is compacted when most of it is such garbage. The output CSV is only touched
+at its tail (see sync_with_output).
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+Row = Sequence[object]
+# Compact on open when dropped call records outnumber live records by this factor.
+COMPACT_RATIO = 2.0
+TAIL_BLOCK_BYTES = 4096
+# Commits whose rows are kept (in memory and across compaction) for re-appending after a crash.
+RECENT_COMMITS = 4096
+
+
+def call_key(model: str, prompt: str, repeat_index: int) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:32]
+    return f"{model}:{prompt_hash}:{repeat_index}"
+
+
+def read_tail_item_id(output_path: Path) -> Optional[str]:
+    """First column of the last data row of a CSV, reading only the end of the file."""
+    if not output_path.exists():
+        return None
+    with output_path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buffer = b""
+        while pos > 0:
+            step = min(TAIL_BLOCK_BYTES, pos)
+            pos -= step
+            f.seek(pos)
+            buffer = f.read(step) + buffer
+            lines = buffer.splitlines()
+            # The first line may be cut off unless we reached the start of the file.
+            candidates = lines if pos == 0 else lines[1:]
+            for raw in reversed(candidates):
+                line = raw.decode("utf-8", errors="ignore").strip()
+                if not line:
+                    continue
+                if pos == 0 and raw is lines[0]:
+                    return None  # only the header is left
+                return line.split(",", 1)[0].strip() or None
+    return None
+
+
+class JobJournal:
+    """Thread-safe journal; `committed` keeps commit order (oldest first)."""
+
+    def __init__(self, path: Path, *, fsync: bool = True) -> None:
+        self.path = path
+        self.fsync = fsync
+        self.committed: Dict[str, None] = {}
+        self.recent_rows: Dict[str, List[List[object]]] = {}  # last RECENT_COMMITS commits, oldest first
+        self._calls: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dead = self._replay()
+        live = len(self.committed) + sum(len(v) for v in self._calls.values())
+        if dead > COMPACT_RATIO * max(1, live):
+            self._rewrite()
+        self._file = path.open("a", encoding="utf-8")
+
+    @property
+    def last_committed(self) -> Optional[str]:
+        return next(reversed(self.committed), None) if self.committed else None
+
+    @property
+    def last_rows(self) -> List[List[object]]:
+        last = self.last_committed
+        return self.recent_rows.get(last, []) if last is not None else []
+
+    def _remember(self, item: str, rows: List[List[object]]) -> None:
+        self.committed.pop(item, None)
+        self.committed[item] = None
+        self.recent_rows.pop(item, None)
+        self.recent_rows[item] = rows
+        while len(self.recent_rows) > RECENT_COMMITS:
+            del self.recent_rows[next(iter(self.recent_rows))]
+
+    def _replay(self) -> int:
+        dead = 0
+        if not self.path.exists():
+            return dead
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line after a crash
+                item = str(record.get("item"))
+                if record.get("t") == "call":
+                    if item in self.committed:
+                        dead += 1
+                        continue
+                    self._calls.setdefault(item, {})[str(record.get("key"))] = record.get("value")
+                elif record.get("t") == "commit":
+                    dead += len(self._calls.pop(item, {}))
+                    self._remember(item, record.get("rows") or [])
+        return dead
+
+    def _rewrite(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for item in self.committed:
+                rows = self.recent_rows.get(item, [])
+                f.write(json.dumps({"t": "commit", "item": item, "rows": rows}) + "\n")
+            for item, calls in self._calls.items():
+                for key, value in calls.items():
+                    f.write(json.dumps({"t": "call", "item": item, "key": key, "value": value}) + "\n")
+        tmp.replace(self.path)
+
+    def _append(self, records: Sequence[Dict[str, object]]) -> None:
+        self._file.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def lookup(self, item: object, model: str, prompt: str, repeat_index: int) -> Optional[object]:
+        with self._lock:
+            return self._calls.get(str(item), {}).get(call_key(model, prompt, repeat_index))
+
+    def record_call(self, item: object, model: str, prompt: str, repeat_index: int, value: object) -> None:
+        key = call_key(model, prompt, repeat_index)
+        with self._lock:
+            self._calls.setdefault(str(item), {})[key] = value
+            self._append([{"t": "call", "item": str(item), "key": key, "value": value}])
+
+    def record_calls(self, values: Mapping[object, object], model: str, prompt: str, repeat_index: int) -> None:
+        """record_call() for one call that answered several items: each item's part under its own ID."""
+        key = call_key(model, prompt, repeat_index)
+        records = [{"t": "call", "item": str(item), "key": key, "value": value} for item, value in values.items()]
+        with self._lock:
+            for record in records:
+                self._calls.setdefault(record["item"], {})[key] = record["value"]
+            self._append(records)
+
+    def commit(self, item: object, rows: Sequence[Row]) -> None:
+        """Record the final rows of `item`; call this right before appending them to the output."""
+        self.commit_many([(item, rows)])
+
+    def commit_many(self, items: Sequence[Tuple[object, Sequence[Row]]]) -> None:
+        """commit() for several items with a single write and fsync (group commit)."""
+        records = []
+        with self._lock:
+            for item, rows in items:
+                self._calls.pop(str(item), None)
+                row_lists = [list(row) for row in rows]
+                self._remember(str(item), row_lists)
+                records.append({"t": "commit", "item": str(item), "rows": row_lists})
+            if records:
+                self._append(records)
+
+    def reset(self, committed: Sequence[str] = ()) -> None:
+        """Drop all state; optionally seed commit records (e.g. from an existing output CSV)."""
+        with self._lock:
+            self._calls.clear()
+            self.committed = {str(item): None for item in committed}
+            self.recent_rows = {}
+            self._reopen()
+
+    def move_to_end(self, items: Sequence[str]) -> None:
+        """Reorder commits so `items` come last, in this order (after merging shards into the output)."""
+        with self._lock:
+            for item in items:
+                if str(item) in self.committed:
+                    self._remember(str(item), self.recent_rows.get(str(item), []))
+            self._reopen()
+
+    def forget(self, items: Sequence[str]) -> None:
+        """Drop commits and recorded calls of `items` (their rows were removed from the output to re-tag them)."""
+        with self._lock:
+            for item in items:
+                self.committed.pop(str(item), None)
+                self.recent_rows.pop(str(item), None)
+                self._calls.pop(str(item), None)
+            self._reopen()
+
+    def _reopen(self) -> None:
+        self._file.close()
+        self._rewrite()
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def _commits_after(self, tail: Optional[str]) -> Optional[List[str]]:
+        """Items committed after `tail` (all items if tail is None); None if tail is not a known commit."""
+        if tail is None:
+            return list(self.committed)
+        if tail not in self.committed:
+            return None
+        after: List[str] = []
+        for item in reversed(self.committed):
+            if item == tail:
+                break
+            after.append(item)
+        after.reverse()
+        return after
+
+    def sync_with_output(
+        self,
+        output_path: Path,
+        append_rows: Callable[[Sequence[Row]], None],
+        *,
+        max_lag: int = 1,
+    ) -> None:
+        """
+        Reconcile with the output CSV by looking only at its last row:
+        - journal ahead (crash between commit and write): re-append the rows of the commits after the last row;
+        - output without journal, or edited by hand: rebuild commit records from the CSV (one full read);
+        - output removed: start over. An empty output counts as removed once more than `max_lag`
+          (the writer's largest group commit) items were committed.
+        """
+        tail = read_tail_item_id(output_path)
+        missing = self._commits_after(tail)
+        if missing == []:
+            return
+        if (
+            missing is not None
+            and (tail is not None or len(missing) <= max_lag)
+            and all(item in self.recent_rows for item in missing)
+        ):
+            print(
+                f"[journal] re-appending rows of {len(missing)} item(s) from {missing[0]} "
+                "(interrupted before the output write)",
+                file=sys.stderr,
+            )
+            for item in missing:
+                append_rows(self.recent_rows[item])
+            return
+        if tail is None:
+            print(f"[journal] {output_path.name} has no rows; resetting {self.path.name}", file=sys.stderr)
+            self.reset()
+            return
+        print(f"[journal] rebuilding {self.path.name} from {output_path.name}", file=sys.stderr)
+        self.reset(list(read_item_ids(output_path)))
+
+    def sync_with_shards(
+        self,
+        output_path: Path,
+        shard_items: Mapping[str, None],
+        append_rows: Callable[[str, Sequence[Row]], None],
+    ) -> None:
+        """
+        Sharded counterpart of sync_with_output. Items committed after the output's last row
+        belong to shard files (`shard_items`: item IDs found there); committed items missing
+        from the shards are re-appended via append_rows(item, rows), or forgotten if their rows
+        are no longer known, and shard items without a commit record are added.
+        """
+        after = self._commits_after(read_tail_item_id(output_path))
+        if after is None:
+            print(f"[journal] rebuilding {self.path.name} from {output_path.name} and shards", file=sys.stderr)
+            ids = read_item_ids(output_path)
+            for item in shard_items:
+                ids.pop(item, None)
+                ids[item] = None
+            self.reset(list(ids))
+            return
+        changed = False
+        for item in after:
+            if item in shard_items:
+                continue
+            if item in self.recent_rows:
+                print(f"[journal] re-appending rows of {item} to its shard", file=sys.stderr)
+                append_rows(item, self.recent_rows[item])
+            else:
+                self.committed.pop(item, None)
+                changed = True
+        for item in shard_items:
+            if item not in self.committed:
+                self.committed[item] = None
+                changed = True
+        if changed:
+            with self._lock:
+                self._reopen()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def summary(self) -> str:
+        pending = sum(len(v) for v in self._calls.values())
+        return f"journal={self.path.name} committed={len(self.committed)} pending_calls={pending}"
+
+
+def read_item_ids(output_path: Path) -> Dict[str, None]:
+    """First-column IDs of a CSV in file order (one full read)."""
+    ids: Dict[str, None] = {}
+    if not output_path.exists():
+        return ids
+    with output_path.open(encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row and row[0].strip():
+                ids.pop(row[0].strip(), None)
+                ids[row[0].strip()] = None
+    return ids
@@ -0,0 +1,190 @@
+"""
+Token-bucket rate limiting shared by all OpenAI callers.
+
+Two buckets refill continuously instead of resetting once per minute:
+- requests: refills at RPM/60 per second,
+- tokens:   refills at TPM/60 per second (disabled when TPM <= 0).
+
+Each bucket holds at most `burst_seconds` worth of budget, so a fresh limiter
+cannot fire a whole minute of requests at once. Callers reserve an estimated
+token count before sending, then report the response `usage` so the limiter can
+refund/charge the difference and learn a better chars-per-token ratio. A call
+that fails without a `usage` block gives its reservation back via `release()`.
+A 429 with Retry-After pauses every caller of the limiter via `backoff()`.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional
+
+DEFAULT_BURST_SECONDS = 10.0
+DEFAULT_CHARS_PER_TOKEN = 4.0
+# Exponential smoothing factor for the learned chars-per-token ratio.
+USAGE_SMOOTHING = 0.2
+# Pause used by backoff() when the server did not send a Retry-After hint.
+DEFAULT_BACKOFF_SECONDS = 5.0
+# Tolerance for float rounding after a refill (avoids endless micro-sleeps).
+_EPS = 1e-6
+
+
+@dataclass
+class Reservation:
+    """Budget taken by one request; passed back to `record_usage`."""
+
+    estimated_tokens: int
+    prompt_chars: int = 0
+    settled: bool = False  # usage recorded or released; the reservation no longer holds tokens
+
+
+class _Bucket:
+    def __init__(self, per_minute: float, burst_seconds: float, now: float) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute * burst_seconds / 60.0)
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the bucket are admitted once it is full (the level then goes negative).
+        needed = min(amount, self.capacity)
+        if self.level >= needed - _EPS:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def drain(self) -> None:
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """Thread-safe RPM + TPM token-bucket limiter (0 disables a dimension)."""
+
+    def __init__(
+        self,
+        max_requests_per_minute: int,
+        max_tokens_per_minute: int = 0,
+        *,
+        burst_seconds: float = DEFAULT_BURST_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.max_requests = max_requests_per_minute
+        self.max_tokens = max_tokens_per_minute
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self.total_requests = 0
+        self.total_tokens = 0
+        self.total_wait_seconds = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        now = clock()
+        self._requests = _Bucket(max_requests_per_minute, burst_seconds, now) if max_requests_per_minute > 0 else None
+        self._tokens = _Bucket(max_tokens_per_minute, burst_seconds, now) if max_tokens_per_minute > 0 else None
+        self._blocked_until = 0.0
+
+    def estimate_tokens(self, prompt: str, max_output_tokens: int = 0) -> int:
+        """Estimate the TPM cost of a request (prompt estimate + reserved output tokens)."""
+        return int(math.ceil(len(prompt) / self.chars_per_token)) + max(0, max_output_tokens)
+
+    def wait_for_slot(self, estimated_tokens: int = 0, prompt_chars: int = 0) -> Reservation:
+        """Block until one request and `estimated_tokens` fit into the buckets, then reserve them."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                delay = max(0.0, self._blocked_until - now)
+                if delay <= 0:
+                    if self._requests:
+                        self._requests.refill(now)
+                        delay = self._requests.wait_time(1)
+                    if self._tokens and estimated_tokens > 0:
+                        self._tokens.refill(now)
+                        delay = max(delay, self._tokens.wait_time(estimated_tokens))
+                if delay <= 0:
+                    if self._requests:
+                        self._requests.level -= 1
+                    if self._tokens:
+                        self._tokens.level -= estimated_tokens
+                    self.total_requests += 1
+                    self.total_wait_seconds += waited
+                    return Reservation(estimated_tokens=estimated_tokens, prompt_chars=prompt_chars)
+            self._sleep(delay)
+            waited += delay
+
+    def record_usage(self, reservation: Reservation, usage: Optional[Mapping[str, object]]) -> None:
+        """Correct the token bucket and the estimate ratio from a response `usage` block."""
+        if not isinstance(usage, Mapping):
+            return
+        total = usage.get("total_tokens")
+        prompt_tokens = usage.get("prompt_tokens")
+        with self._lock:
+            if isinstance(total, int) and total >= 0 and not reservation.settled:
+                reservation.settled = True
+                self.total_tokens += total
+                self._refund(reservation.estimated_tokens - total)
+            if isinstance(prompt_tokens, int) and prompt_tokens > 0 and reservation.prompt_chars > 0:
+                observed = reservation.prompt_chars / prompt_tokens
+                self.chars_per_token = (1 - USAGE_SMOOTHING) * self.chars_per_token + USAGE_SMOOTHING * observed
+
+    def release(self, reservation: Reservation) -> None:
+        """Give back the reserved tokens of a call that ended without usage (error, timeout); idempotent."""
+        with self._lock:
+            if not reservation.settled:
+                reservation.settled = True
+                self._refund(reservation.estimated_tokens)
+
+    def _refund(self, tokens: int) -> None:
+        # Caller holds the lock.
+        if self._tokens:
+            self._tokens.refill(self._clock())
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + tokens)
+
+    def backoff(self, retry_after: Optional[float] = None) -> None:
+        """
+        React to a 429: drain both buckets and block all callers for `retry_after` seconds
+        (or DEFAULT_BACKOFF_SECONDS). The pause is enforced by the next `wait_for_slot`.
+        """
+        pause = retry_after if retry_after and retry_after > 0 else DEFAULT_BACKOFF_SECONDS
+        with self._lock:
+            now = self._clock()
+            self._blocked_until = max(self._blocked_until, now + pause)
+            for bucket in (self._requests, self._tokens):
+                if bucket:
+                    bucket.refill(now)
+                    bucket.drain()
+                    bucket.updated = self._blocked_until
+
+
+def parse_retry_after_seconds(headers: object) -> Optional[float]:
+    # urllib returns email.message.Message for headers; access via get().
+    try:
+        raw = headers.get("Retry-After")  # type: ignore[attr-defined]
+    except Exception:
+        raw = None
+    if not raw:
+        return None
+    return normalize_retry_after_seconds(str(raw).strip())
+
+
+def normalize_retry_after_seconds(value: object) -> Optional[float]:
+    """
+    OpenAI's error payloads sometimes return retry_after in milliseconds (seen in practice),
+    while HTTP Retry-After headers are seconds. Normalize to seconds.
+    """
+    try:
+        seconds = float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    if seconds <= 0:
+        return None
+    # Heuristic: values that look like milliseconds (e.g. 55728) -> 55.728s.
+    if seconds > 300 and seconds < 300_000:
+        return seconds / 1000.0
+    return seconds
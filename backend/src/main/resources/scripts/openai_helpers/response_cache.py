@@ -0,0 +1,121 @@
+"""
+Persistent, content-addressed cache for parsed OpenAI responses (SQLite).
+
+Entries are keyed on (model, prompt hash, sampling params, repeat index), so a
+re-run with the same prompts returns exactly the lists of the previous run,
+while separate repeats of the same prompt stay separate samples.
+Values are stored as JSON. When the database grows beyond `max_bytes`, the
+least recently used entries are evicted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Mapping, Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# After an eviction the cache is trimmed to this fraction of max_bytes.
+EVICT_TARGET_RATIO = 0.9
+
+
+class CacheMissError(RuntimeError):
+    """Raised in cache-only mode when a response is not cached."""
+
+
+def cache_key(model: str, prompt: str, params: Mapping[str, object], repeat_index: int) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    params_json = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    raw = f"{model}\n{prompt_hash}\n{params_json}\n{repeat_index}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe SQLite cache; `cache_only=True` turns misses into CacheMissError."""
+
+    def __init__(self, path: Path, *, max_bytes: int = DEFAULT_MAX_BYTES, cache_only: bool = False) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    def get(self, model: str, prompt: str, params: Mapping[str, object], repeat_index: int) -> Optional[object]:
+        key = cache_key(model, prompt, params, repeat_index)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        if row is None:
+            if self.cache_only:
+                raise CacheMissError(f"cache-only: no cached response for model={model} repeat={repeat_index}")
+            return None
+        return json.loads(row[0])
+
+    def put(self, model: str, prompt: str, params: Mapping[str, object], repeat_index: int, value: object) -> None:
+        key = cache_key(model, prompt, params, repeat_index)
+        data = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, data, len(key) + len(model) + len(data), now, now),
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def summary(self) -> str:
+        return f"cache={self.path.name} hits={self.hits} misses={self.misses} size={self.total_bytes() / 1024:.1f}KiB"
+
+    def _total_bytes_locked(self) -> int:
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return int(row[0])
+
+    def _evict_locked(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        total = self._total_bytes_locked()
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        cursor = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC")
+        doomed = []
+        for key, size in cursor:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
@@ -0,0 +1,395 @@
+"""
+Token usage totals collected from the `usage` block of chat-completions responses,
+plus per-model call telemetry for sizing concurrency and budget.
+
+`cached_prompt_tokens` comes from `usage.prompt_tokens_details.cached_tokens`, i.e. the
+part of the prompt served from OpenAI's prompt cache (billed at a discount). It only
+grows when prompts share a byte-identical prefix of at least ~1024 tokens.
+
+Per model, UsageStats keeps call latencies (p50/p95/p99), tokens, an estimated cost
+(MODEL_PRICES, USD per 1M tokens), failed calls by exception type (RateLimitError,
+MaxTokensError, ...; each one is retried or given up by the caller) and the time spent
+waiting for rate-limit slots. With a sink, every call is also written out:
+    JsonlSink        one JSON record per call, plus a summary record at close()
+    PrometheusSink   textfile-collector format, rewritten every few seconds and at close()
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+# USD per 1M tokens: (input, cached input, output). Dated snapshots match by prefix
+# ("gpt-4.1-nano-2025-04-14" -> "gpt-4.1-nano"); override with --price MODEL=IN,CACHED,OUT.
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+}
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_INTERVAL_SECONDS = 5.0
+METRIC_PREFIX = "tagging"
+
+
+def _as_int(value: object) -> int:
+    try:
+        return int(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return 0
+
+
+def _cached_tokens(usage: Mapping[str, object]) -> int:
+    details = usage.get("prompt_tokens_details")
+    return _as_int(details.get("cached_tokens")) if isinstance(details, Mapping) else 0
+
+
+def price_for(model: str, prices: Mapping[str, Tuple[float, float, float]]) -> Optional[Tuple[float, float, float]]:
+    """Exact match first, then the longest known model name the given one starts with."""
+    if model in prices:
+        return prices[model]
+    matches = [name for name in prices if model.startswith(name + "-")]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def parse_price(spec: str) -> Tuple[str, Tuple[float, float, float]]:
+    """'MODEL=IN,CACHED,OUT' (USD per 1M tokens) -> (model, prices)."""
+    model, sep, values = spec.partition("=")
+    parts = values.split(",")
+    if not sep or not model.strip() or len(parts) != 3:
+        raise ValueError(f"price must look like MODEL=IN,CACHED,OUT, got {spec!r}")
+    return model.strip(), (float(parts[0]), float(parts[1]), float(parts[2]))
+
+
+def quantile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank quantile of an ascending sequence (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ModelStats:
+    """Totals for one model; UsageStats holds the lock."""
+
+    def __init__(self) -> None:
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd: Optional[float] = 0.0
+        self.latencies: List[float] = []
+        self.failures: Dict[str, int] = {}  # exception type name -> count
+        self.wait_seconds = 0.0
+
+    def add_usage(self, usage: Mapping[str, object], price: Optional[Tuple[float, float, float]]) -> float:
+        prompt = _as_int(usage.get("prompt_tokens"))
+        cached = _cached_tokens(usage)
+        completion = _as_int(usage.get("completion_tokens"))
+        self.prompt_tokens += prompt
+        self.cached_prompt_tokens += cached
+        self.completion_tokens += completion
+        if price is None:
+            self.cost_usd = None
+            return 0.0
+        cost = ((prompt - cached) * price[0] + cached * price[1] + completion * price[2]) / 1_000_000
+        if self.cost_usd is not None:
+            self.cost_usd += cost
+        return cost
+
+    def latency_quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.latencies)
+        return {q: quantile(ordered, q) for q in LATENCY_QUANTILES}
+
+
+class UsageStats:
+    """Thread-safe running totals; feed it every response `usage` dict via record() or record_call()."""
+
+    def __init__(
+        self,
+        *,
+        sink: Optional["MetricsSink"] = None,
+        prices: Optional[Mapping[str, Tuple[float, float, float]]] = None,
+        item_label: str = "items",
+    ) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.items = 0
+        self.item_label = item_label
+        self.models: Dict[str, ModelStats] = {}
+        self.prices = dict(MODEL_PRICES if prices is None else prices)
+        self.sink = sink
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _model(self, model: str) -> ModelStats:
+        stats = self.models.get(model)
+        if stats is None:
+            stats = self.models[model] = ModelStats()
+        return stats
+
+    def record(self, usage: Mapping[str, object], *, model: Optional[str] = None) -> None:
+        with self._lock:
+            self._add_usage(usage, model)
+
+    def _add_usage(self, usage: Mapping[str, object], model: Optional[str]) -> float:
+        self.calls += 1
+        self.prompt_tokens += _as_int(usage.get("prompt_tokens"))
+        self.cached_prompt_tokens += _cached_tokens(usage)
+        self.completion_tokens += _as_int(usage.get("completion_tokens"))
+        if model is None:
+            return 0.0
+        return self._model(model).add_usage(usage, price_for(model, self.prices))
+
+    def record_call(
+        self,
+        model: str,
+        latency_s: float,
+        usage: Optional[Mapping[str, object]] = None,
+        *,
+        outcome: str = "ok",
+    ) -> None:
+        """One HTTP call: its latency, its usage block (if any) and "ok" or the exception type name."""
+        with self._lock:
+            stats = self._model(model)
+            cost = self._add_usage(usage, model) if usage else 0.0
+            stats.latencies.append(latency_s)
+            if outcome != "ok":
+                stats.failures[outcome] = stats.failures.get(outcome, 0) + 1
+            if self.sink:
+                self.sink.event(
+                    {
+                        "t": "call",
+                        "ts": round(time.time(), 3),
+                        "model": model,
+                        "outcome": outcome,
+                        "latency_s": round(latency_s, 4),
+                        "prompt_tokens": _as_int(usage.get("prompt_tokens")) if usage else 0,
+                        "cached_prompt_tokens": _cached_tokens(usage) if usage else 0,
+                        "completion_tokens": _as_int(usage.get("completion_tokens")) if usage else 0,
+                        "cost_usd": round(cost, 8),
+                    }
+                )
+                self.sink.update(self)
+
+    def record_wait(self, model: str, seconds: float) -> None:
+        """Time spent blocked on rate limits (limiter slots, 429 back-off) before a call to `model`."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._model(model).wait_seconds += seconds
+
+    def record_item(self, count: int = 1) -> None:
+        with self._lock:
+            self.items += count
+            if self.sink:
+                self.sink.update(self)
+
+    def items_per_minute(self) -> float:
+        return self.items / max(1e-6, (time.monotonic() - self.started) / 60.0)
+
+    def total_cost(self) -> Optional[float]:
+        costs = [m.cost_usd for m in self.models.values()]
+        return None if any(c is None for c in costs) else sum(c for c in costs if c is not None)
+
+    def cached_ratio(self) -> float:
+        return self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def summary(self) -> str:
+        cost = self.total_cost()
+        cost_text = f" cost_usd={cost:.4f}" if cost is not None and self.models else ""
+        return (
+            f"calls={self.calls} prompt_tokens={self.prompt_tokens} "
+            f"cached_prompt_tokens={self.cached_prompt_tokens} ({100.0 * self.cached_ratio():.0f}%) "
+            f"completion_tokens={self.completion_tokens}{cost_text}"
+        )
+
+    def table(self) -> List[str]:
+        """Per-model summary table (one string per line)."""
+        lines = [
+            f"{'model':<24} {'calls':>6} {'p50_s':>7} {'p95_s':>7} {'p99_s':>7} {'prompt':>10} {'cached':>10} "
+            f"{'completion':>10} {'cost_usd':>9} {'429':>5} {'max_tok':>7} {'errors':>6} {'wait_s':>8}"
+        ]
+        with self._lock:
+            for model, stats in sorted(self.models.items()):
+                q = stats.latency_quantiles()
+                rate_limited = stats.failures.get("RateLimitError", 0)
+                max_tokens = stats.failures.get("MaxTokensError", 0)
+                other = sum(stats.failures.values()) - rate_limited - max_tokens
+                cost = f"{stats.cost_usd:9.4f}" if stats.cost_usd is not None else f"{'n/a':>9}"
+                lines.append(
+                    f"{model:<24} {len(stats.latencies):>6} {q[0.5]:>7.2f} {q[0.95]:>7.2f} {q[0.99]:>7.2f} "
+                    f"{stats.prompt_tokens:>10} {stats.cached_prompt_tokens:>10} {stats.completion_tokens:>10} "
+                    f"{cost} {rate_limited:>5} {max_tokens:>7} {other:>6} {stats.wait_seconds:>8.1f}"
+                )
+        lines.append(f"{self.item_label}={self.items} {self.item_label}_per_min={self.items_per_minute():.2f}")
+        return lines
+
+    def snapshot(self) -> Dict[str, object]:
+        """All totals as plain data (JSONL summary record)."""
+        with self._lock:
+            models = {}
+            for model, stats in self.models.items():
+                models[model] = {
+                    "calls": len(stats.latencies),
+                    "latency_s": {f"p{int(q * 100)}": round(v, 4) for q, v in stats.latency_quantiles().items()},
+                    "prompt_tokens": stats.prompt_tokens,
+                    "cached_prompt_tokens": stats.cached_prompt_tokens,
+                    "completion_tokens": stats.completion_tokens,
+                    "cost_usd": None if stats.cost_usd is None else round(stats.cost_usd, 6),
+                    "failures": dict(stats.failures),
+                    "wait_s": round(stats.wait_seconds, 3),
+                }
+            return {
+                "t": "summary",
+                "ts": round(time.time(), 3),
+                "items": self.items,
+                "items_per_min": round(self.items_per_minute(), 3),
+                "models": models,
+            }
+
+    def close(self) -> None:
+        """Final write to the sink (if any)."""
+        if self.sink:
+            self.sink.close(self)
+            self.sink = None
+
+
+class MetricsSink:
+    """Where UsageStats writes: event() per call, update() after each change, close() once at the end."""
+
+    def event(self, record: Mapping[str, object]) -> None:
+        pass
+
+    def update(self, stats: UsageStats) -> None:
+        pass
+
+    def close(self, stats: UsageStats) -> None:
+        pass
+
+
+class JsonlSink(MetricsSink):
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file = path.open("a", encoding="utf-8")
+
+    def event(self, record: Mapping[str, object]) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self, stats: UsageStats) -> None:
+        self.event(stats.snapshot())
+        self._file.close()
+
+
+class PrometheusSink(MetricsSink):
+    """node_exporter textfile collector format; the file is replaced atomically."""
+
+    def __init__(self, path: Path, *, interval_seconds: float = PROMETHEUS_INTERVAL_SECONDS) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self._last_write = 0.0
+
+    def update(self, stats: UsageStats) -> None:
+        if time.monotonic() - self._last_write >= self.interval_seconds:
+            self._write(stats)
+
+    def close(self, stats: UsageStats) -> None:
+        with stats._lock:
+            self._write(stats)
+
+    def _write(self, stats: UsageStats) -> None:
+        # Called with stats._lock held.
+        p = METRIC_PREFIX
+        out: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: Sequence[Tuple[str, float]]) -> None:
+            out.append(f"# HELP {p}_{name} {help_text}")
+            out.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                out.append(f"{p}_{name}{{{labels}}} {value}" if labels else f"{p}_{name} {value}")
+
+        models = sorted(stats.models.items())
+        calls = []
+        for model, m in models:
+            failed = sum(m.failures.values())
+            calls.append((f'model="{model}",outcome="ok"', len(m.latencies) - failed))
+            calls += [(f'model="{model}",outcome="{name}"', n) for name, n in sorted(m.failures.items())]
+        metric("openai_calls_total", "counter", "HTTP calls by model and outcome.", calls)
+        latency: List[Tuple[str, float]] = []
+        for model, m in models:
+            latency += [(f'model="{model}",quantile="{q}"', round(v, 4)) for q, v in m.latency_quantiles().items()]
+        metric("openai_latency_seconds", "summary", "Call latency.", latency)
+        out += [f'{p}_openai_latency_seconds_sum{{model="{model}"}} {sum(m.latencies):.4f}' for model, m in models]
+        out += [f'{p}_openai_latency_seconds_count{{model="{model}"}} {len(m.latencies)}' for model, m in models]
+        tokens = []
+        for model, m in models:
+            tokens += [
+                (f'model="{model}",kind="prompt"', m.prompt_tokens),
+                (f'model="{model}",kind="cached_prompt"', m.cached_prompt_tokens),
+                (f'model="{model}",kind="completion"', m.completion_tokens),
+            ]
+        metric("openai_tokens_total", "counter", "Tokens from response usage blocks.", tokens)
+        cost = [(f'model="{model}"', round(m.cost_usd, 6)) for model, m in models if m.cost_usd is not None]
+        metric("openai_cost_usd_total", "counter", "Estimated cost from MODEL_PRICES.", cost)
+        wait = [(f'model="{model}"', round(m.wait_seconds, 3)) for model, m in models]
+        metric("openai_rate_limit_wait_seconds_total", "counter", "Time blocked on rate limits.", wait)
+        metric("items_done_total", "counter", f"Finished {stats.item_label}.", [("", stats.items)])
+        rate = round(stats.items_per_minute(), 3)
+        metric("items_per_minute", "gauge", f"Finished {stats.item_label} per minute.", [("", rate)])
+
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("\n".join(out) + "\n", encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._last_write = time.monotonic()
+
+
+def open_metrics_sink(path: Optional[Path]) -> Optional[MetricsSink]:
+    """`*.prom` -> PrometheusSink, any other path -> JsonlSink, None -> no sink."""
+    if path is None:
+        return None
+    sink: MetricsSink = PrometheusSink(path) if path.suffix == ".prom" else JsonlSink(path)
+    print(f"[usage] metrics -> {path}", file=sys.stderr)
+    return sink
+
+
+class CallTimer:
+    """
+    Context manager around one model call:
+        call = CallTimer(usage_stats, model)
+        with call:
+            call_openai(..., on_usage=call.add_usage)
+    records latency, usage and outcome (exception type name) on exit; no-op without stats.
+    """
+
+    def __init__(self, stats: Optional[UsageStats], model: str) -> None:
+        self.stats = stats
+        self.model = model
+        self.usage: Dict[str, object] = {}
+        self._started = 0.0
+
+    def add_usage(self, usage: Mapping[str, object]) -> None:
+        self.usage.update(usage)
+
+    def __enter__(self) -> "CallTimer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.stats is not None:
+            outcome = "ok" if exc_type is None else exc_type.__name__
+            self.stats.record_call(self.model, time.perf_counter() - self._started, self.usage, outcome=outcome)
+        return False
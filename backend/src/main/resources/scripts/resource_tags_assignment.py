@@ -8,7 +8,7 @@ Workflow:
 - Merge ranked results with weights, then write up to the first 5 tags as rows: resourceID,tagID,weight (weights 5..1).
 
 Supports dry-run (no API calls), resume (skip already written resourceIDs),
-per-model rate limits, retries, prompt shrinking on token overrun, and debug logging.
+per-model rate limits (RPM + TPM token buckets), retries, prompt shrinking on token overrun, and debug logging.
 """
 
 from __future__ import annotations
@@ -23,9 +23,35 @@ import textwrap
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+
+from embedding_helpers.shortlist import (
+    DEFAULT_MODEL_NAME as DEFAULT_EMBEDDING_MODEL,
+    DEFAULT_RECALL_KS,
+    TagShortlister,
+    item_text,
+    load_reference_rows,
+    print_recall_report,
+)
+from embedding_helpers.store import open_store
+from openai_helpers.http_client import default_client
+from openai_helpers.journal import JobJournal, read_tail_item_id
+from openai_helpers.rate_limit import RateLimiter, normalize_retry_after_seconds, parse_retry_after_seconds
+from openai_helpers.response_cache import CacheMissError, ResponseCache
+from openai_helpers.usage import MODEL_PRICES, CallTimer, UsageStats, open_metrics_sink, parse_price
+from tagging_helpers.output_writer import (
+    DEFAULT_BATCH_ITEMS,
+    DEFAULT_BATCH_ROWS,
+    DEFAULT_FSYNC_SECONDS,
+    RowWriter,
+    append_rows,
+    merge_shards,
+    prefix_shard,
+    read_shard_items,
+    shard_dir_for,
+    shard_files,
+)
 
 # Default OpenAI models (fast + cost-effective)
 # Keep defaults conservative for trial credits and rate limits:
@@ -38,6 +64,8 @@ DEFAULT_OUTPUT = "../csv/ct_resource_tags_PLANNING.csv.txt"
 MIN_TAGS = 4
 MAX_TAGS = 7
 MAX_WEIGHTS = 5  # we only emit the first 5 tags (weights 5..1)
+DEFAULT_SHORTLIST_K = 0  # 0 = send the full tag catalog
+DEFAULT_JOURNAL_DIR = ".cache/journal"  # journal file: <dir>/<output file name>.jsonl
 DEFAULT_CONTINUE_AFTER_LAST_SOURCE_ID = True
 DEFAULT_CUSTOM_STARTING_SOURCE_ID: Optional[int] = None
 SAMPLE_SIZE_A = 1  # number of calls per resource to primary
@@ -49,6 +77,16 @@ WEIGHT_C = 3       # unused when tertiary disabled
 # Some newer models (e.g. gpt-5-*) may spend completion tokens on internal reasoning;
 # keep this high enough to still get a short JSON array in the visible output.
 DEFAULT_MAX_OUTPUT_TOKENS = 768
+DEFAULT_TOKENS_PER_MINUTE = 0  # TPM budget per model; 0 = only RPM limiting
+SAMPLING_TEMPERATURE = 0.2
+REASONING_EFFORT = "low"
+# Part of the response-cache key: changing sampling must not reuse old answers.
+SAMPLING_PARAMS: Dict[str, object] = {"temperature": SAMPLING_TEMPERATURE, "reasoning_effort": REASONING_EFFORT}
+DEFAULT_CACHE_PATH = ".cache/tag_responses.sqlite"
+DEFAULT_CACHE_MAX_MB = 256
+OUTPUT_HEADER = ["resourceID", "tagID", "weight"]
+SHARD_MODES = ("none", "prefix")
+DEFAULT_SHARD_PREFIX_LEN = 3  # leading digits of the resourceID (IDs are allocated in per-channel ranges)
 
 # Per-model parameter compatibility cache.
 # Some models reject specific parameters (e.g. gpt-5-nano may reject max_tokens).
@@ -86,43 +124,6 @@ class QuotaError(RuntimeError):
     pass
 
 
-class RateLimiter:
-    """Simple per-minute rate limiter."""
-
-    def __init__(self, max_requests_per_minute: int) -> None:
-        self.max_requests = max_requests_per_minute
-        self.window_start = time.time()
-        self.count = 0
-
-    def wait_for_slot(self) -> None:
-        if self.max_requests <= 0:
-            return
-        now = time.time()
-        elapsed = now - self.window_start
-        if elapsed >= 60:
-            self.window_start = now
-            self.count = 0
-        if self.count >= self.max_requests:
-            sleep_for = 60 - elapsed
-            if sleep_for > 0:
-                time.sleep(sleep_for)
-            self.window_start = time.time()
-            self.count = 0
-        self.count += 1
-
-    def wait_next_window(self, retry_after: Optional[float] = None) -> None:
-        """Wait until the next minute window or a provided retry_after hint."""
-        if retry_after and retry_after > 0:
-            time.sleep(retry_after)
-        else:
-            now = time.time()
-            elapsed = now - self.window_start
-            sleep_for = max(0.0, 60 - elapsed)
-            time.sleep(sleep_for)
-        self.window_start = time.time()
-        self.count = 0
-
-
 def load_env_file(env_path: Path) -> Dict[str, str]:
     if not env_path.exists():
         return {}
@@ -225,9 +226,9 @@ def load_resources(csv_path: Path) -> List[Resource]:
 
 
 def load_existing(output_path: Path) -> Set[int]:
+    seen: Set[int] = {int(item) for item in read_shard_items(shard_dir_for(output_path)) if item.isdigit()}
     if not output_path.exists():
-        return set()
-    seen: Set[int] = set()
+        return seen
     with output_path.open(encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -239,32 +240,34 @@ def load_existing(output_path: Path) -> Set[int]:
 
 
 def find_last_resource_id(output_path: Path) -> Optional[int]:
-    if not output_path.exists():
+    # Reads only the tail of the file, not the whole CSV.
+    last_id = read_tail_item_id(output_path)
+    try:
+        return int(last_id) if last_id is not None else None
+    except ValueError:
         return None
-    last_id: Optional[int] = None
-    with output_path.open(encoding="utf-8") as f:
-        for line in reversed(f.read().splitlines()):
-            line = line.strip()
-            if not line or line.startswith("resourceID"):
-                continue
-            parts = line.split(",")
-            if parts:
-                try:
-                    last_id = int(parts[0])
-                    break
-                except ValueError:
-                    continue
-    return last_id
 
 
 def ensure_header(output_path: Path) -> None:
     if output_path.exists():
         return
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text("resourceID,tagID,weight\n", encoding="utf-8")
+    output_path.write_text(",".join(OUTPUT_HEADER) + "\n", encoding="utf-8")
+
+
+def shard_function(shard_by: str, prefix_len: int) -> Optional[Callable[[str], str]]:
+    """resourceID -> shard key for --shard-by (None = no sharding)."""
+    if shard_by == "prefix":
+        return lambda resource_id: prefix_shard(resource_id, prefix_len)
+    return None
 
 
-def build_prompt(resource: Resource, tags: Dict[int, Tag], desc_limit: int, include_synonyms: bool) -> str:
+def build_prompt_prefix(tags: Dict[int, Tag], *, include_synonyms: bool) -> str:
+    """
+    Static head of every resource prompt: instructions + full tag catalog.
+    Build it once per run and keep it byte-identical across calls, so OpenAI's
+    prompt caching can reuse it; only the resource block differs per call.
+    """
     tag_lines = []
     for tag in tags.values():
         if include_synonyms and tag.synonyms:
@@ -274,11 +277,7 @@ def build_prompt(resource: Resource, tags: Dict[int, Tag], desc_limit: int, incl
         tag_lines.append(f"- {tag.tag_id}: {tag.name}{syn}")
     tag_catalog = "\n".join(tag_lines)
 
-    desc = (resource.description or "").strip()
-    if desc_limit and len(desc) > desc_limit:
-        desc = desc[:desc_limit] + "..."
-
-    return textwrap.dedent(
+    instructions = textwrap.dedent(
         f"""
         You are mapping a video resource to tags.
         - Choose between {MIN_TAGS} and {MAX_TAGS} tagIDs from the provided catalog.
@@ -286,15 +285,29 @@ def build_prompt(resource: Resource, tags: Dict[int, Tag], desc_limit: int, incl
         - Only return tagIDs from the catalog; never invent new IDs.
         - Prefer niche/specific tags when applicable; avoid overly generic matches unless clearly relevant.
         - Respond with a plain JSON array of integers, e.g. [12,4,7,1].
+        """
+    ).strip()
+    return f"{instructions}\n\nTag catalog:\n{tag_catalog}\n\n"
 
-        Tag catalog:
-        {tag_catalog}
 
+def build_prompt_prefixes(tags: Dict[int, Tag]) -> Dict[bool, str]:
+    """Prefixes keyed by include_synonyms (retries after MAX_TOKENS drop the synonyms)."""
+    return {flag: build_prompt_prefix(tags, include_synonyms=flag) for flag in (True, False)}
+
+
+def build_prompt(resource: Resource, prefix: str, desc_limit: int) -> str:
+    desc = (resource.description or "").strip()
+    if desc_limit and len(desc) > desc_limit:
+        desc = desc[:desc_limit] + "..."
+
+    suffix = textwrap.dedent(
+        f"""
         Resource:
         Title: {resource.title or "[no title]"}
         Description (truncated): {desc or "[no description]"}
         """
     ).strip()
+    return prefix + suffix
 
 
 def parse_tag_ids(raw_text: str) -> List[int]:
@@ -316,37 +329,6 @@ def parse_tag_ids(raw_text: str) -> List[int]:
     return tag_ids
 
 
-def _parse_retry_after_seconds(headers: object) -> Optional[float]:
-    # urllib returns email.message.Message for headers; access via get().
-    try:
-        raw = headers.get("Retry-After")  # type: ignore[attr-defined]
-    except Exception:
-        raw = None
-    if not raw:
-        return None
-    try:
-        return _normalize_retry_after_seconds(str(raw).strip())
-    except ValueError:
-        return None
-
-
-def _normalize_retry_after_seconds(value: object) -> Optional[float]:
-    """
-    OpenAI's error payloads sometimes return retry_after in milliseconds (seen in practice),
-    while HTTP Retry-After headers are seconds. Normalize to seconds.
-    """
-    try:
-        seconds = float(value)  # type: ignore[arg-type]
-    except (TypeError, ValueError):
-        return None
-    if seconds <= 0:
-        return None
-    # Heuristic: values that look like milliseconds (e.g. 55728) -> 55.728s.
-    if seconds > 300 and seconds < 300_000:
-        return seconds / 1000.0
-    return seconds
-
-
 def _normalize_param_name(raw: str) -> str:
     name = raw.strip()
     lowered = name.lower()
@@ -398,8 +380,15 @@ def _is_param_unsupported(model: str, param: str) -> bool:
 
 
 def call_openai(
-    api_key: str, model: str, prompt: str, *, max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS, debug: bool = False
+    api_key: str,
+    model: str,
+    prompt: str,
+    *,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    debug: bool = False,
+    on_usage: Optional[Callable[[Dict[str, object]], None]] = None,
 ) -> List[int]:
+    """Return the tagIDs chosen by `model`; `on_usage` receives the response `usage` block if present."""
     url = "https://api.openai.com/v1/chat/completions"
     base_messages = [
         {"role": "system", "content": "You are a precise tag selector. Return only JSON arrays of tagIDs."},
@@ -417,10 +406,10 @@ def call_openai(
             body: Dict[str, object] = {"model": model, "messages": base_messages}
 
             if not _is_param_unsupported(model, "temperature"):
-                body["temperature"] = 0.2
+                body["temperature"] = SAMPLING_TEMPERATURE
             if not _is_param_unsupported(model, "reasoning"):
                 # Reduce internal reasoning to preserve visible output tokens on reasoning-heavy models.
-                body["reasoning"] = {"effort": "low"}
+                body["reasoning"] = {"effort": REASONING_EFFORT}
             if tokens_param and not _is_param_unsupported(model, tokens_param):
                 body[tokens_param] = max_output_tokens
 
@@ -431,21 +420,27 @@ def call_openai(
                 )
 
             data = json.dumps(body).encode("utf-8")
-            req = Request(url, data=data, headers=headers)
 
             try:
-                with urlopen(req, timeout=30) as resp:
-                    payload = resp.read().decode("utf-8")
+                resp = default_client().request("POST", url, body=data, headers=headers, timeout=30)
+                payload = resp.read().decode("utf-8")
+                if debug:
+                    timing = resp.timing
+                    print(
+                        f"[debug] http connect={timing.connect_s * 1000:.0f}ms ttfb={timing.ttfb_s * 1000:.0f}ms "
+                        f"total={timing.total_s * 1000:.0f}ms reused={timing.reused}",
+                        file=sys.stderr,
+                    )
             except HTTPError as exc:
                 detail = exc.read().decode("utf-8", errors="ignore")
                 last_error_detail = detail
 
                 if exc.code == 429:
-                    retry_after = _parse_retry_after_seconds(exc.headers)
+                    retry_after = parse_retry_after_seconds(exc.headers)
                     try:
                         parsed_detail = json.loads(detail)
                         err = parsed_detail.get("error", {}) if isinstance(parsed_detail, dict) else {}
-                        retry_after = _normalize_retry_after_seconds(err.get("retry_after")) or retry_after
+                        retry_after = normalize_retry_after_seconds(err.get("retry_after")) or retry_after
                         err_type = err.get("type")
                         err_code = err.get("code")
                         err_msg = err.get("message")
@@ -506,6 +501,8 @@ def call_openai(
 
             parsed = json.loads(payload)
             _MODEL_TOKENS_PARAM[model] = tokens_param
+            if on_usage and isinstance(parsed.get("usage"), dict):
+                on_usage(parsed["usage"])
             if debug:
                 print(f"[debug] model={model} payload={payload}", file=sys.stderr)
             choices = parsed.get("choices") or []
@@ -558,23 +555,68 @@ def fetch_model_lists(
     max_output_tokens: int,
     max_rate_limit_retries: int,
     debug: bool,
+    cache: Optional[ResponseCache] = None,
+    usage_stats: Optional[UsageStats] = None,
+    journal: Optional[JobJournal] = None,
+    journal_item: Optional[int] = None,
 ) -> List[List[int]]:
     results: List[List[int]] = []
     if not model or repeats <= 0:
         return results
     for repeat_index in range(repeats):
+        if journal:
+            journaled = journal.lookup(journal_item, model, prompt, repeat_index)
+            if journaled is not None:
+                results.append(sanitize_ids(journaled, valid_ids))
+                continue
+        if cache:
+            cached = cache.get(model, prompt, SAMPLING_PARAMS, repeat_index)
+            if cached is not None:
+                cleaned = sanitize_ids(cached, valid_ids)
+                if debug:
+                    print(
+                        f"[debug] model={model} repeat={repeat_index + 1}/{repeats} cache_hit cleaned={cleaned}",
+                        file=sys.stderr,
+                    )
+                results.append(cleaned)
+                continue
         call_tokens = max_output_tokens
         call_attempts = 0
         rate_limit_hits = 0
         while True:
-            if limiter:
-                limiter.wait_for_slot()
+            wait_started = time.perf_counter()
+            reservation = (
+                limiter.wait_for_slot(limiter.estimate_tokens(prompt, call_tokens), prompt_chars=len(prompt))
+                if limiter
+                else None
+            )
+            if usage_stats:
+                usage_stats.record_wait(model, time.perf_counter() - wait_started)
+            call = CallTimer(usage_stats, model)
+
+            def on_usage(usage: Dict[str, object]) -> None:
+                if reservation:
+                    limiter.record_usage(reservation, usage)
+                call.add_usage(usage)
+
             try:
                 call_attempts += 1
-                raw = call_openai(api_key, model, prompt, max_output_tokens=call_tokens, debug=debug)
+                with call:
+                    raw = call_openai(
+                        api_key,
+                        model,
+                        prompt,
+                        max_output_tokens=call_tokens,
+                        debug=debug,
+                        on_usage=on_usage,
+                    )
                 cleaned = sanitize_ids(raw, valid_ids)
                 if debug:
                     print(f"[debug] model={model} raw_ids={raw} cleaned={cleaned}", file=sys.stderr)
+                if journal:
+                    journal.record_call(journal_item, model, prompt, repeat_index, raw)
+                if cache:
+                    cache.put(model, prompt, SAMPLING_PARAMS, repeat_index, raw)
                 results.append(cleaned)
                 break
             except RateLimitError as exc:
@@ -584,9 +626,11 @@ def fetch_model_lists(
                 wait_seconds = exc.retry_after if exc.retry_after and exc.retry_after > 0 else retry_delay
                 print(f"[rate-limit] model={model} waiting {wait_seconds:.1f}s", file=sys.stderr)
                 if limiter:
-                    limiter.wait_next_window(retry_after=wait_seconds)
+                    limiter.backoff(retry_after=wait_seconds)
                 else:
                     time.sleep(wait_seconds)
+                    if usage_stats:
+                        usage_stats.record_wait(model, wait_seconds)
                 continue
             except MaxTokensError as exc:
                 # Some models (notably reasoning-heavy ones) may return empty output with finish_reason=length.
@@ -597,6 +641,8 @@ def fetch_model_lists(
                             f"[debug] model={model} repeat={repeat_index + 1}/{repeats} max_tokens_exceeded; skipping repeat ({exc})",
                             file=sys.stderr,
                         )
+                    if journal:
+                        journal.record_call(journal_item, model, prompt, repeat_index, [])
                     results.append([])
                     break
                 call_tokens = min(4096, int(call_tokens * 1.6))
@@ -607,10 +653,14 @@ def fetch_model_lists(
                     )
                 time.sleep(min(2.0, retry_delay))
                 continue
+            finally:
+                if reservation:
+                    limiter.release(reservation)  # no-op once usage was recorded
     return results
 
 
 def merge_ranked(weighted_lists: List[Tuple[int, Sequence[int]]]) -> List[int]:
+    """Candidates by weighted position sum (absent = list length), best first; ties by tagID."""
     pos_maps = []
     lengths = []
     weights = []
@@ -621,7 +671,7 @@ def merge_ranked(weighted_lists: List[Tuple[int, Sequence[int]]]) -> List[int]:
         lengths.append(len(seq))
         weights.append(weight)
         all_ids.update(seq)
-    combined_ids = list(all_ids)
+    combined_ids = sorted(all_ids)  # the sort below is stable: equal scores stay in tagID order
 
     def score(tid: int) -> int:
         total = 0
@@ -643,12 +693,10 @@ def assign_weights(tag_ids: Sequence[int]) -> List[int]:
     return weights
 
 
-def write_rows(output_path: Path, resource_id: int, tag_ids: Sequence[int]) -> None:
+def commit_rows(writer: RowWriter, resource_id: int, tag_ids: Sequence[int]) -> None:
+    """Hand a resource's rows to the writer stage (which journals and appends them, in submit order)."""
     weights = assign_weights(tag_ids)
-    with output_path.open("a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, lineterminator="\n")
-        for tag_id, weight in zip(tag_ids[: len(weights)], weights):
-            writer.writerow([resource_id, tag_id, weight])
+    writer.submit(resource_id, [[resource_id, tag_id, weight] for tag_id, weight in zip(tag_ids, weights)])
 
 
 def process_resources(
@@ -675,20 +723,46 @@ def process_resources(
     repeats_c: int,
     include_synonyms: bool,
     debug: bool,
+    cache: Optional[ResponseCache] = None,
+    usage_stats: Optional[UsageStats] = None,
+    shortlister: Optional[TagShortlister] = None,
+    shortlist_k: int = 0,
+    journal: Optional[JobJournal] = None,
+    writer: Optional[RowWriter] = None,
 ) -> None:
+    """Tag the selected resources; rows go through `writer` (the caller closes it and merges shards)."""
     ensure_header(output_path)
+    own_writer = writer is None
+    if writer is None:
+        writer = RowWriter(output_path, OUTPUT_HEADER, journal=journal)
     valid_ids = set(tags.keys())
-    already = load_existing(output_path) if resume else set()
+    # Built once per run: the byte-identical prefix is what OpenAI's prompt cache can reuse.
+    prompt_prefixes = build_prompt_prefixes(tags)
+    if not resume:
+        already: Set[int] = set()
+    elif journal:
+        already = {int(item) for item in journal.committed}
+    else:
+        already = load_existing(output_path)
     processed = 0
 
+    pending: List[Resource] = []
     for idx, resource in enumerate(resources, start=1):
         if idx < start_row:
             continue
         if resume and resource.source_id in already:
             continue
-        if limit is not None and processed >= limit:
+        if limit is not None and len(pending) >= limit:
             break
+        pending.append(resource)
 
+    # Only the resources this run will send need a shortlist; done or skipped ones are never embedded.
+    shortlists: Dict[int, List[int]] = {}
+    if shortlister is not None and pending:
+        ranked = shortlister.shortlist([item_text(r.title, r.description) for r in pending], shortlist_k)
+        shortlists = {r.source_id: ids for r, ids in zip(pending, ranked)}
+
+    for resource in pending:
         attempt = 0
         rate_limit_hits = 0
         desc_limit = 2000
@@ -703,9 +777,12 @@ def process_resources(
                     results_b: List[List[int]] = []
                     results_c: List[List[int]] = []
                 else:
-                    prompt = build_prompt(
-                        resource, tags, desc_limit=desc_limit, include_synonyms=include_synonyms_local
-                    )
+                    if shortlists and resource.source_id in shortlists:
+                        candidates = {tid: tags[tid] for tid in shortlists[resource.source_id] if tid in tags}
+                        prefix = build_prompt_prefix(candidates, include_synonyms=include_synonyms_local)
+                    else:
+                        prefix = prompt_prefixes[include_synonyms_local]
+                    prompt = build_prompt(resource, prefix, desc_limit=desc_limit)
                     results_a = fetch_model_lists(
                         model_a,
                         repeats=repeats_a,
@@ -717,6 +794,10 @@ def process_resources(
                         max_output_tokens=max_output_tokens,
                         max_rate_limit_retries=max_rate_limit_retries,
                         debug=debug,
+                        cache=cache,
+                        usage_stats=usage_stats,
+                        journal=journal,
+                        journal_item=resource.source_id,
                     )
                     results_b = fetch_model_lists(
                         model_b,
@@ -729,6 +810,10 @@ def process_resources(
                         max_output_tokens=max_output_tokens,
                         max_rate_limit_retries=max_rate_limit_retries,
                         debug=debug,
+                        cache=cache,
+                        usage_stats=usage_stats,
+                        journal=journal,
+                        journal_item=resource.source_id,
                     )
                     results_c = fetch_model_lists(
                         model_c,
@@ -741,6 +826,10 @@ def process_resources(
                         max_output_tokens=max_output_tokens,
                         max_rate_limit_retries=max_rate_limit_retries,
                         debug=debug,
+                        cache=cache,
+                        usage_stats=usage_stats,
+                        journal=journal,
+                        journal_item=resource.source_id,
                     )
 
                 weighted_lists: List[Tuple[int, Sequence[int]]] = []
@@ -759,8 +848,10 @@ def process_resources(
 
                 merged = merge_ranked(weighted_lists)
 
-                write_rows(output_path, resource.source_id, merged)
+                commit_rows(writer, resource.source_id, merged)
                 processed += 1
+                if usage_stats:
+                    usage_stats.record_item()
                 break
             except RateLimitError as exc:
                 attempt -= 1
@@ -771,19 +862,19 @@ def process_resources(
                     ) from exc
                 wait_seconds = exc.retry_after if exc.retry_after and exc.retry_after > 0 else retry_delay
                 print(
-                    f"[resource {resource.source_id}] rate limit hit ({exc}); waiting {wait_seconds:.1f}s for next window",
+                    f"[resource {resource.source_id}] rate limit hit ({exc}); backing off {wait_seconds:.1f}s",
                     file=sys.stderr,
                 )
                 if rate_limiter_a:
-                    rate_limiter_a.wait_next_window(retry_after=wait_seconds)
+                    rate_limiter_a.backoff(retry_after=wait_seconds)
                 if rate_limiter_b:
-                    rate_limiter_b.wait_next_window(retry_after=wait_seconds)
+                    rate_limiter_b.backoff(retry_after=wait_seconds)
                 if rate_limiter_c:
-                    rate_limiter_c.wait_next_window(retry_after=wait_seconds)
+                    rate_limiter_c.backoff(retry_after=wait_seconds)
                 if not rate_limiter_a and not rate_limiter_b and not rate_limiter_c:
                     time.sleep(wait_seconds)
                 continue
-            except QuotaError:
+            except (QuotaError, CacheMissError):
                 raise
             except MaxTokensError:
                 desc_limit = max(300, int(desc_limit * 0.6))
@@ -808,9 +899,46 @@ def process_resources(
                 )
                 time.sleep(retry_delay)
 
+    if own_writer:
+        writer.close()
+    if usage_stats and usage_stats.calls:
+        print(f"[usage] {usage_stats.summary()}", file=sys.stderr)
+        for line in usage_stats.table():
+            print(f"[usage] {line}", file=sys.stderr)
+    if not dry_run:
+        print(f"[http] {default_client().stats.summary()}", file=sys.stderr)
     print(f"Done. Processed {processed} resources; output -> {output_path}", file=sys.stderr)
 
 
+def report_shortlist_recall(
+    shortlister: TagShortlister,
+    resources: List[Resource],
+    output_path: Path,
+    *,
+    sample_size: int,
+    top_k: int,
+    catalog_size: int,
+) -> int:
+    """Compare embedding shortlists with full-catalog rows already written to output_path."""
+    reference = load_reference_rows(output_path, "resourceID")
+    candidates = [r for r in resources if str(r.source_id) in reference]
+    if not candidates:
+        print(f"No full-catalog rows found in {output_path}; run without --shortlist-k first.", file=sys.stderr)
+        return 1
+    step = max(1, len(candidates) // max(1, sample_size))
+    sample = candidates[::step][:sample_size]
+    ks = sorted({k for k in (*DEFAULT_RECALL_KS, top_k) if 0 < k <= catalog_size})
+    ranked = shortlister.shortlist([item_text(r.title, r.description) for r in sample], max(ks))
+    print_recall_report(
+        reference,
+        {str(r.source_id): ids for r, ids in zip(sample, ranked)},
+        ks,
+        label=output_path.name,
+        catalog_size=catalog_size,
+    )
+    return 0
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Assign tags to resources via OpenAI models and write ct_resource_tags_PLANNING.csv.txt"
@@ -897,6 +1025,24 @@ def parse_args() -> argparse.Namespace:
         default=6,
         help="Max requests per minute for the tertiary model (default: 6).",
     )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Token budget per minute (TPM) for the primary model; 0 disables token limiting (default: 0).",
+    )
+    parser.add_argument(
+        "--secondary-tokens-per-minute",
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Token budget per minute (TPM) for the secondary model (default: 0).",
+    )
+    parser.add_argument(
+        "--tertiary-tokens-per-minute",
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Token budget per minute (TPM) for the tertiary model (default: 0).",
+    )
     parser.add_argument(
         "--repeats-a",
         type=int,
@@ -933,6 +1079,110 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_CUSTOM_STARTING_SOURCE_ID,
         help="Start at the given sourceID (after filtering sa_resource==1); ignored if continue-after-last is set.",
     )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite response cache path relative to scripts directory (default: {DEFAULT_CACHE_PATH}).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the response cache (always query OpenAI).",
+    )
+    parser.add_argument(
+        "--cache-only",
+        action="store_true",
+        help="Never call OpenAI; fail fast on the first response that is not cached.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f"Evict least recently used cache entries beyond this size (default: {DEFAULT_CACHE_MAX_MB} MB).",
+    )
+    parser.add_argument(
+        "--shortlist-k",
+        type=int,
+        default=DEFAULT_SHORTLIST_K,
+        help=(
+            "Only put the top-K tags by embedding similarity (median over tag name/synonym variants) "
+            "into each prompt; 0 sends the full catalog (default: 0)."
+        ),
+    )
+    parser.add_argument(
+        "--embedding-model",
+        default=DEFAULT_EMBEDDING_MODEL,
+        help=f"sentence-transformers model for --shortlist-k (default: {DEFAULT_EMBEDDING_MODEL}).",
+    )
+    parser.add_argument(
+        "--shortlist-report",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Print the recall of embedding shortlists against the full-catalog results already in the "
+            "output CSV for a sample of N resources, then exit without calling OpenAI."
+        ),
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help=(
+            "Write-ahead journal of completed model calls and committed resources, relative to scripts directory "
+            f"(default: {DEFAULT_JOURNAL_DIR}/<output file name>.jsonl)."
+        ),
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Disable the journal; --resume then re-reads the whole output CSV.",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_MODES,
+        default="none",
+        help=(
+            "Write rows into <output>.shards/<key>.csv by resourceID prefix and merge them into the "
+            "output (in t_source.csv order) when the run finishes (default: none)."
+        ),
+    )
+    parser.add_argument(
+        "--shard-prefix-len",
+        type=int,
+        default=DEFAULT_SHARD_PREFIX_LEN,
+        help=f"ResourceID digits used as shard key with --shard-by prefix (default: {DEFAULT_SHARD_PREFIX_LEN}).",
+    )
+    parser.add_argument(
+        "--write-batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help=f"Most rows the writer stage journals and appends in one go (default: {DEFAULT_BATCH_ROWS}).",
+    )
+    parser.add_argument(
+        "--fsync-seconds",
+        type=float,
+        default=DEFAULT_FSYNC_SECONDS,
+        help=f"Seconds between fsyncs of the output files; 0 = after every batch (default: {DEFAULT_FSYNC_SECONDS:g}).",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help=(
+            "Write per-call telemetry (latency, tokens, cost, failures, rate-limit wait) relative to scripts "
+            "directory: a *.prom path is a Prometheus textfile, any other path JSONL (default: off)."
+        ),
+    )
+    parser.add_argument(
+        "--price",
+        action="append",
+        type=parse_price,
+        default=[],
+        metavar="MODEL=IN,CACHED,OUT",
+        help=(
+            "USD per 1M input / cached input / output tokens for the cost estimate; repeatable "
+            "(default: built-in table for gpt-4.1/4o/5 models)."
+        ),
+    )
     parser.add_argument(
         "--max-rate-limit-retries",
         type=int,
@@ -948,7 +1198,9 @@ def main() -> int:
     csv_dir = script_dir.parent / "csv"
     config = resolve_config(args, script_dir)
 
-    if not args.dry_run and not config["api_key"]:
+    # --cache-only replays cached answers and never calls OpenAI, so it needs no key.
+    replay_only = args.cache_only
+    if not args.dry_run and not replay_only and args.shortlist_report <= 0 and not config["api_key"]:
         print("OPENAI_API_KEY is required for live runs. Set env or .env in backend/.", file=sys.stderr)
         return 1
 
@@ -957,8 +1209,39 @@ def main() -> int:
     output_path = (script_dir / args.output).resolve()
     # Determine effective start row based on resume/override flags
     effective_start_row = max(1, args.start_row)
+    journal: Optional[JobJournal] = None
+    if not args.no_journal:
+        journal_path = (
+            (script_dir / args.journal).resolve()
+            if args.journal
+            else script_dir / DEFAULT_JOURNAL_DIR / f"{output_path.name}.jsonl"
+        )
+        journal = JobJournal(journal_path)
+        ensure_header(output_path)
+    shard_of = shard_function(args.shard_by, args.shard_prefix_len)
+    shard_dir = shard_dir_for(output_path)
+    resource_order = [str(r.source_id) for r in resources]
+    if journal and (shard_of or shard_files(shard_dir)):
+        # Rows of an interrupted sharded run go back to their shard ("_" when only merging leftovers).
+        journal.sync_with_shards(
+            output_path,
+            read_shard_items(shard_dir),
+            lambda item, rows: append_rows(
+                shard_dir / f"{shard_of(item) if shard_of else '_'}.csv", OUTPUT_HEADER, rows
+            ),
+        )
+    elif journal:
+        journal.sync_with_output(
+            output_path, lambda rows: append_rows(output_path, OUTPUT_HEADER, rows), max_lag=DEFAULT_BATCH_ITEMS
+        )
+    if not shard_of and shard_files(shard_dir):
+        merge_shards(output_path, shard_dir, resource_order, OUTPUT_HEADER, journal)
+
     if args.continue_after_last_source_id:
-        last_id = find_last_resource_id(output_path)
+        if journal:
+            last_id = int(journal.last_committed) if journal.last_committed is not None else None
+        else:
+            last_id = find_last_resource_id(output_path)
         if last_id is None:
             print("No previous rows found in output; starting from row 1.", file=sys.stderr)
             effective_start_row = 1
@@ -977,14 +1260,58 @@ def main() -> int:
             )
         effective_start_row = match_index
     output_path = (script_dir / args.output).resolve()
-    rate_limiter_a = None if args.dry_run else RateLimiter(args.requests_per_minute)
+    rate_limiter_a = None if args.dry_run else RateLimiter(args.requests_per_minute, args.tokens_per_minute)
     rate_limiter_b = None if (args.dry_run or not args.secondary_model) else RateLimiter(
-        args.secondary_requests_per_minute
+        args.secondary_requests_per_minute, args.secondary_tokens_per_minute
     )
     rate_limiter_c = None if (args.dry_run or not args.tertiary_model) else RateLimiter(
-        args.tertiary_requests_per_minute
+        args.tertiary_requests_per_minute, args.tertiary_tokens_per_minute
     )
 
+    shortlister: Optional[TagShortlister] = None
+    if args.shortlist_report > 0 or (args.shortlist_k > 0 and not args.dry_run):
+        shortlister = TagShortlister(
+            [(tag.tag_id, tag.name, list(tag.synonyms)) for tag in tags.values()],
+            open_store(args.embedding_model),
+        )
+        if args.shortlist_report > 0:
+            if journal:
+                journal.close()
+            return report_shortlist_recall(
+                shortlister,
+                resources,
+                output_path,
+                sample_size=args.shortlist_report,
+                top_k=args.shortlist_k,
+                catalog_size=len(tags),
+            )
+        print(
+            f"[shortlist] {args.shortlist_k} of {len(tags)} tags per prompt ({args.embedding_model})",
+            file=sys.stderr,
+        )
+
+    cache = None
+    if not args.dry_run and (args.cache_only or not args.no_cache):
+        cache = ResponseCache(
+            (script_dir / args.cache).resolve(),
+            max_bytes=max(0, args.cache_max_mb) * 1024 * 1024,
+            cache_only=args.cache_only,
+        )
+
+    usage_stats = UsageStats(
+        sink=open_metrics_sink((script_dir / args.metrics).resolve() if args.metrics else None),
+        prices={**MODEL_PRICES, **dict(args.price)},
+        item_label="resources",
+    )
+    writer = RowWriter(
+        output_path,
+        OUTPUT_HEADER,
+        journal=journal,
+        shard_dir=shard_dir,
+        shard_of=shard_of,
+        batch_rows=max(1, args.write_batch_rows),
+        fsync_seconds=max(0.0, args.fsync_seconds),
+    )
     try:
         process_resources(
             resources=resources,
@@ -1009,10 +1336,32 @@ def main() -> int:
             repeats_c=max(0, args.repeats_c),
             include_synonyms=bool(args.include_synonyms),
             debug=args.debug,
+            cache=cache,
+            usage_stats=usage_stats,
+            shortlister=shortlister,
+            shortlist_k=args.shortlist_k,
+            journal=journal,
+            writer=writer,
         )
+        writer.close()
+        print(f"[writer] {writer.summary()}", file=sys.stderr)
+        if shard_of:
+            merge_shards(output_path, shard_dir, resource_order, OUTPUT_HEADER, journal)
     except Exception as exc:  # noqa: BLE001
         print(f"Error: {exc}", file=sys.stderr)
         return 1
+    finally:
+        try:
+            writer.close()  # keep every finished resource, also when the run failed
+        except Exception as exc:  # noqa: BLE001
+            print(f"Error: {exc}", file=sys.stderr)
+        usage_stats.close()
+        if cache:
+            print(f"[cache] {cache.summary()}", file=sys.stderr)
+            cache.close()
+        if journal:
+            print(f"[journal] {journal.summary()}", file=sys.stderr)
+            journal.close()
 
     return 0
 
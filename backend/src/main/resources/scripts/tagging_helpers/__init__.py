@@ -0,0 +1 @@
+# Merge and output helpers shared by the tagging scripts.
@@ -0,0 +1,171 @@
+"""
+Diff-aware re-tagging: find the items whose tag assignment could change since the last run.
+
+A snapshot (JSON) records the tag catalog and a hash of every item text (topic name,
+layer and description) as of the last run. Comparing it with the current t_tag.csv /
+t_topic.csv gives a CatalogDiff; an item needs new tags if
+- it is new, or its text changed,
+- one of its assigned tags was removed or changed (renamed / new synonyms), or
+- a tag that was added or changed ranks among its nearest tags.
+All other items keep their rows as they are.
+
+The snapshot also lists the items still `pending` from a planned re-tag, so an
+interrupted incremental run picks them up again instead of losing them.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+DEFAULT_SNAPSHOT_DIR = ".cache/retag"  # snapshot file: <dir>/<output file name>.json
+DEFAULT_RETAG_RANK = 20  # an added tag within an item's top-K nearest tags makes it affected
+
+TagEntry = Tuple[int, str, Sequence[str]]  # (tagID, name, synonyms)
+
+
+def text_hash(*parts: object) -> str:
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class CatalogSnapshot:
+    tags: Dict[str, List[object]]  # tagID -> [name, synonyms]
+    items: Dict[str, str]  # itemID -> text_hash
+    pending: List[str] = field(default_factory=list)
+
+
+def take_snapshot(
+    tags: Iterable[TagEntry], items: Mapping[str, str], pending: Sequence[str] = ()
+) -> CatalogSnapshot:
+    """Snapshot of the current catalog; `items` maps itemID -> text_hash of its text."""
+    return CatalogSnapshot(
+        tags={str(tag_id): [name, list(synonyms)] for tag_id, name, synonyms in tags},
+        items=dict(items),
+        pending=list(pending),
+    )
+
+
+def load_snapshot(path: Path) -> Optional[CatalogSnapshot]:
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return CatalogSnapshot(tags=data["tags"], items=data["items"], pending=list(data.get("pending", [])))
+
+
+def save_snapshot(path: Path, snapshot: CatalogSnapshot) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    data = {"tags": snapshot.tags, "items": snapshot.items, "pending": snapshot.pending}
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=0)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp.replace(path)
+
+
+@dataclass
+class CatalogDiff:
+    added_tags: List[int]
+    removed_tags: List[int]
+    changed_tags: List[int]  # same tagID, other name or synonyms
+    new_items: List[str]
+    changed_items: List[str]
+    removed_items: List[str]
+
+    def summary(self) -> str:
+        return (
+            f"tags +{len(self.added_tags)} -{len(self.removed_tags)} ~{len(self.changed_tags)}; "
+            f"items +{len(self.new_items)} -{len(self.removed_items)} ~{len(self.changed_items)}"
+        )
+
+
+def diff_catalog(old: CatalogSnapshot, new: CatalogSnapshot) -> CatalogDiff:
+    return CatalogDiff(
+        added_tags=[int(t) for t in new.tags if t not in old.tags],
+        removed_tags=[int(t) for t in old.tags if t not in new.tags],
+        changed_tags=[int(t) for t, entry in new.tags.items() if t in old.tags and old.tags[t] != entry],
+        new_items=[i for i in new.items if i not in old.items],
+        changed_items=[i for i, h in new.items.items() if i in old.items and old.items[i] != h],
+        removed_items=[i for i in old.items if i not in new.items],
+    )
+
+
+def affected_items(
+    diff: CatalogDiff,
+    assigned: Mapping[str, Sequence[int]],
+    nearest: Optional[Mapping[str, Sequence[int]]] = None,
+) -> Dict[str, str]:
+    """
+    itemID -> reason for every item that needs new tags (in first-reason order).
+    `assigned` holds the tagIDs currently written per item; `nearest` the top-K nearest
+    tagIDs per current item (only needed when tags were added or changed).
+    """
+    affected: Dict[str, str] = {}
+    for item in diff.new_items:
+        affected.setdefault(item, "new")
+    for item in diff.changed_items:
+        affected.setdefault(item, "text changed")
+    gone = set(diff.removed_tags) | set(diff.changed_tags)
+    if gone:
+        removed_items = set(diff.removed_items)
+        for item, tag_ids in assigned.items():
+            if item not in removed_items and gone.intersection(tag_ids):
+                affected.setdefault(item, "assigned tag removed/changed")
+    fresh = set(diff.added_tags) | set(diff.changed_tags)
+    if fresh and nearest:
+        for item, tag_ids in nearest.items():
+            if fresh.intersection(tag_ids):
+                affected.setdefault(item, "near added/changed tag")
+    return affected
+
+
+def read_assigned(output_path: Path) -> Dict[str, List[int]]:
+    """itemID -> tagIDs from an output CSV (id,tagID,weight)."""
+    assigned: Dict[str, List[int]] = {}
+    if not output_path.exists():
+        return assigned
+    with output_path.open(encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) < 2 or not row[0].strip():
+                continue
+            try:
+                assigned.setdefault(row[0].strip(), []).append(int(row[1]))
+            except ValueError:
+                continue
+    return assigned
+
+
+def drop_item_rows(output_path: Path, items: Set[str]) -> int:
+    """Rewrite the output CSV without the rows of `items` (temp file + rename); returns rows dropped."""
+    if not items or not output_path.exists():
+        return 0
+    tmp = output_path.with_name(output_path.name + ".retag.tmp")
+    dropped = 0
+    with output_path.open(encoding="utf-8", newline="") as src, tmp.open("w", encoding="utf-8", newline="") as out:
+        for index, line in enumerate(src):
+            if index > 0 and line.split(",", 1)[0].strip() in items:
+                dropped += 1
+                continue
+            out.write(line)
+        out.flush()
+        os.fsync(out.fileno())
+    tmp.replace(output_path)
+    return dropped
+
+
+def print_plan(diff: CatalogDiff, affected: Mapping[str, str], total: int, *, label: str = "items") -> None:
+    print(f"[retag] {diff.summary()}", file=sys.stderr)
+    reasons: Dict[str, int] = {}
+    for reason in affected.values():
+        reasons[reason] = reasons.get(reason, 0) + 1
+    detail = ", ".join(f"{k}: {v}" for k, v in reasons.items()) or "none"
+    print(f"[retag] {len(affected)} of {total} {label} to re-tag ({detail})", file=sys.stderr)
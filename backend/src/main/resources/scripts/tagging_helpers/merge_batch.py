@@ -0,0 +1,232 @@
+"""
+Vectorized merge_ranked over many topics at once (NumPy).
+
+merge_ranked scores every candidate tag of a topic as
+    sum over lists of weight * (position in the list, or the list length if absent)
+and sorts ascending (ties by tagID). For offline re-merges over cached model
+outputs (e.g. sweeping WEIGHT_A/B/C or the layer weight tables) calling it per
+topic is dominated by Python dict and closure overhead. Here all lists are packed
+once into flat integer arrays; each merge then scores every (topic, candidate tag)
+pair in one vectorized pass,
+
+    score = sum(weight * length)  -  sum over lists containing the tag of weight * (length - position)
+
+and one lexsort by (topic, score, tagID) yields the top-k of every topic. Memory is
+linear in the number of list entries (no dense topics x catalog matrix).
+
+    packed = pack_ranked_lists([weighted_lists_topic_1, weighted_lists_topic_2, ...])
+    top = merge_packed(packed, top_k=[4, 5, ...])          # == [merge_ranked(w)[:k] for ...]
+    top = merge_packed(packed, top_k=4, list_weights=...)  # same lists, other weights
+
+Benchmark and equivalence check against topic_tags_assignment.merge_ranked:
+    python -m tagging_helpers.merge_batch --topics 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+WeightedLists = Sequence[Tuple[int, Sequence[int]]]
+
+
+@dataclass
+class PackedRankedLists:
+    """
+    Flat (CSR-like) form of many topics' merge_ranked inputs.
+    Lists are numbered 0..n_lists-1 in input order; an entry is one (list, tag) occurrence and
+    a pair is one (topic, candidate tag), i.e. one value merge_ranked would score.
+    """
+
+    n_topics: int
+    tag_ids: np.ndarray  # (V,) sorted tagIDs seen; "col" values index into it
+    list_topic: np.ndarray  # (n_lists,) topic row of each list
+    list_length: np.ndarray  # (n_lists,) len(seq), duplicates included (as in merge_ranked)
+    list_weight: np.ndarray  # (n_lists,) weight given at pack time
+    entry_list: np.ndarray  # (E,) list of each entry
+    entry_pos: np.ndarray  # (E,) position in the list (last occurrence, like merge_ranked's dict)
+    entry_pair: np.ndarray  # (E,) pair of each entry
+    pair_topic: np.ndarray  # (P,) topic row of each pair, non-decreasing
+    pair_col: np.ndarray  # (P,) candidate tag of each pair
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.list_topic)
+
+
+def pack_ranked_lists(topics: Sequence[WeightedLists]) -> PackedRankedLists:
+    """Pack merge_ranked inputs (one [(weight, ranked tagIDs), ...] per topic) into flat arrays."""
+    list_topic: List[int] = []
+    list_length: List[int] = []
+    list_weight: List[int] = []
+    entry_list: List[int] = []
+    entry_tag: List[int] = []
+    entry_pos: List[int] = []
+    for row, weighted_lists in enumerate(topics):
+        for weight, seq in weighted_lists:
+            list_index = len(list_topic)
+            list_topic.append(row)
+            list_length.append(len(seq))
+            list_weight.append(weight)
+            entry_list.extend([list_index] * len(seq))
+            entry_tag.extend(seq)
+            entry_pos.extend(range(len(seq)))
+
+    l_topic = np.asarray(list_topic, dtype=np.int64)
+    e_list = np.asarray(entry_list, dtype=np.int64)
+    e_pos = np.asarray(entry_pos, dtype=np.int64)
+    tag_ids, e_col = np.unique(np.asarray(entry_tag, dtype=np.int64), return_inverse=True)
+    e_col = e_col.reshape(-1)
+    if len(e_list):
+        # A tag repeated within one list keeps its last position (merge_ranked builds {tid: idx}).
+        order = np.lexsort((e_pos, e_col, e_list))
+        e_list, e_col, e_pos = e_list[order], e_col[order], e_pos[order]
+        last = np.ones(len(e_list), dtype=bool)
+        last[:-1] = (e_list[1:] != e_list[:-1]) | (e_col[1:] != e_col[:-1])
+        e_list, e_col, e_pos = e_list[last], e_col[last], e_pos[last]
+    pair_keys, e_pair = np.unique(l_topic[e_list] * max(1, len(tag_ids)) + e_col, return_inverse=True)
+    return PackedRankedLists(
+        n_topics=len(topics),
+        tag_ids=tag_ids,
+        list_topic=l_topic,
+        list_length=np.asarray(list_length, dtype=np.int64),
+        list_weight=np.asarray(list_weight, dtype=np.int64),
+        entry_list=e_list,
+        entry_pos=e_pos,
+        entry_pair=e_pair.reshape(-1),
+        pair_topic=pair_keys // max(1, len(tag_ids)),
+        pair_col=pair_keys % max(1, len(tag_ids)),
+    )
+
+
+def merge_packed(
+    packed: PackedRankedLists,
+    top_k: Union[None, int, Sequence[int]] = None,
+    *,
+    list_weights: Optional[Sequence[int]] = None,
+) -> List[List[int]]:
+    """
+    Per topic, the first top_k tagIDs of merge_ranked (all candidates if top_k is None).
+    top_k may be one value or one per topic. list_weights (one per packed list) replaces
+    the packed weights, e.g. np.array([w_a, w_b, w_c])[model_slot_of_each_list] for a sweep.
+    """
+    n_topics = packed.n_topics
+    if top_k is None:
+        limits = np.full(n_topics, len(packed.tag_ids), dtype=np.int64)
+    elif isinstance(top_k, (int, np.integer)):
+        limits = np.full(n_topics, int(top_k), dtype=np.int64)
+    else:
+        limits = np.asarray(top_k, dtype=np.int64)
+        if len(limits) != n_topics:
+            raise ValueError(f"top_k has {len(limits)} values for {n_topics} topics")
+    weights = packed.list_weight if list_weights is None else np.asarray(list_weights, dtype=np.int64)
+    if len(weights) != packed.n_lists:
+        raise ValueError(f"list_weights has {len(weights)} values for {packed.n_lists} lists")
+    if len(packed.pair_topic) == 0:
+        return [[] for _ in range(n_topics)]
+
+    # Score of a tag missing from every list of its topic, minus what each list containing it takes off.
+    base = np.bincount(packed.list_topic, weights=weights * packed.list_length, minlength=n_topics)
+    entry_gain = weights[packed.entry_list] * (packed.list_length[packed.entry_list] - packed.entry_pos)
+    gain = np.bincount(packed.entry_pair, weights=entry_gain, minlength=len(packed.pair_topic))
+    score = (base[packed.pair_topic] - gain).astype(np.int64)
+
+    # Sort pairs by (topic, score, tagID); cols are in tagID order because tag_ids is sorted.
+    # A single int64 key sorts several times faster than lexsort; fall back if it could overflow.
+    score -= score.min()
+    span_score = int(score.max()) + 1
+    span_col = len(packed.tag_ids)
+    if n_topics * span_score * span_col < 2**62:
+        order = np.argsort((packed.pair_topic * span_score + score) * span_col + packed.pair_col)
+    else:
+        order = np.lexsort((packed.pair_col, score, packed.pair_topic))
+    topic_sorted = packed.pair_topic[order]
+    counts = np.bincount(topic_sorted, minlength=n_topics)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(order)) - starts[topic_sorted]
+    keep = rank < np.clip(limits, 0, None)[topic_sorted]
+    kept_ids = packed.tag_ids[packed.pair_col[order[keep]]].tolist()
+    kept_counts = np.bincount(topic_sorted[keep], minlength=n_topics).tolist()
+
+    out: List[List[int]] = []
+    offset = 0
+    for count in kept_counts:
+        out.append(kept_ids[offset : offset + count])
+        offset += count
+    return out
+
+
+def merge_ranked_batch(
+    topics: Sequence[WeightedLists],
+    top_k: Union[None, int, Sequence[int]] = None,
+) -> List[List[int]]:
+    """Convenience wrapper: pack once, merge once."""
+    return merge_packed(pack_ranked_lists(topics), top_k)
+
+
+def _synthetic_topics(n_topics: int, catalog: int, seed: int) -> List[List[Tuple[int, List[int]]]]:
+    """Shapes like a tagging run: 2-9 samples of 6-10 ranked tags, drawn from a per-topic pool."""
+    rng = random.Random(seed)
+    tag_ids = rng.sample(range(1, catalog * 10), catalog)
+    topics = []
+    for _ in range(n_topics):
+        pool = rng.sample(tag_ids, 14)
+        lists = []
+        for _sample in range(rng.randint(2, 9)):
+            lists.append((rng.choice((1, 2, 3)), rng.sample(pool, rng.randint(6, 10))))
+        topics.append(lists)
+    return topics
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark merge_packed against merge_ranked on synthetic topics.")
+    parser.add_argument("--topics", type=int, default=5000, help="Number of synthetic topics (default: 5000).")
+    parser.add_argument("--catalog", type=int, default=300, help="Number of distinct tagIDs (default: 300).")
+    parser.add_argument("--top-k", type=int, default=5, help="Tags kept per topic (default: 5).")
+    parser.add_argument("--sweeps", type=int, default=10, help="Weight settings merged per run (default: 10).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from topic_tags_assignment import merge_ranked
+
+    topics = _synthetic_topics(args.topics, args.catalog, args.seed)
+    rng = random.Random(args.seed + 1)
+    sweeps = [{w: rng.randint(1, 5) for w in (1, 2, 3)} for _ in range(args.sweeps)]
+
+    started = time.perf_counter()
+    expected = [
+        [merge_ranked([(sweep[w], seq) for w, seq in lists])[: args.top_k] for lists in topics] for sweep in sweeps
+    ]
+    python_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    packed = pack_ranked_lists(topics)
+    pack_s = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = []
+    for sweep in sweeps:
+        lookup = np.zeros(4, dtype=np.int64)
+        for slot, weight in sweep.items():
+            lookup[slot] = weight
+        actual.append(merge_packed(packed, args.top_k, list_weights=lookup[packed.list_weight]))
+    numpy_s = time.perf_counter() - started
+
+    mismatches = sum(a != e for run_a, run_e in zip(actual, expected) for a, e in zip(run_a, run_e))
+    merges = args.topics * len(sweeps)
+    print(f"[merge] topics={args.topics} sweeps={len(sweeps)} lists={packed.n_lists} catalog={len(packed.tag_ids)}")
+    print(f"[merge] merge_ranked  {python_s:8.3f}s  ({merges / python_s:,.0f} topic merges/s)")
+    print(f"[merge] merge_packed  {numpy_s:8.3f}s  ({merges / numpy_s:,.0f} topic merges/s, pack once {pack_s:.3f}s)")
+    print(f"[merge] speed-up x{python_s / max(numpy_s + pack_s, 1e-9):.1f}; mismatching topics: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
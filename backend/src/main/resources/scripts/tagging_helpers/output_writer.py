@@ -0,0 +1,265 @@
+"""
+Single writer stage for the tagging outputs (ct_topic_tags / ct_resource_tags).
+
+Workers hand finished items to RowWriter.submit(); one background thread drains
+the queue in batches, group-commits the batch to the job journal (one fsync),
+appends the rows to files it keeps open, and fsyncs the outputs every
+`fsync_seconds`. Output order is submit order.
+
+With sharding, each item goes to <output>.shards/<key>.csv instead (`shard_of`
+maps an item ID to its key, e.g. topic-ID prefix or layer); merge_shards()
+appends the shards to the output in input order at the end of the run.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openai_helpers.journal import JobJournal, read_item_ids
+
+Row = Sequence[object]
+DEFAULT_BATCH_ROWS = 256
+DEFAULT_BATCH_ITEMS = 64  # most items per group commit, i.e. committed but possibly not yet written
+DEFAULT_FSYNC_SECONDS = 5.0  # 0 = fsync after every batch
+QUEUE_ITEMS = 1024  # submit() blocks when the writer is this far behind
+SHARD_DIR_SUFFIX = ".shards"
+
+_STOP = object()
+
+
+def shard_dir_for(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + SHARD_DIR_SUFFIX)
+
+
+def shard_files(shard_dir: Path) -> List[Path]:
+    return sorted(shard_dir.glob("*.csv")) if shard_dir.is_dir() else []
+
+
+def prefix_shard(item_id: object, length: int) -> str:
+    """Shard key from the first characters of an ID (topic IDs: subject prefix such as 'ART')."""
+    key = "".join(ch for ch in str(item_id)[:length] if ch.isalnum())
+    return key or "_"
+
+
+class RowWriter:
+    """Queue-fed writer thread; submit() is safe to call from any thread."""
+
+    def __init__(
+        self,
+        output_path: Path,
+        header: Sequence[str],
+        *,
+        journal: Optional[JobJournal] = None,
+        shard_dir: Optional[Path] = None,
+        shard_of: Optional[Callable[[str], str]] = None,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+        batch_items: int = DEFAULT_BATCH_ITEMS,
+        fsync_seconds: float = DEFAULT_FSYNC_SECONDS,
+    ) -> None:
+        self.output_path = output_path
+        self.header = list(header)
+        self.journal = journal
+        self.shard_dir = shard_dir if shard_of is not None else None
+        self.shard_of = shard_of
+        self.batch_rows = max(1, batch_rows)
+        self.batch_items = max(1, batch_items)
+        self.fsync_seconds = fsync_seconds
+        self.items = 0
+        self.rows = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=QUEUE_ITEMS)
+        self._files: Dict[Path, IO[str]] = {}
+        self._dirty: Dict[Path, None] = {}
+        self._last_fsync = time.monotonic()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="row-writer", daemon=True)
+        self._thread.start()
+
+    def path_for(self, item: str) -> Path:
+        if self.shard_dir is None or self.shard_of is None:
+            return self.output_path
+        return self.shard_dir / f"{self.shard_of(item)}.csv"
+
+    def submit(self, item: object, rows: Sequence[Row]) -> None:
+        """Queue the final rows of one item (journal commit and write happen on the writer thread)."""
+        self._raise_if_failed()
+        if self._closed:
+            raise RuntimeError("RowWriter is closed")
+        self._queue.put((str(item), [list(row) for row in rows]))
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"output writer failed: {self._error}") from self._error
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            n_rows = len(entry[1])
+            # Take whatever else is already waiting, up to batch_rows / batch_items; never wait for more.
+            while n_rows < self.batch_rows and len(batch) < self.batch_items:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+                n_rows += len(entry[1])
+            if self._error is not None:
+                continue  # keep draining so submit() never blocks forever
+            try:
+                self._write(batch)
+            except BaseException as exc:  # noqa: BLE001
+                self._error = exc
+        try:
+            self._fsync(force=True)
+        except BaseException as exc:  # noqa: BLE001
+            self._error = self._error or exc
+
+    def _open(self, path: Path) -> IO[str]:
+        handle = self._files.get(path)
+        if handle is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not path.exists() or path.stat().st_size == 0
+            handle = path.open("a", encoding="utf-8", newline="")
+            if new_file:
+                csv.writer(handle, lineterminator="\n").writerow(self.header)
+            self._files[path] = handle
+        return handle
+
+    def _write(self, batch: List[Tuple[str, List[List[object]]]]) -> None:
+        if self.journal:
+            self.journal.commit_many(batch)
+        for item, rows in batch:
+            path = self.path_for(item)
+            csv.writer(self._open(path), lineterminator="\n").writerows(rows)
+            self._dirty[path] = None
+            self.items += 1
+            self.rows += len(rows)
+        for path in self._dirty:
+            self._files[path].flush()
+        self.batches += 1
+        self._fsync(force=self.fsync_seconds <= 0)
+
+    def _fsync(self, *, force: bool) -> None:
+        if not self._dirty or (not force and time.monotonic() - self._last_fsync < self.fsync_seconds):
+            return
+        for path in self._dirty:
+            handle = self._files[path]
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._dirty.clear()
+        self._last_fsync = time.monotonic()
+        self.fsyncs += 1
+
+    def close(self) -> None:
+        """Write everything still queued, fsync and close; re-raises a writer error (first call only)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+        self._raise_if_failed()
+
+    def summary(self) -> str:
+        target = self.shard_dir.name if self.shard_dir else self.output_path.name
+        return f"writer={target} items={self.items} rows={self.rows} batches={self.batches} fsyncs={self.fsyncs}"
+
+
+def append_rows(path: Path, header: Sequence[str], rows: Sequence[Row]) -> None:
+    """Synchronous append (journal recovery), writing the header first if the file is new."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not path.exists() or path.stat().st_size == 0
+    with path.open("a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if new_file:
+            writer.writerow(list(header))
+        writer.writerows(rows)
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_shard_items(shard_dir: Path) -> Dict[str, None]:
+    """Item IDs present in the shard files (for JobJournal.sync_with_shards)."""
+    items: Dict[str, None] = {}
+    for path in shard_files(shard_dir):
+        items.update(read_item_ids(path))
+    return items
+
+
+def merge_shards(
+    output_path: Path,
+    shard_dir: Path,
+    order: Sequence[str],
+    header: Sequence[str],
+    journal: Optional[JobJournal] = None,
+) -> int:
+    """
+    Append all shard rows to the output, items in `order` (IDs not listed follow in shard
+    order), via a temp file + rename; then delete the shards. Returns the number of rows merged.
+    """
+    paths = shard_files(shard_dir)
+    if not paths:
+        return 0
+    rows_by_item: Dict[str, List[List[str]]] = {}
+    for path in paths:
+        with path.open(encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row and row[0].strip():
+                    rows_by_item.setdefault(row[0].strip(), []).append(row)
+    ordered = [item for item in dict.fromkeys(str(i) for i in order) if item in rows_by_item]
+    seen = set(ordered)
+    ordered += [item for item in rows_by_item if item not in seen]
+
+    tmp = output_path.with_name(output_path.name + ".merge.tmp")
+    merged = 0
+    with tmp.open("w", encoding="utf-8", newline="") as out:
+        if output_path.exists() and output_path.stat().st_size > 0:
+            with output_path.open(encoding="utf-8", newline="") as existing:
+                shutil.copyfileobj(existing, out)
+            if not _ends_with_newline(output_path):
+                out.write("\n")
+        else:
+            csv.writer(out, lineterminator="\n").writerow(list(header))
+        writer = csv.writer(out, lineterminator="\n")
+        for item in ordered:
+            writer.writerows(rows_by_item[item])
+            merged += len(rows_by_item[item])
+        out.flush()
+        os.fsync(out.fileno())
+    tmp.replace(output_path)
+    if journal:
+        # Output order now differs from commit order; the journal's tail check needs them to agree.
+        journal.move_to_end(ordered)
+    for path in paths:
+        path.unlink()
+    try:
+        shard_dir.rmdir()
+    except OSError:
+        pass
+    print(f"[writer] merged {merged} rows from {len(paths)} shards into {output_path.name}", file=sys.stderr)
+    return merged
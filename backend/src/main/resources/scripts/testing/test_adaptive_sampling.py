@@ -0,0 +1,66 @@
+import itertools
+import unittest
+from unittest import mock
+
+import topic_tags_assignment as tta
+
+TAGS = {tid: tta.Tag(tag_id=tid, name=f"tag{tid}", synonyms=[]) for tid in range(1, 21)}
+TOPIC = tta.Topic(topic_id="ART0", layer=2, name="Art", description="Visual arts")  # 4 output tags
+
+
+def run_topic(answers, adaptive, repeats=3):
+    with mock.patch.object(tta, "call_openai", side_effect=answers) as fake:
+        selected, _weights = tta.tag_topic(
+            TOPIC,
+            TAGS,
+            set(TAGS),
+            "key",
+            "model-a",
+            "model-b",
+            None,
+            dry_run=False,
+            max_attempts=1,
+            retry_delay=0.0,
+            rate_limiter_a=None,
+            rate_limiter_b=None,
+            rate_limiter_c=None,
+            max_rate_limit_retries=1,
+            repeats_a=repeats,
+            repeats_b=repeats,
+            repeats_c=0,
+            include_synonyms=False,
+            debug=False,
+            adaptive=adaptive,
+        )
+    return selected, fake.call_count
+
+
+class AdaptiveSamplingTests(unittest.TestCase):
+    def test_merge_stability_is_leave_one_out(self) -> None:
+        agree = [(3, [1, 2, 3, 4, 5]), (3, [2, 1, 3, 4, 6])]
+        self.assertTrue(tta.is_merge_stable(agree, 4, 1.0))
+        disagree = [(3, [1, 2, 3, 4]), (3, [5, 6, 7, 8])]
+        self.assertFalse(tta.is_merge_stable(disagree, 4, 1.0))
+        self.assertTrue(tta.is_merge_stable(disagree, 4, 0.0))
+        self.assertFalse(tta.is_merge_stable(agree[:1], 4, 1.0))
+
+    def test_consistent_topic_stops_after_first_round(self) -> None:
+        adaptive = tta.AdaptiveSampling()
+        selected, calls = run_topic(itertools.repeat([1, 2, 3, 4, 5, 6]), adaptive)
+        self.assertEqual(calls, 2)
+        self.assertEqual(selected, [1, 2, 3, 4])
+        self.assertIn("calls=2 cap=6 saved=4", adaptive.summary())
+
+    def test_ambiguous_topic_uses_the_cap_and_matches_fixed_sampling(self) -> None:
+        answers = [[1, 2, 3, 4], [5, 6, 7, 8], [1, 5, 2, 6], [7, 3, 8, 4], [1, 2, 5, 6], [3, 4, 7, 8]]
+        adaptive = tta.AdaptiveSampling()
+        adaptive_selected, calls = run_topic(iter(answers), adaptive)
+        # Rounds interleave A and B; fixed sampling issues all A repeats, then all B repeats.
+        fixed_selected, fixed_calls = run_topic(iter(answers[0::2] + answers[1::2]), None)
+        self.assertEqual((calls, fixed_calls), (6, 6))
+        self.assertEqual(adaptive_selected, fixed_selected)
+        self.assertEqual(adaptive.stable_early, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
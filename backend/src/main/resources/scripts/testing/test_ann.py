@@ -0,0 +1,122 @@
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def fake_encoder(dim=16):
+    """Deterministic unit vectors per text; texts of the same tag number share a direction."""
+    cache = {}
+
+    def encode(texts):
+        out = []
+        for text in texts:
+            if text not in cache:
+                digits = "".join(ch for ch in text if ch.isdigit()) or "0"
+                base = np.random.default_rng(int(digits)).standard_normal(dim)
+                noise = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(dim)
+                vector = base + 0.3 * noise
+                cache[text] = vector / np.linalg.norm(vector)
+            out.append(cache[text])
+        return np.asarray(out, dtype=np.float32).reshape(len(texts), dim)
+
+    return encode
+
+
+def make_tags(ids):
+    return [(i, f"tag {i}", [f"alias {i}"] * (i % 3 == 0)) for i in ids]
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class IVFIndexTests(unittest.TestCase):
+    def test_sync_keeps_known_rows_and_retrains_after_large_changes(self) -> None:
+        from embedding_helpers.ann import IVFIndex
+
+        encode = fake_encoder()
+        keys = [f"text {i}" for i in range(100)]
+        index = IVFIndex(16)
+        self.assertEqual(index.sync(keys, encode(keys)), (100, 0, True))
+        centroids = index.centroids.copy()
+
+        changed = keys[5:] + ["text 500", "text 501"]
+        self.assertEqual(index.sync(changed, encode(changed)), (2, 5, False))
+        np.testing.assert_array_equal(index.centroids, centroids)
+        self.assertEqual(sorted(index.keys), sorted(changed))
+        self.assertEqual(index.sync(changed, encode(changed)), (0, 0, False))
+
+        replaced = [f"other {i}" for i in range(40)] + changed[40:]
+        self.assertEqual(index.sync(replaced, encode(replaced))[2], True)
+
+    def test_full_probe_is_exact_and_save_load_round_trips(self) -> None:
+        from embedding_helpers.ann import IVFIndex
+
+        encode = fake_encoder()
+        keys = [f"text {i}" for i in range(200)]
+        vectors = encode(keys)
+        index = IVFIndex(16)
+        index.sync(keys, vectors)
+        queries = encode([f"query {i}" for i in range(20)])
+        rows, scores = index.search(queries, 5, nprobe=index.n_lists)
+        expected = np.argsort(-(queries @ vectors.T), axis=1, kind="stable")[:, :5]
+        np.testing.assert_array_equal(rows, expected)
+        self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "index.npz"
+            index.save(path)
+            loaded = IVFIndex.load(path)
+            with np.load(path, allow_pickle=False) as data:
+                self.assertEqual(data["keys"].dtype.kind, "U")  # no object arrays: loading never unpickles
+        self.assertEqual(loaded.keys, index.keys)
+        np.testing.assert_array_equal(loaded.search(queries, 5, nprobe=3)[0], index.search(queries, 5, nprobe=3)[0])
+        self.assertIsNone(IVFIndex.load(Path(tmp) / "missing.npz"))
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class TagIndexTests(unittest.TestCase):
+    def test_exact_matches_shortlister_and_search_recalls_it(self) -> None:
+        from embedding_helpers.ann import TagIndex
+        from embedding_helpers.shortlist import TagShortlister
+
+        encode = fake_encoder()
+        tags = make_tags(range(1, 301))
+        index = TagIndex.open(tags, encode)
+        queries = [f"tag {i} query" for i in range(1, 300, 13)]
+        query_emb = encode(queries)
+        exact = index.exact(query_emb, 7)
+        expected = TagShortlister(tags, encode).shortlist(queries, 7)
+        self.assertEqual([[tag_id for tag_id, _score in hits] for hits in exact], expected)
+
+        full = index.search(query_emb, 7, nprobe=index.index.n_lists)
+        self.assertEqual([[t for t, _s in hits] for hits in full], [[t for t, _s in hits] for hits in exact])
+        self.assertEqual(index.recall(query_emb, 7, nprobe=index.index.n_lists)["recall"], 1.0)
+        probed = index.search(query_emb, 7, nprobe=4)
+        self.assertEqual([hits[0][0] for hits in probed], list(range(1, 300, 13)))  # own tag found with few lists
+
+    def test_open_refreshes_the_stored_index_incrementally(self) -> None:
+        from embedding_helpers.ann import TagIndex, index_path_for
+
+        encode = fake_encoder()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = index_path_for(Path(tmp) / "tags.csv", "test/model", Path(tmp))
+            first = TagIndex.open(make_tags(range(1, 101)), encode, path)
+            self.assertTrue(path.exists())
+            self.assertEqual(first.index.meta["last_sync"]["added"], 133)
+
+            # Renumbered and extended catalog, as after tag_update.py: known variants are re-used.
+            second = TagIndex.open(make_tags(range(1, 106)), encode, path)
+            self.assertEqual(
+                {key: second.index.meta["last_sync"][key] for key in ("added", "removed", "retrained")},
+                {"added": 7, "removed": 0, "retrained": False},
+            )
+            hits = second.search(encode(["tag 104"]), 1, nprobe=second.index.n_lists)
+            self.assertEqual(hits[0][0][0], 104)
+
+
+if __name__ == "__main__":
+    unittest.main()
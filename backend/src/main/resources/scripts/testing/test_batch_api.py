@@ -0,0 +1,153 @@
+import json
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import topic_tags_assignment as tta
+from openai_helpers.batch_api import BatchError
+from tagging_helpers.output_writer import append_rows
+
+
+class FakeBatchServer(ThreadingHTTPServer):
+    """Stand-in for the /files and /batches endpoints; answers every request with fixed tagIDs."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeBatchHandler)
+        self.files = {}
+        self.batches = {}
+        self.fail_next_get = False
+        self.answer = "[3, 1, 2, 99, 4, 5]"
+
+    def add_file(self, content: bytes) -> str:
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = content
+        return file_id
+
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    server: FakeBatchServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, payload: object, raw: bytes = b"") -> None:
+        data = raw or json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/v1/files":
+            content = re.search(rb"Content-Type: application/jsonl\r\n\r\n(.*)\r\n--", body, re.S).group(1)
+            self._send(200, {"id": self.server.add_file(content)})
+        elif self.path == "/v1/batches":
+            request = json.loads(body)
+            lines = []
+            for line in self.server.files[request["input_file_id"]].decode("utf-8").splitlines():
+                custom_id = json.loads(line)["custom_id"]
+                lines.append(
+                    json.dumps(
+                        {
+                            "custom_id": custom_id,
+                            "response": {
+                                "status_code": 200,
+                                "body": {"choices": [{"message": {"content": self.server.answer}}]},
+                            },
+                        }
+                    )
+                )
+            output_id = self.server.add_file("\n".join(lines).encode("utf-8"))
+            batch_id = f"batch-{len(self.server.batches)}"
+            self.server.batches[batch_id] = {"id": batch_id, "status": "in_progress", "output_file_id": output_id}
+            self._send(200, self.server.batches[batch_id])
+        else:
+            self._send(404, {})
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"]:
+            if self.server.fail_next_get:
+                self.server.fail_next_get = False
+                self._send(500, {"error": "boom"})
+                return
+            batch = self.server.batches[parts[2]]
+            self._send(200, dict(batch))
+            batch["status"] = "completed"
+        elif parts[:2] == ["v1", "files"] and parts[-1] == "content":
+            self._send(200, None, raw=self.server.files[parts[2]])
+        else:
+            self._send(404, {})
+
+
+class BatchModeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = FakeBatchServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_base = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.output = self.dir / "out.csv"
+        tta.ensure_header(self.output)
+        self.tags = {i: tta.Tag(tag_id=i, name=f"tag{i}", synonyms=[]) for i in range(1, 8)}
+        self.topics = [
+            tta.Topic(topic_id="ART0", layer=1, name="Art", description="Creative expression"),
+            tta.Topic(topic_id="BOL1", layer=2, name="Cells", description="Cell biology"),
+        ]
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def run_batch(self):
+        return tta.run_batch(
+            self.topics,
+            {t.topic_id: t for t in self.topics},
+            self.tags,
+            self.output,
+            "test-key",
+            [("a", "model-a", 2, tta.WEIGHT_A), ("b", None, 1, tta.WEIGHT_B)],
+            batch_dir=self.dir / "batch",
+            api_base=self.api_base,
+            poll_seconds=0,
+            include_synonyms=False,
+            debug=False,
+        )
+
+    def test_batch_results_are_merged_and_written(self) -> None:
+        self.assertEqual(self.run_batch(), 2)
+        self.assertEqual(
+            self.output.read_text(encoding="utf-8").splitlines(),
+            [
+                "topicID,tagID,weight",
+                "ART0,3,5",
+                "ART0,1,3",
+                "ART0,2,1",
+                "BOL1,3,5",
+                "BOL1,1,3",
+                "BOL1,2,2",
+                "BOL1,4,1",
+            ],
+        )
+        self.assertEqual(len(self.server.batches), 1)
+        self.assertFalse((self.dir / "batch" / tta.BATCH_STATE_FILE).exists())
+
+    def test_interrupted_run_resumes_same_batch(self) -> None:
+        self.server.fail_next_get = True
+        with self.assertRaises(BatchError):
+            self.run_batch()
+        self.assertTrue((self.dir / "batch" / tta.BATCH_STATE_FILE).exists())
+        # Pretend the first topic had already been written before the interruption.
+        append_rows(self.output, tta.OUTPUT_HEADER, [["ART0", 3, 5], ["ART0", 1, 3], ["ART0", 2, 1]])
+        self.assertEqual(self.run_batch(), 1)
+        self.assertEqual(len(self.server.batches), 1)
+        self.assertEqual(len(self.output.read_text(encoding="utf-8").splitlines()), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
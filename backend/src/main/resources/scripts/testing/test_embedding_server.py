@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+VOCAB = ["music", "song", "cell", "biology", "art"]
+
+
+def bag_of_words(texts):
+    out = np.zeros((len(texts), len(VOCAB)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for j, word in enumerate(VOCAB):
+            out[i, j] = text.lower().count(word) + 0.1
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class EmbeddingServerTests(unittest.TestCase):
+    def start_server(self, encoder):
+        from embedding_helpers.server import EmbeddingServer
+
+        server = EmbeddingServer(("127.0.0.1", 0), "test/model", encoder, max_wait_s=0.05)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, f"127.0.0.1:{server.server_address[1]}"
+
+    def test_concurrent_requests_are_batched(self) -> None:
+        from embedding_helpers.server import EmbeddingClient
+
+        calls = []
+        gate = threading.Event()
+
+        def encoder(texts):
+            calls.append(list(texts))
+            gate.wait(5)  # hold the first batch so the others queue up behind it
+            return bag_of_words(texts)
+
+        server, address = self.start_server(encoder)
+        inputs = [["music", "art"], ["cell biology"], ["art", "song"], ["music"], []]
+        results = [None] * len(inputs)
+
+        def run(index):
+            client = EmbeddingClient(address, "test/model")
+            results[index] = client.encode(inputs[index])
+            client.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        gate.set()
+        for thread in threads:
+            thread.join(10)
+        for texts, result in zip(inputs, results):
+            np.testing.assert_allclose(result, bag_of_words(texts) if texts else np.empty((0, len(VOCAB))))
+        self.assertLess(len(calls), len(inputs))
+        self.assertTrue(all(len(set(batch)) == len(batch) for batch in calls))  # shared texts encoded once
+        self.assertEqual(server.health()["requests"], len(inputs))
+
+    def test_client_uses_server_or_falls_back(self) -> None:
+        from embedding_helpers.server import daemon_or_local_encoder
+
+        loaded = []
+
+        def local_factory(name):
+            loaded.append(name)
+            return bag_of_words
+
+        server, address = self.start_server(bag_of_words)
+        encode = daemon_or_local_encoder("test/model", address=address, local_factory=local_factory)
+        np.testing.assert_allclose(encode(["music song"]), bag_of_words(["music song"]))
+        self.assertEqual((loaded, server.health()["texts"]), ([], 1))
+
+        daemon_or_local_encoder("other/model", address=address, local_factory=local_factory)
+        self.assertEqual(loaded, ["other/model"])
+
+        server.shutdown()
+        server.server_close()
+        np.testing.assert_allclose(encode(["art"]), bag_of_words(["art"]))  # server gone mid-run
+        self.assertEqual(loaded, ["other/model", "test/model"])
+
+        daemon_or_local_encoder("test/model", address=address, local_factory=local_factory)
+        self.assertEqual(loaded[-1], "test/model")
+
+
+if __name__ == "__main__":
+    unittest.main()
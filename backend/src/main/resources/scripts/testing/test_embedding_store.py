@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+VOCAB = ["music", "song", "cell", "biology", "art"]
+
+
+class CountingEncoder:
+    """Bag-of-words vectors; remembers every batch it was asked to encode."""
+
+    def __init__(self, shift: float = 0.0) -> None:
+        self.shift = shift
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        out = np.full((len(texts), len(VOCAB)), self.shift, dtype=np.float32)
+        for i, text in enumerate(texts):
+            for j, word in enumerate(VOCAB):
+                out[i, j] += text.lower().count(word)
+            out[i, -1] += 0.1 if not self.shift else -1.0
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class EmbeddingStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def open(self, encoder, dtype="float32"):
+        from embedding_helpers.store import EmbeddingStore
+
+        return EmbeddingStore(self.root, "test/model", dtype=dtype, encoder_factory=lambda name: encoder)
+
+    def test_encodes_only_new_normalized_texts(self) -> None:
+        encoder = CountingEncoder()
+        store = self.open(encoder)
+        first = store.encode(["Music  song", "cell biology", " Music song "])
+        self.assertEqual(encoder.calls, [["Music song", "cell biology"]])
+        np.testing.assert_array_equal(first[0], first[2])
+
+        second = store.encode(["cell biology", "art"])
+        self.assertEqual(encoder.calls[-1], ["art"])
+        np.testing.assert_array_equal(second[0], first[1])
+        self.assertEqual((store.hits, store.misses), (1, 3))
+        self.assertEqual(store.encode([]).shape, (0, len(VOCAB)))
+
+    def test_one_index_write_per_call(self) -> None:
+        store = self.open(CountingEncoder())
+        saves = []
+        original = store._save_index
+        store._save_index = lambda: (saves.append(1), original())
+        store.encode(["music", "art", "cell", "biology"])
+        self.assertEqual(len(saves), 1)
+        store.encode(["art", "music"])  # hits, already stamped today
+        self.assertEqual(len(saves), 1)
+
+    def test_other_instance_reuses_rows_and_prune_drops_unused(self) -> None:
+        store = self.open(CountingEncoder())
+        expected = store.encode(["music", "art", "cell"])
+
+        encoder = CountingEncoder()
+        reopened = self.open(encoder)
+        np.testing.assert_allclose(reopened.encode(["art", "music"]), expected[[1, 0]])
+        store.encode(["biology"])  # appended by the first instance after the second one loaded
+        reopened.encode(["biology"])
+        self.assertEqual(encoder.calls, [])
+
+        reopened.last_used[reopened.rows["cell"]] -= 40
+        reopened._save_index()
+        self.assertEqual(reopened.prune(30), 1)
+        self.assertEqual(sorted(self.open(encoder).rows), ["art", "biology", "music"])
+        np.testing.assert_allclose(reopened.encode(["music"])[0], expected[0])
+
+    def test_changed_model_output_discards_the_store(self) -> None:
+        self.open(CountingEncoder()).encode(["music", "art"])
+        changed = CountingEncoder(shift=1.0)
+        store = self.open(changed)
+        store.encode(["music", "cell"])
+        self.assertEqual(changed.calls[-1], ["music", "cell"])  # probe first, then both texts again
+        self.assertEqual(store.texts, ["music", "cell"])
+
+    def test_float16_rows(self) -> None:
+        encoder = CountingEncoder()
+        store = self.open(encoder, dtype="float16")
+        vectors = store.encode(["music song", "art"])
+        self.assertEqual(store.matrix.dtype, np.float16)
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertEqual(store.data_path.stat().st_size, 2 * len(VOCAB) * 2)
+        np.testing.assert_allclose(vectors, encoder(["music song", "art"]), atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import io
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+
+from openai_helpers.http_client import AsyncHttpClient, HttpClient
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.ports.add(self.client_address[1])
+        self.server.paths.append(self.path)
+        if self.path == "/drop":
+            self.close_connection = True  # the request arrived, but the answer is lost
+            return
+        status = 429 if self.path == "/limited" else 200
+        data = b'{"error": "slow down"}' if status == 429 else body[::-1] or b"file content"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "2")
+        self.end_headers()
+        self.wfile.write(data)
+        if self.path == "/bye":
+            self.close_connection = True  # drop the socket without announcing it, like an idle timeout
+
+    do_GET = do_POST
+
+
+class HttpClientTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.server.ports = set()
+        self.server.paths = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.client = HttpClient(max_connections_per_host=2)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sequential_requests_reuse_one_connection(self) -> None:
+        for i in range(3):
+            resp = self.client.request("POST", f"{self.base}/echo", body=f"abc{i}".encode())
+            self.assertEqual(resp.read(), f"{i}cba".encode())
+        timings = self.client.stats.snapshot()
+        self.assertEqual([t.reused for t in timings], [False, True, True])
+        self.assertEqual(len(self.server.ports), 1)
+        self.assertTrue(all(t.total_s >= t.ttfb_s for t in timings))
+        self.assertIn("requests=3 reused=2", self.client.stats.summary())
+
+    def test_error_status_raises_urllib_http_error(self) -> None:
+        with self.assertRaises(HTTPError) as ctx:
+            self.client.request("POST", f"{self.base}/limited", body=b"x")
+        self.assertEqual(ctx.exception.code, 429)
+        self.assertEqual(ctx.exception.headers.get("Retry-After"), "2")
+        self.assertIn(b"slow down", ctx.exception.read())
+
+    def test_reconnects_when_idle_connection_was_dropped(self) -> None:
+        self.client.request("POST", f"{self.base}/bye", body=b"a")
+        time.sleep(0.2)  # let the server's close reach the idle socket
+        self.assertEqual(self.client.request("POST", f"{self.base}/echo", body=b"ab").read(), b"ba")
+        self.assertEqual(len(self.server.ports), 2)
+
+    def test_request_that_went_out_is_not_resent(self) -> None:
+        self.client.request("POST", f"{self.base}/echo", body=b"a")
+        with self.assertRaises(URLError):
+            self.client.request("POST", f"{self.base}/drop", body=b"paid call")
+        self.assertEqual(self.server.paths, ["/echo", "/drop"])
+
+    def test_shrinking_the_pool_closes_idle_connections(self) -> None:
+        async def run():
+            client = AsyncHttpClient(self.client)
+            await asyncio.gather(*(client.request("POST", f"{self.base}/echo", body=b"x") for _ in range(4)))
+
+        asyncio.run(run())
+        self.client.set_max_connections(1)
+        self.assertEqual(sum(len(idle) for idle in self.client._idle.values()), 1)
+
+    def test_sink_streams_body(self) -> None:
+        sink = io.BytesIO()
+        resp = self.client.request("GET", f"{self.base}/file", sink=sink)
+        self.assertEqual(resp.read(), b"")
+        self.assertEqual(sink.getvalue(), b"file content")
+
+    def test_async_requests_share_the_pool(self) -> None:
+        async def run():
+            client = AsyncHttpClient(self.client)
+            return await asyncio.gather(
+                *(client.request("POST", f"{self.base}/echo", body=str(i).encode()) for i in range(6))
+            )
+
+        responses = asyncio.run(run())
+        self.assertEqual([r.read() for r in responses], [str(i).encode() for i in range(6)])
+        self.assertLessEqual(len(self.server.ports), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from openai_helpers.journal import JobJournal
+from tagging_helpers.incremental import (
+    affected_items,
+    diff_catalog,
+    drop_item_rows,
+    load_snapshot,
+    read_assigned,
+    save_snapshot,
+    take_snapshot,
+    text_hash,
+)
+
+OLD_TAGS = [(1, "art", []), (2, "biology", []), (3, "music", ["songs"])]
+OLD_ITEMS = {"ART0": text_hash("Art", 1, "x"), "BOL0": text_hash("Biology", 1, "y"), "MUS0": text_hash("Music", 1, "z")}
+
+
+class IncrementalRetagTests(unittest.TestCase):
+    def test_diff_and_affected_items(self) -> None:
+        old = take_snapshot(OLD_TAGS, OLD_ITEMS)
+        new_tags = [(1, "art", []), (3, "music", ["songs", "melody"]), (4, "ecology", [])]
+        new_items = dict(OLD_ITEMS, ART0=text_hash("Art", 1, "edited"), GEO0=text_hash("Geo", 1, ""))
+        del new_items["MUS0"]
+        diff = diff_catalog(old, take_snapshot(new_tags, new_items))
+        self.assertEqual((diff.added_tags, diff.removed_tags, diff.changed_tags), ([4], [2], [3]))
+        self.assertEqual((diff.new_items, diff.changed_items, diff.removed_items), (["GEO0"], ["ART0"], ["MUS0"]))
+
+        assigned = {"ART0": [1], "BOL0": [1, 2], "MUS0": [3], "CHE0": [1]}
+        nearest = {"ART0": [1, 3], "BOL0": [4, 1], "CHE0": [1, 4], "GEO0": [1, 4]}
+        affected = affected_items(diff, assigned, nearest)
+        self.assertEqual(
+            affected,
+            {
+                "GEO0": "new",
+                "ART0": "text changed",
+                "BOL0": "assigned tag removed/changed",
+                "CHE0": "near added/changed tag",
+            },
+        )
+        self.assertEqual(affected_items(diff, {"XYZ0": [1]}, {"XYZ0": [1]}), {"GEO0": "new", "ART0": "text changed"})
+
+    def test_drop_rows_and_forget_keep_the_rest(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "out.csv"
+            output.write_text("topicID,tagID,weight\nART0,1,5\nBOL0,2,5\nBOL0,1,4\nCHE0,1,5\n", encoding="utf-8")
+            journal = JobJournal(Path(tmp) / "journal.jsonl", fsync=False)
+            journal.commit_many([("ART0", [["ART0", 1, 5]]), ("BOL0", []), ("CHE0", [["CHE0", 1, 5]])])
+            self.assertEqual(drop_item_rows(output, {"BOL0"}), 2)
+            journal.forget(["BOL0"])
+            journal.close()
+            self.assertEqual(read_assigned(output), {"ART0": [1], "CHE0": [1]})
+            reopened = JobJournal(Path(tmp) / "journal.jsonl", fsync=False)
+            self.assertEqual(list(reopened.committed), ["ART0", "CHE0"])
+            reopened.close()
+
+            snapshot_path = Path(tmp) / "snap.json"
+            save_snapshot(snapshot_path, take_snapshot(OLD_TAGS, OLD_ITEMS, ["BOL0"]))
+            loaded = load_snapshot(snapshot_path)
+            self.assertEqual((loaded.items, loaded.pending), (OLD_ITEMS, ["BOL0"]))
+            self.assertEqual(diff_catalog(loaded, take_snapshot(OLD_TAGS, OLD_ITEMS)).summary(), "tags +0 -0 ~0; items +0 -0 ~0")
+
+
+if __name__ == "__main__":
+    unittest.main()
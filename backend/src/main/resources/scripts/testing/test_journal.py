@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from openai_helpers.journal import JobJournal, read_tail_item_id
+
+
+class JobJournalTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.path = self.dir / "journal.jsonl"
+        self.output = self.dir / "out.csv"
+        self.output.write_text("topicID,tagID,weight\n", encoding="utf-8")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def append(self, rows) -> None:
+        with self.output.open("a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(",".join(str(v) for v in row) + "\n")
+
+    def test_replay_keeps_calls_of_unfinished_items_only(self) -> None:
+        journal = JobJournal(self.path, fsync=False)
+        journal.record_call("A", "m", "prompt A", 0, [1, 2])
+        journal.commit("A", [["A", 1, 5]])
+        journal.record_call("B", "m", "prompt B", 0, [3, 4])
+        journal.close()
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write('{"t":"call","item":"B","ke')  # torn write from a crash
+
+        journal = JobJournal(self.path, fsync=False)
+        self.assertEqual(list(journal.committed), ["A"])
+        self.assertEqual(journal.lookup("B", "m", "prompt B", 0), [3, 4])
+        self.assertIsNone(journal.lookup("B", "m", "prompt B", 1))
+        self.assertIsNone(journal.lookup("A", "m", "prompt A", 0))
+        journal.close()
+
+    def test_shared_call_is_retired_per_item(self) -> None:
+        journal = JobJournal(self.path, fsync=False)
+        journal.record_calls({"A": [1, 2], "B": []}, "m", "packed prompt", 0)
+        journal.commit("A", [["A", 1, 5]])
+        journal.close()
+
+        journal = JobJournal(self.path, fsync=False)
+        self.assertIsNone(journal.lookup("A", "m", "packed prompt", 0))
+        self.assertEqual(journal.lookup("B", "m", "packed prompt", 0), [])
+        journal.commit("B", [])
+        self.assertIn("pending_calls=0", journal.summary())
+        journal.close()
+
+    def test_sync_reappends_rows_committed_but_not_written(self) -> None:
+        journal = JobJournal(self.path, fsync=False)
+        journal.commit("A", [["A", 1, 5]])
+        self.append([["A", 1, 5]])
+        journal.commit("B", [["B", 2, 5], ["B", 3, 3]])  # crash before the CSV write
+        journal.sync_with_output(self.output, self.append)
+        self.assertEqual(self.output.read_text(encoding="utf-8").splitlines()[-2:], ["B,2,5", "B,3,3"])
+        self.assertEqual(read_tail_item_id(self.output), "B")
+        journal.close()
+
+    def test_sync_rebuilds_from_output_without_journal(self) -> None:
+        self.append([["A", 1, 5], ["B", 2, 5], ["C", 3, 5]])
+        journal = JobJournal(self.path, fsync=False)
+        journal.sync_with_output(self.output, self.append)
+        self.assertEqual(list(journal.committed), ["A", "B", "C"])
+        journal.close()
+
+    def test_read_tail_item_id_header_only(self) -> None:
+        self.assertIsNone(read_tail_item_id(self.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import random
+import unittest
+
+import topic_tags_assignment as tta
+
+try:
+    from tagging_helpers.merge_batch import merge_packed, merge_ranked_batch, pack_ranked_lists
+except ImportError:  # pragma: no cover - numpy missing
+    merge_packed = None
+
+
+class MergeRankedTests(unittest.TestCase):
+    def test_ties_are_broken_by_tag_id(self) -> None:
+        # 100 and 5 both score 3 (1 + 2), 7 and 8 both score 4.
+        self.assertEqual(tta.merge_ranked([(1, [100, 5, 7]), (1, [5, 100, 8])]), [5, 100, 7, 8])
+
+
+@unittest.skipUnless(merge_packed is not None, "numpy not installed")
+class MergeBatchTests(unittest.TestCase):
+    def random_topics(self, seed: int):
+        rng = random.Random(seed)
+        topics = []
+        for _ in range(300):
+            pool = rng.sample(range(1, 60), 12)
+            # Empty topics, single lists and in-list duplicates included.
+            lists = [
+                (rng.randint(1, 4), [rng.choice(pool) for _ in range(rng.randint(1, 9))])
+                for _ in range(rng.randint(0, 5))
+            ]
+            topics.append(lists)
+        return topics
+
+    def test_matches_merge_ranked(self) -> None:
+        topics = self.random_topics(1)
+        expected = [tta.merge_ranked(lists) for lists in topics]
+        self.assertEqual(merge_ranked_batch(topics), expected)
+        limits = [i % 7 for i in range(len(topics))]
+        self.assertEqual(merge_ranked_batch(topics, limits), [e[:k] for e, k in zip(expected, limits)])
+
+    def test_list_weights_override(self) -> None:
+        topics = self.random_topics(2)
+        packed = pack_ranked_lists(topics)
+        new_weights = (packed.list_weight * 3) % 5 + 1
+        reweighted = []
+        index = 0
+        for lists in topics:
+            reweighted.append([(int(new_weights[index + i]), seq) for i, (_w, seq) in enumerate(lists)])
+            index += len(lists)
+        expected = [tta.merge_ranked(lists)[:4] for lists in reweighted]
+        self.assertEqual(merge_packed(packed, 4, list_weights=new_weights), expected)
+
+    def test_empty_input(self) -> None:
+        self.assertEqual(merge_ranked_batch([[], []], 3), [[], []])
+
+
+if __name__ == "__main__":
+    unittest.main()
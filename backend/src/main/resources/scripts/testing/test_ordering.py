@@ -0,0 +1,66 @@
+import time
+import unittest
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def row_normalized_sim(n, seed):
+    rng = np.random.default_rng(seed)
+    points = rng.standard_normal((n, 8)) + 1.5
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    raw = points @ points.T
+    off_diagonal = raw.copy()
+    np.fill_diagonal(off_diagonal, -np.inf)
+    return raw / off_diagonal.max(axis=1, keepdims=True)  # asymmetric, as in base_tag_order.py
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class OrderingTests(unittest.TestCase):
+    def test_local_search_ends_in_a_brute_force_local_optimum(self) -> None:
+        from embedding_helpers.ordering import edge_weights, local_search, path_score
+
+        for mode in ("sum", "product"):
+            weights = edge_weights(row_normalized_sim(12, 1), mode)
+            path = local_search(np.random.default_rng(0).permutation(12), weights, time.time() + 30)
+            score = path_score(path, weights)
+            self.assertEqual(sorted(path.tolist()), list(range(12)))
+            order = path.tolist()
+            for i in range(12):
+                for k in range(i + 1, 12):
+                    reversed_segment = order[:i] + order[i : k + 1][::-1] + order[k + 1 :]
+                    self.assertLessEqual(path_score(reversed_segment, weights), score + 1e-9)
+                for length in (1, 2, 3):
+                    segment, rest = order[i : i + length], order[:i] + order[i + length :]
+                    for gap in range(len(rest) + 1):
+                        for moved in (segment, segment[::-1]):
+                            candidate = rest[:gap] + moved + rest[gap:]
+                            self.assertLessEqual(path_score(candidate, weights), score + 1e-9)
+
+    def test_best_orders_is_optimal_on_small_inputs_and_independent_of_workers(self) -> None:
+        from itertools import permutations
+
+        from embedding_helpers.ordering import best_orders, edge_weights, path_score
+
+        sim = row_normalized_sim(7, 2)
+        for mode in ("sum", "product"):
+            weights = edge_weights(sim, mode)
+            optimum = max(path_score(order, weights) for order in permutations(range(7)))
+            single, restarts = best_orders(
+                sim, mode, max_seconds=60, random_starts=20, seed=5, top_results=3, workers=1
+            )
+            self.assertEqual(restarts, 27)
+            self.assertAlmostEqual(single[0][0], optimum)
+            self.assertEqual([score for score, _order in single], sorted((s for s, _o in single), reverse=True))
+            pooled, _restarts = best_orders(
+                sim, mode, max_seconds=60, random_starts=20, seed=5, top_results=3, workers=2
+            )
+            self.assertEqual(pooled, single)
+        with self.assertRaises(ValueError):
+            edge_weights(sim, "max")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from openai_helpers.journal import JobJournal
+from tagging_helpers.output_writer import RowWriter, merge_shards, read_shard_items, shard_dir_for
+
+HEADER = ["topicID", "tagID", "weight"]
+
+
+class RowWriterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.output = self.dir / "out.csv"
+        self.journal = JobJournal(self.dir / "journal.jsonl", fsync=False)
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        self.tmp.cleanup()
+
+    def lines(self, path: Path):
+        return path.read_text(encoding="utf-8").splitlines()
+
+    def test_rows_keep_submit_order_and_are_journaled(self) -> None:
+        writer = RowWriter(self.output, HEADER, journal=self.journal, batch_rows=5, fsync_seconds=0)
+        for i in range(20):
+            writer.submit(f"T{i}", [[f"T{i}", 1, 5], [f"T{i}", 2, 3]])
+        writer.close()
+        lines = self.lines(self.output)
+        self.assertEqual(lines[0], "topicID,tagID,weight")
+        self.assertEqual([line.split(",")[0] for line in lines[1::2]], [f"T{i}" for i in range(20)])
+        self.assertEqual(list(self.journal.committed), [f"T{i}" for i in range(20)])
+        self.assertGreater(writer.batches, 0)
+
+    def test_concurrent_submitters_do_not_interleave_rows(self) -> None:
+        writer = RowWriter(self.output, HEADER, batch_rows=64)
+
+        def work(prefix: str) -> None:
+            for i in range(50):
+                writer.submit(f"{prefix}{i}", [[f"{prefix}{i}", tag, 1] for tag in range(4)])
+
+        threads = [threading.Thread(target=work, args=(p,)) for p in "ABCD"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.close()
+        rows = [line.split(",") for line in self.lines(self.output)[1:]]
+        self.assertEqual(len(rows), 4 * 50 * 4)
+        for start in range(0, len(rows), 4):
+            self.assertEqual({row[0] for row in rows[start : start + 4]}, {rows[start][0]})
+
+    def test_shards_merge_in_input_order(self) -> None:
+        shard_dir = shard_dir_for(self.output)
+        layers = {"ART0": 1, "ART1": 2, "BOL0": 1, "BOL1": 2}
+        writer = RowWriter(
+            self.output,
+            HEADER,
+            journal=self.journal,
+            shard_dir=shard_dir,
+            shard_of=lambda item: f"layer{layers[item]}",
+        )
+        for item in ["BOL1", "ART0", "ART1", "BOL0"]:
+            writer.submit(item, [[item, 7, 5]])
+        writer.close()
+        self.assertEqual(sorted(p.name for p in shard_dir.iterdir()), ["layer1.csv", "layer2.csv"])
+        self.assertEqual(set(read_shard_items(shard_dir)), set(layers))
+
+        merge_shards(self.output, shard_dir, ["ART0", "ART1", "BOL0", "BOL1"], HEADER, self.journal)
+        self.assertEqual([line.split(",")[0] for line in self.lines(self.output)[1:]], ["ART0", "ART1", "BOL0", "BOL1"])
+        self.assertFalse(shard_dir.exists())
+        self.assertEqual(self.journal.last_committed, "BOL1")
+
+    def test_merge_appends_after_an_unterminated_last_row(self) -> None:
+        self.output.write_text("topicID,tagID,weight\nX,1,5", encoding="utf-8")
+        shard_dir = shard_dir_for(self.output)
+        writer = RowWriter(self.output, HEADER, shard_dir=shard_dir, shard_of=lambda item: "s")
+        writer.submit("A", [["A", 2, 5]])
+        writer.close()
+        self.assertEqual(merge_shards(self.output, shard_dir, ["A"], HEADER), 1)
+        self.assertEqual(self.lines(self.output), ["topicID,tagID,weight", "X,1,5", "A,2,5"])
+
+    def test_sync_reappends_a_lost_group_commit(self) -> None:
+        writer = RowWriter(self.output, HEADER, journal=self.journal)
+        writer.submit("A", [["A", 1, 5]])
+        writer.close()
+        # Crash after the journal group commit of B and C, before their rows reached the CSV.
+        self.journal.commit_many([("B", [["B", 2, 5]]), ("C", [["C", 3, 5]])])
+        self.journal.sync_with_output(self.output, lambda rows: self._append(self.output, rows))
+        self.assertEqual(self.lines(self.output)[1:], ["A,1,5", "B,2,5", "C,3,5"])
+
+    def test_sync_with_shards_restores_missing_items(self) -> None:
+        shard_dir = shard_dir_for(self.output)
+        writer = RowWriter(self.output, HEADER, journal=self.journal, shard_dir=shard_dir, shard_of=lambda item: "s")
+        writer.submit("A", [["A", 1, 5]])
+        writer.close()
+        self.output.write_text("topicID,tagID,weight\n", encoding="utf-8")
+        self.journal.commit("B", [["B", 2, 5]])  # committed, never written to its shard
+        self.journal.sync_with_shards(
+            self.output, read_shard_items(shard_dir), lambda item, rows: self._append(shard_dir / "s.csv", rows)
+        )
+        self.assertEqual(self.lines(shard_dir / "s.csv")[1:], ["A,1,5", "B,2,5"])
+        self.assertEqual(list(self.journal.committed), ["A", "B"])
+
+    @staticmethod
+    def _append(path: Path, rows) -> None:
+        with path.open("a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(",".join(str(v) for v in row) + "\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
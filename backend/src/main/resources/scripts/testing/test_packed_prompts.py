@@ -0,0 +1,29 @@
+import unittest
+
+import topic_tags_assignment as tta
+
+
+def make_topic(topic_id: str, desc_len: int = 10) -> tta.Topic:
+    return tta.Topic(topic_id=topic_id, layer=2, name=topic_id, description="x" * desc_len)
+
+
+class PackedPromptTests(unittest.TestCase):
+    def test_parse_topic_map_keeps_requested_topics(self) -> None:
+        raw = 'Sure:\n```json\n{"ART0": [3, "1", 2], "BOL0": "n/a", "XYZ9": [4]}\n```'
+        self.assertEqual(tta.parse_topic_map(raw, ["ART0", "BOL0", "CHE0"]), {"ART0": [3, 1, 2]})
+
+    def test_parse_topic_map_salvages_truncated_object(self) -> None:
+        raw = '{"ART0": [3, 1, 2], "BOL0": [5, 6], "CHE0": [7,'
+        self.assertEqual(tta.parse_topic_map(raw, ["ART0", "BOL0", "CHE0"]), {"ART0": [3, 1, 2], "BOL0": [5, 6]})
+
+    def test_plan_packs_respects_size_and_budget(self) -> None:
+        topics = [make_topic(f"T{i}") for i in range(7)]
+        packs = tta.plan_packs(topics, pack_size=3, token_budget=10_000, prefix_chars=0)
+        self.assertEqual([len(p) for p in packs], [3, 3, 1])
+        big = [make_topic(f"B{i}", desc_len=1500) for i in range(4)]
+        packs = tta.plan_packs(big, pack_size=10, token_budget=900, prefix_chars=0)
+        self.assertEqual([len(p) for p in packs], [2, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from openai_helpers.rate_limit import RateLimiter, normalize_retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(rpm: int, tpm: int = 0, burst_seconds: float = 10.0) -> tuple[RateLimiter, FakeClock]:
+    clock = FakeClock()
+    limiter = RateLimiter(rpm, tpm, burst_seconds=burst_seconds, clock=clock, sleep=clock.sleep)
+    return limiter, clock
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_requests_refill_smoothly(self) -> None:
+        limiter, clock = make_limiter(60, burst_seconds=2.0)
+        limiter.wait_for_slot()
+        limiter.wait_for_slot()
+        self.assertEqual(clock.now, 0.0)
+        limiter.wait_for_slot()
+        # 60 RPM refills one request per second instead of waiting for a new minute window.
+        self.assertAlmostEqual(clock.now, 1.0)
+        self.assertEqual(limiter.total_requests, 3)
+
+    def test_token_bucket_limits_large_prompts(self) -> None:
+        limiter, clock = make_limiter(0, 600, burst_seconds=10.0)
+        limiter.wait_for_slot(100)
+        self.assertEqual(clock.now, 0.0)
+        limiter.wait_for_slot(100)
+        # 600 TPM = 10 tokens/s -> 100 tokens need 10s after the bucket ran dry.
+        self.assertAlmostEqual(clock.now, 10.0)
+
+    def test_usage_refunds_overestimate_and_learns_ratio(self) -> None:
+        limiter, clock = make_limiter(0, 600, burst_seconds=10.0)
+        reservation = limiter.wait_for_slot(100, prompt_chars=400)
+        limiter.record_usage(reservation, {"prompt_tokens": 15, "completion_tokens": 5, "total_tokens": 20})
+        limiter.wait_for_slot(80)
+        self.assertEqual(clock.now, 0.0)
+        self.assertGreater(limiter.chars_per_token, 4.0)
+        self.assertEqual(limiter.total_tokens, 20)
+
+    def test_release_refunds_failed_calls_once(self) -> None:
+        limiter, clock = make_limiter(0, 600, burst_seconds=10.0)
+        failed = limiter.wait_for_slot(100)
+        limiter.release(failed)  # the call raised before any usage came back
+        limiter.release(failed)
+        answered = limiter.wait_for_slot(100)
+        self.assertEqual(clock.now, 0.0)
+        limiter.record_usage(answered, {"prompt_tokens": 70, "completion_tokens": 30, "total_tokens": 100})
+        limiter.release(answered)  # settled by the usage block: nothing to give back
+        limiter.wait_for_slot(10)
+        self.assertAlmostEqual(clock.now, 1.0)
+        self.assertEqual(limiter.total_tokens, 100)
+
+    def test_backoff_blocks_until_retry_after(self) -> None:
+        limiter, clock = make_limiter(600)
+        limiter.backoff(retry_after=7.5)
+        limiter.wait_for_slot()
+        self.assertGreaterEqual(clock.now, 7.5)
+
+    def test_normalize_retry_after_milliseconds(self) -> None:
+        self.assertAlmostEqual(normalize_retry_after_seconds(55728), 55.728)
+        self.assertEqual(normalize_retry_after_seconds("12"), 12.0)
+        self.assertIsNone(normalize_retry_after_seconds("soon"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from openai_helpers.response_cache import CacheMissError, ResponseCache
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache.sqlite"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_roundtrip_is_keyed_by_repeat_and_params(self) -> None:
+        cache = ResponseCache(self.path)
+        cache.put("gpt", "prompt", {"temperature": 0.2}, 0, [3, 1, 2])
+        self.assertEqual(cache.get("gpt", "prompt", {"temperature": 0.2}, 0), [3, 1, 2])
+        self.assertIsNone(cache.get("gpt", "prompt", {"temperature": 0.2}, 1))
+        self.assertIsNone(cache.get("gpt", "prompt", {"temperature": 0.7}, 0))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        cache.close()
+
+    def test_cache_only_fails_fast_on_miss(self) -> None:
+        cache = ResponseCache(self.path, cache_only=True)
+        with self.assertRaises(CacheMissError):
+            cache.get("gpt", "prompt", {}, 0)
+        cache.close()
+
+    def test_eviction_keeps_size_below_limit(self) -> None:
+        cache = ResponseCache(self.path, max_bytes=2000)
+        for i in range(100):
+            cache.put("gpt", f"prompt {i}", {}, 0, list(range(20)))
+        self.assertLessEqual(cache.total_bytes(), 2000)
+        self.assertIsNotNone(cache.get("gpt", "prompt 99", {}, 0))
+        self.assertIsNone(cache.get("gpt", "prompt 0", {}, 0))
+        cache.close()
+
+
+def run_main(module, argv, *, api_key):
+    """Run a tagging script's main() on the repo CSVs with OPENAI_API_KEY set to `api_key` (or unset)."""
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    if api_key:
+        env["OPENAI_API_KEY"] = api_key
+    with mock.patch.dict(os.environ, env, clear=True), mock.patch.object(module, "load_env_file", return_value={}), \
+            mock.patch("sys.argv", [module.__file__, *argv]), contextlib.redirect_stderr(io.StringIO()), \
+            contextlib.redirect_stdout(io.StringIO()):
+        return module.main()
+
+
+class CacheOnlyRunTests(unittest.TestCase):
+    def test_cache_only_replays_without_api_key(self) -> None:
+        import resource_tags_assignment
+        import topic_tags_assignment
+
+        for module in (topic_tags_assignment, resource_tags_assignment):
+            with self.subTest(module=module.__name__), tempfile.TemporaryDirectory() as tmp:
+                def argv(name, *extra):
+                    return ["--limit", "1", "--output", str(Path(tmp) / name), "--cache", str(Path(tmp) / "c.sqlite"),
+                            "--no-journal", *extra]
+
+                with mock.patch.object(module, "call_openai", return_value=[2, 1, 3]) as live:
+                    self.assertEqual(run_main(module, argv("live.csv"), api_key="sk-test"), 0)
+                self.assertGreater(live.call_count, 0)
+
+                with mock.patch.object(module, "call_openai", side_effect=AssertionError("no live calls")):
+                    self.assertEqual(run_main(module, argv("replay.csv", "--cache-only"), api_key=None), 0)
+                    self.assertEqual(run_main(module, argv("nokey.csv"), api_key=None), 1)  # live runs need a key
+                rows = {}
+                for name in ("live.csv", "replay.csv"):
+                    with (Path(tmp) / name).open(encoding="utf-8", newline="") as f:
+                        rows[name] = list(csv.reader(f))
+                self.assertGreater(len(rows["live.csv"]), 1)
+                self.assertEqual(rows["replay.csv"], rows["live.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
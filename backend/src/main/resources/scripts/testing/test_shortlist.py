@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from embedding_helpers.shortlist import build_tag_variants, recall_at_k
+from test_response_cache import run_main
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+VOCAB = ["music", "song", "cell", "biology", "art"]
+
+
+def bag_of_words(texts):
+    out = np.zeros((len(texts), len(VOCAB)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for j, word in enumerate(VOCAB):
+            out[i, j] = text.lower().count(word)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+class ShortlistTests(unittest.TestCase):
+    def test_variants_match_tag_assign_v1_format(self) -> None:
+        texts, indices = build_tag_variants([(1, "music", ["song"]), (2, "art", [])])
+        self.assertEqual(texts, ["Tag: music.", "Tag: song.", "Tag: art."])
+        self.assertEqual(indices, [[0, 1], [2]])
+
+    @unittest.skipUnless(np is not None, "numpy not installed")
+    def test_shortlist_ranks_by_median_variant_similarity(self) -> None:
+        from embedding_helpers.shortlist import TagShortlister
+
+        shortlister = TagShortlister(
+            [(10, "music", ["song"]), (20, "cell", ["biology"]), (30, "art", [])],
+            bag_of_words,
+        )
+        ranked = shortlister.shortlist(["Cell biology basics", "Song and music"], top_k=2)
+        self.assertEqual(ranked[0][0], 20)
+        self.assertEqual(ranked[1][0], 10)
+        self.assertEqual(len(ranked[0]), 2)
+
+    def test_recall_at_k(self) -> None:
+        reference = {"A": [1, 2], "B": [3]}
+        ranked = {"A": [1, 5, 2], "B": [4, 3], "C": [1]}
+        self.assertEqual(recall_at_k(reference, ranked, [1, 3]), {1: (0.25, 0.0), 3: (1.0, 1.0)})
+
+
+
+class PendingShortlistTests(unittest.TestCase):
+    def test_only_pending_items_are_shortlisted(self) -> None:
+        import resource_tags_assignment
+        import topic_tags_assignment
+
+        for module in (topic_tags_assignment, resource_tags_assignment):
+            with self.subTest(module=module.__name__), tempfile.TemporaryDirectory() as tmp:
+                shortlister = mock.Mock()
+                shortlister.shortlist.side_effect = lambda texts, k: [[2, 1, 3] for _ in texts]
+                argv = ["--start-row", "3", "--limit", "2", "--shortlist-k", "3", "--no-cache", "--no-journal",
+                        "--output", str(Path(tmp) / "out.csv")]
+                with mock.patch.object(module, "TagShortlister", return_value=shortlister), \
+                        mock.patch.object(module, "open_store"), \
+                        mock.patch.object(module, "call_openai", return_value=[2, 1, 3]):
+                    self.assertEqual(run_main(module, argv, api_key="sk-test"), 0)
+                # Rows before --start-row and past --limit are never embedded.
+                shortlister.shortlist.assert_called_once()
+                self.assertEqual(len(shortlister.shortlist.call_args.args[0]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
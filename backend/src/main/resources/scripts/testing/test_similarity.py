@@ -0,0 +1,112 @@
+import unittest
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class TopPairsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        # Small integer vectors: every dot product is exact, so blocked and full scores agree bit for bit
+        # and there are many ties.
+        rng = np.random.default_rng(3)
+        self.emb = rng.integers(-2, 3, size=(37, 4)).astype(np.float32)
+        self.labels = [f"Tag{i % 30}" for i in range(37)]  # repeated labels, like a tag and its variant
+        self.excluded = [("tag1", "TAG2"), ("tag5", "tag5"), ("tag7", "tag0"), ("missing", "tag3")]
+
+    def test_matches_loop_including_ties_and_exclusions(self) -> None:
+        from embedding_helpers.similarity import top_pairs, top_pairs_loop
+
+        sim = self.emb @ self.emb.T
+        for k in (1, 5, 40, 1000):
+            expected = top_pairs_loop(sim, self.labels, k, excluded=self.excluded)
+            self.assertEqual(top_pairs(sim, self.labels, k, excluded=self.excluded), expected)
+            for block_rows in (1, 5, 36):  # fewer rows per block than the matrix has: row-block path
+                self.assertEqual(
+                    top_pairs(sim, self.labels, k, excluded=self.excluded, block_rows=block_rows), expected
+                )
+        self.assertEqual(top_pairs(sim[:1, :1], self.labels[:1], 3), [])
+
+    def test_blocked_matches_full_matrix(self) -> None:
+        from embedding_helpers.similarity import top_pairs, top_pairs_blocked
+
+        sim = self.emb @ self.emb.T
+        for block_rows in (1, 4, 36, 100):
+            for k in (3, 25, 1000):
+                self.assertEqual(
+                    top_pairs_blocked(self.emb, self.labels, k, excluded=self.excluded, block_rows=block_rows),
+                    top_pairs(sim, self.labels, k, excluded=self.excluded),
+                )
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class BlockedSimilarityTests(unittest.TestCase):
+    def test_blocked_analyses_match_full_matrix(self) -> None:
+        from embedding_helpers.similarity import PairScores, threshold_edges, top_per_row
+
+        rng = np.random.default_rng(5)
+        tags = rng.integers(-2, 3, size=(23, 4)).astype(np.float32)
+        topics = rng.integers(-2, 3, size=(41, 4)).astype(np.float32)
+        full = topics @ tags.T
+        tag_sim = tags @ tags.T
+        for max_bytes in (1, 4 * 23 * 5, 1 << 20):  # one row, five rows, everything per block
+            indices, scores = top_per_row(topics, tags, 5, max_bytes=max_bytes)
+            expected = np.lexsort((np.broadcast_to(np.arange(23), full.shape), -full), axis=1)[:, :5]
+            np.testing.assert_array_equal(indices, expected)
+            np.testing.assert_array_equal(scores, np.take_along_axis(full, expected, axis=1))
+
+            rows, cols, values = threshold_edges(tags, 3.0, max_bytes=max_bytes)
+            exp_rows, exp_cols = np.nonzero(np.triu(tag_sim >= 3.0, 1))
+            np.testing.assert_array_equal(rows, exp_rows)
+            np.testing.assert_array_equal(cols, exp_cols)
+            np.testing.assert_array_equal(values, tag_sim[exp_rows, exp_cols])
+        self.assertEqual(top_per_row(topics, tags, 50)[0].shape, (41, 23))
+        self.assertEqual(PairScores(tags)[3, 7], float(tag_sim[3, 7]))
+
+
+def bfs_groups(n, edges):
+    """The former adjacency-list DFS, as the reference."""
+    adjacency = [[] for _ in range(n)]
+    for i, j in edges:
+        adjacency[i].append(j)
+        adjacency[j].append(i)
+    seen, groups = [False] * n, []
+    for start in range(n):
+        if seen[start]:
+            continue
+        seen[start], stack, component = True, [start], [start]
+        while stack:
+            for nb in adjacency[stack.pop()]:
+                if not seen[nb]:
+                    seen[nb] = True
+                    stack.append(nb)
+                    component.append(nb)
+        if len(component) > 1:
+            groups.append(sorted(component))
+    return groups
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class RedundancyGroupTests(unittest.TestCase):
+    def test_union_find_and_sweep_match_per_threshold_search(self) -> None:
+        from embedding_helpers.similarity import connected_groups, redundancy_sweep, threshold_edges
+
+        rng = np.random.default_rng(11)
+        emb = rng.standard_normal((60, 3)).astype(np.float32)
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+        thresholds = [0.7, 0.99, 0.9, 0.95]
+        sweep = redundancy_sweep(emb, thresholds, max_bytes=4 * 60 * 7)
+        self.assertEqual([level for level, _groups in sweep], [0.99, 0.95, 0.9, 0.7])
+        for level, groups in sweep:
+            rows, cols, _scores = threshold_edges(emb, level)
+            expected = bfs_groups(len(emb), zip(rows.tolist(), cols.tolist()))
+            self.assertEqual(connected_groups(len(emb), rows, cols), expected)
+            self.assertEqual(groups, expected)
+        self.assertGreater(len(sweep[-1][1]), 0)
+        self.assertEqual(redundancy_sweep(emb, []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import topic_tags_assignment as tta
+from openai_helpers.usage import JsonlSink, PrometheusSink, UsageStats, price_for, quantile
+
+USAGE = {"prompt_tokens": 2000, "completion_tokens": 100, "prompt_tokens_details": {"cached_tokens": 1000}}
+
+
+class UsageMetricsTests(unittest.TestCase):
+    def test_quantiles_cost_and_prefix_prices(self) -> None:
+        self.assertEqual(quantile([1.0, 2.0, 3.0, 4.0], 0.5), 2.0)
+        self.assertEqual(quantile([1.0, 2.0, 3.0, 4.0], 0.99), 4.0)
+        prices = {"gpt-4.1": (1, 1, 1), "gpt-4.1-nano": (2, 2, 2)}
+        self.assertEqual(price_for("gpt-4.1-nano-2025-04-14", prices), (2, 2, 2))
+        stats = UsageStats(prices={"m": (1.0, 0.5, 4.0)})
+        stats.record_call("m", 0.2, USAGE)
+        stats.record_call("unknown", 0.1, USAGE)
+        # 1000 uncached * 1 + 1000 cached * 0.5 + 100 completion * 4 per 1M tokens
+        self.assertAlmostEqual(stats.models["m"].cost_usd, 0.0019)
+        self.assertIsNone(stats.total_cost())
+        self.assertEqual(stats.calls, 2)
+
+    def test_fetch_model_lists_records_failures_and_tokens(self) -> None:
+        answers = [tta.MaxTokensError("length"), [1, 2, 3]]
+
+        def fake_call(api_key, model, prompt, *, max_output_tokens, debug, on_usage):
+            on_usage(USAGE)
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        stats = UsageStats(item_label="topics")
+        with mock.patch.object(tta, "call_openai", side_effect=fake_call), mock.patch.object(tta.time, "sleep"):
+            lists = tta.fetch_model_lists(
+                "gpt-4.1-nano", 1, "prompt", "key", {1, 2, 3}, None, 0.0, 100, 1, 5, False, usage_stats=stats
+            )
+        self.assertEqual(lists, [[1, 2, 3]])
+        model = stats.models["gpt-4.1-nano"]
+        self.assertEqual((len(model.latencies), model.failures), (2, {"MaxTokensError": 1}))
+        self.assertEqual((model.prompt_tokens, model.completion_tokens), (4000, 200))
+        self.assertIn("max_tok", stats.table()[0])
+
+    def test_sinks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / "metrics.jsonl"
+            prom = Path(tmp) / "metrics.prom"
+            for sink in (JsonlSink(jsonl), PrometheusSink(prom, interval_seconds=3600)):
+                stats = UsageStats(sink=sink, item_label="topics")
+                stats.record_call("gpt-4.1-nano", 0.5, USAGE)
+                stats.record_call("gpt-4.1-nano", 1.5, outcome="RateLimitError")
+                stats.record_wait("gpt-4.1-nano", 2.0)
+                stats.record_item()
+                stats.close()
+            records = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+            self.assertEqual([r["t"] for r in records], ["call", "call", "summary"])
+            self.assertEqual(records[-1]["models"]["gpt-4.1-nano"]["failures"], {"RateLimitError": 1})
+            text = prom.read_text(encoding="utf-8")
+            self.assertIn('tagging_openai_calls_total{model="gpt-4.1-nano",outcome="RateLimitError"} 1', text)
+            self.assertIn('tagging_openai_rate_limit_wait_seconds_total{model="gpt-4.1-nano"} 2.0', text)
+            self.assertIn("tagging_items_done_total 1", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
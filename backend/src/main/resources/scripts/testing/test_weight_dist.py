@@ -0,0 +1,195 @@
+import contextlib
+import io
+import multiprocessing
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import weight_dist_bruteforce as wdb
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+SMALL_SPACE = {
+    "MINUEND_RANGE": range(5, 7),
+    "F_SIZE_RANGE": range(1, 3),
+    "F_INDEX_RANGE": range(6, 8),
+    "INDEX_SHIFT_RANGE": range(-3, 4),
+    "SIZE_SHIFT_RANGE": range(-12, 9),
+    "F_STEPS": 2,
+    "PROGRESS_SECONDS": 3600,
+}
+
+
+def small_space(test):
+    patcher = mock.patch.multiple(wdb, **SMALL_SPACE)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    quiet = contextlib.redirect_stderr(io.StringIO())  # progress lines
+    quiet.__enter__()
+    test.addCleanup(quiet.__exit__, None, None, None)
+
+
+def fake_search_outer(minuend, f_size, size_shift):
+    """Zero to two synthetic matches per point, so the merge order is visible."""
+    return [{"point": [minuend, f_size, size_shift], "n": n} for n in range(abs(size_shift) % 3)]
+
+
+class ChunkedSearchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        small_space(self)
+
+    def test_chunks_merge_in_loop_order_and_resume_from_checkpoint(self) -> None:
+        expected = [m for point in wdb.outer_points() for m in fake_search_outer(*point)]
+        calls = []
+
+        def interrupted(*point):
+            calls.append(point)
+            if len(calls) == 30:
+                raise KeyboardInterrupt
+            return fake_search_outer(*point)
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(wdb, "CHECKPOINT_SECONDS", 0):
+            checkpoint = Path(tmp) / "checkpoint.json"
+            with mock.patch.object(wdb, "search_outer", interrupted), self.assertRaises(KeyboardInterrupt):
+                wdb.brute_force(workers=1, checkpoint=checkpoint, chunk_size=4, engine="python")
+            done = wdb.load_checkpoint(checkpoint, wdb.search_signature(4))
+            self.assertEqual(sorted(done), list(range(7)))  # 7 full chunks of 4 before the 30th point
+
+            calls.clear()
+            with mock.patch.object(wdb, "search_outer", fake_search_outer):
+                resumed = wdb.brute_force(workers=1, checkpoint=checkpoint, chunk_size=4, engine="python")
+                self.assertEqual(resumed, expected)
+                self.assertEqual(wdb.load_checkpoint(checkpoint, wdb.search_signature(5)), {})  # other config
+            with mock.patch.object(wdb, "SIZE_SHIFT_RANGE", range(-12, 9, 2)):
+                self.assertEqual(wdb.load_checkpoint(checkpoint, wdb.search_signature(4)), {})  # other step
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "patched config only reaches forked workers")
+    def test_process_pool_matches_serial_search(self) -> None:
+        serial = [m for point in wdb.outer_points() for m in wdb.search_outer(*point)]
+        self.assertEqual(wdb.brute_force(workers=1, chunk_size=1000, engine="python"), serial)
+        self.assertEqual(wdb.brute_force(workers=3, chunk_size=7, engine="python"), serial)
+        with mock.patch.object(wdb, "search_outer", fake_search_outer):
+            expected = [m for point in wdb.outer_points() for m in fake_search_outer(*point)]
+            self.assertEqual(wdb.brute_force(workers=3, chunk_size=5, engine="python"), expected)
+
+
+def scalar_table(minuend, size_shift, f_size, index_shift, f_index):
+    table = [[0] * wdb.MAX_SIZE for _ in range(wdb.MAX_INDEX + 1)]
+    for index in range(wdb.MAX_INDEX + 1):
+        for size in range(1, wdb.MAX_SIZE + 1):
+            value = wdb.cell_value(size, index, minuend, size_shift, f_size, index_shift, f_index)
+            if value is None:
+                return None
+            table[index][size - 1] = value
+    return table
+
+
+def accepted_table():
+    """A table meeting every constraint: SUMME 5 7 9 11 13 14 ... and DIFF 2 2 2 2 1 1 ..."""
+    table = np.zeros((wdb.MAX_INDEX + 1, wdb.MAX_SIZE), dtype=np.int64)
+    table[0, 0] = 5
+    table[0, 1], table[1, 1] = 4, 3
+    table[8, 8] = 1
+    targets = [5, 7, 9, 11, 13] + list(range(14, 14 + wdb.MAX_SIZE - 5))
+    for size in range(3, wdb.MAX_SIZE + 1):
+        table[0, size - 1] = targets[size - 1] - table[1:, size - 1].sum()
+    return table
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class NumpyEngineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        small_space(self)
+
+    def test_block_tables_equal_cell_by_cell_tables(self) -> None:
+        rng = np.random.default_rng(7)
+        for _ in range(40):
+            minuend, size_shift, f_size = int(rng.integers(3, 8)), int(rng.integers(-60, 40)), rng.integers(10, 50) / 10
+            index_shifts = rng.integers(-30, 30, size=25)
+            f_indices = rng.integers(40, 100, size=25) / 10
+            tables, invalid = wdb.evaluate_block(minuend, size_shift, f_size, index_shifts, f_indices)
+            screen = wdb.single_cell_screen(minuend, size_shift, f_size, index_shifts, f_indices)
+            for c in range(25):
+                args = (minuend, size_shift, f_size, int(index_shifts[c]), float(f_indices[c]))
+                expected = scalar_table(*args)
+                self.assertEqual(bool(invalid[c]), expected is None)
+                if expected is not None:
+                    self.assertEqual(tables[c].tolist(), expected)
+                cells = [wdb.cell_value(2, 0, *args), wdb.cell_value(2, 1, *args), wdb.cell_value(9, 8, *args)]
+                self.assertEqual(bool(screen[c]), cells == [4, 3, 1])
+
+    def test_constraint_masks(self) -> None:
+        table = accepted_table()
+        breaks = [
+            (0, 1, 1),    # table[0][2] == 4
+            (1, 1, -1),   # table[1][2] == 3
+            (8, 8, 1),    # table[8][9] == 1
+            (2, 3, 1),    # SUMME[4] == 11
+            (2, 6, 1),    # DIFF[7] == 1
+            (2, 9, 5),    # DIFF non-increasing
+        ]
+        blocks = [table]
+        for index, size_pos, delta in breaks:
+            broken = table.copy()
+            broken[index, size_pos] += delta
+            blocks.append(broken)
+        ok, sums, diffs = wdb.block_matches(np.stack(blocks), np.zeros(len(blocks), dtype=bool))
+        self.assertEqual(ok.tolist(), [True] + [False] * len(breaks))
+        self.assertEqual(sums[0, :6].tolist(), [5, 7, 9, 11, 13, 14])
+        self.assertEqual(diffs[0, :6].tolist(), [2, 2, 2, 2, 1, 1])
+        self.assertFalse(wdb.block_matches(table[None], np.array([True]))[0][0])
+        single, _, _ = wdb.block_matches(np.stack(blocks), np.zeros(len(blocks), dtype=bool), single_cells_only=True)
+        self.assertEqual(single.tolist(), [True, False, False, False, True, True, True])
+
+    def test_numpy_engine_matches_python_engine(self) -> None:
+        for point in wdb.outer_points()[::5]:
+            self.assertEqual(wdb.search_outer_numpy(*point), wdb.search_outer(*point))
+        self.assertEqual(wdb.brute_force(engine="numpy"), wdb.brute_force(engine="python"))
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class IntervalEngineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        small_space(self)
+
+    def test_interval_candidates_contain_every_single_cell_survivor(self) -> None:
+        f_values = list(wdb.f_iter(wdb.F_INDEX_RANGE, wdb.F_STEPS))
+        grid_shifts = np.repeat(np.array(wdb.INDEX_SHIFT_RANGE), len(f_values))
+        grid_f = np.tile(f_values, len(wdb.INDEX_SHIFT_RANGE))
+        rng = np.random.default_rng(3)
+        survivors = 0
+        for _ in range(300):
+            minuend, size_shift, f_size = int(rng.integers(3, 8)), int(rng.integers(-40, 20)), rng.integers(5, 40) / 10
+            full = wdb.single_cell_screen(minuend, size_shift, f_size, grid_shifts, grid_f)
+            shifts, f_indices = wdb.interval_candidates(minuend, f_size, size_shift, f_values)
+            self.assertLessEqual(len(shifts), len(grid_shifts))
+            kept = wdb.single_cell_screen(minuend, size_shift, f_size, shifts, f_indices)
+            self.assertEqual(
+                list(zip(shifts[kept].tolist(), f_indices[kept].tolist())),
+                list(zip(grid_shifts[full].tolist(), grid_f[full].tolist())),
+            )
+            survivors += int(full.sum())
+            if not wdb.precheck_indexshift_findex(minuend, size_shift, f_size):
+                self.assertFalse(full.any())  # the corner precheck never drops a survivor
+        self.assertGreater(survivors, 0)
+
+    def test_intervals_engine_matches_numpy_engine(self) -> None:
+        self.assertEqual(wdb.brute_force(engine="intervals"), wdb.brute_force(engine="numpy"))
+        found = wdb.brute_force(engine="intervals", single_cells_only=True)
+        self.assertGreater(len(found), 0)  # C1-C3 only, so that the small space has matches to compare
+        self.assertEqual(found, wdb.brute_force(engine="numpy", single_cells_only=True))
+        with self.assertRaises(ValueError):
+            wdb.brute_force(engine="python", single_cells_only=True)
+
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(wdb.main(["--check", "--workers", "1"]), 0)
+        self.assertIn(f"nur C1-C3, intervals: {len(found)} Treffer", out.getvalue())
+        self.assertIn("OK", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
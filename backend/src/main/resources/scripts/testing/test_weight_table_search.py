@@ -0,0 +1,105 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+import weight_dist_bruteforce as wdb
+from test_weight_dist import SMALL_SPACE
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+SINGLE_CELLS = ["cell(2, 0) == 4", "cell(2, 1) == 3", "cell(9, 8) == 1"]
+
+
+def small_spec(constraints, **extra):
+    """weight_specs/weight_dist.json restricted to SMALL_SPACE (same loop order as weight_dist_bruteforce.py)."""
+    from weight_table_search import DEFAULT_SPEC, load_spec
+
+    raw = dict(load_spec(DEFAULT_SPEC).raw)
+    raw["parameters"] = {
+        "minuend": {"range": [5, 7]},
+        "f_size": {"range": [1, 3], "steps": 2},
+        "size_shift": {"range": [-12, 9]},
+        "index_shift": {"range": [-3, 4]},
+        "f_index": {"range": [6, 8], "steps": 2},
+    }
+    raw["constraints"] = constraints
+    raw.update(extra)
+    return raw
+
+
+def point(match):
+    return tuple(match[key] for key in ("minuend", "f_size", "size_shift", "index_shift", "f_index"))
+
+
+@unittest.skipUnless(np is not None, "numpy not installed")
+class WeightTableSearchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.multiple(wdb, **SMALL_SPACE)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        quiet = contextlib.redirect_stderr(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def test_default_spec_reproduces_weight_dist_bruteforce(self) -> None:
+        from weight_table_search import DEFAULT_SPEC, load_spec, search
+
+        full = load_spec(small_spec(load_spec(DEFAULT_SPEC).raw["constraints"], layers=None))
+        self.assertEqual([p.source for p in full.predicates[:3]], SINGLE_CELLS)  # cheapest first
+        self.assertEqual(search(full).matches, [])
+        self.assertEqual(wdb.brute_force(engine="numpy"), [])
+
+        relaxed = load_spec(small_spec(SINGLE_CELLS, layers=None))
+        expected = wdb.brute_force(engine="numpy", single_cells_only=True)
+        result = search(relaxed, workers=1, chunk_size=7)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual([tuple(m["parameters"].values()) for m in result.matches], [point(m) for m in expected])
+        for found, reference in zip(result.matches, expected):
+            self.assertEqual([sum(column) for column in found["table"]], reference["sums"])
+        self.assertEqual(search(relaxed, workers=2, chunk_size=5).matches, result.matches)
+        self.assertEqual(sum(result.rejected.values()) + len(result.matches), result.candidates)
+
+    def test_layer_output_matches_weights_for_layer_format(self) -> None:
+        from topic_tags_assignment import cutoff_for_layer
+        from weight_table_search import distinct_tables, format_java, format_python, load_spec, search
+
+        spec = load_spec(small_spec(SINGLE_CELLS))
+        result = search(spec)
+        groups = distinct_tables(result.matches)
+        self.assertGreater(len(groups), 0)
+        self.assertEqual(sum(group["count"] for group in groups), len(result.matches))
+        for group in groups:
+            tables = group["tables"]
+            self.assertEqual(sorted(tables), list(range(1, 14)))
+            for layer, weights in tables.items():
+                self.assertEqual(len(weights), cutoff_for_layer(layer))
+                self.assertTrue(all(isinstance(w, int) and 1 <= w <= 5 for w in weights))
+            namespace = {"Dict": dict, "List": list}
+            exec(format_python(tables), namespace)  # pasteable into weights_for_layer
+            self.assertEqual(namespace["weights_by_layer"], tables)
+        java = format_java(groups[0]["tables"])  # all 13 layers in, only the clamped 3..8 out
+        self.assertTrue(java.startswith("Map<Integer, List<Integer>> map = Map.of(\n        3, List.of("))
+        self.assertEqual(len(java.splitlines()), 2 + 6)
+        self.assertIn(f"        8, List.of({', '.join(map(str, groups[0]['tables'][8]))})\n);", java)
+        with self.assertRaisesRegex(ValueError, "missing \\[8\\]"):
+            format_java({layer: groups[0]["tables"][layer] for layer in range(1, 8)})
+
+    def test_invalid_specs_are_rejected(self) -> None:
+        from weight_table_search import load_spec
+
+        with self.assertRaisesRegex(ValueError, "unknown names"):
+            load_spec(small_spec(["cel(2, 0) == 4"]))
+        with self.assertRaisesRegex(ValueError, "Invalid constraint expression 'total\\(3\\) >'"):
+            load_spec(small_spec(["total(3) >"]))
+        with self.assertRaisesRegex(ValueError, "Unknown outer"):
+            load_spec(small_spec(SINGLE_CELLS, outer=["minuend", "shift"]))
+        with self.assertRaisesRegex(ValueError, "Layer 14"):
+            load_spec(small_spec(SINGLE_CELLS, layers={"first": 1, "last": 14, "size": "layer + 2", "cutoff": "3"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,7 +9,13 @@ Workflow:
   where K = 3 + floor(layer/2) and weights depend on (index, layer).
 
 Supports dry-run (no API calls), resume (skip already written topicIDs),
-per-model rate limits, retries, prompt shrinking on token overrun, and debug logging.
+per-model rate limits (RPM + TPM token buckets), retries, prompt shrinking on token overrun, and debug logging.
+With --concurrency N, up to N topics are in flight at once and the models of a topic are
+queried in parallel; rows are still written in topic order.
+With --pack-size N, up to N topics share one request (JSON object topicID -> tagIDs);
+topics missing from a packed answer fall back to single-topic calls.
+With --batch, all pending prompts are sent through the OpenAI Batch API instead
+(see openai_helpers/batch_api.py); an interrupted batch run resumes from its state file.
 """
 
 from __future__ import annotations
@@ -21,12 +27,69 @@ import os
 import re
 import sys
 import textwrap
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+
+from embedding_helpers.shortlist import (
+    DEFAULT_MODEL_NAME as DEFAULT_EMBEDDING_MODEL,
+    DEFAULT_RECALL_KS,
+    TagShortlister,
+    item_text,
+    load_reference_rows,
+    print_recall_report,
+)
+from embedding_helpers.store import open_store
+from openai_helpers.batch_api import (
+    DEFAULT_API_BASE,
+    DEFAULT_POLL_SECONDS,
+    build_batch_line,
+    create_batch,
+    download_file,
+    iter_batch_results,
+    upload_batch_file,
+    wait_for_batch,
+)
+from openai_helpers.http_client import default_client, set_default_pool_size
+from openai_helpers.journal import JobJournal, read_tail_item_id
+from openai_helpers.rate_limit import (
+    DEFAULT_CHARS_PER_TOKEN,
+    RateLimiter,
+    normalize_retry_after_seconds,
+    parse_retry_after_seconds,
+)
+from openai_helpers.response_cache import CacheMissError, ResponseCache
+from openai_helpers.usage import MODEL_PRICES, CallTimer, UsageStats, open_metrics_sink, parse_price
+from tagging_helpers.incremental import (
+    DEFAULT_RETAG_RANK,
+    DEFAULT_SNAPSHOT_DIR,
+    CatalogSnapshot,
+    affected_items,
+    diff_catalog,
+    drop_item_rows,
+    load_snapshot,
+    print_plan,
+    read_assigned,
+    save_snapshot,
+    take_snapshot,
+    text_hash,
+)
+from tagging_helpers.output_writer import (
+    DEFAULT_BATCH_ITEMS,
+    DEFAULT_BATCH_ROWS,
+    DEFAULT_FSYNC_SECONDS,
+    RowWriter,
+    append_rows,
+    merge_shards,
+    prefix_shard,
+    read_shard_items,
+    shard_dir_for,
+    shard_files,
+)
 
 # Default OpenAI models (fast + cost-effective)
 # Keep defaults conservative for trial credits and rate limits:
@@ -48,6 +111,31 @@ WEIGHT_C = 3       # unused when tertiary disabled
 # Some newer models (e.g. gpt-5-*) may spend completion tokens on internal reasoning;
 # keep this high enough to still get a short JSON array in the visible output.
 DEFAULT_MAX_OUTPUT_TOKENS = 768
+DEFAULT_TOKENS_PER_MINUTE = 0  # TPM budget per model; 0 = only RPM limiting
+SYSTEM_PROMPT = "You are a precise tag selector. Return only JSON with tagIDs."
+SAMPLING_TEMPERATURE = 0.2
+REASONING_EFFORT = "low"
+# Part of the response-cache key: changing sampling must not reuse old answers.
+SAMPLING_PARAMS: Dict[str, object] = {"temperature": SAMPLING_TEMPERATURE, "reasoning_effort": REASONING_EFFORT}
+DEFAULT_CACHE_PATH = ".cache/tag_responses.sqlite"
+DEFAULT_CACHE_MAX_MB = 256
+DEFAULT_CONCURRENCY = 1  # topics in flight at once; 1 = sequential
+MAX_REORDER_FACTOR = 4   # finished-but-unwritten topics allowed per concurrency slot
+DEFAULT_BATCH_DIR = ".cache/batch"
+BATCH_STATE_FILE = "state.json"
+BATCH_INPUT_FILE = "requests.jsonl"
+BATCH_ID_SEPARATOR = "|"  # custom_id = topicID|slot|repeat
+BATCH_DESC_LIMIT = 2000   # same first-attempt description limit as tag_topic
+DEFAULT_SHORTLIST_K = 0   # 0 = send the full tag catalog
+DEFAULT_JOURNAL_DIR = ".cache/journal"  # journal file: <dir>/<output file name>.jsonl
+DEFAULT_PACK_SIZE = 1     # topics per request; 1 = one topic per request
+DEFAULT_PACK_TOKEN_BUDGET = 12000  # estimated prompt tokens per packed request
+PACK_DESC_LIMIT = 2000
+PACK_OUTPUT_TOKENS_PER_TOPIC = 64
+DEFAULT_ADAPTIVE_OVERLAP = 1.0  # adaptive sampling: required leave-one-out top-k overlap
+OUTPUT_HEADER = ["topicID", "tagID", "weight"]
+SHARD_MODES = ("none", "prefix", "layer")
+DEFAULT_SHARD_PREFIX_LEN = 3  # topicIDs start with a subject code, e.g. ART0, BOL1
 
 # Per-model parameter compatibility cache.
 # Some models reject specific parameters (e.g. gpt-5-nano may reject max_tokens).
@@ -141,43 +229,6 @@ class QuotaError(RuntimeError):
     pass
 
 
-class RateLimiter:
-    """Simple per-minute rate limiter."""
-
-    def __init__(self, max_requests_per_minute: int) -> None:
-        self.max_requests = max_requests_per_minute
-        self.window_start = time.time()
-        self.count = 0
-
-    def wait_for_slot(self) -> None:
-        if self.max_requests <= 0:
-            return
-        now = time.time()
-        elapsed = now - self.window_start
-        if elapsed >= 60:
-            self.window_start = now
-            self.count = 0
-        if self.count >= self.max_requests:
-            sleep_for = 60 - elapsed
-            if sleep_for > 0:
-                time.sleep(sleep_for)
-            self.window_start = time.time()
-            self.count = 0
-        self.count += 1
-
-    def wait_next_window(self, retry_after: Optional[float] = None) -> None:
-        """Wait until the next minute window or a provided retry_after hint."""
-        if retry_after and retry_after > 0:
-            time.sleep(retry_after)
-        else:
-            now = time.time()
-            elapsed = now - self.window_start
-            sleep_for = max(0.0, 60 - elapsed)
-            time.sleep(sleep_for)
-        self.window_start = time.time()
-        self.count = 0
-
-
 def load_env_file(env_path: Path) -> Dict[str, str]:
     if not env_path.exists():
         return {}
@@ -299,9 +350,9 @@ def load_topics(csv_path: Path) -> List[Topic]:
 
 
 def load_existing(output_path: Path) -> Set[str]:
+    seen: Set[str] = set(read_shard_items(shard_dir_for(output_path)))
     if not output_path.exists():
-        return set()
-    seen: Set[str] = set()
+        return seen
     with output_path.open(encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -312,38 +363,33 @@ def load_existing(output_path: Path) -> Set[str]:
 
 
 def find_last_topic_id(output_path: Path) -> Optional[str]:
-    if not output_path.exists():
-        return None
-    last_id: Optional[str] = None
-    with output_path.open(encoding="utf-8") as f:
-        for line in reversed(f.read().splitlines()):
-            line = line.strip()
-            if not line or line.startswith("topicID"):
-                continue
-            parts = line.split(",")
-            if parts:
-                last_id = parts[0].strip()
-                if last_id:
-                    break
-    return last_id
+    # Reads only the tail of the file, not the whole CSV.
+    return read_tail_item_id(output_path)
 
 
 def ensure_header(output_path: Path) -> None:
     if output_path.exists():
         return
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text("topicID,tagID,weight\n", encoding="utf-8")
+    output_path.write_text(",".join(OUTPUT_HEADER) + "\n", encoding="utf-8")
 
 
-def build_prompt(
-    topic: Topic,
-    tags: Dict[int, Tag],
-    *,
-    min_tags: int,
-    max_tags: int,
-    desc_limit: int,
-    include_synonyms: bool,
-) -> str:
+def shard_function(topics: Sequence[Topic], shard_by: str, prefix_len: int) -> Optional[Callable[[str], str]]:
+    """topicID -> shard key for --shard-by (None = no sharding); unknown topicIDs go to shard '_'."""
+    if shard_by == "prefix":
+        return lambda topic_id: prefix_shard(topic_id, prefix_len)
+    if shard_by == "layer":
+        layers = {t.topic_id: t.layer for t in topics}
+        return lambda topic_id: f"layer{layers[topic_id]}" if topic_id in layers else "_"
+    return None
+
+
+def build_prompt_prefix(tags: Dict[int, Tag], *, include_synonyms: bool) -> str:
+    """
+    Static head of every topic prompt: instructions + full tag catalog.
+    Build it once per run and keep it byte-identical across calls, so OpenAI's
+    prompt caching can reuse it; everything topic-specific goes into the suffix.
+    """
     tag_lines = []
     for tag in tags.values():
         if include_synonyms and tag.synonyms:
@@ -353,31 +399,70 @@ def build_prompt(
         tag_lines.append(f"- {tag.tag_id}: {tag.name}{syn}")
     tag_catalog = "\n".join(tag_lines)
 
-    desc = (topic.description or "").strip()
-    if desc_limit and len(desc) > desc_limit:
-        desc = desc[:desc_limit] + "..."
-
-    return textwrap.dedent(
-        f"""
+    instructions = textwrap.dedent(
+        """
         You are mapping a topic to tags.
-        - Choose between {min_tags} and {max_tags} tagIDs from the provided catalog.
+        - Choose tagIDs from the tag catalog below; how many to choose is stated with each topic.
         - Order tags by relevance (most relevant first).
         - Only return tagIDs from the catalog; never invent new IDs.
         - Prefer niche/specific tags when applicable; avoid overly generic matches unless clearly relevant.
-        - Respond with a plain JSON array of integers, e.g. [12,4,7,1].
+        - Respond with JSON only, in the format requested at the end.
+        """
+    ).strip()
+    return f"{instructions}\n\nTag catalog:\n{tag_catalog}\n\n"
+
+
+def build_prompt_prefixes(tags: Dict[int, Tag]) -> Dict[bool, str]:
+    """Prefixes keyed by include_synonyms (retries after MAX_TOKENS drop the synonyms)."""
+    return {flag: build_prompt_prefix(tags, include_synonyms=flag) for flag in (True, False)}
 
-        Tag catalog:
-        {tag_catalog}
 
+def _topic_block(topic: Topic, *, min_tags: int, max_tags: int, desc_limit: int) -> str:
+    desc = (topic.description or "").strip()
+    if desc_limit and len(desc) > desc_limit:
+        desc = desc[:desc_limit] + "..."
+
+    return textwrap.dedent(
+        f"""
         Topic:
         ID: {topic.topic_id}
         Layer: {topic.layer}
         Name: {topic.name or "[no name]"}
         Description (truncated): {desc or "[no description]"}
+        Choose between {min_tags} and {max_tags} tagIDs.
         """
     ).strip()
 
 
+def build_prompt(
+    topic: Topic,
+    prefix: str,
+    *,
+    min_tags: int,
+    max_tags: int,
+    desc_limit: int,
+) -> str:
+    block = _topic_block(topic, min_tags=min_tags, max_tags=max_tags, desc_limit=desc_limit)
+    return f"{prefix}{block}\n\nRespond with a plain JSON array of integers, e.g. [12,4,7,1]."
+
+
+def build_packed_prompt(topics: Sequence[Topic], prefix: str, *, desc_limit: int) -> str:
+    """One prompt for several topics; the model answers with a JSON object topicID -> tagIDs."""
+    blocks = []
+    for topic in topics:
+        layer = max(0, topic.layer)
+        min_tags = min_tags_for_layer(layer)
+        max_tags = max(min_tags, max_tags_for_layer(layer))
+        blocks.append(_topic_block(topic, min_tags=min_tags, max_tags=max_tags, desc_limit=desc_limit))
+    example = ", ".join(f'"{t.topic_id}": [12,4,7,1]' for t in topics[:2])
+    return (
+        f"{prefix}Map each of these {len(topics)} topics separately.\n\n"
+        + "\n\n".join(blocks)
+        + "\n\nRespond with one JSON object mapping every topicID to its JSON array of tagIDs, "
+        + f"e.g. {{{example}}}."
+    )
+
+
 def parse_tag_ids(raw_text: str) -> List[int]:
     array_match = re.search(r"\[[^\]]*\]", raw_text)
     if not array_match:
@@ -397,35 +482,41 @@ def parse_tag_ids(raw_text: str) -> List[int]:
     return tag_ids
 
 
-def _parse_retry_after_seconds(headers: object) -> Optional[float]:
-    # urllib returns email.message.Message for headers; access via get().
-    try:
-        raw = headers.get("Retry-After")  # type: ignore[attr-defined]
-    except Exception:
-        raw = None
-    if not raw:
-        return None
-    try:
-        return _normalize_retry_after_seconds(str(raw).strip())
-    except ValueError:
-        return None
-
-
-def _normalize_retry_after_seconds(value: object) -> Optional[float]:
+def parse_topic_map(raw_text: str, topic_ids: Sequence[str]) -> Dict[str, List[int]]:
     """
-    OpenAI's error payloads sometimes return retry_after in milliseconds (seen in practice),
-    while HTTP Retry-After headers are seconds. Normalize to seconds.
+    Parse a packed response into topicID -> tagIDs, keeping only the requested topics.
+    Falls back to per-topic `"ID": [...]` matches when the object as a whole is not valid JSON
+    (e.g. truncated output); topics that cannot be read are simply absent from the result.
     """
-    try:
-        seconds = float(value)  # type: ignore[arg-type]
-    except (TypeError, ValueError):
-        return None
-    if seconds <= 0:
-        return None
-    # Heuristic: values that look like milliseconds (e.g. 55728) -> 55.728s.
-    if seconds > 300 and seconds < 300_000:
-        return seconds / 1000.0
-    return seconds
+    wanted = set(topic_ids)
+    result: Dict[str, List[int]] = {}
+    start, end = raw_text.find("{"), raw_text.rfind("}")
+    data: object = None
+    if start != -1 and end > start:
+        try:
+            data = json.loads(raw_text[start : end + 1])
+        except json.JSONDecodeError:
+            data = None
+    if isinstance(data, dict):
+        items = [(str(key).strip(), value) for key, value in data.items()]
+    else:
+        items = []
+        for match in re.finditer(r'"([^"]+)"\s*:\s*(\[[^\]]*\])', raw_text):
+            try:
+                items.append((match.group(1).strip(), json.loads(match.group(2))))
+            except json.JSONDecodeError:
+                continue
+    for topic_id, value in items:
+        if topic_id not in wanted or not isinstance(value, list):
+            continue
+        tag_ids: List[int] = []
+        for item in value:
+            try:
+                tag_ids.append(int(item))
+            except (TypeError, ValueError):
+                continue
+        result[topic_id] = tag_ids
+    return result
 
 
 def _normalize_param_name(raw: str) -> str:
@@ -478,14 +569,42 @@ def _is_param_unsupported(model: str, param: str) -> bool:
     return param in _MODEL_UNSUPPORTED_PARAMS.get(model, set())
 
 
-def call_openai(
-    api_key: str, model: str, prompt: str, *, max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS, debug: bool = False
-) -> List[int]:
+def build_request_body(
+    model: str,
+    prompt: str,
+    *,
+    tokens_param: Optional[str],
+    max_output_tokens: int,
+) -> Dict[str, object]:
+    """Chat-completions body for one tagging call (shared by live calls and batch files)."""
+    body: Dict[str, object] = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+    }
+    if not _is_param_unsupported(model, "temperature"):
+        body["temperature"] = SAMPLING_TEMPERATURE
+    if not _is_param_unsupported(model, "reasoning"):
+        # Reduce internal reasoning to preserve visible output tokens on reasoning-heavy models.
+        body["reasoning"] = {"effort": REASONING_EFFORT}
+    if tokens_param and not _is_param_unsupported(model, tokens_param):
+        body[tokens_param] = max_output_tokens
+    return body
+
+
+def call_openai_text(
+    api_key: str,
+    model: str,
+    prompt: str,
+    *,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    debug: bool = False,
+    on_usage: Optional[Callable[[Dict[str, object]], None]] = None,
+) -> str:
+    """Return the first non-empty message text; `on_usage` receives the response `usage` block if present."""
     url = "https://api.openai.com/v1/chat/completions"
-    base_messages = [
-        {"role": "system", "content": "You are a precise tag selector. Return only JSON arrays of tagIDs."},
-        {"role": "user", "content": prompt},
-    ]
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
 
     last_error_detail: Optional[str] = None
@@ -495,15 +614,7 @@ def call_openai(
         compat_attempts = 0
         while compat_attempts < 3:
             compat_attempts += 1
-            body: Dict[str, object] = {"model": model, "messages": base_messages}
-
-            if not _is_param_unsupported(model, "temperature"):
-                body["temperature"] = 0.2
-            if not _is_param_unsupported(model, "reasoning"):
-                # Reduce internal reasoning to preserve visible output tokens on reasoning-heavy models.
-                body["reasoning"] = {"effort": "low"}
-            if tokens_param and not _is_param_unsupported(model, tokens_param):
-                body[tokens_param] = max_output_tokens
+            body = build_request_body(model, prompt, tokens_param=tokens_param, max_output_tokens=max_output_tokens)
 
             if debug:
                 print(
@@ -512,21 +623,27 @@ def call_openai(
                 )
 
             data = json.dumps(body).encode("utf-8")
-            req = Request(url, data=data, headers=headers)
 
             try:
-                with urlopen(req, timeout=30) as resp:
-                    payload = resp.read().decode("utf-8")
+                resp = default_client().request("POST", url, body=data, headers=headers, timeout=30)
+                payload = resp.read().decode("utf-8")
+                if debug:
+                    timing = resp.timing
+                    print(
+                        f"[debug] http connect={timing.connect_s * 1000:.0f}ms ttfb={timing.ttfb_s * 1000:.0f}ms "
+                        f"total={timing.total_s * 1000:.0f}ms reused={timing.reused}",
+                        file=sys.stderr,
+                    )
             except HTTPError as exc:
                 detail = exc.read().decode("utf-8", errors="ignore")
                 last_error_detail = detail
 
                 if exc.code == 429:
-                    retry_after = _parse_retry_after_seconds(exc.headers)
+                    retry_after = parse_retry_after_seconds(exc.headers)
                     try:
                         parsed_detail = json.loads(detail)
                         err = parsed_detail.get("error", {}) if isinstance(parsed_detail, dict) else {}
-                        retry_after = _normalize_retry_after_seconds(err.get("retry_after")) or retry_after
+                        retry_after = normalize_retry_after_seconds(err.get("retry_after")) or retry_after
                         err_type = err.get("type")
                         err_code = err.get("code")
                         err_msg = err.get("message")
@@ -587,13 +704,15 @@ def call_openai(
 
             parsed = json.loads(payload)
             _MODEL_TOKENS_PARAM[model] = tokens_param
+            if on_usage and isinstance(parsed.get("usage"), dict):
+                on_usage(parsed["usage"])
             if debug:
                 print(f"[debug] model={model} payload={payload}", file=sys.stderr)
             choices = parsed.get("choices") or []
             for choice in choices:
                 msg = choice.get("message", {}).get("content")
                 if isinstance(msg, str) and msg.strip():
-                    return parse_tag_ids(msg)
+                    return msg
             finish_reason = choices[0].get("finish_reason") if choices else None
             usage = parsed.get("usage")
             message = f"No valid text candidates in OpenAI response (finish_reason={finish_reason}, usage={usage})"
@@ -604,6 +723,22 @@ def call_openai(
     raise RuntimeError(f"OpenAI request failed; last_error={last_error_detail}")
 
 
+def call_openai(
+    api_key: str,
+    model: str,
+    prompt: str,
+    *,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    debug: bool = False,
+    on_usage: Optional[Callable[[Dict[str, object]], None]] = None,
+) -> List[int]:
+    """Return the tagIDs chosen by `model` for a single-topic prompt."""
+    text = call_openai_text(
+        api_key, model, prompt, max_output_tokens=max_output_tokens, debug=debug, on_usage=on_usage
+    )
+    return parse_tag_ids(text)
+
+
 def heuristic_tags(topic: Topic, tags: Dict[int, Tag], max_tags: int) -> List[int]:
     text = f"{topic.name} {topic.description}".lower()
     matches: List[int] = []
@@ -640,23 +775,70 @@ def fetch_model_lists(
     max_rate_limit_retries: int,
     max_tags: int,
     debug: bool,
+    cache: Optional[ResponseCache] = None,
+    usage_stats: Optional[UsageStats] = None,
+    journal: Optional[JobJournal] = None,
+    journal_item: Optional[str] = None,
+    first_repeat: int = 0,
 ) -> List[List[int]]:
+    """Issue repeats first_repeat .. first_repeat+repeats-1 (the index keys cache and journal entries)."""
     results: List[List[int]] = []
     if not model or repeats <= 0:
         return results
-    for repeat_index in range(repeats):
+    for repeat_index in range(first_repeat, first_repeat + repeats):
+        if journal:
+            journaled = journal.lookup(journal_item, model, prompt, repeat_index)
+            if journaled is not None:
+                results.append(sanitize_ids(journaled, valid_ids, max_tags=max_tags))
+                continue
+        if cache:
+            cached = cache.get(model, prompt, SAMPLING_PARAMS, repeat_index)
+            if cached is not None:
+                cleaned = sanitize_ids(cached, valid_ids, max_tags=max_tags)
+                if debug:
+                    print(
+                        f"[debug] model={model} repeat={repeat_index + 1}/{repeats} cache_hit cleaned={cleaned}",
+                        file=sys.stderr,
+                    )
+                results.append(cleaned)
+                continue
         call_tokens = max_output_tokens
         call_attempts = 0
         rate_limit_hits = 0
         while True:
-            if limiter:
-                limiter.wait_for_slot()
+            wait_started = time.perf_counter()
+            reservation = (
+                limiter.wait_for_slot(limiter.estimate_tokens(prompt, call_tokens), prompt_chars=len(prompt))
+                if limiter
+                else None
+            )
+            if usage_stats:
+                usage_stats.record_wait(model, time.perf_counter() - wait_started)
+            call = CallTimer(usage_stats, model)
+
+            def on_usage(usage: Dict[str, object]) -> None:
+                if reservation:
+                    limiter.record_usage(reservation, usage)
+                call.add_usage(usage)
+
             try:
                 call_attempts += 1
-                raw = call_openai(api_key, model, prompt, max_output_tokens=call_tokens, debug=debug)
+                with call:
+                    raw = call_openai(
+                        api_key,
+                        model,
+                        prompt,
+                        max_output_tokens=call_tokens,
+                        debug=debug,
+                        on_usage=on_usage,
+                    )
                 cleaned = sanitize_ids(raw, valid_ids, max_tags=max_tags)
                 if debug:
                     print(f"[debug] model={model} raw_ids={raw} cleaned={cleaned}", file=sys.stderr)
+                if journal:
+                    journal.record_call(journal_item, model, prompt, repeat_index, raw)
+                if cache:
+                    cache.put(model, prompt, SAMPLING_PARAMS, repeat_index, raw)
                 results.append(cleaned)
                 break
             except RateLimitError as exc:
@@ -666,9 +848,11 @@ def fetch_model_lists(
                 wait_seconds = exc.retry_after if exc.retry_after and exc.retry_after > 0 else retry_delay
                 print(f"[rate-limit] model={model} waiting {wait_seconds:.1f}s", file=sys.stderr)
                 if limiter:
-                    limiter.wait_next_window(retry_after=wait_seconds)
+                    limiter.backoff(retry_after=wait_seconds)
                 else:
                     time.sleep(wait_seconds)
+                    if usage_stats:
+                        usage_stats.record_wait(model, wait_seconds)
                 continue
             except MaxTokensError as exc:
                 # Some models (notably reasoning-heavy ones) may return empty output with finish_reason=length.
@@ -679,6 +863,8 @@ def fetch_model_lists(
                             f"[debug] model={model} repeat={repeat_index + 1}/{repeats} max_tokens_exceeded; skipping repeat ({exc})",
                             file=sys.stderr,
                         )
+                    if journal:
+                        journal.record_call(journal_item, model, prompt, repeat_index, [])
                     results.append([])
                     break
                 call_tokens = min(4096, int(call_tokens * 1.6))
@@ -689,10 +875,207 @@ def fetch_model_lists(
                     )
                 time.sleep(min(2.0, retry_delay))
                 continue
+            finally:
+                if reservation:
+                    limiter.release(reservation)  # no-op once usage was recorded
+    return results
+
+
+def fetch_packed_maps(
+    model: Optional[str],
+    repeats: int,
+    prompt: str,
+    topic_ids: Sequence[str],
+    api_key: str,
+    limiter: Optional[RateLimiter],
+    retry_delay: float,
+    max_output_tokens: int,
+    max_rate_limit_retries: int,
+    debug: bool,
+    cache: Optional[ResponseCache] = None,
+    usage_stats: Optional[UsageStats] = None,
+    journal: Optional[JobJournal] = None,
+) -> List[Dict[str, List[int]]]:
+    """
+    Query one packed prompt `repeats` times; returns topicID -> raw tagIDs per repeat.
+    A failed or unreadable response yields an empty map, so its topics fall back to single calls.
+    """
+    results: List[Dict[str, List[int]]] = []
+    if not model or repeats <= 0:
+        return results
+    for repeat_index in range(repeats):
+        if journal:
+            # Each topic's slice is journaled under its own ID, so committing the topic retires it.
+            slices = [journal.lookup(topic_id, model, prompt, repeat_index) for topic_id in topic_ids]
+            if all(isinstance(ids, list) for ids in slices):
+                results.append({topic_id: list(ids) for topic_id, ids in zip(topic_ids, slices)})
+                continue
+        if cache:
+            cached = cache.get(model, prompt, SAMPLING_PARAMS, repeat_index)
+            if isinstance(cached, dict):
+                results.append({str(k): list(v) for k, v in cached.items()})
+                continue
+        call_tokens = max_output_tokens
+        call_attempts = 0
+        rate_limit_hits = 0
+        while True:
+            wait_started = time.perf_counter()
+            reservation = (
+                limiter.wait_for_slot(limiter.estimate_tokens(prompt, call_tokens), prompt_chars=len(prompt))
+                if limiter
+                else None
+            )
+            if usage_stats:
+                usage_stats.record_wait(model, time.perf_counter() - wait_started)
+            call = CallTimer(usage_stats, model)
+
+            def on_usage(usage: Dict[str, object]) -> None:
+                if reservation:
+                    limiter.record_usage(reservation, usage)
+                call.add_usage(usage)
+
+            try:
+                call_attempts += 1
+                with call:
+                    text = call_openai_text(
+                        api_key, model, prompt, max_output_tokens=call_tokens, debug=debug, on_usage=on_usage
+                    )
+                parsed = parse_topic_map(text, topic_ids)
+                if debug:
+                    print(f"[debug] model={model} packed topics={len(parsed)}/{len(topic_ids)}", file=sys.stderr)
+                if journal:
+                    journal.record_calls(
+                        {topic_id: parsed.get(topic_id, []) for topic_id in topic_ids}, model, prompt, repeat_index
+                    )
+                if cache and parsed:
+                    cache.put(model, prompt, SAMPLING_PARAMS, repeat_index, parsed)
+                results.append(parsed)
+                break
+            except RateLimitError as exc:
+                rate_limit_hits += 1
+                if rate_limit_hits > max(1, max_rate_limit_retries):
+                    raise
+                wait_seconds = exc.retry_after if exc.retry_after and exc.retry_after > 0 else retry_delay
+                print(f"[rate-limit] model={model} waiting {wait_seconds:.1f}s", file=sys.stderr)
+                if limiter:
+                    limiter.backoff(retry_after=wait_seconds)
+                else:
+                    time.sleep(wait_seconds)
+                    if usage_stats:
+                        usage_stats.record_wait(model, wait_seconds)
+                continue
+            except MaxTokensError as exc:
+                if call_attempts >= 2:
+                    print(f"[pack] model={model} output still truncated; falling back ({exc})", file=sys.stderr)
+                    results.append({})
+                    break
+                call_tokens = min(8192, int(call_tokens * 1.6))
+                continue
+            except (QuotaError, CacheMissError):
+                raise
+            except Exception as exc:  # noqa: BLE001
+                print(f"[pack] model={model} packed request failed ({exc}); falling back", file=sys.stderr)
+                results.append({})
+                break
+            finally:
+                if reservation:
+                    limiter.release(reservation)  # no-op once usage was recorded
+    return results
+
+
+def plan_packs(
+    topics: Sequence[Topic],
+    *,
+    pack_size: int,
+    token_budget: int,
+    prefix_chars: int,
+) -> List[List[Topic]]:
+    """Group topics in order into packs of at most pack_size topics and ~token_budget prompt tokens."""
+    budget_chars = token_budget * DEFAULT_CHARS_PER_TOKEN
+    packs: List[List[Topic]] = []
+    current: List[Topic] = []
+    current_chars = prefix_chars
+    for topic in topics:
+        layer = max(0, topic.layer)
+        block_chars = len(
+            _topic_block(
+                topic,
+                min_tags=min_tags_for_layer(layer),
+                max_tags=max_tags_for_layer(layer),
+                desc_limit=PACK_DESC_LIMIT,
+            )
+        ) + 64  # separators + per-topic share of the answer format line
+        if current and (len(current) >= pack_size or current_chars + block_chars > budget_chars):
+            packs.append(current)
+            current, current_chars = [], prefix_chars
+        current.append(topic)
+        current_chars += block_chars
+    if current:
+        packs.append(current)
+    return packs
+
+
+def tag_pack(
+    pack: Sequence[Topic],
+    prefix: str,
+    valid_ids: Set[int],
+    api_key: str,
+    model_slots: Sequence[Tuple[Optional[str], int, int, Optional[RateLimiter]]],
+    *,
+    retry_delay: float,
+    max_rate_limit_retries: int,
+    debug: bool,
+    cache: Optional[ResponseCache] = None,
+    usage_stats: Optional[UsageStats] = None,
+    journal: Optional[JobJournal] = None,
+) -> Dict[str, Tuple[List[int], List[int]]]:
+    """
+    Tag a pack of topics with one request per model/repeat.
+    model_slots: (model, repeats, rank weight, limiter). Returns (selected, weights) only for
+    topics whose part was valid in every response; the caller falls back for the rest.
+    """
+    topic_ids = [t.topic_id for t in pack]
+    prompt = build_packed_prompt(pack, prefix, desc_limit=PACK_DESC_LIMIT)
+    max_output_tokens = DEFAULT_MAX_OUTPUT_TOKENS + PACK_OUTPUT_TOKENS_PER_TOPIC * len(pack)
+    responses: List[Tuple[int, Dict[str, List[int]]]] = []
+    for model, repeats, weight, limiter in model_slots:
+        for parsed in fetch_packed_maps(
+            model,
+            repeats=repeats,
+            prompt=prompt,
+            topic_ids=topic_ids,
+            api_key=api_key,
+            limiter=limiter,
+            retry_delay=retry_delay,
+            max_output_tokens=max_output_tokens,
+            max_rate_limit_retries=max_rate_limit_retries,
+            debug=debug,
+            cache=cache,
+            usage_stats=usage_stats,
+            journal=journal,
+        ):
+            responses.append((weight, parsed))
+
+    results: Dict[str, Tuple[List[int], List[int]]] = {}
+    for topic in pack:
+        layer = max(0, topic.layer)
+        max_tags = max(min_tags_for_layer(layer), max_tags_for_layer(layer))
+        weighted_lists: List[Tuple[int, Sequence[int]]] = []
+        for weight, parsed in responses:
+            cleaned = sanitize_ids(parsed.get(topic.topic_id, []), valid_ids, max_tags=max_tags)
+            if not cleaned:
+                break
+            weighted_lists.append((weight, cleaned))
+        else:
+            if weighted_lists:
+                output_weights = weights_for_layer(layer)
+                merged = merge_ranked(weighted_lists)
+                results[topic.topic_id] = (merged[: len(output_weights)] if output_weights else [], output_weights)
     return results
 
 
 def merge_ranked(weighted_lists: List[Tuple[int, Sequence[int]]]) -> List[int]:
+    """Candidates by weighted position sum (absent = list length), best first; ties by tagID."""
     pos_maps = []
     lengths = []
     weights = []
@@ -703,7 +1086,7 @@ def merge_ranked(weighted_lists: List[Tuple[int, Sequence[int]]]) -> List[int]:
         lengths.append(len(seq))
         weights.append(weight)
         all_ids.update(seq)
-    combined_ids = list(all_ids)
+    combined_ids = sorted(all_ids)  # the sort below is stable: equal scores stay in tagID order
 
     def score(tid: int) -> int:
         total = 0
@@ -715,11 +1098,482 @@ def merge_ranked(weighted_lists: List[Tuple[int, Sequence[int]]]) -> List[int]:
     return combined_ids
 
 
-def write_rows(output_path: Path, topic_id: str, tag_ids: Sequence[int], weights: Sequence[int]) -> None:
-    with output_path.open("a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, lineterminator="\n")
-        for tag_id, weight in zip(tag_ids[: len(weights)], weights):
-            writer.writerow([topic_id, tag_id, weight])
+def weighted_samples(
+    results_a: Sequence[Sequence[int]],
+    results_b: Sequence[Sequence[int]],
+    results_c: Sequence[Sequence[int]],
+) -> List[Tuple[int, Sequence[int]]]:
+    """merge_ranked input: every non-empty sample with its model's rank weight."""
+    weighted_lists: List[Tuple[int, Sequence[int]]] = []
+    for weight, results in ((WEIGHT_A, results_a), (WEIGHT_B, results_b), (WEIGHT_C, results_c)):
+        weighted_lists.extend((weight, lst) for lst in results if lst)
+    return weighted_lists
+
+
+def topk_overlap(a: Sequence[int], b: Sequence[int], k: int) -> float:
+    """Share of the first k IDs of `a` that are also among the first k of `b`."""
+    if k <= 0:
+        return 1.0
+    return len(set(a[:k]) & set(b[:k])) / k
+
+
+def is_merge_stable(weighted_lists: List[Tuple[int, Sequence[int]]], k: int, min_overlap: float) -> bool:
+    """
+    Leave-one-out stability of the merged top-k: dropping any single sample must keep
+    at least `min_overlap` of the top-k. Needs two samples; more samples dilute each one's influence.
+    """
+    if k <= 0:
+        return True
+    if len(weighted_lists) < 2:
+        return False
+    merged = merge_ranked(weighted_lists)
+    for skip in range(len(weighted_lists)):
+        rest = weighted_lists[:skip] + weighted_lists[skip + 1 :]
+        if topk_overlap(merged, merge_ranked(rest), k) < min_overlap:
+            return False
+    return True
+
+
+class AdaptiveSampling:
+    """
+    Settings and counters for adaptive sampling: the repeats per model are per-topic caps,
+    and sampling stops after the first round whose merged top-k is stable (is_merge_stable).
+    """
+
+    def __init__(self, min_overlap: float = DEFAULT_ADAPTIVE_OVERLAP) -> None:
+        self.min_overlap = min_overlap
+        self.topics = 0
+        self.stable_early = 0
+        self.calls = 0
+        self.max_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, calls: int, max_calls: int) -> None:
+        with self._lock:
+            self.topics += 1
+            self.calls += calls
+            self.max_calls += max_calls
+            if calls < max_calls:
+                self.stable_early += 1
+
+    def summary(self) -> str:
+        saved = self.max_calls - self.calls
+        share = 100.0 * saved / self.max_calls if self.max_calls else 0.0
+        return (
+            f"topics={self.topics} stable_early={self.stable_early} calls={self.calls} "
+            f"cap={self.max_calls} saved={saved} ({share:.0f}%) min_overlap={self.min_overlap:g}"
+        )
+
+
+def commit_rows(writer: RowWriter, topic_id: str, tag_ids: Sequence[int], weights: Sequence[int]) -> None:
+    """Hand a topic's rows to the writer stage (which journals and appends them, in submit order)."""
+    writer.submit(topic_id, [[topic_id, tag_id, weight] for tag_id, weight in zip(tag_ids[: len(weights)], weights)])
+
+
+def tag_topic(
+    topic: Topic,
+    tags: Dict[int, Tag],
+    valid_ids: Set[int],
+    api_key: str,
+    model_a: str,
+    model_b: Optional[str],
+    model_c: Optional[str],
+    *,
+    dry_run: bool,
+    max_attempts: int,
+    retry_delay: float,
+    rate_limiter_a: Optional[RateLimiter],
+    rate_limiter_b: Optional[RateLimiter],
+    rate_limiter_c: Optional[RateLimiter],
+    max_rate_limit_retries: int,
+    repeats_a: int,
+    repeats_b: int,
+    repeats_c: int,
+    include_synonyms: bool,
+    debug: bool,
+    cache: Optional[ResponseCache] = None,
+    model_pool: Optional[ThreadPoolExecutor] = None,
+    prompt_prefixes: Optional[Dict[bool, str]] = None,
+    usage_stats: Optional[UsageStats] = None,
+    candidate_ids: Optional[Sequence[int]] = None,
+    journal: Optional[JobJournal] = None,
+    adaptive: Optional[AdaptiveSampling] = None,
+) -> Tuple[List[int], List[int]]:
+    """
+    Run the retry loop for a single topic and return (selected tagIDs, output weights).
+    If model_pool is given, the models A/B/C are queried in parallel on it.
+    prompt_prefixes (see build_prompt_prefixes) should be built once per run and shared.
+    candidate_ids (embedding shortlist) restricts the prompt catalog to these tags.
+    With `adaptive`, repeats_a/b/c are caps: the models are sampled in rounds of one call
+    each until the merged top-k is stable.
+    """
+    if candidate_ids is not None:
+        prompt_prefixes = build_prompt_prefixes({tid: tags[tid] for tid in candidate_ids if tid in tags})
+    elif prompt_prefixes is None:
+        prompt_prefixes = build_prompt_prefixes(tags)
+    attempt = 0
+    rate_limit_hits = 0
+    desc_limit = 2000
+    include_synonyms_local = include_synonyms
+    max_output_tokens = DEFAULT_MAX_OUTPUT_TOKENS
+    while True:
+        attempt += 1
+        print(f"[topic {topic.topic_id}] requesting tags... (attempt {attempt})", file=sys.stderr)
+        try:
+            layer = max(0, topic.layer)
+            min_tags = min_tags_for_layer(layer)
+            max_tags = max_tags_for_layer(layer)
+            if max_tags < min_tags:
+                max_tags = min_tags
+            output_weights = weights_for_layer(layer)
+            output_count = len(output_weights)
+
+            if dry_run:
+                results_a = [heuristic_tags(topic, tags, max_tags=max_tags)]
+                results_b: List[List[int]] = []
+                results_c: List[List[int]] = []
+            else:
+                prompt = build_prompt(
+                    topic,
+                    prompt_prefixes[include_synonyms_local],
+                    min_tags=min_tags,
+                    max_tags=max_tags,
+                    desc_limit=desc_limit,
+                )
+                model_jobs = [
+                    (model_a, repeats_a, rate_limiter_a),
+                    (model_b, repeats_b, rate_limiter_b),
+                    (model_c, repeats_c, rate_limiter_c),
+                ]
+
+                def run_model(
+                    model: Optional[str], repeats: int, limiter: Optional[RateLimiter], first_repeat: int = 0
+                ) -> List[List[int]]:
+                    return fetch_model_lists(
+                        model,
+                        repeats=repeats,
+                        prompt=prompt,
+                        api_key=api_key,
+                        valid_ids=valid_ids,
+                        limiter=limiter,
+                        retry_delay=retry_delay,
+                        max_output_tokens=max_output_tokens,
+                        max_rate_limit_retries=max_rate_limit_retries,
+                        max_tags=max_tags,
+                        debug=debug,
+                        cache=cache,
+                        usage_stats=usage_stats,
+                        journal=journal,
+                        journal_item=topic.topic_id,
+                        first_repeat=first_repeat,
+                    )
+
+                def run_models(
+                    jobs: Sequence[Tuple[Optional[str], int, Optional[RateLimiter], int]],
+                ) -> List[List[List[int]]]:
+                    if model_pool is None:
+                        return [run_model(*job) for job in jobs]
+                    futures = [model_pool.submit(run_model, *job) for job in jobs]
+                    # Collect every future before re-raising so no call is left running unobserved.
+                    outcomes: List[List[List[int]]] = []
+                    first_error: Optional[BaseException] = None
+                    for future in futures:
+                        try:
+                            outcomes.append(future.result())
+                        except BaseException as exc:  # noqa: BLE001
+                            outcomes.append([])
+                            first_error = first_error or exc
+                    if first_error is not None:
+                        raise first_error
+                    return outcomes
+
+                if adaptive is None:
+                    results_a, results_b, results_c = run_models([(*job, 0) for job in model_jobs])
+                else:
+                    caps = [repeats if model else 0 for model, repeats, _limiter in model_jobs]
+                    results_a, results_b, results_c = [], [], []
+                    for round_index in range(max(caps)):
+                        jobs = [
+                            (model, 1 if cap > round_index else 0, limiter, round_index)
+                            for (model, _repeats, limiter), cap in zip(model_jobs, caps)
+                        ]
+                        round_a, round_b, round_c = run_models(jobs)
+                        results_a += round_a
+                        results_b += round_b
+                        results_c += round_c
+                        sampled = weighted_samples(results_a, results_b, results_c)
+                        if is_merge_stable(sampled, output_count, adaptive.min_overlap):
+                            break
+                    calls = len(results_a) + len(results_b) + len(results_c)
+                    if debug:
+                        print(f"[debug] topic={topic.topic_id} adaptive calls={calls}/{sum(caps)}", file=sys.stderr)
+
+            weighted_lists = weighted_samples(results_a, results_b, results_c)
+
+            if not weighted_lists:
+                raise RuntimeError("No valid tags returned")
+
+            merged = merge_ranked(weighted_lists)
+
+            selected = merged[:output_count] if output_count else []
+            if adaptive is not None and not dry_run:
+                adaptive.record(calls, sum(caps))
+            return selected, output_weights
+        except RateLimitError as exc:
+            attempt -= 1
+            rate_limit_hits += 1
+            if rate_limit_hits > max_rate_limit_retries:
+                raise RuntimeError(
+                    f"Topic {topic.topic_id} hit rate limits {rate_limit_hits} times; last error: {exc}"
+                ) from exc
+            wait_seconds = exc.retry_after if exc.retry_after and exc.retry_after > 0 else retry_delay
+            print(
+                f"[topic {topic.topic_id}] rate limit hit ({exc}); backing off {wait_seconds:.1f}s",
+                file=sys.stderr,
+            )
+            if rate_limiter_a:
+                rate_limiter_a.backoff(retry_after=wait_seconds)
+            if rate_limiter_b:
+                rate_limiter_b.backoff(retry_after=wait_seconds)
+            if rate_limiter_c:
+                rate_limiter_c.backoff(retry_after=wait_seconds)
+            if not rate_limiter_a and not rate_limiter_b and not rate_limiter_c:
+                time.sleep(wait_seconds)
+            continue
+        except (QuotaError, CacheMissError):
+            raise
+        except MaxTokensError:
+            desc_limit = max(300, int(desc_limit * 0.6))
+            include_synonyms_local = False
+            max_output_tokens = min(4096, int(max_output_tokens * 1.6))
+            print(
+                f"[topic {topic.topic_id}] MAX_TOKENS, shrinking prompt (desc_limit={desc_limit}, synonyms disabled, max_output_tokens={max_output_tokens}); retrying after {retry_delay}s",
+                file=sys.stderr,
+            )
+            if attempt >= max_attempts:
+                raise
+            time.sleep(retry_delay)
+            continue
+        except Exception as exc:  # noqa: BLE001
+            if attempt >= max_attempts:
+                raise RuntimeError(
+                    f"Topic {topic.topic_id} failed after {attempt} attempts: {exc}"
+                ) from exc
+            print(
+                f"[topic {topic.topic_id}] attempt {attempt} failed ({exc}); retrying after {retry_delay}s",
+                file=sys.stderr,
+            )
+            time.sleep(retry_delay)
+
+
+def report_throughput(
+    limiters: Sequence[Tuple[str, Optional[str], Optional[RateLimiter]]],
+    processed: int,
+    elapsed: float,
+) -> None:
+    """Print achieved requests/minute per model slot versus the configured RPM."""
+    minutes = max(elapsed, 1e-6) / 60.0
+    print(
+        f"[throughput] topics={processed} elapsed={elapsed:.1f}s topics_per_min={processed / minutes:.2f}",
+        file=sys.stderr,
+    )
+    for label, model, limiter in limiters:
+        if not model or limiter is None:
+            continue
+        achieved = limiter.total_requests / minutes
+        if limiter.max_requests > 0:
+            utilization = f"{100.0 * achieved / limiter.max_requests:.0f}%"
+            configured = str(limiter.max_requests)
+        else:
+            utilization = "n/a"
+            configured = "unlimited"
+        print(
+            f"[throughput] {label} model={model} calls={limiter.total_requests} "
+            f"achieved_rpm={achieved:.2f} configured_rpm={configured} utilization={utilization}",
+            file=sys.stderr,
+        )
+
+
+def _batch_prompt(topic: Topic, prefix: str) -> Tuple[str, int]:
+    layer = max(0, topic.layer)
+    min_tags = min_tags_for_layer(layer)
+    max_tags = max(min_tags, max_tags_for_layer(layer))
+    prompt = build_prompt(topic, prefix, min_tags=min_tags, max_tags=max_tags, desc_limit=BATCH_DESC_LIMIT)
+    return prompt, max_tags
+
+
+def _save_batch_state(state_path: Path, state: Dict[str, object]) -> None:
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    tmp.replace(state_path)
+
+
+def run_batch(
+    pending: List[Topic],
+    topics_by_id: Dict[str, Topic],
+    tags: Dict[int, Tag],
+    output_path: Path,
+    api_key: str,
+    model_slots: Sequence[Tuple[str, Optional[str], int, int]],
+    *,
+    batch_dir: Path,
+    api_base: str,
+    poll_seconds: float,
+    include_synonyms: bool,
+    debug: bool,
+    cache: Optional[ResponseCache] = None,
+    fallback: Optional[Callable[[Topic], Tuple[List[int], List[int]]]] = None,
+    shortlists: Optional[Dict[str, List[int]]] = None,
+    journal: Optional[JobJournal] = None,
+    writer: Optional[RowWriter] = None,
+) -> int:
+    """
+    Tag `pending` via the OpenAI Batch API and return the number of topics written.
+
+    model_slots: (slot label, model, repeats, rank weight) per model.
+    Progress is kept in batch_dir/state.json (input file, batch ID, topicIDs), so an
+    interrupted run resumes the same batch instead of submitting (and paying for) a new one.
+    Topics without any valid list in the batch output go through `fallback` (live calls).
+    Without `writer`, rows go through a writer of its own on output_path.
+    """
+    own_writer = writer is None
+    if writer is None:
+        writer = RowWriter(output_path, OUTPUT_HEADER, journal=journal)
+    try:
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        full_prefix = build_prompt_prefix(tags, include_synonyms=include_synonyms)
+
+        def prefix_for(topic: Topic) -> str:
+            if shortlists and topic.topic_id in shortlists:
+                candidates = {tid: tags[tid] for tid in shortlists[topic.topic_id] if tid in tags}
+                return build_prompt_prefix(candidates, include_synonyms=include_synonyms)
+            return full_prefix
+
+        state_path = batch_dir / BATCH_STATE_FILE
+        state: Dict[str, object] = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+
+        if state:
+            topic_ids = [str(tid) for tid in state["topic_ids"]]
+            missing = [tid for tid in topic_ids if tid not in topics_by_id]
+            if missing:
+                raise RuntimeError(f"Batch state {state_path} references unknown topicIDs: {missing[:5]}")
+            batch_topics = [topics_by_id[tid] for tid in topic_ids]
+            print(f"[batch] resuming batch state from {state_path} ({len(batch_topics)} topics)", file=sys.stderr)
+        else:
+            batch_topics = list(pending)
+            if not batch_topics:
+                return 0
+            state = {"topic_ids": [t.topic_id for t in batch_topics]}
+
+        if "input_file_id" not in state:
+            input_path = batch_dir / BATCH_INPUT_FILE
+            request_count = 0
+            with input_path.open("w", encoding="utf-8") as f:
+                for topic in batch_topics:
+                    prompt, _ = _batch_prompt(topic, prefix_for(topic))
+                    for slot, model, repeats, _weight in model_slots:
+                        if not model:
+                            continue
+                        tokens_param = _get_tokens_param_candidates(model)[0]
+                        body = build_request_body(
+                            model, prompt, tokens_param=tokens_param, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS
+                        )
+                        for repeat_index in range(repeats):
+                            custom_id = BATCH_ID_SEPARATOR.join([topic.topic_id, slot, str(repeat_index)])
+                            f.write(build_batch_line(custom_id, body) + "\n")
+                            request_count += 1
+            if request_count == 0:
+                raise RuntimeError("Batch mode needs at least one enabled model with repeats > 0")
+            state["input_file_id"] = upload_batch_file(api_key, input_path, api_base=api_base)
+            _save_batch_state(state_path, state)
+            print(f"[batch] uploaded {request_count} requests as {state['input_file_id']}", file=sys.stderr)
+
+        if "batch_id" not in state:
+            batch = create_batch(
+                api_key,
+                str(state["input_file_id"]),
+                api_base=api_base,
+                metadata={"script": "topic_tags_assignment", "topics": str(len(batch_topics))},
+            )
+            state["batch_id"] = batch["id"]
+            _save_batch_state(state_path, state)
+            print(f"[batch] created batch {state['batch_id']}", file=sys.stderr)
+
+        batch_id = str(state["batch_id"])
+        batch = wait_for_batch(api_key, batch_id, api_base=api_base, poll_seconds=poll_seconds)
+        status = batch.get("status")
+        if status != "completed":
+            print(f"[batch {batch_id}] finished with status={status}; using partial output", file=sys.stderr)
+
+        # (topicID, slot) -> list of cleaned lists, in repeat order.
+        results: Dict[Tuple[str, str], List[Tuple[int, List[int]]]] = {}
+        failed_requests = 0
+        wanted = {t.topic_id for t in batch_topics}
+        slot_models = {slot: model for slot, model, _repeats, _weight in model_slots if model}
+        for file_key, suffix in (("output_file_id", "output"), ("error_file_id", "errors")):
+            file_id = batch.get(file_key)
+            if not file_id:
+                continue
+            target = batch_dir / f"{batch_id}_{suffix}.jsonl"
+            if not target.exists():
+                download_file(api_key, str(file_id), target, api_base=api_base)
+            for custom_id, content, error in iter_batch_results(target):
+                topic_id, _, rest = custom_id.rpartition(BATCH_ID_SEPARATOR)
+                topic_id, _, slot = topic_id.rpartition(BATCH_ID_SEPARATOR)
+                if topic_id not in wanted or slot not in slot_models or not rest.isdigit():
+                    continue
+                if content is None:
+                    failed_requests += 1
+                    if debug:
+                        print(f"[debug] batch request {custom_id} failed: {error}", file=sys.stderr)
+                    continue
+                try:
+                    raw = parse_tag_ids(content)
+                except ValueError as exc:
+                    failed_requests += 1
+                    if debug:
+                        print(f"[debug] batch request {custom_id} unparseable: {exc}", file=sys.stderr)
+                    continue
+                topic = topics_by_id[topic_id]
+                prompt, max_tags = _batch_prompt(topic, prefix_for(topic))
+                if cache:
+                    cache.put(slot_models[slot], prompt, SAMPLING_PARAMS, int(rest), raw)
+                cleaned = sanitize_ids(raw, set(tags.keys()), max_tags=max_tags)
+                results.setdefault((topic_id, slot), []).append((int(rest), cleaned))
+        if failed_requests:
+            print(f"[batch {batch_id}] {failed_requests} requests failed or were unparseable", file=sys.stderr)
+
+        # Rows already in the output were written by an interrupted earlier pass over this batch.
+        already = set(journal.committed) if journal else load_existing(output_path)
+        written = 0
+        fallbacks = 0
+        for topic in batch_topics:
+            if topic.topic_id in already:
+                continue
+            weighted_lists: List[Tuple[int, Sequence[int]]] = []
+            for slot, model, _repeats, weight in model_slots:
+                for _repeat_index, lst in sorted(results.get((topic.topic_id, slot), [])):
+                    if lst:
+                        weighted_lists.append((weight, lst))
+            output_weights = weights_for_layer(max(0, topic.layer))
+            if weighted_lists:
+                merged = merge_ranked(weighted_lists)
+                selected = merged[: len(output_weights)] if output_weights else []
+            elif fallback is not None:
+                print(f"[topic {topic.topic_id}] no valid batch result; falling back to live calls", file=sys.stderr)
+                selected, output_weights = fallback(topic)
+                fallbacks += 1
+            else:
+                raise RuntimeError(f"Topic {topic.topic_id}: no valid tags in batch {batch_id}")
+            commit_rows(writer, topic.topic_id, selected, output_weights)
+            written += 1
+
+        state_path.unlink()
+        print(f"[batch {batch_id}] wrote {written} topics ({fallbacks} via live fallback)", file=sys.stderr)
+        return written
+    finally:
+        if own_writer:
+            writer.close()
 
 
 def process_resources(
@@ -746,157 +1600,354 @@ def process_resources(
     repeats_c: int,
     include_synonyms: bool,
     debug: bool,
+    concurrency: int = 1,
+    cache: Optional[ResponseCache] = None,
+    batch_dir: Optional[Path] = None,
+    api_base: str = DEFAULT_API_BASE,
+    batch_poll_seconds: float = DEFAULT_POLL_SECONDS,
+    usage_stats: Optional[UsageStats] = None,
+    shortlister: Optional[TagShortlister] = None,
+    shortlist_k: int = 0,
+    pack_size: int = DEFAULT_PACK_SIZE,
+    pack_token_budget: int = DEFAULT_PACK_TOKEN_BUDGET,
+    journal: Optional[JobJournal] = None,
+    adaptive: Optional[AdaptiveSampling] = None,
+    writer: Optional[RowWriter] = None,
 ) -> None:
+    """Tag the selected topics; rows go through `writer` (the caller closes it and merges shards)."""
     ensure_header(output_path)
+    own_writer = writer is None
+    if writer is None:
+        writer = RowWriter(output_path, OUTPUT_HEADER, journal=journal)
     valid_ids = set(tags.keys())
-    already = load_existing(output_path) if resume else set()
+    if not resume:
+        already: Set[str] = set()
+    elif journal:
+        already = set(journal.committed)
+    else:
+        already = load_existing(output_path)
     processed = 0
 
+    pending: List[Topic] = []
     for idx, topic in enumerate(resources, start=1):
         if idx < start_row:
             continue
         if resume and topic.topic_id in already:
             continue
-        if limit is not None and processed >= limit:
+        if limit is not None and len(pending) >= limit:
             break
+        pending.append(topic)
+
+    # Only the topics this run will send need a shortlist; done or skipped ones are never embedded.
+    shortlists: Dict[str, List[int]] = {}
+    if shortlister is not None and pending:
+        ranked = shortlister.shortlist([item_text(t.name, t.description) for t in pending], shortlist_k)
+        shortlists = {t.topic_id: ids for t, ids in zip(pending, ranked)}
+
+    started = time.time()
+    topic_kwargs = dict(
+        dry_run=dry_run,
+        max_attempts=max_attempts,
+        retry_delay=retry_delay,
+        rate_limiter_a=rate_limiter_a,
+        rate_limiter_b=rate_limiter_b,
+        rate_limiter_c=rate_limiter_c,
+        max_rate_limit_retries=max_rate_limit_retries,
+        repeats_a=repeats_a,
+        repeats_b=repeats_b,
+        repeats_c=repeats_c,
+        include_synonyms=include_synonyms,
+        debug=debug,
+        cache=cache,
+        prompt_prefixes=None if dry_run else build_prompt_prefixes(tags),
+        usage_stats=usage_stats,
+        journal=journal,
+        adaptive=adaptive,
+    )
 
-        attempt = 0
-        rate_limit_hits = 0
-        desc_limit = 2000
-        include_synonyms_local = include_synonyms
-        max_output_tokens = DEFAULT_MAX_OUTPUT_TOKENS
-        while True:
-            attempt += 1
-            print(f"[topic {topic.topic_id}] requesting tags... (attempt {attempt})", file=sys.stderr)
-            try:
-                layer = max(0, topic.layer)
-                min_tags = min_tags_for_layer(layer)
-                max_tags = max_tags_for_layer(layer)
-                if max_tags < min_tags:
-                    max_tags = min_tags
-                output_weights = weights_for_layer(layer)
-                output_count = len(output_weights)
-
-                if dry_run:
-                    results_a = [heuristic_tags(topic, tags, max_tags=max_tags)]
-                    results_b: List[List[int]] = []
-                    results_c: List[List[int]] = []
+    if batch_dir is not None and not dry_run:
+        processed = run_batch(
+            pending,
+            {t.topic_id: t for t in resources},
+            tags,
+            output_path,
+            api_key,
+            [
+                ("a", model_a, repeats_a, WEIGHT_A),
+                ("b", model_b, repeats_b, WEIGHT_B),
+                ("c", model_c, repeats_c, WEIGHT_C),
+            ],
+            batch_dir=batch_dir,
+            api_base=api_base,
+            poll_seconds=batch_poll_seconds,
+            include_synonyms=include_synonyms,
+            debug=debug,
+            cache=cache,
+            fallback=lambda topic: tag_topic(
+                topic,
+                tags,
+                valid_ids,
+                api_key,
+                model_a,
+                model_b,
+                model_c,
+                candidate_ids=shortlists.get(topic.topic_id) if shortlists else None,
+                **topic_kwargs,
+            ),
+            shortlists=shortlists,
+            journal=journal,
+            writer=writer,
+        )
+        if usage_stats:
+            usage_stats.record_item(processed)
+    elif pack_size > 1 and not dry_run:
+        full_prefix = topic_kwargs["prompt_prefixes"][include_synonyms]
+        model_slots = [
+            (model_a, repeats_a, WEIGHT_A, rate_limiter_a),
+            (model_b, repeats_b, WEIGHT_B, rate_limiter_b),
+            (model_c, repeats_c, WEIGHT_C, rate_limiter_c),
+        ]
+        packs = plan_packs(
+            pending, pack_size=pack_size, token_budget=pack_token_budget, prefix_chars=len(full_prefix)
+        )
+        fallbacks = 0
+        for pack in packs:
+            if shortlists:
+                union: Dict[int, Tag] = {}
+                for topic in pack:
+                    union.update((tid, tags[tid]) for tid in shortlists.get(topic.topic_id, []) if tid in tags)
+                prefix = build_prompt_prefix(union, include_synonyms=include_synonyms)
+            else:
+                prefix = full_prefix
+            print(
+                f"[pack] requesting tags for {len(pack)} topics: {pack[0].topic_id}..{pack[-1].topic_id}",
+                file=sys.stderr,
+            )
+            packed = (
+                tag_pack(
+                    pack,
+                    prefix,
+                    valid_ids,
+                    api_key,
+                    model_slots,
+                    retry_delay=retry_delay,
+                    max_rate_limit_retries=max_rate_limit_retries,
+                    debug=debug,
+                    cache=cache,
+                    usage_stats=usage_stats,
+                    journal=journal,
+                )
+                if len(pack) > 1
+                else {}
+            )
+            for topic in pack:
+                if topic.topic_id in packed:
+                    selected, output_weights = packed[topic.topic_id]
                 else:
-                    prompt = build_prompt(
+                    if len(pack) > 1:
+                        print(
+                            f"[topic {topic.topic_id}] missing/invalid in packed response; single-topic call",
+                            file=sys.stderr,
+                        )
+                        fallbacks += 1
+                    selected, output_weights = tag_topic(
                         topic,
                         tags,
-                        min_tags=min_tags,
-                        max_tags=max_tags,
-                        desc_limit=desc_limit,
-                        include_synonyms=include_synonyms_local,
-                    )
-                    results_a = fetch_model_lists(
+                        valid_ids,
+                        api_key,
                         model_a,
-                        repeats=repeats_a,
-                        prompt=prompt,
-                        api_key=api_key,
-                        valid_ids=valid_ids,
-                        limiter=rate_limiter_a,
-                        retry_delay=retry_delay,
-                        max_output_tokens=max_output_tokens,
-                        max_rate_limit_retries=max_rate_limit_retries,
-                        max_tags=max_tags,
-                        debug=debug,
-                    )
-                    results_b = fetch_model_lists(
                         model_b,
-                        repeats=repeats_b,
-                        prompt=prompt,
-                        api_key=api_key,
-                        valid_ids=valid_ids,
-                        limiter=rate_limiter_b,
-                        retry_delay=retry_delay,
-                        max_output_tokens=max_output_tokens,
-                        max_rate_limit_retries=max_rate_limit_retries,
-                        max_tags=max_tags,
-                        debug=debug,
-                    )
-                    results_c = fetch_model_lists(
                         model_c,
-                        repeats=repeats_c,
-                        prompt=prompt,
-                        api_key=api_key,
-                        valid_ids=valid_ids,
-                        limiter=rate_limiter_c,
-                        retry_delay=retry_delay,
-                        max_output_tokens=max_output_tokens,
-                        max_rate_limit_retries=max_rate_limit_retries,
-                        max_tags=max_tags,
-                        debug=debug,
+                        candidate_ids=shortlists.get(topic.topic_id) if shortlists else None,
+                        **topic_kwargs,
                     )
+                commit_rows(writer, topic.topic_id, selected, output_weights)
+                processed += 1
+                if usage_stats:
+                    usage_stats.record_item()
+        print(
+            f"[pack] {len(pending)} topics in {len(packs)} packed requests per model; {fallbacks} fallbacks",
+            file=sys.stderr,
+        )
+    elif concurrency <= 1:
+        for topic in pending:
+            selected, output_weights = tag_topic(
+                topic,
+                tags,
+                valid_ids,
+                api_key,
+                model_a,
+                model_b,
+                model_c,
+                candidate_ids=shortlists.get(topic.topic_id) if shortlists else None,
+                **topic_kwargs,
+            )
+            commit_rows(writer, topic.topic_id, selected, output_weights)
+            processed += 1
+            if usage_stats:
+                usage_stats.record_item()
+    else:
+        # Keep up to `concurrency` topics running; finished topics are buffered (bounded by
+        # MAX_REORDER_FACTOR * concurrency) and written strictly in input order.
+        reorder_limit = concurrency * MAX_REORDER_FACTOR
+        set_default_pool_size(concurrency * 3)  # keep one warm connection per model worker
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="topic") as topic_pool, ThreadPoolExecutor(
+            max_workers=concurrency * 3, thread_name_prefix="model"
+        ) as model_pool:
+            in_flight: Dict[int, Future] = {}
+            next_submit = 0
+            next_write = 0
+            try:
+                while next_write < len(pending):
+                    while (
+                        next_submit < len(pending)
+                        and sum(1 for f in in_flight.values() if not f.done()) < concurrency
+                        and next_submit - next_write < reorder_limit
+                    ):
+                        in_flight[next_submit] = topic_pool.submit(
+                            tag_topic,
+                            pending[next_submit],
+                            tags,
+                            valid_ids,
+                            api_key,
+                            model_a,
+                            model_b,
+                            model_c,
+                            model_pool=model_pool,
+                            candidate_ids=shortlists.get(pending[next_submit].topic_id) if shortlists else None,
+                            **topic_kwargs,
+                        )
+                        next_submit += 1
+                    head = in_flight[next_write]
+                    if not head.done():
+                        wait([f for f in in_flight.values() if not f.done()], return_when=FIRST_COMPLETED)
+                        continue
+                    selected, output_weights = in_flight.pop(next_write).result()
+                    commit_rows(writer, pending[next_write].topic_id, selected, output_weights)
+                    processed += 1
+                    if usage_stats:
+                        usage_stats.record_item()
+                    next_write += 1
+            except BaseException:
+                for future in in_flight.values():
+                    future.cancel()
+                raise
 
-                weighted_lists: List[Tuple[int, Sequence[int]]] = []
-                for lst in results_a:
-                    if lst:
-                        weighted_lists.append((WEIGHT_A, lst))
-                for lst in results_b:
-                    if lst:
-                        weighted_lists.append((WEIGHT_B, lst))
-                for lst in results_c:
-                    if lst:
-                        weighted_lists.append((WEIGHT_C, lst))
+    if own_writer:
+        writer.close()
+    if not dry_run:
+        report_throughput(
+            [
+                ("primary", model_a, rate_limiter_a),
+                ("secondary", model_b, rate_limiter_b),
+                ("tertiary", model_c, rate_limiter_c),
+            ],
+            processed,
+            time.time() - started,
+        )
+        if usage_stats and usage_stats.calls:
+            print(f"[usage] {usage_stats.summary()}", file=sys.stderr)
+            for line in usage_stats.table():
+                print(f"[usage] {line}", file=sys.stderr)
+        if adaptive and adaptive.topics:
+            print(f"[adaptive] {adaptive.summary()}", file=sys.stderr)
+        print(f"[http] {default_client().stats.summary()}", file=sys.stderr)
 
-                if not weighted_lists:
-                    raise RuntimeError("No valid tags returned")
+    print(f"Done. Processed {processed} topics; output -> {output_path}", file=sys.stderr)
 
-                merged = merge_ranked(weighted_lists)
 
-                selected = merged[:output_count] if output_count else []
-                write_rows(output_path, topic.topic_id, selected, output_weights)
-                processed += 1
-                break
-            except RateLimitError as exc:
-                attempt -= 1
-                rate_limit_hits += 1
-                if rate_limit_hits > max_rate_limit_retries:
-                    raise RuntimeError(
-                        f"Topic {topic.topic_id} hit rate limits {rate_limit_hits} times; last error: {exc}"
-                    ) from exc
-                wait_seconds = exc.retry_after if exc.retry_after and exc.retry_after > 0 else retry_delay
-                print(
-                    f"[topic {topic.topic_id}] rate limit hit ({exc}); waiting {wait_seconds:.1f}s for next window",
-                    file=sys.stderr,
-                )
-                if rate_limiter_a:
-                    rate_limiter_a.wait_next_window(retry_after=wait_seconds)
-                if rate_limiter_b:
-                    rate_limiter_b.wait_next_window(retry_after=wait_seconds)
-                if rate_limiter_c:
-                    rate_limiter_c.wait_next_window(retry_after=wait_seconds)
-                if not rate_limiter_a and not rate_limiter_b and not rate_limiter_c:
-                    time.sleep(wait_seconds)
-                continue
-            except QuotaError:
-                raise
-            except MaxTokensError:
-                desc_limit = max(300, int(desc_limit * 0.6))
-                include_synonyms_local = False
-                max_output_tokens = min(4096, int(max_output_tokens * 1.6))
-                print(
-                    f"[topic {topic.topic_id}] MAX_TOKENS, shrinking prompt (desc_limit={desc_limit}, synonyms disabled, max_output_tokens={max_output_tokens}); retrying after {retry_delay}s",
-                    file=sys.stderr,
-                )
-                if attempt >= max_attempts:
-                    raise
-                time.sleep(retry_delay)
-                continue
-            except Exception as exc:  # noqa: BLE001
-                if attempt >= max_attempts:
-                    raise RuntimeError(
-                        f"Topic {topic.topic_id} failed after {attempt} attempts: {exc}"
-                    ) from exc
-                print(
-                    f"[topic {topic.topic_id}] attempt {attempt} failed ({exc}); retrying after {retry_delay}s",
-                    file=sys.stderr,
-                )
-                time.sleep(retry_delay)
+def catalog_snapshot(tags: Dict[int, Tag], topics: Sequence[Topic], pending: Sequence[str] = ()) -> CatalogSnapshot:
+    """Tag catalog plus a hash of every topic's name, layer and description (what its prompt depends on)."""
+    return take_snapshot(
+        [(tag.tag_id, tag.name, list(tag.synonyms)) for tag in tags.values()],
+        {t.topic_id: text_hash(t.name, t.layer, t.description) for t in topics},
+        pending,
+    )
 
-    print(f"Done. Processed {processed} topics; output -> {output_path}", file=sys.stderr)
+
+def plan_incremental(
+    tags: Dict[int, Tag],
+    topics: List[Topic],
+    output_path: Path,
+    snapshot_path: Path,
+    journal: Optional[JobJournal],
+    *,
+    retag_rank: int,
+    embedding_model: str,
+    dry_run: bool,
+) -> List[Topic]:
+    """
+    Topics to re-tag since the snapshot (see tagging_helpers/incremental.py), plus any still
+    pending from an interrupted incremental run. Their rows and journal commits are dropped
+    first, and the snapshot is advanced with them recorded as pending.
+    """
+    previous = load_snapshot(snapshot_path)
+    if previous is None:
+        raise RuntimeError(
+            f"No snapshot at {snapshot_path}; run once with --save-snapshot to record the catalog "
+            "the current output was made with."
+        )
+    current = catalog_snapshot(tags, topics)
+    diff = diff_catalog(previous, current)
+    fresh = [tid for tid in (*diff.added_tags, *diff.changed_tags) if tid in tags]
+    nearest: Optional[Dict[str, List[int]]] = None
+    if fresh and retag_rank > 0:
+        if dry_run:
+            # No embedding model in dry runs: the same name match heuristic_tags uses.
+            nearest = {
+                t.topic_id: [tid for tid in fresh if tags[tid].name.lower() in f"{t.name} {t.description}".lower()]
+                for t in topics
+            }
+        else:
+            shortlister = TagShortlister(
+                [(tag.tag_id, tag.name, list(tag.synonyms)) for tag in tags.values()],
+                open_store(embedding_model),
+            )
+            ranked = shortlister.shortlist([item_text(t.name, t.description) for t in topics], retag_rank)
+            nearest = {t.topic_id: ids for t, ids in zip(topics, ranked)}
+    affected = affected_items(diff, read_assigned(output_path), nearest)
+    print_plan(diff, affected, len(topics), label="topics")
+
+    drop = set(affected) | set(diff.removed_items)
+    dropped = drop_item_rows(output_path, drop)
+    if journal:
+        journal.forget(sorted(drop))
+    pending = [item for item in dict.fromkeys([*previous.pending, *affected]) if item in current.items]
+    save_snapshot(snapshot_path, catalog_snapshot(tags, topics, pending))
+    if previous.pending:
+        print(f"[retag] {len(previous.pending)} topic(s) still pending from the previous run", file=sys.stderr)
+    print(f"[retag] dropped {dropped} rows from {output_path.name}", file=sys.stderr)
+    pending_ids = set(pending)
+    return [t for t in topics if t.topic_id in pending_ids]
+
+
+def report_shortlist_recall(
+    shortlister: TagShortlister,
+    topics: List[Topic],
+    output_path: Path,
+    *,
+    sample_size: int,
+    top_k: int,
+    catalog_size: int,
+) -> int:
+    """Compare embedding shortlists with full-catalog rows already written to output_path."""
+    reference = load_reference_rows(output_path, "topicID")
+    candidates = [t for t in topics if t.topic_id in reference]
+    if not candidates:
+        print(f"No full-catalog rows found in {output_path}; run without --shortlist-k first.", file=sys.stderr)
+        return 1
+    step = max(1, len(candidates) // max(1, sample_size))
+    sample = candidates[::step][:sample_size]
+    ks = sorted({k for k in (*DEFAULT_RECALL_KS, top_k) if 0 < k <= catalog_size})
+    ranked = shortlister.shortlist([item_text(t.name, t.description) for t in sample], max(ks))
+    print_recall_report(
+        reference,
+        {t.topic_id: ids for t, ids in zip(sample, ranked)},
+        ks,
+        label=output_path.name,
+        catalog_size=catalog_size,
+    )
+    return 0
 
 
 def parse_args() -> argparse.Namespace:
@@ -919,6 +1970,37 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Skip topics already present in output (based on topicID).",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only re-tag topics affected by changes to t_tag.csv / t_topic.csv since the snapshot: new or "
+            "edited topics, topics holding a removed or changed tag, and topics near an added tag. "
+            "Their rows are replaced; all other rows stay as they are."
+        ),
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        action="store_true",
+        help="Record the current tag catalog and topics as the --incremental baseline, then exit.",
+    )
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help=(
+            "Catalog snapshot used by --incremental, relative to scripts directory "
+            f"(default: {DEFAULT_SNAPSHOT_DIR}/<output file name>.json)."
+        ),
+    )
+    parser.add_argument(
+        "--retag-rank",
+        type=int,
+        default=DEFAULT_RETAG_RANK,
+        help=(
+            "With --incremental, re-tag a topic if an added or changed tag is among its K nearest tags by "
+            f"embedding similarity; 0 disables the check (default: {DEFAULT_RETAG_RANK})."
+        ),
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -985,6 +2067,24 @@ def parse_args() -> argparse.Namespace:
         default=6,
         help="Max requests per minute for the tertiary model (default: 6).",
     )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Token budget per minute (TPM) for the primary model; 0 disables token limiting (default: 0).",
+    )
+    parser.add_argument(
+        "--secondary-tokens-per-minute",
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Token budget per minute (TPM) for the secondary model (default: 0).",
+    )
+    parser.add_argument(
+        "--tertiary-tokens-per-minute",
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Token budget per minute (TPM) for the tertiary model (default: 0).",
+    )
     parser.add_argument(
         "--repeats-a",
         type=int,
@@ -1003,6 +2103,23 @@ def parse_args() -> argparse.Namespace:
         default=SAMPLE_SIZE_C,
         help=f"Number of calls per topic to tertiary model (default: {SAMPLE_SIZE_C}).",
     )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help=(
+            "Adaptive sampling: treat --repeats-a/b/c as per-topic caps and stop sampling once the merged "
+            "top tags are stable (default: off). Not used for --batch or packed requests."
+        ),
+    )
+    parser.add_argument(
+        "--adaptive-overlap",
+        type=float,
+        default=DEFAULT_ADAPTIVE_OVERLAP,
+        help=(
+            "Stability threshold for --adaptive: share of the merged top tags that must survive dropping any "
+            f"single sample (default: {DEFAULT_ADAPTIVE_OVERLAP:g})."
+        ),
+    )
     parser.add_argument(
         "--start-row",
         type=int,
@@ -1024,6 +2141,158 @@ def parse_args() -> argparse.Namespace:
     # Backwards compatible aliases (from resource script copy)
     parser.add_argument("--continue-after-last-source-id", action="store_true", help=argparse.SUPPRESS)
     parser.add_argument("--custom-starting-source-id", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=(
+            "Number of topics processed in parallel; models of a topic are queried in parallel "
+            f"and every call still respects the per-model RPM limit (default: {DEFAULT_CONCURRENCY})."
+        ),
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite response cache path relative to scripts directory (default: {DEFAULT_CACHE_PATH}).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the response cache (always query OpenAI).",
+    )
+    parser.add_argument(
+        "--cache-only",
+        action="store_true",
+        help="Never call OpenAI; fail fast on the first response that is not cached.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f"Evict least recently used cache entries beyond this size (default: {DEFAULT_CACHE_MAX_MB} MB).",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Use the OpenAI Batch API (cheaper, asynchronous): submit all pending topics as one batch, "
+            "poll until done, then write rows. Re-running resumes an interrupted batch."
+        ),
+    )
+    parser.add_argument(
+        "--batch-dir",
+        default=DEFAULT_BATCH_DIR,
+        help=f"Directory for batch request/output files and resume state (default: {DEFAULT_BATCH_DIR}).",
+    )
+    parser.add_argument(
+        "--batch-poll-seconds",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help=f"Seconds between batch status polls (default: {DEFAULT_POLL_SECONDS:g}).",
+    )
+    parser.add_argument(
+        "--api-base",
+        default=None,
+        help=f"OpenAI API base URL for batch mode (default: {DEFAULT_API_BASE} or OPENAI_API_BASE env).",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_MODES,
+        default="none",
+        help=(
+            "Write rows into <output>.shards/<key>.csv by topicID prefix or layer and merge them into the "
+            "output (in t_topic.csv order) when the run finishes (default: none)."
+        ),
+    )
+    parser.add_argument(
+        "--shard-prefix-len",
+        type=int,
+        default=DEFAULT_SHARD_PREFIX_LEN,
+        help=f"TopicID characters used as shard key with --shard-by prefix (default: {DEFAULT_SHARD_PREFIX_LEN}).",
+    )
+    parser.add_argument(
+        "--write-batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help=f"Most rows the writer stage journals and appends in one go (default: {DEFAULT_BATCH_ROWS}).",
+    )
+    parser.add_argument(
+        "--fsync-seconds",
+        type=float,
+        default=DEFAULT_FSYNC_SECONDS,
+        help=f"Seconds between fsyncs of the output files; 0 = after every batch (default: {DEFAULT_FSYNC_SECONDS:g}).",
+    )
+    parser.add_argument(
+        "--pack-size",
+        type=int,
+        default=DEFAULT_PACK_SIZE,
+        help=(
+            "Pack up to N topics into one request (e.g. 5-20); the model answers with a JSON object "
+            f"topicID -> tagIDs. 1 disables packing (default: {DEFAULT_PACK_SIZE})."
+        ),
+    )
+    parser.add_argument(
+        "--pack-token-budget",
+        type=int,
+        default=DEFAULT_PACK_TOKEN_BUDGET,
+        help=f"Estimated prompt-token cap per packed request (default: {DEFAULT_PACK_TOKEN_BUDGET}).",
+    )
+    parser.add_argument(
+        "--shortlist-k",
+        type=int,
+        default=DEFAULT_SHORTLIST_K,
+        help=(
+            "Only put the top-K tags by embedding similarity (median over tag name/synonym variants) "
+            "into each prompt; 0 sends the full catalog (default: 0)."
+        ),
+    )
+    parser.add_argument(
+        "--embedding-model",
+        default=DEFAULT_EMBEDDING_MODEL,
+        help=f"sentence-transformers model for --shortlist-k (default: {DEFAULT_EMBEDDING_MODEL}).",
+    )
+    parser.add_argument(
+        "--shortlist-report",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Print the recall of embedding shortlists against the full-catalog results already in the "
+            "output CSV for a sample of N topics, then exit without calling OpenAI."
+        ),
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help=(
+            "Write-ahead journal of completed model calls and committed topics, relative to scripts directory "
+            f"(default: {DEFAULT_JOURNAL_DIR}/<output file name>.jsonl)."
+        ),
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Disable the journal; --resume then re-reads the whole output CSV.",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help=(
+            "Write per-call telemetry (latency, tokens, cost, failures, rate-limit wait) relative to scripts "
+            "directory: a *.prom path is a Prometheus textfile, any other path JSONL (default: off)."
+        ),
+    )
+    parser.add_argument(
+        "--price",
+        action="append",
+        type=parse_price,
+        default=[],
+        metavar="MODEL=IN,CACHED,OUT",
+        help=(
+            "USD per 1M input / cached input / output tokens for the cost estimate; repeatable "
+            "(default: built-in table for gpt-4.1/4o/5 models)."
+        ),
+    )
     parser.add_argument(
         "--max-rate-limit-retries",
         type=int,
@@ -1039,7 +2308,9 @@ def main() -> int:
     csv_dir = script_dir.parent / "csv"
     config = resolve_config(args, script_dir)
 
-    if not args.dry_run and not config["api_key"]:
+    # --cache-only replays cached answers and never calls OpenAI, so it needs no key.
+    replay_only = args.cache_only and not args.batch
+    if not args.dry_run and not replay_only and args.shortlist_report <= 0 and not config["api_key"]:
         print("OPENAI_API_KEY is required for live runs. Set env or .env in backend/.", file=sys.stderr)
         return 1
 
@@ -1051,8 +2322,60 @@ def main() -> int:
     continue_after_last = bool(getattr(args, "continue_after_last_topic_id", False) or getattr(args, "continue_after_last_source_id", False))
     custom_starting_topic_id = getattr(args, "custom_starting_topic_id", None) or getattr(args, "custom_starting_source_id", None)
 
-    if continue_after_last:
-        last_id = find_last_topic_id(output_path)
+    journal: Optional[JobJournal] = None
+    if not args.no_journal:
+        journal_path = (
+            (script_dir / args.journal).resolve()
+            if args.journal
+            else script_dir / DEFAULT_JOURNAL_DIR / f"{output_path.name}.jsonl"
+        )
+        journal = JobJournal(journal_path)
+        ensure_header(output_path)
+    shard_of = shard_function(topics, args.shard_by, args.shard_prefix_len)
+    shard_dir = shard_dir_for(output_path)
+    if journal and (shard_of or shard_files(shard_dir)):
+        # Rows of an interrupted sharded run go back to their shard ("_" when only merging leftovers).
+        journal.sync_with_shards(
+            output_path,
+            read_shard_items(shard_dir),
+            lambda item, rows: append_rows(
+                shard_dir / f"{shard_of(item) if shard_of else '_'}.csv", OUTPUT_HEADER, rows
+            ),
+        )
+    elif journal:
+        journal.sync_with_output(
+            output_path, lambda rows: append_rows(output_path, OUTPUT_HEADER, rows), max_lag=DEFAULT_BATCH_ITEMS
+        )
+    if (not shard_of or args.incremental) and shard_files(shard_dir):
+        merge_shards(output_path, shard_dir, [t.topic_id for t in topics], OUTPUT_HEADER, journal)
+
+    snapshot_path = (
+        (script_dir / args.snapshot).resolve()
+        if args.snapshot
+        else script_dir / DEFAULT_SNAPSHOT_DIR / f"{output_path.name}.json"
+    )
+    if args.save_snapshot:
+        save_snapshot(snapshot_path, catalog_snapshot(tags, topics))
+        print(f"[retag] snapshot of {len(tags)} tags and {len(topics)} topics -> {snapshot_path}", file=sys.stderr)
+        if journal:
+            journal.close()
+        return 0
+
+    run_topics = topics
+    if args.incremental:
+        run_topics = plan_incremental(
+            tags,
+            topics,
+            output_path,
+            snapshot_path,
+            journal,
+            retag_rank=args.retag_rank,
+            embedding_model=args.embedding_model,
+            dry_run=args.dry_run,
+        )
+        effective_start_row = 1
+    elif continue_after_last:
+        last_id = journal.last_committed if journal else find_last_topic_id(output_path)
         if last_id is None:
             print("No previous rows found in output; starting from row 1.", file=sys.stderr)
             effective_start_row = 1
@@ -1069,17 +2392,61 @@ def main() -> int:
             )
         effective_start_row = match_index
     output_path = (script_dir / args.output).resolve()
-    rate_limiter_a = None if args.dry_run else RateLimiter(args.requests_per_minute)
+    rate_limiter_a = None if args.dry_run else RateLimiter(args.requests_per_minute, args.tokens_per_minute)
     rate_limiter_b = None if (args.dry_run or not args.secondary_model) else RateLimiter(
-        args.secondary_requests_per_minute
+        args.secondary_requests_per_minute, args.secondary_tokens_per_minute
     )
     rate_limiter_c = None if (args.dry_run or not args.tertiary_model) else RateLimiter(
-        args.tertiary_requests_per_minute
+        args.tertiary_requests_per_minute, args.tertiary_tokens_per_minute
     )
 
+    shortlister: Optional[TagShortlister] = None
+    if args.shortlist_report > 0 or (args.shortlist_k > 0 and not args.dry_run):
+        shortlister = TagShortlister(
+            [(tag.tag_id, tag.name, list(tag.synonyms)) for tag in tags.values()],
+            open_store(args.embedding_model),
+        )
+        if args.shortlist_report > 0:
+            if journal:
+                journal.close()
+            return report_shortlist_recall(
+                shortlister,
+                topics,
+                output_path,
+                sample_size=args.shortlist_report,
+                top_k=args.shortlist_k,
+                catalog_size=len(tags),
+            )
+        print(
+            f"[shortlist] {args.shortlist_k} of {len(tags)} tags per prompt ({args.embedding_model})",
+            file=sys.stderr,
+        )
+
+    cache = None
+    if not args.dry_run and (args.cache_only or not args.no_cache):
+        cache = ResponseCache(
+            (script_dir / args.cache).resolve(),
+            max_bytes=max(0, args.cache_max_mb) * 1024 * 1024,
+            cache_only=args.cache_only,
+        )
+
+    usage_stats = UsageStats(
+        sink=open_metrics_sink((script_dir / args.metrics).resolve() if args.metrics else None),
+        prices={**MODEL_PRICES, **dict(args.price)},
+        item_label="topics",
+    )
+    writer = RowWriter(
+        output_path,
+        OUTPUT_HEADER,
+        journal=journal,
+        shard_dir=shard_dir,
+        shard_of=shard_of,
+        batch_rows=max(1, args.write_batch_rows),
+        fsync_seconds=max(0.0, args.fsync_seconds),
+    )
     try:
         process_resources(
-            resources=topics,
+            resources=run_topics,
             tags=tags,
             output_path=output_path,
             api_key=config["api_key"],
@@ -1087,7 +2454,7 @@ def main() -> int:
             model_b=args.secondary_model or None,
             model_c=args.tertiary_model or None,
             dry_run=args.dry_run,
-            resume=args.resume,
+            resume=args.resume or args.incremental,
             limit=args.limit,
             max_attempts=max(1, args.max_attempts),
             retry_delay=max(0.0, args.retry_delay),
@@ -1101,10 +2468,44 @@ def main() -> int:
             repeats_c=max(0, args.repeats_c),
             include_synonyms=bool(args.include_synonyms),
             debug=args.debug,
+            cache=cache,
+            concurrency=max(1, args.concurrency),
+            batch_dir=(script_dir / args.batch_dir).resolve() if args.batch else None,
+            api_base=(args.api_base or os.environ.get("OPENAI_API_BASE") or DEFAULT_API_BASE).rstrip("/"),
+            batch_poll_seconds=max(0.0, args.batch_poll_seconds),
+            usage_stats=usage_stats,
+            shortlister=shortlister,
+            shortlist_k=args.shortlist_k,
+            pack_size=max(1, args.pack_size),
+            pack_token_budget=max(1, args.pack_token_budget),
+            journal=journal,
+            adaptive=AdaptiveSampling(args.adaptive_overlap) if args.adaptive else None,
+            writer=writer,
         )
+        writer.close()
+        print(f"[writer] {writer.summary()}", file=sys.stderr)
+        if shard_of:
+            merge_shards(output_path, shard_dir, [t.topic_id for t in topics], OUTPUT_HEADER, journal)
+        if args.incremental:
+            done = set(journal.committed) if journal else load_existing(output_path)
+            left = [t.topic_id for t in run_topics if t.topic_id not in done]
+            save_snapshot(snapshot_path, catalog_snapshot(tags, topics, left))
+            print(f"[retag] re-tagged {len(run_topics) - len(left)} topics; {len(left)} still pending", file=sys.stderr)
     except Exception as exc:  # noqa: BLE001
         print(f"Error: {exc}", file=sys.stderr)
         return 1
+    finally:
+        try:
+            writer.close()  # keep every finished topic, also when the run failed
+        except Exception as exc:  # noqa: BLE001
+            print(f"Error: {exc}", file=sys.stderr)
+        usage_stats.close()
+        if cache:
+            print(f"[cache] {cache.summary()}", file=sys.stderr)
+            cache.close()
+        if journal:
+            print(f"[journal] {journal.summary()}", file=sys.stderr)
+            journal.close()
 
     return 0
 
@@ -1,5 +1,44 @@
 #!/usr/bin/env python3
+"""
+Brute-Force-Suche nach Parametern der Gewichtungstabelle (Excel-Formel in cell_value).
+
+    python weight_dist_bruteforce.py                      # alle Kerne, Checkpoint in .cache/
+    python weight_dist_bruteforce.py --workers 1          # ein Prozess, wie früher
+    python weight_dist_bruteforce.py --neu                # vorhandenen Checkpoint ignorieren
+    python weight_dist_bruteforce.py --engine numpy       # alle Kandidaten als NumPy-Blöcke
+    python weight_dist_bruteforce.py --engine python      # Zelle für Zelle
+    python weight_dist_bruteforce.py --check              # Intervall-Engine gegen NumPy-Engine prüfen
+
+Der äußere Raum (minuend, f_size, size_shift) wird in Chunks zu je CHUNK_SIZE Punkten
+geteilt und parallel durchsucht. Fertige Chunks landen regelmäßig im Checkpoint;
+ein abgebrochener Lauf (Strg+C) setzt beim nächsten Start mit derselben
+Konfiguration dort fort. Die Trefferliste ist unabhängig von der Worker-Zahl.
+
+Die Engine "numpy" wertet pro (minuend, f_size, size_shift) alle
+(index_shift, f_index)-Kandidaten als einen Block aus: zuerst die drei
+Einzelzellen-Constraints für alle, dann volle Tabellen, SUMME und DIFF als
+Masken nur für die übrigen. Gleiche Treffer wie Zelle für Zelle; der Standardlauf
+(F_STEPS=10, ein Prozess) braucht 8 s statt 3,5 min.
+
+Die Standard-Engine "intervals" (braucht ebenfalls numpy) erzeugt nicht erst alle Kandidaten: Jede
+Einzelzellen-Constraint C1-C3 ist "floor(sqrt(arg)/2) == minuend - Ziel", also
+4*q^2 <= arg < 4*(q+1)^2 mit arg = f_size*(size+size_shift) + f_index*(index+index_shift).
+Daraus folgen exakte Intervalle für index_shift und (pro index_shift) für f_index;
+nur deren Schnittmenge wird als Block geprüft (siehe interval_candidates).
+"""
+import argparse
+import json
 import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - ohne numpy bleibt nur die Python-Engine
+    np = None
 
 # -------------------------
 # Parameterbereiche
@@ -21,6 +60,20 @@ F_STEPS        = 10  # hier nach Bedarf anpassen
 MAX_SIZE  = 15
 MAX_INDEX = MAX_SIZE - 1
 
+# -------------------------
+# Parallelisierung / Checkpoints
+# -------------------------
+CHUNK_SIZE          = 25   # (minuend, f_size, size_shift)-Punkte pro Chunk
+PROGRESS_SECONDS    = 5    # Abstand der Fortschrittsmeldungen
+CHECKPOINT_SECONDS  = 30   # Abstand der Checkpoint-Speicherungen
+CHECKPOINT_PATH     = Path(__file__).resolve().parent / ".cache" / "weight_dist_bruteforce.json"
+
+# "intervals": nur Kandidaten in den analytischen C1-C3-Intervallen, als Block (search_outer_intervals)
+# "numpy": alle Kandidaten eines (minuend, f_size, size_shift) als Block (search_outer_numpy)
+# "python": Zelle für Zelle (search_outer); gleiche Treffer, nur langsamer
+ENGINES = ("intervals", "numpy", "python")
+ENGINE = "intervals" if np is not None else "python"
+
 
 # -------------------------
 # Hilfsfunktionen für F-Ranges
@@ -160,7 +213,8 @@ def precheck_indexshift_findex(minuend, size_shift, f_size):
 
     Wenn es eine Constraint gibt, die in ALLEN vier Ecken in dieselbe
     Richtung fehlschlägt, verwerfen wir die gesamte (index_shift, f_index)-Ebene
-    für dieses (minuend, size_shift, f_size).
+    für dieses (minuend, size_shift, f_size). Das arg ist bilinear in
+    (index_shift, f_index), seine Extrema liegen also in den Ecken.
     """
     index_shift_min = INDEX_SHIFT_RANGE.start
     index_shift_max = INDEX_SHIFT_RANGE.stop - 1
@@ -179,10 +233,11 @@ def precheck_indexshift_findex(minuend, size_shift, f_size):
         return True
 
     # Für jede einzelne Constraint separat betrachten:
-    for j in range(len(corners[0])):  # 3 Constraints # type: ignore 
-        signs = [sign(c[j]) for c in corners if c[j] != 0] # type: ignore
-        if not signs:
-            # Alle vier Ecken treffen genau oder wir haben keine Info -> nix zu sagen
+    for j in range(len(corners[0])):  # 3 Constraints # type: ignore
+        signs = [sign(c[j]) for c in corners]  # type: ignore
+        # Eine Ecke, die genau trifft, ist selbst ein zulässiger Punkt -> nicht verwerfen
+        # (früher wurden Nullen ignoriert und z.B. [0, +, +, +] fälschlich verworfen).
+        if 0 in signs:
             continue
         # Wenn alle Vorzeichen gleich sind -> alle scheitern in derselben Richtung
         if all(s == signs[0] for s in signs):
@@ -191,130 +246,581 @@ def precheck_indexshift_findex(minuend, size_shift, f_size):
     return True
 
 
-# --- Haupt-Brute-Force mit Vorprüfungen und Substeps ---
+# --- Innere Suche für einen festen Punkt (minuend, f_size, size_shift) ---
 
-def brute_force():
+def search_outer(minuend, f_size, size_shift):
+    """
+    Alle Treffer für ein festes (minuend, f_size, size_shift): die Schleifen
+    index_shift -> f_index (mit Substeps) inklusive aller Vorprüfungen.
+    """
     matches = []
 
-    # Loop-Reihenfolge:
-    # minuend -> f_size (mit Substeps) -> size_shift -> index_shift -> f_index (mit Substeps)
-    for minuend in MINUEND_RANGE:
-        for f_size in f_iter(F_SIZE_RANGE, F_STEPS):
-            for size_shift in SIZE_SHIFT_RANGE:
-
-                # 2D-Vorprüfung auf Ebene (index_shift, f_index)
-                if not precheck_indexshift_findex(minuend, size_shift, f_size):
-                    continue  # ganze index_shift/f_index-Ebene überspringen
-
-                for index_shift in INDEX_SHIFT_RANGE:
-
-                    # 1D-Vorprüfung: nur f_index variieren
-                    if not precheck_f_index(minuend, size_shift, f_size, index_shift):
-                        continue  # diese index_shift-Kombination bringt keine Lösung
-
-                    for f_index in f_iter(F_INDEX_RANGE, F_STEPS):
-
-                        # -------------------------
-                        # Tabelle[index][size]
-                        # -------------------------
-                        table = [[0] * (MAX_SIZE + 1) for _ in range(MAX_INDEX + 1)]
-                        invalid = False
-
-                        for idx in range(0, MAX_INDEX + 1):
-                            for size in range(1, MAX_SIZE + 1):
-                                val = cell_value(
-                                    size, idx,
-                                    minuend, size_shift, f_size,
-                                    index_shift, f_index
-                                )
-                                if val is None:
-                                    invalid = True
-                                    break
-                                table[idx][size] = val
-
-                            if invalid:
-                                break
-
-                            # Frühzeitige Checks nach jeweils kompletter Zeile
-                            # (lokales Pruning auf Einzelzellen):
-
-                            if idx == 0:
-                                # result(size=2,index=0)==4
-                                if table[0][2] != 4:
-                                    invalid = True
-                                    break
-
-                            elif idx == 1:
-                                # result(size=2,index=1)==3
-                                if table[1][2] != 3:
-                                    invalid = True
-                                    break
-
-                        if invalid:
-                            continue
-
-                        # Zusätzliche Bedingung auf Einzelzellen:
-                        # result(size=9,index=8)==1
-                        if table[8][9] != 1:
-                            continue
-
-                        # -------------------------
-                        # SUMME (monoton → Pruning auf Summen)
-                        # -------------------------
-                        sums = [0] * (MAX_SIZE + 1)   # SUMME[size]
-                        for size in range(1, MAX_SIZE + 1):
-                            s = 0
-                            for idx in range(0, MAX_INDEX + 1):
-                                s += table[idx][size]
-                            sums[size] = s
-
-                        # HARTE Summen-Constraints NUR für Sizes 2..5:
-                        # (Pruning-Teil, bevor DIFF überhaupt berechnet wird)
-                        if not (
-                            sums[2] == 7 and
-                            sums[3] == 9 and
-                            sums[4] == 11 and
-                            sums[5] == 13
-                        ):
-                            continue
-
-                        # -------------------------
-                        # DIFF (nur Ergebnis-Filterung)
-                        # -------------------------
-                        diffs = [None] * (MAX_SIZE + 1)  # DIFF[size] = SUMME(size)-SUMME(size-1)
-                        for size in range(2, MAX_SIZE + 1):
-                            diffs[size] = sums[size] - sums[size - 1] # type: ignore
-
-                        # DIFF-Constraints:
-
-                        if not (
-                            diffs[2] == 2 and diffs[7] == 1 and
-                            diffs[11] >= 1 and diffs[13] >= 0 # type: ignore
-                        ):
-                            continue
-
-                        if not (
-                            diffs[2] >= diffs[3] >= diffs[4] >= diffs[5] >= diffs[6] >= diffs[7] >= diffs[8] >= diffs[9] >= diffs[10] >= diffs[11] >= diffs[12] >= diffs[13] >= diffs[14] # type: ignore
-                        ):
-                            continue
-
-                        # Wenn wir hier sind, passt alles
-                        result = {
-                            "minuend": minuend,
-                            "size_shift": size_shift,
-                            "f_size": f_size,
-                            "index_shift": index_shift,
-                            "f_index": f_index,
-                            "sums": [sums[size] for size in range(1, MAX_SIZE + 1)],
-                            "diffs": [diffs[size] for size in range(2, MAX_SIZE + 1)],
-                        }
-                        matches.append(result)
+    # 2D-Vorprüfung auf Ebene (index_shift, f_index)
+    if not precheck_indexshift_findex(minuend, size_shift, f_size):
+        return matches  # ganze index_shift/f_index-Ebene überspringen
+
+    for index_shift in INDEX_SHIFT_RANGE:
+
+        # 1D-Vorprüfung: nur f_index variieren
+        if not precheck_f_index(minuend, size_shift, f_size, index_shift):
+            continue  # diese index_shift-Kombination bringt keine Lösung
+
+        for f_index in f_iter(F_INDEX_RANGE, F_STEPS):
+
+            # -------------------------
+            # Tabelle[index][size]
+            # -------------------------
+            table = [[0] * (MAX_SIZE + 1) for _ in range(MAX_INDEX + 1)]
+            invalid = False
+
+            for idx in range(0, MAX_INDEX + 1):
+                for size in range(1, MAX_SIZE + 1):
+                    val = cell_value(
+                        size, idx,
+                        minuend, size_shift, f_size,
+                        index_shift, f_index
+                    )
+                    if val is None:
+                        invalid = True
+                        break
+                    table[idx][size] = val
+
+                if invalid:
+                    break
+
+                # Frühzeitige Checks nach jeweils kompletter Zeile
+                # (lokales Pruning auf Einzelzellen):
+
+                if idx == 0:
+                    # result(size=2,index=0)==4
+                    if table[0][2] != 4:
+                        invalid = True
+                        break
+
+                elif idx == 1:
+                    # result(size=2,index=1)==3
+                    if table[1][2] != 3:
+                        invalid = True
+                        break
+
+            if invalid:
+                continue
+
+            # Zusätzliche Bedingung auf Einzelzellen:
+            # result(size=9,index=8)==1
+            if table[8][9] != 1:
+                continue
+
+            # -------------------------
+            # SUMME (monoton → Pruning auf Summen)
+            # -------------------------
+            sums = [0] * (MAX_SIZE + 1)   # SUMME[size]
+            for size in range(1, MAX_SIZE + 1):
+                s = 0
+                for idx in range(0, MAX_INDEX + 1):
+                    s += table[idx][size]
+                sums[size] = s
+
+            # HARTE Summen-Constraints NUR für Sizes 2..5:
+            # (Pruning-Teil, bevor DIFF überhaupt berechnet wird)
+            if not (
+                sums[2] == 7 and
+                sums[3] == 9 and
+                sums[4] == 11 and
+                sums[5] == 13
+            ):
+                continue
+
+            # -------------------------
+            # DIFF (nur Ergebnis-Filterung)
+            # -------------------------
+            diffs = [None] * (MAX_SIZE + 1)  # DIFF[size] = SUMME(size)-SUMME(size-1)
+            for size in range(2, MAX_SIZE + 1):
+                diffs[size] = sums[size] - sums[size - 1] # type: ignore
+
+            # DIFF-Constraints:
+
+            if not (
+                diffs[2] == 2 and diffs[7] == 1 and
+                diffs[11] >= 1 and diffs[13] >= 0 # type: ignore
+            ):
+                continue
+
+            if not (
+                diffs[2] >= diffs[3] >= diffs[4] >= diffs[5] >= diffs[6] >= diffs[7] >= diffs[8] >= diffs[9] >= diffs[10] >= diffs[11] >= diffs[12] >= diffs[13] >= diffs[14] # type: ignore
+            ):
+                continue
+
+            # Wenn wir hier sind, passt alles
+            result = {
+                "minuend": minuend,
+                "size_shift": size_shift,
+                "f_size": f_size,
+                "index_shift": index_shift,
+                "f_index": f_index,
+                "sums": [sums[size] for size in range(1, MAX_SIZE + 1)],
+                "diffs": [diffs[size] for size in range(2, MAX_SIZE + 1)],
+            }
+            matches.append(result)
+
+    return matches
+
+
+# --- NumPy-Pfad: ganzer Block von Kandidaten auf einmal ---
+
+def evaluate_block(minuend, size_shift, f_size, index_shifts, f_indices):
+    """
+    Tabellen für einen Block von Kandidaten (index_shift[c], f_index[c]) bei festem
+    (minuend, size_shift, f_size). Liefert (tables, invalid):
+      tables[c, index, size - 1] wie table[index][size] in search_outer,
+      invalid[c] = True, wenn eine Formelzelle ein negatives Argument hat (cell_value -> None).
+    Gleiche Rechenreihenfolge wie cell_value, daher bitgleiche Ergebnisse.
+    """
+    sizes = np.arange(1, MAX_SIZE + 1)
+    indices = np.arange(0, MAX_INDEX + 1)
+    used = sizes[None, :] > indices[:, None]          # size > index, sonst leere Zelle (0)
+    formula = used & (sizes[None, :] != 1)            # size == 1 -> fest 5
+
+    arg = (
+        f_size * (sizes + size_shift)[None, None, :]
+        + f_indices[:, None, None] * (indices[None, :, None] + index_shifts[:, None, None])
+    )
+    negative = arg < 0
+    invalid = (negative & formula).any(axis=(1, 2))
+
+    with np.errstate(invalid="ignore"):
+        values = minuend - np.floor(np.sqrt(np.where(negative, 0.0, arg)) / 2.0)
+    values = np.maximum(values, 0)
+    tables = np.where(formula, values, np.where(used, 5, 0)).astype(np.int64)
+    return tables, invalid
+
+
+def cell_block(size, index, minuend, size_shift, f_size, index_shifts, f_indices):
+    """cell_value(size, index, ...) für einen ganzen Block (nur Formelzellen); -1 statt None."""
+    arg = f_size * (size + size_shift) + f_indices * (index + index_shifts)
+    with np.errstate(invalid="ignore"):
+        values = np.maximum(minuend - np.floor(np.sqrt(np.where(arg < 0, 0.0, arg)) / 2.0), 0)
+    return np.where(arg < 0, -1, values)
+
+
+def single_cell_screen(minuend, size_shift, f_size, index_shifts, f_indices):
+    """Maske der Kandidaten mit table[0][2]==4, table[1][2]==3 und table[8][9]==1 (C1-C3)."""
+    ok = cell_block(2, 0, minuend, size_shift, f_size, index_shifts, f_indices) == 4
+    ok &= cell_block(2, 1, minuend, size_shift, f_size, index_shifts, f_indices) == 3
+    ok &= cell_block(9, 8, minuend, size_shift, f_size, index_shifts, f_indices) == 1
+    return ok
+
+
+def block_matches(tables, invalid, single_cells_only=False):
+    """
+    Alle Constraints aus search_outer als boolesche Masken (mit single_cells_only nur C1-C3).
+    Liefert (Maske, sums[c, size - 1], diffs[c, size - 2]).
+    """
+    ok = ~invalid
+    ok &= tables[:, 0, 1] == 4   # result(size=2,index=0)==4
+    ok &= tables[:, 1, 1] == 3   # result(size=2,index=1)==3
+    ok &= tables[:, 8, 8] == 1   # result(size=9,index=8)==1
+
+    sums = tables.sum(axis=1)                        # SUMME[size] = sums[:, size - 1]
+    if single_cells_only:
+        return ok, sums, sums[:, 1:] - sums[:, :-1]
+    ok &= (sums[:, 1] == 7) & (sums[:, 2] == 9) & (sums[:, 3] == 11) & (sums[:, 4] == 13)
+
+    diffs = sums[:, 1:] - sums[:, :-1]               # DIFF[size] = diffs[:, size - 2]
+    ok &= (diffs[:, 0] == 2) & (diffs[:, 5] == 1) & (diffs[:, 9] >= 1) & (diffs[:, 11] >= 0)
+    ok &= np.all(diffs[:, 0:12] >= diffs[:, 1:13], axis=1)   # DIFF[2] >= DIFF[3] >= ... >= DIFF[14]
+    return ok, sums, diffs
+
 
+def search_outer_numpy(minuend, f_size, size_shift, single_cells_only=False):
+    """
+    Wie search_outer, aber alle (index_shift, f_index)-Kandidaten, die die Vorprüfungen
+    überstehen, werden als ein Block ausgewertet. Gleiche Treffer in gleicher Reihenfolge.
+    """
+    if not precheck_indexshift_findex(minuend, size_shift, f_size):
+        return []
+
+    f_values = list(f_iter(F_INDEX_RANGE, F_STEPS))
+    shifts = [
+        index_shift for index_shift in INDEX_SHIFT_RANGE
+        if precheck_f_index(minuend, size_shift, f_size, index_shift)
+    ]
+    # Reihenfolge wie in den Schleifen: index_shift außen, f_index innen
+    return verify_candidates(
+        minuend, f_size, size_shift,
+        [index_shift for index_shift in shifts for _ in f_values],
+        f_values * len(shifts),
+        single_cells_only,
+    )
+
+
+def verify_candidates(minuend, f_size, size_shift, shifts, f_indices, single_cells_only=False):
+    """Exakte Prüfung eines Blocks (index_shift[c], f_index[c]); Treffer in Block-Reihenfolge."""
+    index_shifts = np.asarray(shifts, dtype=np.int64)
+    f_array = np.asarray(f_indices, dtype=np.float64)
+    if not len(index_shifts):
+        return []
+
+    # Erst die drei Einzelzellen für alle Kandidaten, volle Tabellen nur für den Rest
+    # (entspricht dem frühen Abbruch nach Zeile 0/1 in search_outer).
+    candidates = np.flatnonzero(single_cell_screen(minuend, size_shift, f_size, index_shifts, f_array))
+    if not len(candidates):
+        return []
+    tables, invalid = evaluate_block(minuend, size_shift, f_size, index_shifts[candidates], f_array[candidates])
+    ok, sums, diffs = block_matches(tables, invalid, single_cells_only)
+
+    matches = []
+    for row in np.flatnonzero(ok).tolist():
+        c = int(candidates[row])
+        matches.append({
+            "minuend": minuend,
+            "size_shift": size_shift,
+            "f_size": f_size,
+            "index_shift": int(index_shifts[c]),
+            "f_index": float(f_array[c]),
+            "sums": sums[row].tolist(),
+            "diffs": diffs[row].tolist(),
+        })
     return matches
 
 
-def main():
-    matches = brute_force()
+# --- Intervall-Solver: C1-C3 analytisch nach index_shift und f_index auflösen ---
+
+# (size, index, Zielwert) der Einzelzellen-Constraints C1-C3
+SINGLE_CELL_CONSTRAINTS = ((2, 0, 4), (2, 1, 3), (9, 8, 1))
+# Intervalle werden um diesen relativen Rand erweitert (Rundung von arg/sqrt);
+# jeder Kandidat wird danach ohnehin exakt nachgerechnet.
+INTERVAL_MARGIN = 1e-9
+
+
+def arg_interval(minuend, target):
+    """
+    [lo, hi) der Argumente mit max(minuend - floor(sqrt(arg)/2), 0) == target, oder None.
+    Umkehrung von floor(sqrt(x)/2) == q:  4*q^2 <= x < 4*(q+1)^2  mit q = minuend - target.
+    """
+    if target == 0:
+        return 4.0 * minuend * minuend, math.inf
+    q = minuend - target
+    if q < 0:
+        return None
+    return 4.0 * q * q, 4.0 * (q + 1) * (q + 1)
+
+
+def widen(lo, hi):
+    return lo - INTERVAL_MARGIN * (1.0 + abs(lo)), hi + INTERVAL_MARGIN * (1.0 + abs(hi))
+
+
+def index_shift_interval(minuend, size_shift, f_size, f_lo, f_hi):
+    """
+    Ganzzahlige [erster, letzter] index_shift, für die jede Constraint bei irgendeinem
+    f_index in [f_lo, f_hi] erfüllbar ist (notwendige Bedingung), oder None.
+    arg = a + f_index*(index + index_shift) mit f_index > 0: index + index_shift muss in
+    [lo - a, hi - a) / f_index liegen; über f_index vereinigt sind das die Grenzen bei f_lo und f_hi.
+    """
+    first, last = -math.inf, math.inf
+    for size, index, target in SINGLE_CELL_CONSTRAINTS:
+        arg_range = arg_interval(minuend, target)
+        if arg_range is None:
+            return None
+        lo, hi = arg_range
+        a = f_size * (size + size_shift)
+        u_lo, u_hi = widen(min((lo - a) / f_lo, (lo - a) / f_hi), max((hi - a) / f_lo, (hi - a) / f_hi))
+        first, last = max(first, u_lo - index), min(last, u_hi - index)
+    first = max(INDEX_SHIFT_RANGE.start, math.ceil(first))
+    last = min(INDEX_SHIFT_RANGE.stop - 1, math.floor(last)) if last < math.inf else INDEX_SHIFT_RANGE.stop - 1
+    return (first, last) if first <= last else None
+
+
+def f_index_intervals(minuend, size_shift, f_size, index_shifts):
+    """
+    Pro index_shift das (leicht erweiterte) geschlossene f_index-Intervall, in dem C1-C3
+    gleichzeitig gelten: lo <= a + f_index*b < hi mit b = index + index_shift. Leer, wenn lo > hi.
+    """
+    f_lo = np.full(len(index_shifts), -np.inf)
+    f_hi = np.full(len(index_shifts), np.inf)
+    for size, index, target in SINGLE_CELL_CONSTRAINTS:
+        arg_range = arg_interval(minuend, target)
+        if arg_range is None:
+            return f_lo, np.full(len(index_shifts), -np.inf)
+        lo, hi = arg_range
+        a = f_size * (size + size_shift)
+        b = (index + index_shifts).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            left, right = (lo - a) / b, (hi - a) / b
+        x_lo, x_hi = widen(np.minimum(left, right), np.maximum(left, right))
+        # b == 0: arg hängt nicht von f_index ab -> alles oder nichts
+        always = lo <= a < hi
+        x_lo = np.where(b == 0, -np.inf if always else np.inf, x_lo)
+        x_hi = np.where(b == 0, np.inf if always else -np.inf, x_hi)
+        f_lo, f_hi = np.maximum(f_lo, x_lo), np.minimum(f_hi, x_hi)
+    return f_lo, f_hi
+
+
+def interval_candidates(minuend, f_size, size_shift, f_values):
+    """
+    Nur die (index_shift, f_index) innerhalb der Schnittmenge der C1-C3-Intervalle,
+    in Schleifen-Reihenfolge (index_shift außen). f_values muss aufsteigend sortiert sein (wie f_iter).
+    """
+    f_values = np.asarray(f_values, dtype=np.float64)
+    if not len(f_values):
+        return np.empty(0, dtype=np.int64), f_values
+    if f_values[0] <= 0:
+        # Die index_shift-Schranken setzen f_index > 0 voraus; die f_index-Intervalle gelten immer.
+        shift_range = (INDEX_SHIFT_RANGE.start, INDEX_SHIFT_RANGE.stop - 1)
+    else:
+        shift_range = index_shift_interval(minuend, size_shift, f_size, f_values[0], f_values[-1])
+        if shift_range is None:
+            return np.empty(0, dtype=np.int64), f_values[:0]
+
+    shifts = np.arange(shift_range[0], shift_range[1] + 1, dtype=np.int64)
+    f_lo, f_hi = f_index_intervals(minuend, size_shift, f_size, shifts)
+    start = np.searchsorted(f_values, f_lo, side="left")
+    counts = np.maximum(np.searchsorted(f_values, f_hi, side="right") - start, 0)
+    # f-Positionen start[i], start[i] + 1, ... für jeden index_shift hintereinander
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(shifts, counts), f_values[np.repeat(start, counts) + offsets]
+
+
+def search_outer_intervals(minuend, f_size, size_shift, single_cells_only=False):
+    """
+    Wie search_outer_numpy, aber statt Ecken-Vorprüfungen werden nur die Kandidaten
+    innerhalb der analytischen C1-C3-Intervalle erzeugt und dann exakt geprüft.
+    """
+    f_values = list(f_iter(F_INDEX_RANGE, F_STEPS))
+    index_shifts, f_indices = interval_candidates(minuend, f_size, size_shift, f_values)
+    return verify_candidates(minuend, f_size, size_shift, index_shifts, f_indices, single_cells_only)
+
+
+# --- Aufteilung in Chunks, Prozess-Pool, Fortschritt und Checkpoints ---
+
+def outer_points():
+    """Alle (minuend, f_size, size_shift) in der Reihenfolge der ursprünglichen Schleifen."""
+    return [
+        (minuend, f_size, size_shift)
+        for minuend in MINUEND_RANGE
+        for f_size in f_iter(F_SIZE_RANGE, F_STEPS)
+        for size_shift in SIZE_SHIFT_RANGE
+    ]
+
+
+def make_chunks(points, chunk_size):
+    """Aufeinanderfolgende Punkte zu Chunks zusammenfassen (Chunk-Nummer = Position in der Liste)."""
+    size = max(1, chunk_size)
+    return [points[start:start + size] for start in range(0, len(points), size)]
+
+
+def search_chunk(chunk, engine="python", single_cells_only=False):
+    """Treffer eines Chunks, in Schleifen-Reihenfolge (läuft in einem Worker-Prozess)."""
+    if engine == "python":
+        return [match for point in chunk for match in search_outer(*point)]
+    search = {"intervals": search_outer_intervals, "numpy": search_outer_numpy}[engine]
+    matches = []
+    for minuend, f_size, size_shift in chunk:
+        matches.extend(search(minuend, f_size, size_shift, single_cells_only))
+    return matches
+
+
+def range_signature(r):
+    """[start, stop, step] – die Schrittweite gehört dazu, sonst passt ein Checkpoint zu einem anderen Raster."""
+    return [r.start, r.stop, r.step]
+
+
+def search_signature(chunk_size, single_cells_only=False):
+    """Alles, was das Ergebnis bestimmt: ein Checkpoint passt nur zur selben Konfiguration."""
+    return {
+        "version": 2,  # 2: Ecken-Vorprüfung verwirft keine Ebenen mit exakt treffender Ecke mehr
+        "minuend": range_signature(MINUEND_RANGE),
+        "f_size": range_signature(F_SIZE_RANGE),
+        "f_index": range_signature(F_INDEX_RANGE),
+        "index_shift": range_signature(INDEX_SHIFT_RANGE),
+        "size_shift": range_signature(SIZE_SHIFT_RANGE),
+        "f_steps": F_STEPS,
+        "max_size": MAX_SIZE,
+        "chunk_size": chunk_size,
+        "single_cells_only": single_cells_only,
+    }
+
+
+def load_checkpoint(path, signature):
+    """Fertige Chunks {Nummer: Treffer} aus einem passenden Checkpoint, sonst {}."""
+    if path is None or not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("signature") != signature:
+        print(f"Checkpoint {path} gehört zu einer anderen Konfiguration – starte neu.", file=sys.stderr)
+        return {}
+    return {int(chunk_id): matches for chunk_id, matches in data.get("chunks", {}).items()}
+
+
+def save_checkpoint(path, signature, done):
+    """Atomar schreiben (tmp + replace), damit ein Abbruch keinen halben Checkpoint hinterlässt."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    payload = {"signature": signature, "chunks": {str(chunk_id): done[chunk_id] for chunk_id in sorted(done)}}
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def format_seconds(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    """Fortschritt/ETA auf stderr, höchstens alle PROGRESS_SECONDS Sekunden."""
+
+    def __init__(self, total, already_done):
+        self.total = total
+        self.done = already_done
+        self.resumed = already_done
+        self.started = time.time()
+        self.last_report = 0.0
+
+    def update(self, n_matches, force=False):
+        self.done += 1
+        now = time.time()
+        if not force and now - self.last_report < PROGRESS_SECONDS:
+            return
+        self.last_report = now
+        finished_here = self.done - self.resumed
+        elapsed = now - self.started
+        eta = elapsed / finished_here * (self.total - self.done) if finished_here else 0.0
+        print(
+            f"[{self.done}/{self.total} Chunks, {100.0 * self.done / max(1, self.total):5.1f}%] "
+            f"{n_matches} Treffer, vergangen {format_seconds(elapsed)}, ETA {format_seconds(eta)}",
+            file=sys.stderr,
+        )
+
+
+def brute_force(workers=1, checkpoint=None, chunk_size=CHUNK_SIZE, engine=ENGINE, single_cells_only=False):
+    """
+    Durchsucht den ganzen Parameterraum. Der äußere Raum (minuend, f_size, size_shift)
+    wird in Chunks geteilt und bei workers > 1 auf einen Prozess-Pool verteilt.
+    Die Treffer werden nach Chunk-Nummer zusammengesetzt, also in derselben
+    Reihenfolge wie bei den verschachtelten Schleifen, egal wann welcher Chunk fertig wird.
+
+    Mit `checkpoint` (Pfad) werden fertige Chunks regelmäßig gespeichert und bei
+    einem erneuten Aufruf mit derselben Konfiguration übersprungen.
+
+    single_cells_only prüft nur C1-C3 (nicht mit der Python-Engine): Der Standardraum hat
+    keine vollen Treffer, so bleiben für den Engine-Vergleich echte Kandidaten übrig.
+    """
+    if engine != "python" and np is None:
+        raise RuntimeError(f"Engine '{engine}' braucht numpy (pip install numpy) – oder --engine python.")
+    if single_cells_only and engine == "python":
+        raise ValueError("single_cells_only gibt es nur für die Engines 'intervals' und 'numpy'.")
+    chunks = make_chunks(outer_points(), chunk_size)
+    signature = search_signature(chunk_size, single_cells_only)
+    done = load_checkpoint(checkpoint, signature)
+    pending = [chunk_id for chunk_id in range(len(chunks)) if chunk_id not in done]
+    if done:
+        print(f"Checkpoint: {len(done)} von {len(chunks)} Chunks bereits fertig.", file=sys.stderr)
+
+    progress = Progress(len(chunks), len(done))
+    n_matches = sum(len(matches) for matches in done.values())
+    last_save = time.time()
+
+    def finish(chunk_id, matches):
+        nonlocal n_matches, last_save
+        done[chunk_id] = matches
+        n_matches += len(matches)
+        progress.update(n_matches, force=len(done) == len(chunks))
+        if checkpoint is not None and time.time() - last_save >= CHECKPOINT_SECONDS:
+            save_checkpoint(checkpoint, signature, done)
+            last_save = time.time()
+
+    try:
+        if workers <= 1 or len(pending) <= 1:
+            for chunk_id in pending:
+                finish(chunk_id, search_chunk(chunks[chunk_id], engine, single_cells_only))
+        else:
+            # Nur ein paar Chunks pro Worker gleichzeitig einreichen: bei einem Abbruch
+            # müssen dann nur die gerade laufenden Chunks noch zu Ende rechnen.
+            queue = iter(pending)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                running = {}
+                for chunk_id in queue:
+                    running[pool.submit(search_chunk, chunks[chunk_id], engine, single_cells_only)] = chunk_id
+                    if len(running) >= 2 * workers:
+                        break
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(running.pop(future), future.result())
+                        next_id = next(queue, None)
+                        if next_id is not None:
+                            running[pool.submit(search_chunk, chunks[next_id], engine, single_cells_only)] = next_id
+    finally:
+        if checkpoint is not None and pending:
+            save_checkpoint(checkpoint, signature, done)
+
+    return [match for chunk_id in range(len(chunks)) for match in done[chunk_id]]
+
+
+def check_engines(workers, chunk_size):
+    """
+    Vollständige Läufe mit "intervals" und "numpy" ohne Checkpoint, einmal mit allen
+    Constraints und einmal nur mit C1-C3. Der Standardraum hat keine vollen Treffer;
+    erst der C1-C3-Lauf vergleicht echte Kandidaten. 0 bei gleichen Treffern, sonst 1.
+    """
+    for single_cells_only, label in ((False, "alle Constraints"), (True, "nur C1-C3")):
+        results = {}
+        for engine in ("intervals", "numpy"):
+            started = time.time()
+            results[engine] = brute_force(
+                workers=workers, chunk_size=chunk_size, engine=engine, single_cells_only=single_cells_only
+            )
+            print(f"{label}, {engine:9s}: {len(results[engine])} Treffer in {time.time() - started:.1f} s")
+        if results["intervals"] != results["numpy"]:
+            print(f"FEHLER ({label}): Intervall-Engine und NumPy-Engine liefern unterschiedliche Treffer.")
+            return 1
+    print("OK: gleiche Treffer in gleicher Reihenfolge.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Brute-Force-Suche nach Parametern der Gewichtungstabelle.")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Anzahl Prozesse (default: alle Kerne).",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help=f"(minuend, f_size, size_shift)-Punkte pro Chunk (default: {CHUNK_SIZE}).",
+    )
+    parser.add_argument(
+        "--checkpoint", type=Path, default=CHECKPOINT_PATH,
+        help="Checkpoint-Datei (default: .cache/weight_dist_bruteforce.json).",
+    )
+    parser.add_argument(
+        "--engine", choices=ENGINES, default=ENGINE,
+        help=f"Nur Intervall-Kandidaten, alle Kandidaten blockweise oder Zelle für Zelle (default: {ENGINE}).",
+    )
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Intervall-Engine gegen die NumPy-Block-Engine prüfen, mit allen Constraints und nur mit C1-C3 "
+        "(ohne Checkpoint); Exit-Code 1 bei Abweichung.",
+    )
+    parser.add_argument("--neu", action="store_true", help="Vorhandenen Checkpoint verwerfen und neu starten.")
+    parser.add_argument("--ohne-checkpoint", action="store_true", help="Keinen Checkpoint lesen oder schreiben.")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        return check_engines(args.workers, args.chunk_size)
+    checkpoint = None if args.ohne_checkpoint else args.checkpoint
+    if checkpoint is not None and args.neu and checkpoint.exists():
+        checkpoint.unlink()
+    try:
+        matches = brute_force(
+            workers=args.workers, checkpoint=checkpoint, chunk_size=args.chunk_size, engine=args.engine
+        )
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            print(f"\nAbgebrochen – Fortschritt gespeichert in {checkpoint}.", file=sys.stderr)
+        return 130
     print(f"Insgesamt {len(matches)} Treffer gefunden.\n")
 
     # Einzelne Treffer ausgeben – neue Parameter-Reihenfolge:
@@ -357,7 +863,8 @@ def main():
         print(f"size_shift  : min={min_size_shift}  max={max_size_shift}")
     else:
         print("Keine Treffer – Min/Max der Parameter sind nicht definiert.")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Search weight tables declared in a spec file (generalizes weight_dist_bruteforce.py).
+
+    python weight_table_search.py                                  # weight_specs/weight_dist.json
+    python weight_table_search.py --spec my_spec.json --workers 4
+    python weight_table_search.py --format java --show 3           # layers 3..8 for OpenAiTagMatchingClient
+    python weight_table_search.py --output .cache/weight_tables.json
+
+A spec (JSON) declares:
+- "parameters": name -> {"range": [start, stop], "steps": n} (steps as F_STEPS in
+  weight_dist_bruteforce.py: every integer step split into n values),
+- "outer": the parameters whose grid points are split into chunks and searched in
+  parallel; each chunk is one NumPy block of its outer points times the grid of all
+  other ("inner") parameters,
+- "max_size", "filled" (which (size, index) cells exist) and "cell" (the formula),
+- "constraints": expressions over cell(size, index), total(size), diff(size),
+  weight(layer, rank), layers(), cutoff(layer), all_of(...), nonincreasing(...),
+- optionally "layers": {"first", "last", "size", "cutoff", "weight_range"}, which maps a
+  layer to the first `cutoff` cells of column `size`; the results are then printed as the
+  weights_by_layer table of topic_tags_assignment.weights_for_layer.
+
+Each constraint is compiled into a pruning predicate. Predicates run cheapest first
+(by the number of cells they read) on the candidates still alive, and cells are only
+computed when a predicate needs them, so most candidates are dropped after a few cells.
+Formula cells that are not finite (e.g. sqrt of a negative argument) make a candidate
+invalid, as in weight_dist_bruteforce.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import CodeType
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from weight_dist_bruteforce import f_iter
+
+DEFAULT_SPEC = Path(__file__).resolve().parent / "weight_specs" / "weight_dist.json"
+CHUNK_SIZE = 25          # outer grid points per chunk, evaluated as one block
+PROGRESS_SECONDS = 5
+DEFAULT_SHOW = 5         # distinct tables printed
+MAX_LISTED_PARAMETERS = 10  # parameter sets stored per distinct table in --output
+FORMATS = ("python", "java", "json")
+JAVA_LAYERS = range(3, 9)  # layerEq range of OpenAiTagMatchingClient.weightsForLayerEquivalent
+VALIDITY = "finite integral table, weights in weight_range"  # implicit last predicate (statistics)
+
+# Names available in "cell", "filled", the layer expressions and the constraints.
+FUNCTIONS: Dict[str, Any] = {
+    "sqrt": np.sqrt,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "abs": np.abs,
+    "maximum": np.maximum,
+    "minimum": np.minimum,
+    "where": np.where,
+    "range": range,
+    "min": min,
+    "max": max,
+}
+CELL_READERS = {"cell": 1, "weight": 1}  # constant arguments -> reads one cell
+COLUMN_READERS = {"total": 1, "diff": 2}  # constant arguments -> reads one or two columns
+
+WeightsByLayer = Dict[int, List[int]]
+
+
+def _parse(source: str, what: str) -> ast.Expression:
+    try:
+        return ast.parse(source, mode="eval")
+    except SyntaxError as exc:
+        raise ValueError(f"Invalid {what} expression {source!r}: {exc.msg}") from exc
+
+
+def _compile(source: str, what: str, tree: Optional[ast.Expression] = None) -> CodeType:
+    return compile(tree or _parse(source, what), f"<{what}>", "eval")
+
+
+def _evaluate(code: CodeType, names: Dict[str, Any]) -> Any:
+    return eval(code, {"__builtins__": {}, **FUNCTIONS, **names})  # noqa: S307 - spec files are local input
+
+
+@dataclass
+class Predicate:
+    source: str
+    code: CodeType
+    cost: int  # cells read; constraints with non-constant reads count as the whole table
+
+
+@dataclass
+class Spec:
+    raw: Dict[str, Any]  # as loaded, for the worker processes
+    parameters: Dict[str, List[float]]  # values per parameter, declaration order
+    outer: List[str]
+    inner: List[str]
+    max_size: int
+    filled: np.ndarray  # filled[size - 1, index]
+    cell: CodeType
+    predicates: List[Predicate]
+    layers: Dict[int, Tuple[int, int]] = field(default_factory=dict)  # layer -> (size, cutoff)
+    weight_range: Optional[Tuple[float, float]] = None
+
+    def cells(self) -> int:
+        return int(self.filled.sum())
+
+
+def load_spec(source: Union[str, Path, Dict[str, Any]]) -> Spec:
+    """Read and check a spec (path or dict); ValueError with the offending entry if it is invalid."""
+    raw = json.loads(Path(source).read_text(encoding="utf-8")) if not isinstance(source, dict) else source
+    for key in ("parameters", "outer", "max_size", "cell", "constraints"):
+        if key not in raw:
+            raise ValueError(f"Spec is missing {key!r}.")
+
+    parameters: Dict[str, List[float]] = {}
+    for name, declared in raw["parameters"].items():
+        if not name.isidentifier() or name in FUNCTIONS or name in ("size", "index", "layer"):
+            raise ValueError(f"Invalid parameter name {name!r}.")
+        start, stop = declared["range"]
+        parameters[name] = list(f_iter(range(int(start), int(stop)), int(declared.get("steps", 1))))
+        if not parameters[name]:
+            raise ValueError(f"Parameter {name!r} has an empty range {declared['range']}.")
+    outer = list(raw["outer"])
+    unknown = [name for name in outer if name not in parameters]
+    if unknown:
+        raise ValueError(f"Unknown outer parameters: {unknown}.")
+    inner = [name for name in parameters if name not in outer]
+
+    max_size = int(raw["max_size"])
+    filled_code = _compile(raw.get("filled", "size > index"), "filled")
+    filled = np.array(
+        [[bool(_evaluate(filled_code, {"size": size, "index": index})) for index in range(max_size)]
+         for size in range(1, max_size + 1)]
+    )
+
+    layers: Dict[int, Tuple[int, int]] = {}
+    weight_range = None
+    if raw.get("layers"):
+        declared = raw["layers"]
+        size_code, cutoff_code = _compile(declared["size"], "layer size"), _compile(declared["cutoff"], "cutoff")
+        for layer in range(int(declared["first"]), int(declared["last"]) + 1):
+            size, cutoff = int(_evaluate(size_code, {"layer": layer})), int(_evaluate(cutoff_code, {"layer": layer}))
+            if not 1 <= size <= max_size or not all(filled[size - 1, :cutoff]) or cutoff > max_size:
+                raise ValueError(f"Layer {layer}: column {size} has no {cutoff} filled cells (max_size={max_size}).")
+            layers[layer] = (size, cutoff)
+        if declared.get("weight_range") is not None:
+            low, high = declared["weight_range"]
+            weight_range = (float(low), float(high))
+
+    spec = Spec(
+        raw=raw,
+        parameters=parameters,
+        outer=outer,
+        inner=inner,
+        max_size=max_size,
+        filled=filled,
+        cell=_compile(raw["cell"], "cell"),
+        predicates=[],
+        layers=layers,
+        weight_range=weight_range,
+    )
+    spec.predicates = compile_constraints(spec, raw["constraints"])
+    return spec
+
+
+def constraint_cost(tree: ast.AST, spec: Spec) -> int:
+    """Cells a constraint reads: cell/weight/total/diff calls with constant arguments, else the whole table."""
+    cost = 0
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            constant = all(isinstance(arg, ast.Constant) for arg in node.args)
+            if node.func.id in CELL_READERS:
+                cost += CELL_READERS[node.func.id] if constant else spec.cells()
+            elif node.func.id in COLUMN_READERS:
+                cost += COLUMN_READERS[node.func.id] * spec.max_size if constant else spec.cells()
+    return min(cost, spec.cells())
+
+
+def compile_constraints(spec: Spec, constraints: Sequence[str]) -> List[Predicate]:
+    """Predicates sorted cheapest first (stable, so equal costs keep the spec order)."""
+    names = set(FUNCTIONS) | set(spec.parameters) | set(Block.HELPERS)
+    predicates = []
+    for source in constraints:
+        tree = _parse(source, "constraint")
+        bound = {target.id for node in ast.walk(tree) if isinstance(node, ast.comprehension)
+                 for target in ast.walk(node.target) if isinstance(target, ast.Name)}
+        unknown = sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} - names - bound)
+        if unknown:
+            raise ValueError(f"Constraint {source!r} uses unknown names: {unknown}.")
+        predicates.append(Predicate(source, _compile(source, "constraint", tree), constraint_cost(tree, spec)))
+    return sorted(predicates, key=lambda predicate: predicate.cost)
+
+
+class Block:
+    """Candidates of one outer point; cells are computed on demand and shrink with the candidates."""
+
+    HELPERS = ("cell", "total", "diff", "weight", "layers", "cutoff", "all_of", "nonincreasing", "nondecreasing")
+
+    def __init__(self, spec: Spec, params: Dict[str, np.ndarray]):
+        self.spec = spec
+        self.params = params
+        self.size = len(next(iter(params.values()))) if params else 0
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}
+        self.names: Dict[str, Any] = {name: getattr(self, name) for name in self.HELPERS}
+
+    def _evaluate_cells(self, size: int, indices: Sequence[int]) -> None:
+        """Evaluate the formula for several cells of a column at once (index as a column vector)."""
+        index = np.asarray(indices)[:, None] if len(indices) > 1 else indices[0]
+        params = {name: values[None, :] if len(indices) > 1 else values for name, values in self.params.items()}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = _evaluate(self.spec.cell, {"size": size, "index": index, **params})
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), (len(indices), self.size))
+        for row, i in enumerate(indices):
+            self._cells[(size, i)] = values[row]
+
+    def cell(self, size: int, index: int) -> np.ndarray:
+        key = (size, index)
+        if key not in self._cells:
+            if not (1 <= size <= self.spec.max_size and 0 <= index < self.spec.max_size):
+                limit = self.spec.max_size
+                raise ValueError(f"cell({size}, {index}) is outside the {limit}x{limit} table.")
+            if not self.spec.filled[size - 1, index]:
+                self._cells[key] = np.zeros(self.size)
+            else:
+                self._evaluate_cells(size, [index])
+        return self._cells[key]
+
+    def column(self, size: int) -> List[np.ndarray]:
+        missing = [i for i in np.flatnonzero(self.spec.filled[size - 1]).tolist() if (size, i) not in self._cells]
+        if missing:
+            self._evaluate_cells(size, missing)
+        return [self.cell(size, index) for index in range(self.spec.max_size)]
+
+    def total(self, size: int) -> np.ndarray:
+        """Column sum (SUMME in weight_dist_bruteforce.py)."""
+        return np.sum(self.column(size), axis=0)
+
+    def diff(self, size: int) -> np.ndarray:
+        """total(size) - total(size - 1) (DIFF)."""
+        return self.total(size) - self.total(size - 1)
+
+    def weight(self, layer: int, rank: int) -> np.ndarray:
+        size, _cutoff = self.spec.layers[layer]
+        return self.cell(size, rank)
+
+    def layers(self) -> List[int]:
+        return list(self.spec.layers)
+
+    def cutoff(self, layer: int) -> int:
+        return self.spec.layers[layer][1]
+
+    def all_of(self, conditions: Iterable[Any]) -> np.ndarray:
+        ok = np.ones(self.size, dtype=bool)
+        for condition in conditions:
+            ok &= condition
+        return ok
+
+    def nonincreasing(self, values: Iterable[np.ndarray]) -> np.ndarray:
+        values = list(values)
+        return self.all_of(left >= right for left, right in zip(values, values[1:]))
+
+    def nondecreasing(self, values: Iterable[np.ndarray]) -> np.ndarray:
+        values = list(values)
+        return self.all_of(left <= right for left, right in zip(values, values[1:]))
+
+    def check(self, predicate: Predicate) -> np.ndarray:
+        ok = _evaluate(predicate.code, {**self.params, **self.names})
+        return np.broadcast_to(np.asarray(ok, dtype=bool), (self.size,))
+
+    def table(self) -> np.ndarray:
+        """table[c, size - 1, index] for all filled cells (0 elsewhere)."""
+        return np.stack([np.stack(self.column(size), axis=1) for size in range(1, self.spec.max_size + 1)], axis=1)
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.params = {name: values[mask] for name, values in self.params.items()}
+        self._cells = {key: values[mask] for key, values in self._cells.items()}
+        self.size = int(mask.sum())
+
+
+def layer_weights(spec: Spec, table: np.ndarray) -> WeightsByLayer:
+    """weights_by_layer for one table (table[size - 1, index]), as in weights_for_layer."""
+    return {layer: [int(v) for v in table[size - 1, :cutoff]] for layer, (size, cutoff) in spec.layers.items()}
+
+
+def valid_tables(spec: Spec, block: Block) -> Tuple[np.ndarray, np.ndarray]:
+    """(mask, tables): finite, integral table and (with layers) weights inside weight_range."""
+    tables = block.table()
+    filled = np.broadcast_to(spec.filled, tables.shape)
+    ok = np.all(np.isfinite(tables) | ~filled, axis=(1, 2))
+    with np.errstate(invalid="ignore"):
+        ok &= np.all((tables == np.round(tables)) | ~filled, axis=(1, 2))
+        if spec.layers and spec.weight_range is not None:
+            low, high = spec.weight_range
+            for size, cutoff in spec.layers.values():
+                weights = tables[:, size - 1, :cutoff]
+                ok &= np.all((weights >= low) & (weights <= high), axis=1)
+    return ok, tables
+
+
+def search_chunk(spec: Spec, chunk: Sequence[Sequence[float]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Matches of a chunk of outer points as one block, in loop order (outer points in chunk
+    order, then the inner grid with the first inner parameter outermost); and the candidates
+    each predicate (then the validity check) rejected.
+    """
+    inner_grid = np.meshgrid(*(np.asarray(spec.parameters[name]) for name in spec.inner), indexing="ij")
+    inner = {name: values.reshape(-1) for name, values in zip(spec.inner, inner_grid)}
+    count = math.prod(len(spec.parameters[name]) for name in spec.inner)
+    params = {name: np.tile(values, len(chunk)) for name, values in inner.items()}
+    outer = np.asarray(chunk, dtype=np.float64).reshape(len(chunk), len(spec.outer))
+    for column, name in enumerate(spec.outer):
+        params[name] = np.repeat(outer[:, column], count)
+    block = Block(spec, params)
+
+    rejected = [0] * (len(spec.predicates) + 1)
+    for position, predicate in enumerate(spec.predicates):
+        if not block.size:
+            return [], rejected
+        ok = block.check(predicate)
+        rejected[position] += block.size - int(ok.sum())
+        block.keep(ok)
+    if not block.size:
+        return [], rejected
+    ok, tables = valid_tables(spec, block)
+    rejected[-1] += block.size - int(ok.sum())
+
+    matches = []
+    for c in np.flatnonzero(ok).tolist():
+        table = tables[c]
+        match: Dict[str, Any] = {
+            "parameters": {name: _plain(block.params[name][c]) for name in spec.parameters},
+            "table": [[int(v) for v in table[size - 1, :size]] for size in range(1, spec.max_size + 1)],
+        }
+        if spec.layers:
+            match["weights_by_layer"] = layer_weights(spec, table)
+        matches.append(match)
+    return matches, rejected
+
+
+def _plain(value: Any) -> Union[int, float]:
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+_WORKER_SPEC: Optional[Spec] = None
+
+
+def _init_worker(raw: Dict[str, Any]) -> None:
+    global _WORKER_SPEC
+    _WORKER_SPEC = load_spec(raw)  # code objects do not pickle, so each worker compiles the spec once
+
+
+def _search_chunk_in_worker(chunk: Sequence[Sequence[float]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    assert _WORKER_SPEC is not None
+    return search_chunk(_WORKER_SPEC, chunk)
+
+
+@dataclass
+class SearchResult:
+    matches: List[Dict[str, Any]]
+    candidates: int
+    rejected: Dict[str, int]  # predicate source (cheapest first) -> candidates dropped
+    seconds: float
+
+
+def search(spec: Spec, workers: int = 1, chunk_size: int = CHUNK_SIZE) -> SearchResult:
+    """
+    Whole grid; outer points in chunks, on a process pool if workers > 1.
+    Matches come in loop order (outer parameters in "outer" order, then the inner ones)
+    whatever the number of workers.
+    """
+    started = time.time()
+    points = list(itertools.product(*(spec.parameters[name] for name in spec.outer)))
+    size = max(1, chunk_size)
+    chunks = [points[start:start + size] for start in range(0, len(points), size)]
+    workers = max(1, min(workers, len(chunks)))
+
+    matches: List[Dict[str, Any]] = []
+    rejected = [0] * (len(spec.predicates) + 1)
+    last_report = time.time()
+
+    def collect(done: int, result: Tuple[List[Dict[str, Any]], List[int]]) -> None:
+        nonlocal rejected, last_report
+        matches.extend(result[0])
+        rejected = [a + b for a, b in zip(rejected, result[1])]
+        if time.time() - last_report >= PROGRESS_SECONDS:
+            last_report = time.time()
+            elapsed = last_report - started
+            print(f"[{done}/{len(chunks)} chunks] {len(matches)} matches, {elapsed:.0f}s", file=sys.stderr)
+
+    if workers == 1:
+        for done, chunk in enumerate(chunks, start=1):
+            collect(done, search_chunk(spec, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec.raw,)) as pool:
+            for done, result in enumerate(pool.map(_search_chunk_in_worker, chunks), start=1):
+                collect(done, result)
+
+    inner = math.prod(len(spec.parameters[name]) for name in spec.inner)
+    sources = [predicate.source for predicate in spec.predicates] + [VALIDITY]
+    return SearchResult(matches, len(points) * inner, dict(zip(sources, rejected)), time.time() - started)
+
+
+def distinct_tables(matches: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Matches grouped by weights_by_layer (or the whole table), in order of first appearance."""
+    groups: Dict[str, Dict[str, Any]] = {}
+    for match in matches:
+        tables = match.get("weights_by_layer", match["table"])
+        key = json.dumps(tables)
+        if key not in groups:
+            groups[key] = {"tables": tables, "count": 0, "parameters": []}
+        group = groups[key]
+        group["count"] += 1
+        if len(group["parameters"]) < MAX_LISTED_PARAMETERS:
+            group["parameters"].append(match["parameters"])
+    return list(groups.values())
+
+
+def format_python(weights_by_layer: WeightsByLayer) -> str:
+    """The literal in topic_tags_assignment.weights_for_layer."""
+    lines = ["weights_by_layer: Dict[int, List[int]] = {"]
+    lines += [f"    {layer}: {weights}," for layer, weights in weights_by_layer.items()]
+    return "\n".join(lines + ["}"])
+
+
+def format_java(weights_by_layer: WeightsByLayer) -> str:
+    """
+    The map in OpenAiTagMatchingClient.weightsForLayerEquivalent. The Java client clamps
+    layerEq to JAVA_LAYERS (3..8), so only those layers are emitted.
+    """
+    missing = [layer for layer in JAVA_LAYERS if layer not in weights_by_layer]
+    if missing:
+        raise ValueError(f"The Java map needs layers {JAVA_LAYERS.start}..{JAVA_LAYERS.stop - 1}; missing {missing}.")
+    body = ",\n".join(
+        f"        {layer}, List.of(" + ", ".join(map(str, weights_by_layer[layer])) + ")" for layer in JAVA_LAYERS
+    )
+    return f"Map<Integer, List<Integer>> map = Map.of(\n{body}\n);"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Search weight tables declared in a constraint spec.")
+    parser.add_argument(
+        "--spec", type=Path, default=DEFAULT_SPEC, help="Spec file (default: weight_specs/weight_dist.json)."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)."
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE, help=f"Outer points per chunk (default: {CHUNK_SIZE})."
+    )
+    parser.add_argument("--format", choices=FORMATS, default="python", help="Printed table format (default: python).")
+    parser.add_argument(
+        "--show", type=int, default=DEFAULT_SHOW, help=f"Distinct tables printed (default: {DEFAULT_SHOW})."
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Write all distinct tables as JSON (default: none).")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args.spec)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"Invalid spec {args.spec}: {exc}", file=sys.stderr)
+        return 2
+
+    result = search(spec, workers=args.workers, chunk_size=args.chunk_size)
+    groups = distinct_tables(result.matches)
+    print(f"{result.candidates} candidates, {len(result.matches)} matches, {len(groups)} distinct tables "
+          f"in {result.seconds:.1f}s.")
+    print("Rejected per predicate (cheapest first):")
+    for source, count in result.rejected.items():
+        print(f"  {count:>12}  {source}")
+
+    for number, group in enumerate(groups[: max(args.show, 0)], start=1):
+        print(f"\n# Table {number}: {group['count']} parameter sets, e.g. {group['parameters'][0]}")
+        tables = group["tables"]
+        if args.format == "json" or not spec.layers:
+            print(json.dumps(tables))
+        elif args.format == "java":
+            try:
+                print(format_java(tables))
+            except ValueError as exc:
+                print(f"{exc} Printing JSON instead.\n{json.dumps(tables)}")
+        else:
+            print(format_python(tables))
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "spec": str(args.spec),
+            "candidates": result.candidates,
+            "matches": len(result.matches),
+            "rejected": result.rejected,
+            "tables": groups,
+        }
+        args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"\nWrote {len(groups)} distinct tables to {args.output}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
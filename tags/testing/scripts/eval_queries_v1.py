@@ -3,12 +3,16 @@ from __future__ import annotations
 import csv
 import os
 import random
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "backend" / "src" / "main" / "resources" / "scripts"))
+from embedding_helpers.ann import DEFAULT_NPROBE, TagIndex, index_path_for  # noqa: E402
+from embedding_helpers.store import open_store  # noqa: E402
 
 ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = ROOT / "testing" / "data"
@@ -31,6 +35,10 @@ TOP_N_CANDIDATES = int(os.getenv("TOP_N_CANDIDATES", "250"))
 RELATIVE_MIN_FACTOR = float(os.getenv("RELATIVE_MIN_FACTOR", "0.333333"))
 ABS_MIN_PREFILTER = float(os.getenv("ABS_MIN_PREFILTER", "0.02"))
 TOP_FINAL = int(os.getenv("TOP_FINAL", "20"))
+# Opt-in: tag lookup through the persisted IVF index (embedding_helpers/ann.py) instead of scoring every
+# variant. Approximate, so results can differ from the exact default.
+QUERY_USE_ANN = os.getenv("QUERY_USE_ANN", "0") != "0"
+QUERY_ANN_NPROBE = int(os.getenv("QUERY_ANN_NPROBE", str(DEFAULT_NPROBE)))
 
 
 @dataclass(frozen=True)
@@ -131,10 +139,18 @@ def query_tag_weights(
 ) -> Dict[int, Tuple[str, float, float]]:
     order = np.argsort(tag_scores)[::-1]
     top_indices = order[: max(QUERY_TOP_K, 1)].tolist()
-    filtered = [i for i in top_indices if float(tag_scores[i]) >= QUERY_MIN_SIM]
+    return weigh_query_tags([(i, float(tag_scores[i])) for i in top_indices], tags)
+
+
+def weigh_query_tags(
+    top: List[Tuple[int, float]], tags: List[Tag]
+) -> Dict[int, Tuple[str, float, float]]:
+    """Softmax weights for the top (tag index, score) pairs above QUERY_MIN_SIM (at least the best one)."""
+    scores_by_index = dict(top)
+    filtered = [i for i, score in top if score >= QUERY_MIN_SIM]
     if not filtered:
-        filtered = [top_indices[0]]
-    kept_scores = np.array([float(tag_scores[i]) for i in filtered], dtype=float)
+        filtered = [top[0][0]]
+    kept_scores = np.array([scores_by_index[i] for i in filtered], dtype=float)
     weights = softmax(kept_scores, QUERY_TEMP)
     output: Dict[int, Tuple[str, float, float]] = {}
     for local_idx, (idx, weight) in enumerate(zip(filtered, weights)):
@@ -153,16 +169,21 @@ def main() -> None:
     if not tags or not topics or not assignments:
         raise SystemExit("Missing tags, topics, or assignments.")
 
-    model = SentenceTransformer(MODEL_NAME)
+    store = open_store(MODEL_NAME)  # only strings not embedded before are encoded
     tag_inputs, tag_variant_indices = build_tag_variants(tags)
     topic_inputs = [topic_text(topic) for topic in topics]
 
-    tag_variant_emb = model.encode(
-        tag_inputs, normalize_embeddings=True, show_progress_bar=True
-    )
-    topic_emb = model.encode(
-        topic_inputs, normalize_embeddings=True, show_progress_bar=True
-    )
+    tag_index = None
+    if QUERY_USE_ANN:
+        tag_index = TagIndex.open(
+            [(tag.tag_id, tag.name, tag.synonyms) for tag in tags],
+            store,
+            index_path_for(TAGS_PATH, MODEL_NAME),
+        )
+        tag_position = {tag.tag_id: idx for idx, tag in enumerate(tags)}
+    else:
+        tag_variant_emb = store.encode(tag_inputs)
+    topic_emb = store.encode(topic_inputs)
 
     topic_by_id = {topic.topic_id: topic for topic in topics}
     topic_index = {topic.topic_id: idx for idx, topic in enumerate(topics)}
@@ -227,20 +248,34 @@ def main() -> None:
         log.write(f"Assignments: {len(assignments)}\n\n")
         log.write(
             f"Query sample: {sample_size} of {len(queries)} "
-            f"(seed={QUERY_SAMPLE_SEED or 'none'})\n\n"
+            f"(seed={QUERY_SAMPLE_SEED or 'none'})\n"
         )
-
-        for qi, query in enumerate(selected_queries, start=1):
-            query_emb = model.encode([query], normalize_embeddings=True)[0]
-            variant_scores = (query_emb @ tag_variant_emb.T).ravel()
-            tag_scores = np.array(
-                [
-                    float(np.median(variant_scores[indices]))
-                    for indices in tag_variant_indices
-                ],
-                dtype=float,
+        query_embs = store.encode(selected_queries)  # one call: new queries are stored with one index write
+        if tag_index is not None:
+            report = tag_index.recall(query_embs, QUERY_TOP_K, nprobe=QUERY_ANN_NPROBE)
+            log.write(
+                f"Tag lookup: ANN ({tag_index.summary()}, nprobe={QUERY_ANN_NPROBE}); "
+                f"recall@{QUERY_TOP_K}={report['recall']:0.3f} vs exact, "
+                f"{report['ann_ms']:0.3f} ms/query vs {report['exact_ms']:0.3f} ms/query\n"
             )
-            tag_weights = query_tag_weights(tag_scores, tags)
+        else:
+            log.write("Tag lookup: exact\n")
+        log.write("\n")
+
+        for qi, (query, query_emb) in enumerate(zip(selected_queries, query_embs), start=1):
+            if tag_index is not None:
+                hits = tag_index.search(query_emb, max(QUERY_TOP_K, 1), nprobe=QUERY_ANN_NPROBE)[0]
+                tag_weights = weigh_query_tags([(tag_position[tag_id], score) for tag_id, score in hits], tags)
+            else:
+                variant_scores = (query_emb @ tag_variant_emb.T).ravel()
+                tag_scores = np.array(
+                    [
+                        float(np.median(variant_scores[indices]))
+                        for indices in tag_variant_indices
+                    ],
+                    dtype=float,
+                )
+                tag_weights = query_tag_weights(tag_scores, tags)
 
             log.write(f"=== Query {qi} ===\n{query}\n")
             log.write("Top query tags:\n")
@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import csv
 import os
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "backend" / "src" / "main" / "resources" / "scripts"))
+from embedding_helpers.store import open_store  # noqa: E402
 
 ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = ROOT / "testing" / "data"
@@ -106,16 +109,12 @@ def main() -> None:
     if not topics:
         raise SystemExit("No topics found.")
 
-    model = SentenceTransformer(MODEL_NAME)
+    store = open_store(MODEL_NAME)  # only strings not embedded before are encoded
     tag_inputs, tag_variant_indices = build_tag_variants(tags)
     topic_inputs = [topic_text(topic) for topic in topics]
 
-    tag_variant_emb = model.encode(
-        tag_inputs, normalize_embeddings=True, show_progress_bar=True
-    )
-    topic_emb = model.encode(
-        topic_inputs, normalize_embeddings=True, show_progress_bar=True
-    )
+    tag_variant_emb = store.encode(tag_inputs)
+    topic_emb = store.encode(topic_inputs)
     sim = topic_emb @ tag_variant_emb.T
 
     tag_scores = np.empty((len(topics), len(tags)), dtype=float)
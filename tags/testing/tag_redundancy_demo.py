@@ -3,12 +3,18 @@ from __future__ import annotations
 from pathlib import Path
 from typing import List, Tuple
 import csv
+import sys
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend" / "src" / "main" / "resources" / "scripts"))
+from embedding_helpers import similarity  # noqa: E402
+from embedding_helpers.store import open_store  # noqa: E402
 
 # User-configurable output settings
 TOP_SIMILAR_PAIRS = 40
+SIMILARITY_BLOCK_MB = 64  # similarities are computed in row blocks of at most this size, never as full matrices
 REDUNDANCY_THRESHOLD = 0.78
+REDUNDANCY_SWEEP: List[float] = []  # e.g. [0.9, 0.85, 0.8, 0.75]: show how groups form across thresholds
 TOP_TAGS_PER_TOPIC = 5
 TOPICS_PER_RANK_OUTPUT = 30
 SORT_BY_RANK = 2
@@ -47,41 +53,30 @@ TAGS_CSV_PATH = Path(__file__).resolve().parent / "data" / "t_tag_PLANNING.txt"
 TOPICS_CSV_PATH = Path(__file__).resolve().parent / "data" / "t_topic_PLANNING.csv"
 
 
-def top_pairs(sim: np.ndarray, labels: List[str], k: int = 10) -> List[Tuple[float, str, str]]:
+def block_bytes() -> int:
+    return SIMILARITY_BLOCK_MB * 1024 * 1024
+
+
+def top_pairs(emb: np.ndarray, labels: List[str], k: int = 10) -> List[Tuple[float, str, str]]:
     """Return top-k most similar distinct pairs (i<j)."""
-    excluded = {
-        frozenset((a.casefold(), b.casefold())) for a, b in EXCLUDED_TOP_PAIRS
-    }
-    n = sim.shape[0]
-    pairs: List[Tuple[float, str, str]] = []
-    for i in range(n):
-        for j in range(i + 1, n):
-            pair_key = frozenset((labels[i].casefold(), labels[j].casefold()))
-            if pair_key in excluded:
-                continue
-            pairs.append((float(sim[i, j]), labels[i], labels[j]))
-    pairs.sort(key=lambda t: t[0], reverse=True)
-    return pairs[:k]
+    block_rows = similarity.block_rows_for(len(labels), block_bytes())
+    return similarity.top_pairs_blocked(emb, labels, k, excluded=EXCLUDED_TOP_PAIRS, block_rows=block_rows)
 
 
 def top_topic_tag_sets(
-    sim: np.ndarray,
+    topic_emb: np.ndarray,
+    tag_emb: np.ndarray,
     topic_labels: List[str],
     top_n: int,
 ) -> List[Tuple[float, str, List[int], List[float]]]:
     """Return topics with their top-N tag indices/scores (sorted elsewhere)."""
-    if top_n < 1 or sim.size == 0:
+    if top_n < 1 or len(topic_emb) == 0 or len(tag_emb) == 0:
         return []
 
-    limit = min(top_n, sim.shape[1])
+    indices, scores = similarity.top_per_row(topic_emb, tag_emb, top_n, max_bytes=block_bytes())
     results: List[Tuple[float, str, List[int], List[float]]] = []
-    for topic_idx, topic_name in enumerate(topic_labels):
-        scores = sim[topic_idx]
-        order = np.argsort(scores)[::-1]
-        top_indices = order[:limit].tolist()
-        top_scores = [float(scores[i]) for i in top_indices]
-        nth_score = top_scores[-1]
-        results.append((nth_score, topic_name, top_indices, top_scores))
+    for topic_name, top_indices, top_scores in zip(topic_labels, indices.tolist(), scores.tolist()):
+        results.append((top_scores[-1], topic_name, top_indices, top_scores))
 
     return results
 
@@ -89,7 +84,7 @@ def top_topic_tag_sets(
 def expand_group(
     seed_indices: List[int],
     candidate_indices: List[int],
-    sim: np.ndarray,
+    sim: similarity.PairScores,
     threshold: float,
 ) -> set[int]:
     group = set(seed_indices)
@@ -112,7 +107,7 @@ def expand_group(
 def build_primary_group(
     seed_idx: int,
     candidate_indices: List[int],
-    sim: np.ndarray,
+    sim: similarity.PairScores,
 ) -> set[int]:
     if len(candidate_indices) < 2:
         return {seed_idx}
@@ -135,7 +130,7 @@ def build_primary_group(
 
 def split_tag_groups(
     top_indices: List[int],
-    tag_sim: np.ndarray,
+    tag_sim: similarity.PairScores,
 ) -> Tuple[List[int], List[int], List[int]]:
     if not top_indices:
         return [], [], []
@@ -212,52 +207,45 @@ def summarize_tag_assignments(
         print(f"{count:6.2f}  {tag}")
 
 
-def redundancy_groups(sim: np.ndarray, labels: List[str], threshold: float) -> List[List[str]]:
-    """
-    Simple graph-based clustering:
-    connect i<->j if sim >= threshold, return connected components.
-    """
-    n = sim.shape[0]
-    visited = [False] * n
+def label_groups(components: List[List[int]], labels: List[str]) -> List[List[str]]:
+    """Index groups -> sorted label groups (duplicates removed), largest first, then by name."""
     groups: List[List[str]] = []
     seen_groups = set()
-
-    adjacency = [[] for _ in range(n)]
-    for i in range(n):
-        for j in range(i + 1, n):
-            if sim[i, j] >= threshold:
-                adjacency[i].append(j)
-                adjacency[j].append(i)
-
-    for start in range(n):
-        if visited[start]:
-            continue
-        # BFS/DFS
-        stack = [start]
-        visited[start] = True
-        component = [start]
-        while stack:
-            v = stack.pop()
-            for nb in adjacency[v]:
-                if not visited[nb]:
-                    visited[nb] = True
-                    stack.append(nb)
-                    component.append(nb)
-
-        # Only output non-trivial groups (size>1)
-        if len(component) > 1:
-            group = sorted({labels[i] for i in component}, key=str.lower)
-            if len(group) > 1:
-                key = tuple(item.lower() for item in group)
-                if key not in seen_groups:
-                    seen_groups.add(key)
-                    groups.append(group)
+    for component in components:
+        group = sorted({labels[i] for i in component}, key=str.lower)
+        if len(group) > 1:
+            key = tuple(item.lower() for item in group)
+            if key not in seen_groups:
+                seen_groups.add(key)
+                groups.append(group)
 
     # Sort groups by size desc, then name
     groups.sort(key=lambda g: (-len(g), g[0].lower()))
     return groups
 
 
+def redundancy_groups(emb: np.ndarray, labels: List[str], threshold: float) -> List[List[str]]:
+    """
+    Simple graph-based clustering:
+    connect i<->j if sim >= threshold, return connected components (union-find over the edge list).
+    """
+    rows, cols, _scores = similarity.threshold_edges(emb, threshold, max_bytes=block_bytes())
+    return label_groups(similarity.connected_groups(len(labels), rows, cols), labels)
+
+
+def print_redundancy_sweep(emb: np.ndarray, labels: List[str], thresholds: List[float]) -> None:
+    """Groups for several thresholds in one pass; per threshold only groups that are new or grew."""
+    print("\nRedundanz-Gruppen nach Schwelle (neu oder gewachsen):")
+    previous: set[Tuple[str, ...]] = set()
+    for threshold, components in similarity.redundancy_sweep(emb, thresholds, max_bytes=block_bytes()):
+        groups = label_groups(components, labels)
+        print(f"cosine >= {threshold}: {len(groups)} Gruppen, {sum(len(g) for g in groups)} Tags")
+        for g in groups:
+            if tuple(g) not in previous:
+                print("  + " + ", ".join(g))
+        previous = {tuple(g) for g in groups}
+
+
 def load_tags_from_csv(csv_path: Path) -> List[str]:
     tags: List[str] = []
     with csv_path.open("r", encoding="utf-8", newline="") as handle:
@@ -291,24 +279,19 @@ def main() -> None:
     topics = load_topics_from_csv(TOPICS_CSV_PATH)
 
     model_name = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
-    model = SentenceTransformer(model_name)
+    store = open_store(model_name)  # only strings not embedded before are encoded
 
     # Embeddings (normalize_embeddings=True -> cosine = dot product)
-    tag_emb = model.encode(tags, normalize_embeddings=True)
-    if topics:
-        topic_emb = model.encode(topics, normalize_embeddings=True)
-        topic_tag_sim = topic_emb @ tag_emb.T
-    else:
-        topic_emb = np.empty((0, tag_emb.shape[1]), dtype=tag_emb.dtype)
-        topic_tag_sim = np.empty((0, tag_emb.shape[0]), dtype=tag_emb.dtype)
+    emb = store.encode(tags + topics)  # one call: new strings are stored with one index write
+    tag_emb, topic_emb = emb[: len(tags)], emb[len(tags) :]
 
-    sim = tag_emb @ tag_emb.T  # because normalized
+    sim = similarity.PairScores(tag_emb)  # single tag-tag scores; full matrices are never built
 
     print("\nTop aehnlichste Paare:")
-    for score, a, b in top_pairs(sim, tags, k=TOP_SIMILAR_PAIRS):
+    for score, a, b in top_pairs(tag_emb, tags, k=TOP_SIMILAR_PAIRS):
         print(f"{score:0.3f}  {a}\t<-> {b}")
 
-    groups = redundancy_groups(sim, tags, threshold=REDUNDANCY_THRESHOLD)
+    groups = redundancy_groups(tag_emb, tags, threshold=REDUNDANCY_THRESHOLD)
 
     print(f"\nRedundanz-Gruppen (cosine >= {REDUNDANCY_THRESHOLD}):")
     if not groups:
@@ -316,12 +299,15 @@ def main() -> None:
     else:
         for g in groups:
             print("- " + ", ".join(g))
+    if REDUNDANCY_SWEEP:
+        print_redundancy_sweep(tag_emb, tags, REDUNDANCY_SWEEP)
 
     if not topics:
         print("\n(keine Topics gefunden)")
     else:
         top_sets = top_topic_tag_sets(
-            sim=topic_tag_sim,
+            topic_emb=topic_emb,
+            tag_emb=tag_emb,
             topic_labels=topics,
             top_n=TOP_TAGS_PER_TOPIC,
         )
@@ -372,7 +358,7 @@ def main() -> None:
             )
 
     # Optional: vollstaendige Matrix ausgeben (fuer kleine n)
-    # print("\nSimilarity Matrix:\n", np.round(sim, 3))
+    # print("\nSimilarity Matrix:\n", np.round(tag_emb @ tag_emb.T, 3))
 
 
 if __name__ == "__main__":